@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of hit hydration + build_prompt, legacy vs example table.
+
+For every few-shot example, the 25 nearest examples are retrieved once and
+their vector-store rows are kept. The prompt is then built repeatedly from
+those rows in two ways:
+
+- legacy: each row carries the config as a JSON string, which is parsed
+  (json.loads) and re-serialized (json.dumps, indented) for every hit
+- table:  each row is hydrated by example_id from the in-memory example
+  table, whose few-shot blocks were rendered once at load time
+
+Both paths must produce the same prompt text; the script checks that and
+reports the per-prompt build time (mean/p50/p95) and the speedup. The LLM
+is not called.
+
+Usage:
+    python scripts/benchmark_build_prompt.py
+    python scripts/benchmark_build_prompt.py --repeat 50
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from canvasxpress_generator import CanvasXpressGenerator
+
+
+def summarize(label: str, values: list, unit: str = ""):
+    ordered = sorted(values)
+    p95 = ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+    print(f"  {label:28s} mean {statistics.mean(ordered):9.3f}{unit}   "
+          f"p50 {statistics.median(ordered):9.3f}{unit}   p95 {p95:9.3f}{unit}")
+
+
+def legacy_hydrate(rows: list) -> list:
+    """Hit hydration as done before the example table: parse each stored config."""
+    return [
+        {
+            "description": row["description"],
+            "config": json.loads(row["config"]),
+            "headers": row["headers"],
+            "type": row["type"],
+            "score": row["score"],
+        }
+        for row in rows
+    ]
+
+
+def table_hydrate(generator, rows: list) -> list:
+    """Hit hydration by example_id from the pre-rendered example table."""
+    return [generator.example_table.get(row["example_id"], row["description"], row["score"]) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark build_prompt with and without the example table")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="Prompt builds per example and path (default: 20)")
+    parser.add_argument("--num-examples", type=int, default=25,
+                        help="Retrieved examples per prompt (default: 25)")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    generator = CanvasXpressGenerator(
+        data_dir=os.path.join(project_root, 'data'),
+        vector_db_path=os.path.join(project_root, 'vector_db', 'canvasxpress_mcp.db')
+    )
+
+    print("=" * 70)
+    print("⏱️  build_prompt Micro-benchmark (legacy vs example table)")
+    print("=" * 70)
+    print(f"🔢 Examples: {len(generator.examples)}  |  Hits per prompt: {args.num_examples}  |  "
+          f"Repeats: {args.repeat}")
+    print("=" * 70)
+
+    # Retrieve once; keep each hit as the row the vector store used to return
+    requests = []
+    for example in generator.examples:
+        hits = generator.get_similar_examples(example["description"], num_examples=args.num_examples)
+        rows = [
+            {
+                "example_id": hit["example_id"],
+                "description": hit["description"],
+                "config": json.dumps(hit["config"]),
+                "headers": hit["headers"],
+                "type": hit["type"],
+                "score": hit["score"],
+            }
+            for hit in hits
+        ]
+        requests.append((example["description"], example.get("headers"), rows))
+
+    legacy_ms, table_ms, mismatches = [], [], 0
+    for description, headers, rows in requests:
+        legacy_prompt = generator.build_prompt(description, headers, legacy_hydrate(rows))
+        table_prompt = generator.build_prompt(description, headers, table_hydrate(generator, rows))
+        if legacy_prompt != table_prompt:
+            mismatches += 1
+
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            generator.build_prompt(description, headers, legacy_hydrate(rows))
+            legacy_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            generator.build_prompt(description, headers, table_hydrate(generator, rows))
+            table_ms.append((time.perf_counter() - start) * 1000)
+
+    print("\n⏱️  HYDRATE + BUILD_PROMPT (per prompt):")
+    summarize("legacy (json.loads/dumps)", legacy_ms, " ms")
+    summarize("example table", table_ms, " ms")
+    print(f"\n   Speedup: {statistics.mean(legacy_ms) / statistics.mean(table_ms):.2f}x (mean)")
+
+    if mismatches:
+        print(f"\n❌ {mismatches} of {len(requests)} prompts differ between the two paths")
+        sys.exit(1)
+    print(f"\n✅ Prompts identical for all {len(requests)} examples")
+
+
+if __name__ == "__main__":
+    main()
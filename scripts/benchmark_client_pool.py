@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark pooled keep-alive OpenAI clients against a new client per request.
+
+Starts a local stub Azure OpenAI endpoint (no API key or network needed) and
+times chat completion calls made the way LLMProvider used to (a new
+AzureOpenAI client for every request) against the shared OpenAIClientPool.
+
+The stub speaks plain HTTP on localhost, so the measured savings cover
+client construction and TCP connection setup only; against the real TLS
+endpoints the DNS lookup and TLS handshake saved per request come on top.
+
+Usage:
+    python scripts/benchmark_client_pool.py
+    python scripts/benchmark_client_pool.py --requests 500 --latency-ms 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from openai import AzureOpenAI
+
+from llm_clients import OpenAIClientPool
+
+
+STUB_RESPONSE = json.dumps({
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{
+        "index": 0,
+        "finish_reason": "stop",
+        "message": {"role": "assistant", "content": "{\"graphType\": \"Bar\"}"}
+    }],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+}).encode("utf-8")
+
+
+def make_handler(latency: float):
+    """Build a request handler that answers every POST with a chat completion."""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True  # avoid delayed-ACK stalls on reused connections
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            if latency:
+                time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(STUB_RESPONSE)))
+            self.end_headers()
+            self.wfile.write(STUB_RESPONSE)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def call(client: AzureOpenAI):
+    """Issue one small chat completion."""
+    client.chat.completions.create(
+        model="gpt-4o-mini-global",
+        max_tokens=16,
+        temperature=0.0,
+        messages=[{"role": "user", "content": "bar chart"}]
+    )
+
+
+def run(num_requests: int, get_client) -> list:
+    """Time num_requests sequential calls and return per-request latencies in ms."""
+    latencies = []
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        call(get_client())
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(label: str, latencies: list):
+    """Print mean/p50/p95 latency for one mode."""
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"  {label:28s} mean {statistics.mean(ordered):7.2f} ms   "
+          f"p50 {statistics.median(ordered):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled OpenAI clients")
+    parser.add_argument("--requests", "-n", type=int, default=200,
+                        help="Requests per mode (default: 200)")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Simulated server latency per request (default: 0)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print("=" * 70)
+    print("⏱️  OpenAI Client Pool Benchmark")
+    print("=" * 70)
+    print(f"📡 Stub endpoint: {endpoint}")
+    print(f"🔢 Requests per mode: {args.requests}")
+    print("=" * 70)
+
+    def new_client():
+        return AzureOpenAI(api_version="2024-02-01", api_key="stub", azure_endpoint=endpoint)
+
+    pool = OpenAIClientPool(api_key="stub", api_version="2024-02-01", http2=False)
+
+    # Warm up both paths once (imports, first connection)
+    call(new_client())
+    call(pool.get(endpoint))
+
+    baseline = run(args.requests, new_client)
+    pooled = run(args.requests, lambda: pool.get(endpoint))
+
+    print("\n📊 RESULTS:")
+    summarize("new client per request", baseline)
+    summarize("pooled keep-alive client", pooled)
+    saved = statistics.mean(baseline) - statistics.mean(pooled)
+    print(f"\n✅ Saved per request: {saved:.2f} ms "
+          f"({saved / statistics.mean(baseline) * 100:.1f}% of mean latency)")
+    print(f"   Pool stats: {pool.stats()}")
+
+    pool.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
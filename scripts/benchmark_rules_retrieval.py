@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark retrieved rule chunks against the full canvasxpress_rules.md.
+
+Runs leave-one-out over the few-shot examples: each example's description
+is used as the query (its own entry is excluded from the retrieved
+examples) and the prompt is built with the full rules and with the
+retrieved rule chunks. Reports:
+
+- rules tokens per request (full vs retrieved) and the tokens saved
+- prompt build time with and without rules retrieval
+- how often each non-core chunk was selected
+- with --llm N: LLM latency and exact match for the first N examples, full
+  vs retrieved rules (uses the configured LLM provider)
+
+Token counts are estimates (about 4 characters per token).
+
+Usage:
+    python scripts/benchmark_rules_retrieval.py
+    python scripts/benchmark_rules_retrieval.py --top-k 1 --llm 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ["RULES_RETRIEVAL"] = "true"
+
+from canvasxpress_generator import CanvasXpressGenerator
+from schema_index import graph_types_in
+
+
+def summarize(label: str, values: list, unit: str = ""):
+    ordered = sorted(values)
+    p95 = ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+    print(f"  {label:28s} mean {statistics.mean(ordered):9.2f}{unit}   "
+          f"p50 {statistics.median(ordered):9.2f}{unit}   p95 {p95:9.2f}{unit}")
+
+
+def timed_generate(generator, system_prompt, prompt):
+    """Call the LLM; returns (latency ms, parsed config or {})."""
+    start = time.perf_counter()
+    try:
+        text = generator.llm_provider.generate(prompt=prompt, system_prompt=system_prompt)
+        config = json.loads(generator._extract_json_from_response(text))
+    except Exception as e:
+        print(f"   ⚠️  Generation failed: {e}")
+        config = {}
+    return (time.perf_counter() - start) * 1000, config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rules retrieval vs the full rules text")
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="Chunks retrieved by similarity (default: RULES_TOP_K or 2)")
+    parser.add_argument("--llm", type=int, default=0,
+                        help="Also time LLM calls for the first N examples (default: 0)")
+    args = parser.parse_args()
+
+    if args.top_k is not None:
+        os.environ["RULES_TOP_K"] = str(args.top_k)
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    generator = CanvasXpressGenerator(
+        data_dir=os.path.join(project_root, 'data'),
+        vector_db_path=os.path.join(project_root, 'vector_db', 'canvasxpress_mcp.db')
+    )
+    rules_index = generator.rules_index
+
+    print("=" * 70)
+    print("✂️  Rules Retrieval Benchmark (leave-one-out)")
+    print("=" * 70)
+    print(f"🔢 Examples: {len(generator.examples)}  |  Chunks: {len(rules_index.chunks)} "
+          f"({sum(1 for c in rules_index.chunks if c.core)} core)  |  top-k: {rules_index.top_k}")
+    print("=" * 70)
+
+    rules_tokens, saved, full_ms, retrieved_ms = [], [], [], []
+    chunk_counts = Counter()
+    llm = {"full": [], "retrieved": []}
+    for i, example in enumerate(generator.examples):
+        description = example["description"]
+        query_vector = generator.embedding_provider.encode_query(description)
+        similar = [
+            ex for ex in generator.get_similar_examples(description, num_examples=26, query_vector=query_vector)
+            if ex["description"] != description
+        ][:25]
+
+        start = time.perf_counter()
+        full_parts = generator.build_prompt_parts(
+            description, example.get("headers"), similar, query_vector=query_vector, prune_rules=False
+        )
+        full_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        trace = {}
+        retrieved_parts = generator.build_prompt_parts(
+            description, example.get("headers"), similar, query_vector=query_vector, trace=trace
+        )
+        retrieved_ms.append((time.perf_counter() - start) * 1000)
+        rules_tokens.append(trace["rules_tokens"])
+        saved.append(trace["rules_tokens_saved"])
+
+        # Same signals as build_prompt_parts, to see which chunks were picked
+        _, info = rules_index.select(
+            query_vector,
+            graph_types_in(description) + [ex["type"] for ex in similar[:generator.schema_type_examples]],
+            [key for ex in similar for key in ex["config"]]
+        )
+        chunk_counts.update(info["rules_chunks"])
+
+        if i < args.llm:
+            print(f"🤖 [{i + 1}/{args.llm}] {description[:60]}")
+            for label, (system_prompt, prompt) in (("full", full_parts), ("retrieved", retrieved_parts)):
+                latency, config = timed_generate(generator, system_prompt, prompt)
+                llm[label].append((latency, config == example["config"]))
+
+    print("\n📏 RULES TOKENS PER REQUEST (estimated):")
+    print(f"  {'full rules':28s} {rules_index.full_tokens:9d}")
+    summarize("retrieved chunks", rules_tokens)
+    summarize("tokens saved", saved)
+    print(f"\n   Rules reduced by {statistics.mean(saved) / rules_index.full_tokens * 100:.1f}% on average")
+
+    print("\n⏱️  PROMPT BUILD:")
+    summarize("full rules", full_ms, " ms")
+    summarize("retrieved rules", retrieved_ms, " ms")
+
+    print("\n📚 NON-CORE CHUNKS SELECTED:")
+    for title, count in chunk_counts.most_common():
+        print(f"  {count:4d}x  {title}")
+
+    if args.llm:
+        print(f"\n🤖 LLM ({args.llm} examples):")
+        for label, results in llm.items():
+            latencies = [latency for latency, _ in results]
+            exact = sum(1 for _, match in results if match) / len(results)
+            print(f"  {label:10s} latency mean {statistics.mean(latencies):8.1f} ms   "
+                  f"p50 {statistics.median(latencies):8.1f} ms   exact match {exact * 100:5.1f}%")
+
+
+if __name__ == "__main__":
+    main()
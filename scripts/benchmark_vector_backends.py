@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark the retrieval backends (Milvus Lite vs in-process NumPy index).
+
+Builds both indexes in a temporary directory from the same synthetic,
+normalized vectors (sized like the few-shot corpus by default), then times
+top-k searches and reports the storage/memory footprint of each backend.
+No embedding model or API key is needed.
+
+Usage:
+    python scripts/benchmark_vector_backends.py
+    python scripts/benchmark_vector_backends.py --vectors 2000 --dimension 1024 --queries 500
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from vector_index import create_vector_index
+
+
+def make_rows(vectors: np.ndarray) -> list:
+    """Build rows shaped like the few-shot collection."""
+    return [
+        {
+            "id": i,
+            "vector": vector.tolist(),
+            "description": f"Example description {i}",
+            "config": '{"graphType": "Bar"}',
+            "headers": "A,B,C",
+            "type": "Bar",
+            "example_id": i // 4,
+            "is_primary": i % 4 == 0,
+        }
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def time_searches(index, queries: np.ndarray, limit: int) -> list:
+    """Run one search per query and return latencies in ms."""
+    output_fields = ["description", "config", "headers", "type", "example_id"]
+    index.search([queries[0].tolist()], limit=limit, output_fields=output_fields)  # warm-up
+    latencies = []
+    for query in queries:
+        vector = query.tolist()
+        start = time.perf_counter()
+        index.search([vector], limit=limit, output_fields=output_fields)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def dir_size(path: Path) -> int:
+    """Total size in bytes of a file or directory tree."""
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def summarize(label: str, latencies: list):
+    """Print mean/p50/p95 latency for one backend."""
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"  {label:8s} search   mean {statistics.mean(ordered):8.3f} ms   "
+          f"p50 {statistics.median(ordered):8.3f} ms   p95 {p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Milvus Lite vs NumPy retrieval backends")
+    parser.add_argument("--vectors", type=int, default=400, help="Corpus size (default: 400)")
+    parser.add_argument("--dimension", type=int, default=1024, help="Vector dimension (default: 1024, BGE-M3)")
+    parser.add_argument("--queries", type=int, default=200, help="Number of timed searches (default: 200)")
+    parser.add_argument("--limit", type=int, default=100, help="Top-k per search (default: 100 = 25 examples x 4 wordings)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    corpus = rng.standard_normal((args.vectors, args.dimension)).astype(np.float32)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+    rows = make_rows(corpus)
+
+    print("=" * 70)
+    print("⏱️  Retrieval Backend Benchmark")
+    print("=" * 70)
+    print(f"🔢 Corpus: {args.vectors} x {args.dimension}  |  Queries: {args.queries}  |  top-k: {args.limit}")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        results = {}
+        for backend in ("milvus", "numpy"):
+            tracemalloc.start()
+            index = create_vector_index(backend, db_path)
+            index.create(args.dimension)
+            index.insert(rows)
+            latencies = time_searches(index, queries, args.limit)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            storage = Path(db_path) if backend == "milvus" else Path(db_path).with_name("bench_numpy")
+            results[backend] = (latencies, peak, dir_size(storage))
+
+        # Both backends must agree on the nearest neighbour
+        milvus_index = create_vector_index("milvus", db_path)
+        numpy_index = create_vector_index("numpy", db_path)
+        agree = sum(
+            milvus_index.search([q.tolist()], limit=1)[0][0]["id"] == numpy_index.search([q.tolist()], limit=1)[0][0]["id"]
+            for q in queries[:50]
+        )
+
+    print("\n📊 LATENCY:")
+    for backend, (latencies, _, _) in results.items():
+        summarize(backend, latencies)
+    speedup = statistics.mean(results["milvus"][0]) / statistics.mean(results["numpy"][0])
+    print(f"\n   NumPy is {speedup:.1f}x faster per search")
+
+    print("\n💾 MEMORY / STORAGE:")
+    for backend, (_, peak, storage) in results.items():
+        print(f"  {backend:8s} peak Python allocations {peak / 1e6:8.2f} MB   on disk {storage / 1e6:8.2f} MB")
+    print("   (Milvus Lite runs its server in a separate process, so its own RSS is not included above;")
+    print(f"    the NumPy matrix itself is {args.vectors * args.dimension * 4 / 1e6:.2f} MB, memory-mapped)")
+
+    print(f"\n✅ Top-1 agreement on 50 queries: {agree}/50")
+
+
+if __name__ == "__main__":
+    main()
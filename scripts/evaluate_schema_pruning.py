@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Evaluate retrieval-driven schema pruning against the full schema.
+
+Runs leave-one-out over the few-shot examples: each example's description is
+used as the query, its own entry is excluded from the retrieved examples,
+and the prompt is built once with the full schema.md and once with the
+pruned schema. Reports:
+
+- prompt size (estimated tokens) with the full and the pruned schema
+- key coverage: share of the expected config's parameters that are listed
+  in schema.md and kept by the pruned schema
+- with --llm N: exact match and key/value accuracy of LLM output for the
+  first N examples, full vs pruned (uses the configured LLM provider)
+
+Usage:
+    python scripts/evaluate_schema_pruning.py
+    python scripts/evaluate_schema_pruning.py --budget 1500 --llm 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ["SCHEMA_PRUNING"] = "true"
+
+from canvasxpress_generator import CanvasXpressGenerator
+from schema_index import estimate_tokens
+
+
+def key_accuracy(expected: dict, actual: dict) -> float:
+    """Share of expected key/value pairs reproduced exactly."""
+    if not expected:
+        return 1.0
+    return sum(1 for k, v in expected.items() if actual.get(k) == v) / len(expected)
+
+
+def generate(generator, system_prompt, prompt) -> dict:
+    """Call the LLM and parse its JSON output ({} on failure)."""
+    try:
+        text = generator.llm_provider.generate(prompt=prompt, system_prompt=system_prompt)
+        return json.loads(generator._extract_json_from_response(text))
+    except Exception as e:
+        print(f"   ⚠️  Generation failed: {e}")
+        return {}
+
+
+def summarize(label: str, values: list, unit: str = ""):
+    ordered = sorted(values)
+    p95 = ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+    print(f"  {label:28s} mean {statistics.mean(ordered):9.1f}{unit}   "
+          f"p50 {statistics.median(ordered):9.1f}{unit}   p95 {p95:9.1f}{unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate schema pruning vs the full schema")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="Schema token budget (default: SCHEMA_TOKEN_BUDGET or 2500)")
+    parser.add_argument("--llm", type=int, default=0,
+                        help="Also compare LLM output for the first N examples (default: 0)")
+    args = parser.parse_args()
+
+    if args.budget:
+        os.environ["SCHEMA_TOKEN_BUDGET"] = str(args.budget)
+
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    generator = CanvasXpressGenerator(
+        data_dir=os.path.join(project_root, 'data'),
+        vector_db_path=os.path.join(project_root, 'vector_db', 'canvasxpress_mcp.db')
+    )
+    schema_index = generator.schema_index
+
+    print("=" * 70)
+    print("✂️  Schema Pruning Evaluation (leave-one-out)")
+    print("=" * 70)
+    print(f"🔢 Examples: {len(generator.examples)}  |  Schema parameters: {len(schema_index.parameters)}  |  "
+          f"Budget: {schema_index.token_budget} tokens")
+    print("=" * 70)
+
+    full_tokens, pruned_tokens, select_ms, coverage = [], [], [], []
+    llm_results = {"full": [], "pruned": []}
+    for i, example in enumerate(generator.examples):
+        description = example["description"]
+        query_vector = generator.embedding_provider.encode_query(description)
+        similar = [
+            ex for ex in generator.get_similar_examples(description, num_examples=26, query_vector=query_vector)
+            if ex["description"] != description
+        ][:25]
+
+        full_system, full_prompt = generator.build_prompt_parts(
+            description, example.get("headers"), similar, query_vector=query_vector, prune_schema=False
+        )
+        start = time.perf_counter()
+        trace = {}
+        pruned_system, pruned_prompt = generator.build_prompt_parts(
+            description, example.get("headers"), similar, query_vector=query_vector, trace=trace
+        )
+        select_ms.append((time.perf_counter() - start) * 1000)
+        full_tokens.append(estimate_tokens((full_system or "") + full_prompt))
+        pruned_tokens.append(estimate_tokens((pruned_system or "") + pruned_prompt))
+
+        expected = example["config"]
+        schema_keys = [key for key in expected if key in schema_index.by_name]
+        if schema_keys:
+            kept = sum(1 for key in schema_keys if f"**{key}**" in pruned_prompt)
+            coverage.append(kept / len(schema_keys))
+
+        if i < args.llm:
+            print(f"🤖 [{i + 1}/{args.llm}] {description[:60]}")
+            for label, system_prompt, prompt in (
+                ("full", full_system, full_prompt), ("pruned", pruned_system, pruned_prompt)
+            ):
+                actual = generate(generator, system_prompt, prompt)
+                llm_results[label].append((actual == expected, key_accuracy(expected, actual)))
+
+    print("\n📏 PROMPT SIZE (estimated tokens):")
+    summarize("full schema", full_tokens)
+    summarize("pruned schema", pruned_tokens)
+    reduction = 1 - sum(pruned_tokens) / sum(full_tokens)
+    print(f"\n   Prompt reduced by {reduction * 100:.1f}% "
+          f"(schema ~{schema_index.full_tokens} tokens -> budget {schema_index.token_budget})")
+    summarize("pruning + prompt build", select_ms, " ms")
+
+    print("\n🎯 KEY COVERAGE (expected config keys present in pruned schema):")
+    print(f"   {statistics.mean(coverage) * 100:.1f}% over {len(coverage)} examples "
+          f"({sum(1 for c in coverage if c == 1.0)} fully covered)")
+
+    if args.llm:
+        print(f"\n🤖 LLM ACCURACY ({args.llm} examples):")
+        for label, results in llm_results.items():
+            exact = sum(1 for match, _ in results if match) / len(results)
+            keys = statistics.mean(acc for _, acc in results)
+            print(f"  {label:8s} exact match {exact * 100:5.1f}%   key/value accuracy {keys * 100:5.1f}%")
+
+
+if __name__ == "__main__":
+    main()
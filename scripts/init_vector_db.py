@@ -70,6 +70,10 @@ print("✅ Vector database initialized successfully!")
 print("=" * 60)
 print(f"\n📊 Examples loaded: {len(generator.examples)}")
 print(f"📁 Database location: {vector_db_path}")
+store = generator.embedding_provider.store_stats()
+if store:
+    print(f"💾 Embedding store: {store['path']} ({store['entries']} vectors, "
+          f"{store['hits']} reused, {store['misses']} embedded)")
 print("\nNext steps:")
 print("  1. Run the server: make run-local")
 print("  2. Test with CLI:  python3 mcp_cli.py -q 'bar chart'")
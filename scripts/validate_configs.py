@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Run the local config validator over a set of configs.
+
+By default the few-shot example configs are validated against their
+headers. They are the reference outputs, so any error reported for them
+points at a gap in the validator (or in the examples). With --file, configs
+from a JSON array or JSONL file ({"config": {...}, "headers": "..."} or
+bare configs) are validated instead, e.g. saved LLM outputs.
+
+Reports errors, warnings and repairs per violation code and the
+validation time per config.
+
+Usage:
+    python scripts/validate_configs.py
+    python scripts/validate_configs.py --file outputs.jsonl --verbose
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from collections import Counter
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config_validator import ConfigValidator
+
+
+def load_items(path: str) -> list:
+    """Configs (with optional headers) from a JSON array or JSONL file."""
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    items = []
+    for record in records:
+        if isinstance(record, dict) and isinstance(record.get("config"), dict):
+            items.append((record["config"], record.get("headers"), record.get("description", "")))
+        else:
+            items.append((record, None, ""))
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate CanvasXpress configs with the local validator")
+    parser.add_argument("--file", help="JSON array or JSONL of configs (default: the few-shot examples)")
+    parser.add_argument("--no-repair", action="store_true", help="Report repairable problems without repairing")
+    parser.add_argument("--verbose", action="store_true", help="Print every violation")
+    args = parser.parse_args()
+
+    data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+    with open(os.path.join(data_dir, 'schema.md')) as f:
+        schema_text = f.read()
+    rules_text = ""
+    rules_path = os.path.join(data_dir, 'canvasxpress_rules.md')
+    if os.path.exists(rules_path):
+        with open(rules_path) as f:
+            rules_text = f.read()
+    validator = ConfigValidator(schema_text, rules_text)
+
+    if args.file:
+        items = load_items(args.file)
+    else:
+        with open(os.path.join(data_dir, 'few_shot_examples.json')) as f:
+            items = [(ex["config"], ex.get("headers"), ex["description"]) for ex in json.load(f)]
+
+    print("=" * 70)
+    print("🔎 Config Validation")
+    print("=" * 70)
+    print(f"📋 Validator: {len(validator.specs)} parameters, {len(validator.graph_types)} graph types")
+    print(f"🔢 Configs: {len(items)} ({args.file or 'few-shot examples'})")
+    print("=" * 70)
+
+    invalid, repaired, times = 0, 0, []
+    errors, warnings, repairs = Counter(), Counter(), Counter()
+    for i, (config, headers, description) in enumerate(items):
+        result = validator.validate(config, headers, repair=not args.no_repair)
+        times.append(result.elapsed_ms)
+        invalid += not result.valid
+        repaired += result.repairs > 0
+        for violation in result.violations:
+            if violation["repaired"]:
+                repairs[violation["code"]] += 1
+            elif violation["severity"] == "error":
+                errors[violation["code"]] += 1
+            else:
+                warnings[violation["code"]] += 1
+        if result.violations and (args.verbose or not result.valid):
+            print(f"\n{'❌' if not result.valid else '🔧'} [{i}] {description[:60]}")
+            for violation in result.violations:
+                state = "repaired" if violation["repaired"] else violation["severity"]
+                print(f"   {state:8s} {violation['code']:22s} {violation['message'][:100]}")
+
+    print("\n📊 RESULTS:")
+    print(f"   Valid:    {len(items) - invalid}/{len(items)}")
+    print(f"   Repaired: {repaired}")
+    for label, counts in (("Errors", errors), ("Warnings", warnings), ("Repairs", repairs)):
+        if counts:
+            print(f"   {label}: " + ", ".join(f"{code} {n}" for code, n in counts.most_common()))
+    if times:
+        print(f"   Time per config: mean {statistics.mean(times):.3f} ms, max {max(times):.3f} ms")
+
+    sys.exit(1 if invalid and not args.file else 0)
+
+
+if __name__ == "__main__":
+    main()
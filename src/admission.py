@@ -0,0 +1,283 @@
+"""
+Admission control and fair queueing for generation requests in HTTP mode.
+
+Without a limit, a burst of HTTP requests starts as many generations as
+arrive; they all wait on the LLM together, memory grows and every request
+times out at about the same time. AdmissionController sits in front of the
+generation tools:
+
+- at most `max_concurrent` slots are in use; a batch request takes as
+  many slots as LLM calls it runs concurrently
+- requests beyond that wait in a bounded queue (`max_queue` requests in
+  total, optionally `max_queue_per_client` per client)
+- waiting requests are served round-robin across clients (MCP client id,
+  else session id, else HTTP peer address; see fair_queue_key), FIFO
+  within a client, so one busy client cannot starve the others. Requests
+  with none of these share the "anonymous" bucket
+- a request that has waited `queue_timeout` seconds leaves the queue
+- when the queue is full a request is rejected at once; rejections raise
+  AdmissionRejected with a retry-after estimate, so the tool can return an
+  explicit "overloaded" error instead of timing out
+- slots are held until the work stops, not until the caller returns:
+  blocking work runs through run_blocking(), which waits for its worker
+  thread even when the caller is cancelled (as SingleFlight.ado does for
+  a shielded leader)
+
+The controller lives on the server's event loop and is not thread-safe.
+
+Configuration via environment variables:
+    ADMISSION_CONTROL: auto (on in HTTP mode), true or false (default: auto)
+    ADMISSION_MAX_CONCURRENT: Generation slots in use at once (default: 16)
+    ADMISSION_MAX_QUEUE: Requests waiting for a slot (default: 64)
+    ADMISSION_MAX_QUEUE_PER_CLIENT: Waiting requests per client, 0 = no limit (default: 0)
+    ADMISSION_QUEUE_TIMEOUT: Seconds a request may wait for a slot (default: 30)
+"""
+
+import asyncio
+import functools
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+ANONYMOUS = "anonymous"
+
+
+class AdmissionRejected(Exception):
+    """A request was not admitted (queue full or queue-time deadline passed)."""
+
+    def __init__(self, reason: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.reason = reason  # "queue_full", "client_queue_full" or "queue_timeout"
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("future", "client", "weight")
+
+    def __init__(self, future: asyncio.Future, client: str, weight: int):
+        self.future = future
+        self.client = client
+        self.weight = weight
+
+
+def _percentile(sorted_values, q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class AdmissionController:
+    """Weighted concurrency limit with a bounded, per-client round-robin queue."""
+
+    # Weight of the newest slot hold time in the average used for retry-after estimates
+    HOLD_EWMA_ALPHA = 0.2
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_concurrent: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_queue_per_client: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        window: int = 1000
+    ):
+        """
+        Args:
+            enabled: Apply the limits; when disabled every request is admitted at once
+            max_concurrent: Generation slots in use at once (env default)
+            max_queue: Requests waiting for a slot (env default)
+            max_queue_per_client: Waiting requests per client, 0 = no limit (env default)
+            queue_timeout: Seconds a request may wait for a slot (env default)
+            window: Number of recent queue waits the wait percentiles are computed over
+        """
+        self.enabled = enabled
+        self.max_concurrent = max_concurrent or int(os.environ.get("ADMISSION_MAX_CONCURRENT", "16"))
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get("ADMISSION_MAX_QUEUE", "64"))
+        self.max_queue_per_client = (
+            max_queue_per_client if max_queue_per_client is not None
+            else int(os.environ.get("ADMISSION_MAX_QUEUE_PER_CLIENT", "0"))
+        )
+        self.queue_timeout = queue_timeout or float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "30"))
+        self.active = 0  # slots in use
+        self.queued = 0  # requests waiting
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()  # round-robin order of clients
+        self._waits: Deque[float] = deque(maxlen=window)
+        self._hold_ewma: Optional[float] = None
+        self.totals = {
+            "admitted": 0,
+            "admitted_after_wait": 0,
+            "rejected_queue_full": 0,
+            "rejected_client_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "cancelled_in_queue": 0,
+            "max_active": 0,
+            "max_queue_depth": 0,
+        }
+
+    def _fits(self, weight: int) -> bool:
+        return self.active + weight <= self.max_concurrent
+
+    def _grant(self, weight: int):
+        self.active += weight
+        self.totals["admitted"] += 1
+        self.totals["max_active"] = max(self.totals["max_active"], self.active)
+
+    def _dispatch(self):
+        """Hand free slots to waiting requests, one client at a time in round-robin order."""
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            if not self._fits(waiter.weight):
+                return  # the next request in turn waits for enough slots (no overtaking)
+            queue.popleft()
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            self.queued -= 1
+            self._grant(waiter.weight)
+            waiter.future.set_result(None)
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.client)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._queues[waiter.client]
+        self.queued -= 1
+        # The removed request may have been blocking smaller ones behind it
+        self._dispatch()
+
+    def retry_after(self) -> float:
+        """Rough seconds until a new request would get a slot (for overload errors)."""
+        hold = self._hold_ewma or 1.0
+        return round(max(1.0, hold * (self.queued + 1) / self.max_concurrent), 1)
+
+    def _reject(self, reason: str, message: str):
+        self.totals[f"rejected_{reason}"] += 1
+        retry_after = self.retry_after()
+        raise AdmissionRejected(reason, f"{message}; retry in about {retry_after:.0f}s", retry_after)
+
+    async def acquire(self, client: str, weight: int = 1) -> float:
+        """
+        Wait for `weight` slots for a request of `client`.
+
+        Returns:
+            Seconds the request waited in the queue
+
+        Raises:
+            AdmissionRejected: If the queue is full or the queue-time deadline passed
+        """
+        weight = max(1, min(weight, self.max_concurrent))
+        if not self.enabled or (not self._queues and self._fits(weight)):
+            self._grant(weight)
+            return 0.0
+        if self.queued >= self.max_queue:
+            self._reject(
+                "queue_full",
+                f"Server overloaded: {self.active} generation slots busy and {self.queued} requests queued"
+            )
+        queue = self._queues.get(client)
+        if self.max_queue_per_client and queue is not None and len(queue) >= self.max_queue_per_client:
+            self._reject(
+                "client_queue_full",
+                f"Too many queued requests from this client ({len(queue)}, "
+                f"limit ADMISSION_MAX_QUEUE_PER_CLIENT={self.max_queue_per_client})"
+            )
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), client, weight)
+        self._queues.setdefault(client, deque()).append(waiter)
+        self.queued += 1
+        self.totals["max_queue_depth"] = max(self.totals["max_queue_depth"], self.queued)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait([waiter.future], timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if waiter.future.done():
+                self.release(weight)
+            else:
+                self.totals["cancelled_in_queue"] += 1
+                self._remove(waiter)
+            raise
+        waited = time.perf_counter() - start
+        self._waits.append(waited)
+        if not waiter.future.done():
+            self._remove(waiter)
+            self._reject("queue_timeout", f"Server overloaded: no generation slot within {self.queue_timeout:.0f}s")
+        self.totals["admitted_after_wait"] += 1
+        return waited
+
+    def release(self, weight: int = 1, held: Optional[float] = None):
+        """Free the slots of a finished request and admit waiting ones.
+
+        Args:
+            weight: Slots the request held
+            held: Seconds the slots were held (feeds the retry-after estimate)
+        """
+        self.active -= max(1, min(weight, self.max_concurrent))
+        if held is not None:
+            self._hold_ewma = (
+                held if self._hold_ewma is None
+                else self.HOLD_EWMA_ALPHA * held + (1 - self.HOLD_EWMA_ALPHA) * self._hold_ewma
+            )
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, client: str, weight: int = 1):
+        """Hold `weight` slots for the body of the block; yields the seconds spent queued."""
+        waited = await self.acquire(client, weight)
+        start = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            self.release(weight, time.perf_counter() - start)
+
+    def stats(self) -> Dict:
+        """Return limits, current load, queue wait percentiles and rejection counters."""
+        waits = sorted(self._waits)
+        return {
+            "enabled": self.enabled,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "active": self.active,
+            "queue_depth": self.queued,
+            "clients_waiting": len(self._queues),
+            **self.totals,
+            "queue_wait_ms": {
+                "avg": round(sum(waits) / len(waits) * 1000, 1),
+                "p50": round(_percentile(waits, 0.5) * 1000, 1),
+                "p95": round(_percentile(waits, 0.95) * 1000, 1),
+                "max": round(waits[-1] * 1000, 1),
+            } if waits else None,
+            "avg_hold_ms": round(self._hold_ewma * 1000, 1) if self._hold_ewma is not None else None,
+        }
+
+
+def fair_queue_key(*ids: Optional[str]) -> str:
+    """The first non-empty client identifier, else the shared ANONYMOUS bucket."""
+    for client in ids:
+        if client:
+            return client
+    return ANONYMOUS
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call in a worker thread without blocking the event loop.
+
+    A thread cannot be interrupted: when the caller is cancelled it still
+    waits for the thread to finish before re-raising, so an admission slot
+    held around this call is not released while the work goes on.
+    """
+    future = asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        while not future.done():
+            try:
+                await asyncio.wait([future])
+            except asyncio.CancelledError:
+                pass
+        raise
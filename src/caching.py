@@ -0,0 +1,494 @@
+"""
+Caching utilities for the CanvasXpress generator.
+
+Provides a thread-safe in-memory LRU cache with TTL support, an optional
+SQLite-backed persistent tier that survives restarts, the exact-match
+response cache that sits in front of CanvasXpressGenerator.generate, a
+semantic cache that reuses configs for near-identical queries, and the
+query-embedding cache used by EmbeddingProvider.encode_query.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class LRUCache:
+    """Thread-safe, bounded LRU cache with optional time-to-live."""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        """
+        Args:
+            max_size: Maximum number of entries kept in memory
+            ttl: Entry lifetime in seconds (None or 0 = never expire)
+        """
+        self.max_size = max(1, int(max_size))
+        self.ttl = ttl or None
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing/expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        """Insert or refresh an entry, evicting the least recently used one if full."""
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        """Return size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SQLiteCacheTier:
+    """Persistent key/value tier stored in a SQLite file.
+
+    Values are stored as BLOBs together with their creation time so the same
+    TTL semantics as LRUCache can be applied after a restart.
+    """
+
+    def __init__(self, path: str, table: str = "cache", ttl: Optional[float] = None):
+        """
+        Args:
+            path: SQLite database file (parent directory is created if needed)
+            table: Table name, allowing several caches to share one file
+            ttl: Entry lifetime in seconds (None or 0 = never expire)
+        """
+        self.path = str(path)
+        self.table = table
+        self.ttl = ttl or None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the stored bytes for key, or None if missing/expired."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self.ttl and created_at + self.ttl <= time.time():
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: bytes):
+        """Insert or replace an entry."""
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                (key, sqlite3.Binary(value), time.time())
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Delete expired entries and return how many were removed."""
+        if not self.ttl:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at <= ?", (time.time() - self.ttl,)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> Dict:
+        """Return size and hit/miss counters."""
+        return {
+            "path": self.path,
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class ResponseCache:
+    """Exact-match cache for generated CanvasXpress configurations.
+
+    Keys combine everything that can change the generated config: the
+    normalized description and headers, the temperature, the prompt version,
+    the LLM model and a hash of the data files (examples, schema, rules and
+    prompt template). Configs are stored as JSON text so callers always get a
+    fresh copy and the persistent tier can store them verbatim.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None, path: Optional[str] = None):
+        """
+        Args:
+            max_size: Maximum number of configs kept in memory
+            ttl: Entry lifetime in seconds (None or 0 = never expire)
+            path: Optional SQLite file for the persistent tier
+        """
+        self.memory = LRUCache(max_size=max_size, ttl=ttl)
+        self.disk = SQLiteCacheTier(path, table="responses", ttl=ttl) if path else None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_description(description: str) -> str:
+        """Collapse whitespace; case is preserved since titles and column names are case-sensitive."""
+        return " ".join((description or "").split())
+
+    @staticmethod
+    def normalize_headers(headers: Optional[str]) -> str:
+        """Strip whitespace around each comma-separated header."""
+        if not headers:
+            return ""
+        return ",".join(h.strip() for h in headers.split(","))
+
+    @classmethod
+    def make_key(
+        cls,
+        description: str,
+        headers: Optional[str],
+        temperature: float,
+        prompt_version: str,
+        llm_model: str,
+        data_hash: str
+    ) -> str:
+        """Build the cache key for a generation request."""
+        payload = json.dumps([
+            cls.normalize_description(description),
+            cls.normalize_headers(headers),
+            float(temperature),
+            prompt_version,
+            llm_model,
+            data_hash,
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a cached config, checking memory first and then the persistent tier."""
+        text = self.memory.get(key)
+        if text is None and self.disk is not None:
+            blob = self.disk.get(key)
+            if blob is not None:
+                text = bytes(blob).decode("utf-8")
+                self.memory.put(key, text)
+        if text is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(text)
+
+    def put(self, key: str, config: Dict):
+        """Store a config in memory and, if enabled, in the persistent tier."""
+        text = json.dumps(config)
+        self.memory.put(key, text)
+        if self.disk is not None:
+            self.disk.put(key, text.encode("utf-8"))
+
+    def stats(self) -> Dict:
+        """Return overall hit/miss counters plus memory and persistent tier statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
+
+
+class SemanticCache:
+    """Reuses configs of past answers for paraphrased queries.
+
+    Stores (normalized query embedding, headers, config) for successful
+    generations in a preallocated float32 matrix. A lookup is one
+    matrix-vector product restricted to unexpired entries with identical
+    headers; the best entry is returned when its cosine similarity reaches
+    the threshold. An answer for the same headers and the same description
+    (or a near-identical embedding) replaces the stored one instead of
+    taking a second slot. When full, an expired entry or else the least
+    recently used one is overwritten.
+    """
+
+    # Upper bounds of the similarity histogram buckets
+    HISTOGRAM_BUCKETS = [0.5, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 1.0]
+
+    # Similarity at which two query embeddings are treated as the same query
+    DUPLICATE_SIMILARITY = 0.999
+
+    def __init__(self, dimension: int, threshold: float = 0.95, max_size: int = 512, ttl: Optional[float] = None):
+        """
+        Args:
+            dimension: Embedding dimension of the query vectors
+            threshold: Minimum cosine similarity for a cache hit
+            max_size: Maximum number of stored answers
+            ttl: Entry lifetime in seconds (None or 0 = never expire)
+        """
+        self.dimension = dimension
+        self.threshold = threshold
+        self.max_size = max(1, int(max_size))
+        self.ttl = ttl or None
+        self._vectors = np.zeros((self.max_size, dimension), dtype=np.float32)
+        self._header_ids = np.full(self.max_size, -1, dtype=np.int64)
+        self._last_used = np.zeros(self.max_size, dtype=np.float64)
+        self._created = np.zeros(self.max_size, dtype=np.float64)
+        self._configs: List[Optional[str]] = [None] * self.max_size
+        self._descriptions: List[Optional[str]] = [None] * self.max_size
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.duplicates = 0
+        self._histogram = [0] * len(self.HISTOGRAM_BUCKETS)
+        self._recent_similarities = deque(maxlen=1000)
+
+    @staticmethod
+    def _header_id(headers: Optional[str]) -> int:
+        """Map normalized headers to a stable 63-bit integer."""
+        normalized = ResponseCache.normalize_headers(headers)
+        return int(hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:15], 16)
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def _purge(self, now: float):
+        """Free the slots of entries past their TTL (caller holds the lock)."""
+        if not self.ttl:
+            return
+        expired = np.flatnonzero(
+            (self._header_ids[:self._size] != -1) & (self._created[:self._size] + self.ttl <= now)
+        )
+        for index in expired:
+            self._header_ids[index] = -1
+            self._configs[index] = None
+            self._descriptions[index] = None
+        self.expirations += len(expired)
+
+    def lookup(self, query_vector, headers: Optional[str]) -> Tuple[Optional[Dict], float]:
+        """Find the most similar unexpired stored answer with identical headers.
+
+        Returns:
+            Tuple of (config or None, best similarity found)
+        """
+        q = self._normalize(query_vector)
+        header_id = self._header_id(headers)
+        with self._lock:
+            best_similarity = 0.0
+            best_index = -1
+            self._purge(time.time())
+            candidates = np.flatnonzero(self._header_ids[:self._size] == header_id)
+            if candidates.size:
+                similarities = self._vectors[candidates] @ q
+                best = int(np.argmax(similarities))
+                best_index = int(candidates[best])
+                best_similarity = float(similarities[best])
+                self._record_similarity(best_similarity)
+            if best_index >= 0 and best_similarity >= self.threshold:
+                self._last_used[best_index] = time.time()
+                self.hits += 1
+                return json.loads(self._configs[best_index]), best_similarity
+            self.misses += 1
+            return None, best_similarity
+
+    def add(self, query_vector, headers: Optional[str], config: Dict, description: str = ""):
+        """Store a successful answer, replacing a duplicate or else evicting if full."""
+        q = self._normalize(query_vector)
+        header_id = self._header_id(headers)
+        normalized = ResponseCache.normalize_description(description)
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            index = self._duplicate(q, header_id, normalized)
+            if index >= 0:
+                self.duplicates += 1
+            elif self._size < self.max_size:
+                index = self._size
+                self._size += 1
+            else:
+                free = np.flatnonzero(self._header_ids == -1)
+                if free.size:
+                    index = int(free[0])
+                else:
+                    index = int(np.argmin(self._last_used))
+                    self.evictions += 1
+            self._vectors[index] = q
+            self._header_ids[index] = header_id
+            self._last_used[index] = now
+            self._created[index] = now
+            self._configs[index] = json.dumps(config)
+            self._descriptions[index] = description
+
+    def _duplicate(self, q: np.ndarray, header_id: int, normalized: str) -> int:
+        """Index of a stored answer to the same query: same headers and description, or a near-identical vector."""
+        candidates = np.flatnonzero(self._header_ids[:self._size] == header_id)
+        if not candidates.size:
+            return -1
+        if normalized:
+            for index in candidates:
+                if ResponseCache.normalize_description(self._descriptions[index]) == normalized:
+                    return int(index)
+        similarities = self._vectors[candidates] @ q
+        best = int(np.argmax(similarities))
+        return int(candidates[best]) if similarities[best] >= self.DUPLICATE_SIMILARITY else -1
+
+    def _record_similarity(self, similarity: float):
+        """Track the best similarity of each lookup with candidates (caller holds the lock)."""
+        self._recent_similarities.append(similarity)
+        for i, upper in enumerate(self.HISTOGRAM_BUCKETS):
+            if similarity <= upper or i == len(self.HISTOGRAM_BUCKETS) - 1:
+                self._histogram[i] += 1
+                break
+
+    def stats(self) -> Dict:
+        """Return hit rate and the distribution of best-match similarities."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            recent = np.asarray(self._recent_similarities, dtype=np.float32)
+            labels = []
+            lower = 0.0
+            for upper in self.HISTOGRAM_BUCKETS:
+                labels.append(f"{lower:.2f}-{upper:.2f}")
+                lower = upper
+            return {
+                "size": int((self._header_ids[:self._size] != -1).sum()),  # expired entries are purged lazily
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "duplicates": self.duplicates,
+                "similarity": {
+                    "mean": round(float(recent.mean()), 4) if recent.size else None,
+                    "p50": round(float(np.percentile(recent, 50)), 4) if recent.size else None,
+                    "p90": round(float(np.percentile(recent, 90)), 4) if recent.size else None,
+                    "histogram": dict(zip(labels, self._histogram)),
+                },
+            }
+
+
+class EmbeddingCache:
+    """Cache of query embeddings stored as float32 vectors.
+
+    Keys combine the provider, model name, text prefix (e.g. the nomic
+    "search_query: " prefix) and the text itself. The optional SQLite tier
+    keeps paid remote embeddings (openai/gemini) across restarts.
+    """
+
+    def __init__(self, max_size: int = 4096, path: Optional[str] = None):
+        """
+        Args:
+            max_size: Maximum number of vectors kept in memory
+            path: Optional SQLite file for the persistent tier
+        """
+        self.memory = LRUCache(max_size=max_size)
+        self.disk = SQLiteCacheTier(path, table="query_embeddings") if path else None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(provider: str, model_name: str, prefix: str, text: str) -> str:
+        """Build the cache key for a query text."""
+        payload = json.dumps([provider, model_name, prefix, text])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached vector, checking memory first and then the persistent tier."""
+        vector = self.memory.get(key)
+        if vector is None and self.disk is not None:
+            blob = self.disk.get(key)
+            if blob is not None:
+                vector = np.frombuffer(bytes(blob), dtype=np.float32)
+                self.memory.put(key, vector)
+        if vector is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return vector
+
+    def put(self, key: str, vector) -> np.ndarray:
+        """Store a vector as float32 and return the stored array."""
+        array = np.asarray(vector, dtype=np.float32)
+        array.setflags(write=False)
+        self.memory.put(key, array)
+        if self.disk is not None:
+            self.disk.put(key, array.tobytes())
+        return array
+
+    def stats(self) -> Dict:
+        """Return the number of embedding calls saved plus tier statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "calls_saved": self.hits,
+            "calls_made": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
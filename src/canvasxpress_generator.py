@@ -15,15 +15,57 @@ Based on the JOSS-published methodology (Smith & Neuhaus, 2025):
 - 25 most relevant examples per query
 """
 
+import asyncio
+import hashlib
 import json
 import os
-import random
-import re
-import requests
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from pymilvus import MilvusClient
+# Handle imports for both Docker and local environments
+try:
+    from caching import EmbeddingCache, ResponseCache, SemanticCache
+    from config_repair import ConfigRepairer
+    from config_validator import ConfigValidator
+    from embedding_store import EmbeddingStore
+    from endpoint_balancer import EndpointBalancer
+    from endpoint_manifest import get_endpoint_manifest
+    from example_table import ExampleTable
+    from json_extractor import JsonExtractor, extract_json
+    from few_shot_selector import FewShotSelector
+    from hedging import RequestHedger
+    from prompt_layout import PromptLayout
+    from rate_limiter import AdaptiveRateLimiter
+    from rules_index import DEFAULT_CORE_CHUNKS, RulesIndex
+    from schema_index import SchemaIndex, graph_types_in
+    from single_flight import SingleFlight
+    from tokenizer import get_token_counter
+    from vector_index import create_vector_index
+    from warmup import phase_report
+except ImportError:
+    from src.caching import EmbeddingCache, ResponseCache, SemanticCache
+    from src.config_repair import ConfigRepairer
+    from src.config_validator import ConfigValidator
+    from src.embedding_store import EmbeddingStore
+    from src.endpoint_balancer import EndpointBalancer
+    from src.endpoint_manifest import get_endpoint_manifest
+    from src.example_table import ExampleTable
+    from src.json_extractor import JsonExtractor, extract_json
+    from src.few_shot_selector import FewShotSelector
+    from src.hedging import RequestHedger
+    from src.prompt_layout import PromptLayout
+    from src.rate_limiter import AdaptiveRateLimiter
+    from src.rules_index import DEFAULT_CORE_CHUNKS, RulesIndex
+    from src.schema_index import SchemaIndex, graph_types_in
+    from src.single_flight import SingleFlight
+    from src.tokenizer import get_token_counter
+    from src.vector_index import create_vector_index
+    from src.warmup import phase_report
 
 # Conditional imports for providers
 LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "openai").lower()
@@ -31,11 +73,16 @@ EMBEDDING_PROVIDER = os.environ.get("EMBEDDING_PROVIDER", "local").lower()
 
 # Import based on LLM provider (also needed for OpenAI embeddings)
 if LLM_PROVIDER == "openai" or EMBEDDING_PROVIDER == "openai":
-    from openai import AzureOpenAI
+    import httpx
     import openai
+    try:
+        from llm_clients import get_client_pool
+    except ImportError:
+        from src.llm_clients import get_client_pool
 
 if LLM_PROVIDER == "gemini" or EMBEDDING_PROVIDER == "gemini":
     import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
 
 # Import based on embedding provider
 if EMBEDDING_PROVIDER == "local":
@@ -45,6 +92,17 @@ if EMBEDDING_PROVIDER == "onnx":
     from sentence_transformers import SentenceTransformer
 
 
+# Rate limiter key of the Gemini API (a single endpoint)
+GEMINI_ENDPOINT = "gemini"
+
+
+def _is_endpoint_fault(error: Exception) -> bool:
+    """True for OpenAI errors that reflect endpoint health (connection errors, HTTP 429 and 5xx)."""
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, openai.APIConnectionError)
+
+
 class EmbeddingProvider:
     """Abstract embedding provider supporting multiple backends."""
     
@@ -83,9 +141,27 @@ class EmbeddingProvider:
         self.dimension = None
         self.is_nomic = False  # Only True for nomic ONNX models
         
+        # Query-embedding cache (repeated descriptions skip the model/API call)
+        self.query_cache = None
+        if os.environ.get("EMBEDDING_CACHE_ENABLED", "true").lower() == "true":
+            self.query_cache = EmbeddingCache(
+                max_size=int(os.environ.get("EMBEDDING_CACHE_MAX_SIZE", "4096")),
+                path=os.environ.get("EMBEDDING_CACHE_PATH") or None
+            )
+        
+        # Persistent content-addressed store: texts already embedded with this model are never re-embedded
+        self.store = None
+        if os.environ.get("EMBEDDING_STORE_ENABLED", "true").lower() == "true":
+            store_dir = os.environ.get("EMBEDDING_STORE_DIR", "~/.cache/canvasxpress_mcp/embeddings")
+            try:
+                self.store = EmbeddingStore(store_dir)
+            except OSError as e:
+                print(f"⚠️  Embedding store disabled ({store_dir}): {e}")
+        
         if provider == "local":
             print("🔧 Initializing BGE-M3 embedding model (local)...")
-            self.model = BGEM3FlagModel('BAAI/bge-m3', use_fp16=False)
+            self.model_name = "BAAI/bge-m3"
+            self.model = BGEM3FlagModel(self.model_name, use_fp16=False)
             self.dimension = 1024
         elif provider == "onnx":
             self.model_name = os.environ.get("ONNX_EMBEDDING_MODEL", self.DEFAULT_ONNX_MODEL)
@@ -113,8 +189,13 @@ class EmbeddingProvider:
             self.api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2024-02-01")
             self.model_name = os.environ.get("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
             self.llm_environment = os.environ.get("LLM_ENVIRONMENT", "nonprod")
-            # Fetch BMS endpoints for embeddings
-            self.bms_openai_urls = self._fetch_bms_endpoints()
+            # Keep-alive clients shared with the LLM provider
+            self.client_pool = get_client_pool(self.api_key, self.api_version)
+            self.balancer = EndpointBalancer(name="embeddings")
+            self.rate_limiter = AdaptiveRateLimiter(name="embeddings")
+            # Shared BMS endpoint manifest (cached, refreshed in the background)
+            self.manifest = get_endpoint_manifest()
+            self.manifest.get()
             self.dimension = 1536  # text-embedding-3-small dimension
         elif provider == "gemini":
             print("🔧 Initializing Gemini embeddings (API)...")
@@ -123,24 +204,18 @@ class EmbeddingProvider:
                 raise ValueError("GOOGLE_API_KEY environment variable not set")
             genai.configure(api_key=api_key)
             self.model_name = os.environ.get("GEMINI_EMBEDDING_MODEL", "text-embedding-004")
+            self.rate_limiter = AdaptiveRateLimiter(name="embeddings")
             self.dimension = 768  # Gemini text-embedding-004 dimension
         else:
             raise ValueError(f"Unknown embedding provider: {provider}. Use 'local', 'onnx', 'openai', or 'gemini'.")
     
-    def _fetch_bms_endpoints(self) -> dict:
-        """Fetch BMS OpenAI endpoint configuration."""
-        try:
-            response = requests.get(
-                'https://bms-openai-proxy-eus-prod.azu.bms.com/openai-urls.json',
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"Failed to fetch BMS OpenAI endpoints: {e}")
+    @property
+    def bms_openai_urls(self) -> dict:
+        """Current BMS OpenAI endpoint configuration (from the shared manifest)."""
+        return self.manifest.get()
     
-    def _get_openai_endpoint(self) -> str:
-        """Get a random Azure OpenAI endpoint for embeddings."""
+    def _get_openai_endpoint(self, exclude: Optional[set] = None) -> str:
+        """Choose an Azure OpenAI endpoint for embeddings (latency/error aware)."""
         try:
             # Look for embedding model endpoints
             endpoints = self.bms_openai_urls.get(self.llm_environment, {}).get(self.model_name, [])
@@ -155,12 +230,18 @@ class EmbeddingProvider:
             if not endpoints:
                 raise ValueError(f"No embedding endpoints found for {self.llm_environment}")
             
-            return random.choice(endpoints)['endpoint']
+            return self.balancer.choose([e['endpoint'] for e in endpoints], exclude=exclude)
         except KeyError as e:
             raise ValueError(f"No deployments found: {e}")
     
     def encode(self, texts: List[str]) -> List[List[float]]:
-        """Encode texts to embeddings (for documents/indexing)."""
+        """Encode texts to embeddings (for documents/indexing), through the embedding store."""
+        if self.store is None:
+            return self._encode_uncached(texts)
+        return self.store.embed(texts, self.provider, self.model_name, "document", self._encode_uncached)
+    
+    def _encode_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Encode document texts with the underlying model or API."""
         if self.provider == "local":
             result = self.model.encode(texts)['dense_vecs']
             return [v.tolist() if hasattr(v, 'tolist') else v for v in result]
@@ -171,73 +252,182 @@ class EmbeddingProvider:
             result = self.model.encode(texts)
             return [v.tolist() if hasattr(v, 'tolist') else list(v) for v in result]
         elif self.provider == "openai":
-            endpoint = self._get_openai_endpoint()
-            client = AzureOpenAI(
-                api_version=self.api_version,
-                api_key=self.api_key,
-                azure_endpoint=endpoint
-            )
             # Batch embed (OpenAI supports up to 2048 texts)
-            response = client.embeddings.create(
-                model=self.model_name,
-                input=texts
-            )
-            return [item.embedding for item in response.data]
+            return self._embed_openai(texts)
         elif self.provider == "gemini":
-            embeddings = []
-            for text in texts:
+            return [self._embed_gemini(text, "retrieval_document") for text in texts]
+    
+    def _embed_openai(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with Azure OpenAI, reporting endpoint health to the balancer and rate limiter.
+        
+        Calls wait for their turn in the rate limiter; after HTTP 429 the call
+        is retried on another endpoint up to RATE_LIMIT_MAX_RETRIES times.
+        """
+        tried = set()
+        for attempt in range(self.rate_limiter.max_retries + 1):
+            endpoint = self._get_openai_endpoint(exclude=tried)
+            self.rate_limiter.acquire(endpoint)
+            client = self.client_pool.get(endpoint)
+            start = time.perf_counter()
+            try:
+                raw = client.embeddings.with_raw_response.create(
+                    model=self.model_name,
+                    input=texts
+                )
+            except openai.RateLimitError as e:
+                self.balancer.record_failure(endpoint, rate_limited=True)
+                self.rate_limiter.on_rate_limited(endpoint, e.response.headers)
+                tried.add(endpoint)
+                if attempt == self.rate_limiter.max_retries:
+                    raise
+                print(f"⚠️  Embedding rate limit (HTTP 429) on attempt {attempt + 1}, retrying")
+                continue
+            except (openai.APIConnectionError, openai.APIStatusError) as e:
+                if _is_endpoint_fault(e):
+                    self.balancer.record_failure(endpoint)
+                raise
+            self.balancer.record_success(endpoint, time.perf_counter() - start)
+            self.rate_limiter.on_success(endpoint, raw.headers)
+            return [item.embedding for item in raw.parse().data]
+    
+    def _embed_gemini(self, content, task_type: str):
+        """Embed text(s) with Gemini, paced by the rate limiter and retried after HTTP 429."""
+        for attempt in range(self.rate_limiter.max_retries + 1):
+            self.rate_limiter.acquire(GEMINI_ENDPOINT)
+            try:
                 result = genai.embed_content(
                     model=f"models/{self.model_name}",
-                    content=text,
-                    task_type="retrieval_document"
+                    content=content,
+                    task_type=task_type
                 )
-                embeddings.append(result['embedding'])
-            return embeddings
+            except google_exceptions.ResourceExhausted:
+                self.rate_limiter.on_rate_limited(GEMINI_ENDPOINT)
+                if attempt == self.rate_limiter.max_retries:
+                    raise
+                print(f"⚠️  Embedding rate limit (HTTP 429) on attempt {attempt + 1}, retrying")
+                continue
+            self.rate_limiter.on_success(GEMINI_ENDPOINT)
+            return result['embedding']
     
     def encode_query(self, text: str) -> List[float]:
-        """Encode a single query text (for search)."""
+        """Encode a single query text (for search), using the query-embedding cache."""
+        return self.encode_queries([text])[0]
+    
+    def encode_queries(self, texts: List[str]) -> List[List[float]]:
+        """Encode query texts (for search) in one batch, using the query-embedding cache.
+        
+        Only texts missing from the cache are sent to the model/API, in a single call.
+        Queries are user input without bound, so they stay out of the persistent
+        embedding store; the size-capped query cache is their only cache.
+        """
+        if self.query_cache is None:
+            return self._encode_queries_uncached(texts)
+        
+        prefix = "search_query: " if self.is_nomic else ""
+        keys = [EmbeddingCache.make_key(self.provider, self.model_name, prefix, t) for t in texts]
+        vectors = [self.query_cache.get(key) for key in keys]
+        
+        missing = {}  # text -> positions (duplicates in a batch are embedded once)
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
+        if missing:
+            embedded = self._encode_queries_uncached(list(missing))
+            for (text, positions), embedding in zip(missing.items(), embedded):
+                stored = self.query_cache.put(keys[positions[0]], embedding)
+                for i in positions:
+                    vectors[i] = stored
+        return [v.tolist() for v in vectors]
+    
+    def cache_stats(self) -> Optional[Dict]:
+        """Return query-embedding cache statistics (None if disabled)."""
+        return self.query_cache.stats() if self.query_cache is not None else None
+    
+    def store_stats(self) -> Optional[Dict]:
+        """Return embedding store statistics (None if disabled)."""
+        return self.store.stats() if self.store is not None else None
+    
+    def _encode_queries_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Encode query texts with the underlying model or API."""
         if self.provider == "local":
-            result = self.model.encode([text])['dense_vecs'][0]
-            return result.tolist() if hasattr(result, 'tolist') else result
+            result = self.model.encode(texts)['dense_vecs']
+            return [v.tolist() if hasattr(v, 'tolist') else v for v in result]
         elif self.provider == "onnx":
             # Nomic models require "search_query: " prefix for queries
             if self.is_nomic:
-                text = f"search_query: {text}"
-            result = self.model.encode([text])[0]
-            return result.tolist() if hasattr(result, 'tolist') else list(result)
+                texts = [f"search_query: {t}" for t in texts]
+            result = self.model.encode(texts)
+            return [v.tolist() if hasattr(v, 'tolist') else list(v) for v in result]
         elif self.provider == "openai":
-            endpoint = self._get_openai_endpoint()
-            client = AzureOpenAI(
-                api_version=self.api_version,
-                api_key=self.api_key,
-                azure_endpoint=endpoint
-            )
-            response = client.embeddings.create(
-                model=self.model_name,
-                input=[text]
-            )
-            return response.data[0].embedding
+            return self._embed_openai(texts)
         elif self.provider == "gemini":
-            result = genai.embed_content(
-                model=f"models/{self.model_name}",
-                content=text,
-                task_type="retrieval_query"
-            )
-            return result['embedding']
+            return self._embed_gemini(texts, "retrieval_query")
+
+
+class _StreamReader:
+    """Collects streamed text, reports throttled progress and detects JSON completion."""
+    
+    def __init__(self, start: float, on_progress, interval: float):
+        self.start = start
+        self.on_progress = on_progress
+        self.interval = interval
+        self.parts: List[str] = []
+        self.chunks = 0
+        self.ttft_ms: Optional[float] = None
+        self.extractor = JsonExtractor()
+        self.stopped_early = False
+        self._last_progress = 0.0
+    
+    async def add(self, delta: str) -> bool:
+        """Add one streamed chunk; True when the JSON object is complete and the stream can be closed."""
+        now = time.perf_counter()
+        if self.ttft_ms is None:
+            self.ttft_ms = (now - self.start) * 1000
+        self.parts.append(delta)
+        self.chunks += 1
+        complete = self.extractor.feed(delta)
+        if self.on_progress is not None and (complete or now - self._last_progress >= self.interval):
+            self._last_progress = now
+            message = "JSON complete" if complete else f"Generating ({self.chunks} chunks)"
+            await self.on_progress(self.chunks, message)
+        self.stopped_early = complete
+        return complete
+    
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
 
 
 class LLMProvider:
     """Abstract LLM provider supporting multiple backends."""
     
+    # Worker threads running hedged sync calls (created on demand)
+    HEDGE_THREADS = 64
+    
     def __init__(self, provider: str = "openai", **kwargs):
         self.provider = provider
         
+        # Token usage totals, including prompt tokens served from the provider's prefix cache
+        self._usage_lock = threading.Lock()
+        self.usage_totals = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        
+        # Streaming (agenerate): progress callbacks and early stop once the JSON object is complete
+        self.streaming = os.environ.get("LLM_STREAMING", "false").lower() == "true"
+        self.stream_progress_interval = float(os.environ.get("LLM_STREAM_PROGRESS_INTERVAL", "0.25"))
+        self.stream_totals = {"streams": 0, "early_stops": 0, "ttft_ms": 0.0, "tokens_saved_est": 0}
+        # Tokens the model emitted after the JSON object in complete responses (basis of the savings estimate)
+        self.trailing_totals = {"responses": 0, "tokens": 0}
+        
+        # Client-side pacing shared by all concurrent calls (per endpoint and global)
+        self.rate_limiter = AdaptiveRateLimiter(name="llm")
+        
         if provider == "openai":
             self._init_openai(**kwargs)
         elif provider == "gemini":
             self._init_gemini(**kwargs)
         else:
             raise ValueError(f"Unknown LLM provider: {provider}")
+        self.token_counter = get_token_counter(self.llm_model)
     
     def _init_openai(self, llm_model: str = None, llm_environment: str = "nonprod", **kwargs):
         """Initialize Azure OpenAI (BMS Proxy)."""
@@ -251,9 +441,22 @@ class LLMProvider:
         if not self.api_key:
             raise ValueError("AZURE_OPENAI_KEY environment variable not set")
         
-        # Download BMS OpenAI endpoints
-        print("🔧 Fetching BMS OpenAI endpoints...")
-        self.bms_openai_urls = self._fetch_bms_endpoints()
+        # Keep-alive clients per endpoint (shared with OpenAI embeddings)
+        self.client_pool = get_client_pool(self.api_key, self.api_version)
+        self.balancer = EndpointBalancer(name="llm")
+        
+        # Per-call timeout, and optional hedging of slow calls to a second endpoint
+        self.call_timeout = float(os.environ.get("LLM_CALL_TIMEOUT", "60"))
+        self.hedger = RequestHedger() if os.environ.get("LLM_HEDGING", "false").lower() == "true" else None
+        self._hedge_executor = (
+            ThreadPoolExecutor(max_workers=self.HEDGE_THREADS, thread_name_prefix="cx-hedge")
+            if self.hedger else None
+        )
+        
+        # Load BMS OpenAI endpoints (shared manifest, cached and refreshed in the background)
+        print("🔧 Loading BMS OpenAI endpoints...")
+        self.manifest = get_endpoint_manifest()
+        self.manifest.get()
     
     def _init_gemini(self, **kwargs):
         """Initialize Google Gemini."""
@@ -265,6 +468,12 @@ class LLMProvider:
         genai.configure(api_key=api_key)
         self.llm_model = os.environ.get("GEMINI_MODEL", "gemini-2.0-flash-exp")
         self.model = genai.GenerativeModel(self.llm_model)
+        
+        # Context cache (cachedContent) for the static prompt prefix
+        self.gemini_context_cache = os.environ.get("GEMINI_CONTEXT_CACHE", "true").lower() == "true"
+        self.gemini_cache_ttl = int(os.environ.get("GEMINI_CACHE_TTL", "3600"))
+        self._gemini_prefix_models: Dict[str, Tuple[object, float]] = {}
+        self._gemini_cache_lock = threading.Lock()
     
     def _get_model_version(self) -> str:
         """Get model version based on model name (OpenAI only)."""
@@ -275,20 +484,17 @@ class LLMProvider:
         }
         return versions.get(self.llm_model, "2024-07-18")
     
-    def _fetch_bms_endpoints(self) -> dict:
-        """Fetch BMS OpenAI endpoint configuration."""
-        try:
-            response = requests.get(
-                'https://bms-openai-proxy-eus-prod.azu.bms.com/openai-urls.json',
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"Failed to fetch BMS OpenAI endpoints: {e}")
+    @property
+    def bms_openai_urls(self) -> dict:
+        """Current BMS OpenAI endpoint configuration (from the shared manifest)."""
+        return self.manifest.get()
     
-    def _get_endpoint(self) -> str:
-        """Get a random Azure OpenAI endpoint from BMS proxy."""
+    def _get_endpoint(self, exclude: Optional[set] = None) -> str:
+        """Choose an Azure OpenAI endpoint from BMS proxy (latency/error aware).
+        
+        Args:
+            exclude: Endpoints to avoid, e.g. ones that already failed this request
+        """
         try:
             endpoints = [
                 e for e in self.bms_openai_urls[self.llm_environment][self.llm_model]
@@ -301,56 +507,560 @@ class LLMProvider:
                     f"{self.llm_model}, {self.model_version}"
                 )
             
-            return random.choice(endpoints)['endpoint']
+            return self.balancer.choose([e['endpoint'] for e in endpoints], exclude=exclude)
             
         except KeyError as e:
             raise ValueError(f"No deployments found for model: {e}")
     
-    def generate(self, prompt: str, temperature: float = 0.0, max_retries: int = 3) -> str:
-        """Generate text from prompt."""
+    def _record_failure(self, endpoint: str, error: Exception, tried: set):
+        """Exclude a failed endpoint from the next retry and feed endpoint faults to the balancer."""
+        tried.add(endpoint)
+        if _is_endpoint_fault(error):
+            self.balancer.record_failure(endpoint, rate_limited=isinstance(error, openai.RateLimitError))
+        if isinstance(error, openai.RateLimitError):
+            # Blocks the endpoint for Retry-After (or a backoff) and lowers the allowed rates
+            self.rate_limiter.on_rate_limited(endpoint, error.response.headers)
+    
+    def _record_gemini_failure(self, error: Exception):
+        """Feed a Gemini rate limit (ResourceExhausted, HTTP 429) to the rate limiter."""
+        if isinstance(error, google_exceptions.ResourceExhausted):
+            self.rate_limiter.on_rate_limited(GEMINI_ENDPOINT)
+    
+    def _record_latency(self, endpoint: str, latency: float):
+        """Feed a successful call's latency to the balancer and the hedge threshold."""
+        self.balancer.record_success(endpoint, latency)
+        if self.hedger is not None:
+            self.hedger.observe(latency)
+    
+    def _hedge_timeout(self, endpoint: str) -> Exception:
+        """Error recorded for a call still running at the end of a hedged attempt's LLM_CALL_TIMEOUT."""
+        error = openai.APITimeoutError(request=httpx.Request("POST", endpoint))
+        error.__cause__ = TimeoutError(f"no response within LLM_CALL_TIMEOUT={self.call_timeout}s")
+        return error
+    
+    def _create_openai(self, endpoint: str, messages: List[Dict], temperature: float):
+        """One chat completion on an endpoint, after waiting for its turn in the rate limiter."""
+        self.rate_limiter.acquire(endpoint)
+        client = self.client_pool.get(endpoint)
+        start = time.perf_counter()
+        raw = client.chat.completions.with_raw_response.create(
+            model=self.llm_model,
+            max_tokens=4096,
+            temperature=temperature,
+            messages=messages,
+            timeout=self.call_timeout
+        )
+        self._record_latency(endpoint, time.perf_counter() - start)
+        self.rate_limiter.on_success(endpoint, raw.headers)
+        return raw.parse()
+    
+    def _create_openai_hedged(self, endpoint: str, messages: List[Dict], temperature: float, tried: set):
+        """Chat completion on an endpoint, hedged to a second endpoint when it is slower than the threshold.
+        
+        Errors of the call to `endpoint` are raised for the caller to record;
+        a failed hedge is recorded here. A sync call cannot be interrupted, so
+        the losing call is abandoned: its result is discarded and its tokens
+        are added to the usage totals when it completes.
+        """
+        if self.hedger is None:
+            return self._create_openai(endpoint, messages, temperature)
+        return self.hedger.call(
+            lambda target: self._create_openai(target, messages, temperature),
+            endpoint,
+            lambda: self._get_endpoint(exclude=tried | {endpoint}),
+            self._hedge_executor,
+            self.call_timeout,
+            recoverable=(openai.APIError,),
+            on_hedge_error=lambda hedge_endpoint, error: self._record_failure(hedge_endpoint, error, tried),
+            on_abandon=self._abandon,
+            timeout_error=self._hedge_timeout
+        )
+    
+    def _abandon(self, call: futures.Future):
+        """Discard a losing sync call, counting its tokens once it completes."""
+        def count_usage(done: futures.Future):
+            if not done.cancelled() and done.exception() is None:
+                self._record_openai_usage(done.result(), None)
+        
+        if not call.cancel():
+            call.add_done_callback(count_usage)
+    
+    async def _acreate_openai(self, endpoint: str, messages: List[Dict], temperature: float):
+        """One chat completion on an endpoint (async client), after waiting for its turn in the rate limiter."""
+        await self.rate_limiter.aacquire(endpoint)
+        client = self.client_pool.get_async(endpoint)
+        start = time.perf_counter()
+        raw = await client.chat.completions.with_raw_response.create(
+            model=self.llm_model,
+            max_tokens=4096,
+            temperature=temperature,
+            messages=messages,
+            timeout=self.call_timeout
+        )
+        self._record_latency(endpoint, time.perf_counter() - start)
+        self.rate_limiter.on_success(endpoint, raw.headers)
+        return raw.parse()
+    
+    async def _acreate_openai_hedged(self, endpoint: str, messages: List[Dict], temperature: float, tried: set):
+        """Async variant of _create_openai_hedged; the losing call is cancelled.
+        
+        A cancelled slow call's elapsed time is recorded as a lower bound of
+        its latency, so the balancer and the hedge threshold still see it.
+        """
+        if self.hedger is None:
+            return await self._acreate_openai(endpoint, messages, temperature)
+        return await self.hedger.acall(
+            lambda target: self._acreate_openai(target, messages, temperature),
+            endpoint,
+            lambda: self._get_endpoint(exclude=tried | {endpoint}),
+            self.call_timeout,
+            recoverable=(openai.APIError,),
+            on_hedge_error=lambda hedge_endpoint, error: self._record_failure(hedge_endpoint, error, tried),
+            on_cancelled=self.balancer.record_latency,
+            timeout_error=self._hedge_timeout
+        )
+    
+    @staticmethod
+    def _build_messages(prompt: str, system_prompt: Optional[str]) -> List[Dict]:
+        """Chat messages; a static system prompt comes first so its tokens form a cacheable prefix."""
+        messages = [{"role": "user", "content": prompt}]
+        if system_prompt:
+            messages.insert(0, {"role": "system", "content": system_prompt})
+        return messages
+    
+    def _record_usage(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int,
+        usage: Optional[Dict]
+    ):
+        """Add one call's token counts to the totals and to the caller's usage dict."""
+        with self._usage_lock:
+            self.usage_totals["calls"] += 1
+            self.usage_totals["prompt_tokens"] += prompt_tokens
+            self.usage_totals["cached_tokens"] += cached_tokens
+            self.usage_totals["completion_tokens"] += completion_tokens
+        if usage is not None:
+            usage.update(
+                prompt_tokens=prompt_tokens,
+                cached_tokens=cached_tokens,
+                completion_tokens=completion_tokens
+            )
+    
+    def _record_openai_usage(self, response, usage: Optional[Dict]):
+        """Read token counts (incl. usage.prompt_tokens_details.cached_tokens) from a chat completion."""
+        response_usage = getattr(response, "usage", None)
+        if response_usage is None:
+            return
+        details = getattr(response_usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        self._record_usage(
+            response_usage.prompt_tokens or 0, response_usage.completion_tokens or 0, cached_tokens, usage
+        )
+    
+    def _record_gemini_usage(self, response, usage: Optional[Dict]):
+        """Read token counts (incl. usage_metadata.cached_content_token_count) from a Gemini response."""
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is None:
+            return
+        self._record_usage(
+            getattr(metadata, "prompt_token_count", 0) or 0,
+            getattr(metadata, "candidates_token_count", 0) or 0,
+            getattr(metadata, "cached_content_token_count", 0) or 0,
+            usage
+        )
+    
+    def _record_trailing(self, text: str):
+        """Count the tokens a complete response carries after its JSON object."""
+        extractor = JsonExtractor()
+        if not extractor.feed(text) and not extractor.finish():
+            return
+        trailing = self.token_counter.count(text[extractor.end:].strip())
+        with self._usage_lock:
+            self.trailing_totals["responses"] += 1
+            self.trailing_totals["tokens"] += trailing
+    
+    def _finish_stream(
+        self,
+        reader: _StreamReader,
+        prompt: str,
+        system_prompt: Optional[str],
+        usage: Optional[Dict],
+        stream_info: Optional[Dict],
+        usage_recorded: bool = False
+    ) -> str:
+        """Record stream metrics and token usage; returns the streamed text (just the JSON object after an early stop)."""
+        text = reader.text
+        completion_tokens = self.token_counter.count(text)
+        if not usage_recorded:
+            # Streams closed early carry no usage block: count the tokens locally
+            prompt_tokens = self.token_counter.count((system_prompt or "") + prompt)
+            self._record_usage(prompt_tokens, completion_tokens, 0, usage)
+            if usage is not None:
+                usage["estimated"] = True
+        
+        tokens_saved = 0
+        with self._usage_lock:
+            if reader.stopped_early:
+                # Estimate: average tokens after the JSON object in complete responses
+                responses = self.trailing_totals["responses"]
+                tokens_saved = round(self.trailing_totals["tokens"] / responses) if responses else None
+            self.stream_totals["streams"] += 1
+            self.stream_totals["early_stops"] += int(reader.stopped_early)
+            self.stream_totals["ttft_ms"] += reader.ttft_ms or 0.0
+            self.stream_totals["tokens_saved_est"] += tokens_saved or 0
+        if not reader.stopped_early:
+            self._record_trailing(text)
+        
+        if stream_info is not None:
+            stream_info.update(
+                ttft_ms=round(reader.ttft_ms, 1) if reader.ttft_ms is not None else None,
+                chunks=reader.chunks,
+                completion_tokens=completion_tokens,
+                early_stop=reader.stopped_early,
+                tokens_saved_est=tokens_saved
+            )
+        if reader.stopped_early:
+            return reader.extractor.text
+        return text
+    
+    def stream_stats(self) -> Dict:
+        """Return streaming totals: early stops, average time to first token and estimated tokens saved."""
+        with self._usage_lock:
+            totals = dict(self.stream_totals)
+            trailing = dict(self.trailing_totals)
+        streams = totals["streams"]
+        return {
+            "enabled": self.streaming,
+            "streams": streams,
+            "early_stops": totals["early_stops"],
+            "avg_ttft_ms": round(totals["ttft_ms"] / streams, 1) if streams else None,
+            "tokens_saved_est": totals["tokens_saved_est"],
+            "avg_trailing_tokens": round(trailing["tokens"] / trailing["responses"], 1) if trailing["responses"] else None,
+        }
+    
+    def usage_stats(self) -> Dict:
+        """Return token totals and the share of prompt tokens served from the prefix cache."""
+        with self._usage_lock:
+            totals = dict(self.usage_totals)
+        totals["cached_ratio"] = (
+            round(totals["cached_tokens"] / totals["prompt_tokens"], 4) if totals["prompt_tokens"] else 0.0
+        )
+        return totals
+    
+    def _gemini_model_for(self, system_prompt: Optional[str]):
+        """Gemini model serving the static prefix from a context cache (created once, renewed before expiry)."""
+        if not system_prompt:
+            return self.model
+        key = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        with self._gemini_cache_lock:
+            entry = self._gemini_prefix_models.get(key)
+            if entry is not None and time.time() < entry[1]:
+                return entry[0]
+            model, renew_at = self._create_gemini_prefix_model(system_prompt)
+            self._gemini_prefix_models = {key: (model, renew_at)}  # one static prefix per process
+            return model
+    
+    def _create_gemini_prefix_model(self, system_prompt: str) -> Tuple[object, float]:
+        """Create a cachedContent for the prefix; fall back to a plain system instruction."""
+        if self.gemini_context_cache:
+            try:
+                cached_content = genai.caching.CachedContent.create(
+                    model=f"models/{self.llm_model}",
+                    system_instruction=system_prompt,
+                    ttl=timedelta(seconds=self.gemini_cache_ttl)
+                )
+                print(f"   ✓ Gemini context cache created: {cached_content.name}")
+                # Renew a minute before the server-side cache expires
+                renew_at = time.time() + max(self.gemini_cache_ttl - 60, 60)
+                return genai.GenerativeModel.from_cached_content(cached_content=cached_content), renew_at
+            except Exception as e:
+                print(f"⚠️  Gemini context cache unavailable, sending prefix as system instruction: {e}")
+        return genai.GenerativeModel(self.llm_model, system_instruction=system_prompt), float("inf")
+    
+    def generate(
+        self,
+        prompt: str,
+        temperature: float = 0.0,
+        max_retries: int = 3,
+        system_prompt: Optional[str] = None,
+        usage: Optional[Dict] = None
+    ) -> str:
+        """Generate text from prompt.
+        
+        Args:
+            prompt: User prompt (the per-request part when system_prompt is set)
+            temperature: Sampling temperature
+            max_retries: Maximum number of endpoint retry attempts
+            system_prompt: Optional static prefix, sent as system message /
+                Gemini cached content so the provider can cache it
+            usage: Optional dict filled with prompt/cached/completion token counts
+        """
         if self.provider == "openai":
-            return self._generate_openai(prompt, temperature, max_retries)
+            text = self._generate_openai(prompt, temperature, max_retries, system_prompt, usage)
         elif self.provider == "gemini":
-            return self._generate_gemini(prompt, temperature, max_retries)
+            text = self._generate_gemini(prompt, temperature, max_retries, system_prompt, usage)
+        self._record_trailing(text)
+        return text
     
-    def _generate_openai(self, prompt: str, temperature: float, max_retries: int) -> str:
+    def _generate_openai(
+        self,
+        prompt: str,
+        temperature: float,
+        max_retries: int,
+        system_prompt: Optional[str] = None,
+        usage: Optional[Dict] = None
+    ) -> str:
         """Generate using Azure OpenAI."""
-        messages = [{"role": "user", "content": prompt}]
+        messages = self._build_messages(prompt, system_prompt)
+        last_error = None
+        tried = set()
+        
+        for attempt in range(max_retries):
+            endpoint = self._get_endpoint(exclude=tried)
+            try:
+                response = self._create_openai_hedged(endpoint, messages, temperature, tried)
+                self._record_openai_usage(response, usage)
+                return response.choices[0].message.content
+                
+            except openai.APIConnectionError as e:
+                self._record_failure(endpoint, e, tried)
+                last_error = f"Server unreachable: {e.__cause__}"
+                print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
+            except openai.RateLimitError as e:
+                self._record_failure(endpoint, e, tried)
+                last_error = f"Rate limit (HTTP 429): {e}"
+                print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
+            except openai.APIStatusError as e:
+                self._record_failure(endpoint, e, tried)
+                last_error = f"API error: {e}"
+                print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
+        
+        raise RuntimeError(f"Azure OpenAI call failed after {max_retries} attempts. Last error: {last_error}")
+    
+    def _generate_gemini(
+        self,
+        prompt: str,
+        temperature: float,
+        max_retries: int,
+        system_prompt: Optional[str] = None,
+        usage: Optional[Dict] = None
+    ) -> str:
+        """Generate using Google Gemini."""
+        last_error = None
+        model = self._gemini_model_for(system_prompt)
+        
+        generation_config = genai.GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=4096
+        )
+        
+        for attempt in range(max_retries):
+            self.rate_limiter.acquire(GEMINI_ENDPOINT)
+            try:
+                response = model.generate_content(
+                    prompt,
+                    generation_config=generation_config
+                )
+                self.rate_limiter.on_success(GEMINI_ENDPOINT)
+                self._record_gemini_usage(response, usage)
+                return response.text
+                
+            except Exception as e:
+                self._record_gemini_failure(e)
+                last_error = str(e)
+                print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
+        
+        raise RuntimeError(f"Gemini call failed after {max_retries} attempts. Last error: {last_error}")
+    
+    async def agenerate(
+        self,
+        prompt: str,
+        temperature: float = 0.0,
+        max_retries: int = 3,
+        system_prompt: Optional[str] = None,
+        usage: Optional[Dict] = None,
+        stream: Optional[bool] = None,
+        on_progress=None,
+        stream_info: Optional[Dict] = None
+    ) -> str:
+        """Generate text from prompt without blocking the event loop (see generate()).
+        
+        With streaming (stream=True, or LLM_STREAMING=true when stream is None)
+        the completion is read chunk by chunk and the stream is closed as soon
+        as the top-level JSON object is complete, so prose the model would add
+        after the JSON is never generated.
+        
+        Args:
+            stream: Stream the completion (default: LLM_STREAMING)
+            on_progress: Optional async callback(chunks_received, message),
+                called at most every LLM_STREAM_PROGRESS_INTERVAL seconds
+            stream_info: Optional dict filled with ttft_ms, chunks,
+                completion_tokens, early_stop and tokens_saved_est (an
+                estimate: the average number of tokens found after the JSON
+                object in complete responses)
+        """
+        use_stream = self.streaming if stream is None else stream
+        if use_stream:
+            if self.provider == "openai":
+                return await self._astream_openai(
+                    prompt, temperature, max_retries, system_prompt, usage, on_progress, stream_info
+                )
+            elif self.provider == "gemini":
+                return await self._astream_gemini(
+                    prompt, temperature, max_retries, system_prompt, usage, on_progress, stream_info
+                )
+        if self.provider == "openai":
+            text = await self._agenerate_openai(prompt, temperature, max_retries, system_prompt, usage)
+        elif self.provider == "gemini":
+            text = await self._agenerate_gemini(prompt, temperature, max_retries, system_prompt, usage)
+        self._record_trailing(text)
+        return text
+    
+    async def _agenerate_openai(
+        self,
+        prompt: str,
+        temperature: float,
+        max_retries: int,
+        system_prompt: Optional[str] = None,
+        usage: Optional[Dict] = None
+    ) -> str:
+        """Generate using Azure OpenAI (async client)."""
+        messages = self._build_messages(prompt, system_prompt)
         last_error = None
+        tried = set()
         
         for attempt in range(max_retries):
+            endpoint = self._get_endpoint(exclude=tried)
             try:
-                endpoint = self._get_endpoint()
-                client = AzureOpenAI(
-                    api_version=self.api_version,
-                    api_key=self.api_key,
-                    azure_endpoint=endpoint
+                response = await self._acreate_openai_hedged(endpoint, messages, temperature, tried)
+                self._record_openai_usage(response, usage)
+                return response.choices[0].message.content
+                
+            except openai.APIConnectionError as e:
+                self._record_failure(endpoint, e, tried)
+                last_error = f"Server unreachable: {e.__cause__}"
+                print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
+            except openai.RateLimitError as e:
+                self._record_failure(endpoint, e, tried)
+                last_error = f"Rate limit (HTTP 429): {e}"
+                print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
+            except openai.APIStatusError as e:
+                self._record_failure(endpoint, e, tried)
+                last_error = f"API error: {e}"
+                print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
+        
+        raise RuntimeError(f"Azure OpenAI call failed after {max_retries} attempts. Last error: {last_error}")
+    
+    async def _agenerate_gemini(
+        self,
+        prompt: str,
+        temperature: float,
+        max_retries: int,
+        system_prompt: Optional[str] = None,
+        usage: Optional[Dict] = None
+    ) -> str:
+        """Generate using Google Gemini (async API)."""
+        last_error = None
+        model = await asyncio.to_thread(self._gemini_model_for, system_prompt)
+        
+        generation_config = genai.GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=4096
+        )
+        
+        for attempt in range(max_retries):
+            await self.rate_limiter.aacquire(GEMINI_ENDPOINT)
+            try:
+                response = await model.generate_content_async(
+                    prompt,
+                    generation_config=generation_config
                 )
+                self.rate_limiter.on_success(GEMINI_ENDPOINT)
+                self._record_gemini_usage(response, usage)
+                return response.text
+                
+            except Exception as e:
+                self._record_gemini_failure(e)
+                last_error = str(e)
+                print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
+        
+        raise RuntimeError(f"Gemini call failed after {max_retries} attempts. Last error: {last_error}")
+    
+    async def _astream_openai(
+        self,
+        prompt: str,
+        temperature: float,
+        max_retries: int,
+        system_prompt: Optional[str] = None,
+        usage: Optional[Dict] = None,
+        on_progress=None,
+        stream_info: Optional[Dict] = None
+    ) -> str:
+        """Stream from Azure OpenAI, closing the stream once the JSON object is complete."""
+        messages = self._build_messages(prompt, system_prompt)
+        last_error = None
+        tried = set()
+        
+        for attempt in range(max_retries):
+            endpoint = self._get_endpoint(exclude=tried)
+            try:
+                await self.rate_limiter.aacquire(endpoint)
+                client = self.client_pool.get_async(endpoint)
+                start = time.perf_counter()
                 
-                response = client.chat.completions.create(
+                stream = await client.chat.completions.create(
                     model=self.llm_model,
                     max_tokens=4096,
                     temperature=temperature,
-                    messages=messages
+                    messages=messages,
+                    stream=True,
+                    timeout=self.call_timeout
                 )
+                reader = _StreamReader(start, on_progress, self.stream_progress_interval)
+                try:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta and await reader.add(delta):
+                            break
+                finally:
+                    # Closing the connection early ends generation on the server side
+                    await stream.close()
                 
-                return response.choices[0].message.content
+                self.balancer.record_success(endpoint, time.perf_counter() - start)
+                # The stream's HTTP response carries the x-ratelimit-* headers like a plain completion
+                self.rate_limiter.on_success(endpoint, stream.response.headers)
+                return self._finish_stream(reader, prompt, system_prompt, usage, stream_info)
                 
             except openai.APIConnectionError as e:
+                self._record_failure(endpoint, e, tried)
                 last_error = f"Server unreachable: {e.__cause__}"
                 print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
             except openai.RateLimitError as e:
+                self._record_failure(endpoint, e, tried)
                 last_error = f"Rate limit (HTTP 429): {e}"
                 print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
             except openai.APIStatusError as e:
+                self._record_failure(endpoint, e, tried)
                 last_error = f"API error: {e}"
                 print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
         
         raise RuntimeError(f"Azure OpenAI call failed after {max_retries} attempts. Last error: {last_error}")
     
-    def _generate_gemini(self, prompt: str, temperature: float, max_retries: int) -> str:
-        """Generate using Google Gemini."""
+    async def _astream_gemini(
+        self,
+        prompt: str,
+        temperature: float,
+        max_retries: int,
+        system_prompt: Optional[str] = None,
+        usage: Optional[Dict] = None,
+        on_progress=None,
+        stream_info: Optional[Dict] = None
+    ) -> str:
+        """Stream from Google Gemini, stopping once the JSON object is complete."""
         last_error = None
+        model = await asyncio.to_thread(self._gemini_model_for, system_prompt)
         
         generation_config = genai.GenerationConfig(
             temperature=temperature,
@@ -358,14 +1068,33 @@ class LLMProvider:
         )
         
         for attempt in range(max_retries):
+            await self.rate_limiter.aacquire(GEMINI_ENDPOINT)
             try:
-                response = self.model.generate_content(
+                start = time.perf_counter()
+                response = await model.generate_content_async(
                     prompt,
-                    generation_config=generation_config
+                    generation_config=generation_config,
+                    stream=True
                 )
-                return response.text
+                reader = _StreamReader(start, on_progress, self.stream_progress_interval)
+                async for chunk in response:
+                    try:
+                        delta = chunk.text
+                    except ValueError:  # chunk without text parts (e.g. safety metadata)
+                        continue
+                    if delta and await reader.add(delta):
+                        break  # abandoning the iterator cancels the remaining stream
+                
+                self.rate_limiter.on_success(GEMINI_ENDPOINT)
+                # usage_metadata is only complete when the stream ran to the end
+                recorded = False
+                if not reader.stopped_early and getattr(response, "usage_metadata", None) is not None:
+                    self._record_gemini_usage(response, usage)
+                    recorded = True
+                return self._finish_stream(reader, prompt, system_prompt, usage, stream_info, usage_recorded=recorded)
                 
             except Exception as e:
+                self._record_gemini_failure(e)
                 last_error = str(e)
                 print(f"⚠️  Attempt {attempt + 1}/{max_retries}: {last_error}")
         
@@ -380,27 +1109,37 @@ class CanvasXpressGenerator:
         data_dir: str = "/app/data",
         vector_db_path: str = "/root/.cache/canvasxpress_mcp.db",
         llm_model: Optional[str] = None,
-        llm_environment: str = "nonprod"
+        llm_environment: str = "nonprod",
+        init_phases: Optional[List[Dict]] = None
     ):
         """
         Initialize the generator.
         
         Args:
             data_dir: Directory containing few-shot examples and schema
-            vector_db_path: Path to store the Milvus vector database
+            vector_db_path: Path to store the Milvus vector database (the numpy
+                backend stores its index in a sibling directory)
             llm_model: Model name (for OpenAI: 'gpt-4o-mini-global', for Gemini: 'gemini-2.0-flash-exp')
             llm_environment: BMS environment ('nonprod' or 'prod') - only used for OpenAI
+            init_phases: Optional list that initialization phases are appended to
+                as they run ({"phase", "status", "duration_ms"}), so another
+                thread can report startup progress
         """
+        self.init_phases = init_phases if init_phases is not None else []
+        self._begin_init_phase("data_files")
         self.data_dir = Path(data_dir)
         self.vector_db_path = vector_db_path
         
         # Determine providers from environment
         self.llm_provider_name = os.environ.get("LLM_PROVIDER", "openai").lower()
         self.embedding_provider_name = os.environ.get("EMBEDDING_PROVIDER", "local").lower()
+        self.prompt_version = os.environ.get("PROMPT_VERSION", "v2").lower()
         
         # Load data files
         print("🔧 Loading few-shot examples...")
         self.examples = self._load_examples()
+        # Parsed configs and pre-rendered prompt blocks, keyed by example_id
+        self.example_table = ExampleTable(self.examples)
         
         print("🔧 Loading schema...")
         self.schema = self._load_schema()
@@ -411,28 +1150,181 @@ class CanvasXpressGenerator:
         print("🔧 Loading prompt template...")
         self.prompt_template = self._load_prompt_template()
         
+        # Local validation of generated configs, compiled from schema.md and the rules'
+        # key definitions; unambiguous problems are repaired, the rest reported
+        self.config_validator = None
+        self.config_auto_repair = os.environ.get("CONFIG_AUTO_REPAIR", "true").lower() == "true"
+        if os.environ.get("CONFIG_VALIDATION", "true").lower() == "true":
+            self.config_validator = ConfigValidator(self.schema, self.rules)
+        
+        # Prompt layout: 'template' formats the whole template per request,
+        # 'prefix_cache' renders the static rules/schema prefix once so the
+        # provider can cache it (OpenAI system message / Gemini cachedContent)
+        self.prompt_layout_mode = os.environ.get("PROMPT_LAYOUT", "template").lower()
+        self.schema_pruning = os.environ.get("SCHEMA_PRUNING", "false").lower() == "true"
+        self.rules_retrieval = (
+            os.environ.get("RULES_RETRIEVAL", "false").lower() == "true" and bool(self.rules)
+        )
+        self.prompt_layout = None
+        if self.prompt_layout_mode == "prefix_cache":
+            # Pruned schema/rules differ per request, so they move to the dynamic suffix
+            static_values = {}
+            if not self.rules_retrieval:
+                static_values["rules_info"] = self.rules
+            if not self.schema_pruning:
+                static_values["schema_info"] = self.schema
+            self.prompt_layout = PromptLayout(self.prompt_template, static_values)
+        elif self.prompt_layout_mode != "template":
+            raise ValueError(f"Unknown PROMPT_LAYOUT: {self.prompt_layout_mode}. Use 'template' or 'prefix_cache'.")
+        
         # Initialize embedding provider
+        self._begin_init_phase("embedding_model")
         self.embedding_provider = EmbeddingProvider(self.embedding_provider_name)
         
-        # Initialize vector database
-        print("🔧 Initializing vector database...")
-        self.vector_db = MilvusClient(self.vector_db_path)
+        # Initialize vector database (retrieval backend: milvus or numpy)
+        self._begin_init_phase("vector_database")
+        self.vector_backend = os.environ.get("VECTOR_BACKEND", "milvus").lower()
+        print(f"🔧 Initializing vector database ({self.vector_backend})...")
+        self.vector_index = create_vector_index(self.vector_backend, self.vector_db_path)
         self._setup_vector_db()
         
+        # Schema pruning: send only the schema.md parameters relevant to each request
+        self._begin_init_phase("prompt_indexes")
+        self.schema_index = None
+        self.schema_type_examples = int(os.environ.get("SCHEMA_TYPE_EXAMPLES", "5"))
+        if self.schema_pruning:
+            print("🔧 Indexing schema parameters...")
+            self.schema_index = SchemaIndex(
+                self.schema,
+                embed=self.embedding_provider.encode,
+                token_budget=int(os.environ.get("SCHEMA_TOKEN_BUDGET", "2500"))
+            )
+        
+        # Rules retrieval: core rules always, other rule chunks by graph type/keys/query
+        self.rules_index = None
+        if self.rules_retrieval:
+            print("🔧 Indexing rule chunks...")
+            core = os.environ.get("RULES_CORE_CHUNKS")
+            self.rules_index = RulesIndex(
+                self.rules,
+                embed=self.embedding_provider.encode,
+                core=[c.strip() for c in core.split(",") if c.strip()] if core else DEFAULT_CORE_CHUNKS,
+                top_k=int(os.environ.get("RULES_TOP_K", "2"))
+            )
+        
         # Initialize LLM provider
+        self._begin_init_phase("llm_provider")
         self.llm_provider = LLMProvider(
             provider=self.llm_provider_name,
             llm_model=llm_model,
             llm_environment=llm_environment
         )
         
+        # Few-shot selection: 'fixed' sends the 25 nearest examples, 'budget'
+        # fills a per-model token budget by MMR over a larger candidate set
+        self._begin_init_phase("caches_and_workers")
+        self.token_counter = get_token_counter(self.llm_provider.llm_model)
+        
+        # Repair round trip: a small prompt (broken output, errors, schema lines)
+        # instead of failing requests whose output is not valid JSON or a valid config
+        self.config_repairer = None
+        if os.environ.get("CONFIG_REPAIR_ENABLED", "true").lower() == "true":
+            self.config_repairer = ConfigRepairer(
+                self.token_counter.count,
+                schema_lines=self.config_validator.schema_lines if self.config_validator else None,
+                max_attempts=int(os.environ.get("CONFIG_REPAIR_MAX_ATTEMPTS", "1")),
+                max_prompt_tokens=int(os.environ.get("CONFIG_REPAIR_MAX_TOKENS", "2000"))
+            )
+        
+        self.few_shot_selection = os.environ.get("FEW_SHOT_SELECTION", "fixed").lower()
+        self.few_shot_selector = None
+        self.num_candidates = 25
+        if self.few_shot_selection == "budget":
+            self.few_shot_selector = FewShotSelector(
+                self.token_counter,
+                token_budget=self._few_shot_budget(self.llm_provider.llm_model),
+                mmr_lambda=float(os.environ.get("FEW_SHOT_MMR_LAMBDA", "0.7")),
+                max_examples=int(os.environ.get("FEW_SHOT_MAX_EXAMPLES", "25")),
+                min_examples=int(os.environ.get("FEW_SHOT_MIN_EXAMPLES", "1"))
+            )
+            self.num_candidates = int(os.environ.get("FEW_SHOT_CANDIDATES", "40"))
+        elif self.few_shot_selection != "fixed":
+            raise ValueError(f"Unknown FEW_SHOT_SELECTION: {self.few_shot_selection}. Use 'fixed' or 'budget'.")
+        
+        # Initialize exact-match response cache (keyed on data files + model)
+        self.data_hash = self._hash_data_files()
+        self.response_cache = None
+        if os.environ.get("RESPONSE_CACHE_ENABLED", "true").lower() == "true":
+            self.response_cache = ResponseCache(
+                max_size=int(os.environ.get("RESPONSE_CACHE_MAX_SIZE", "1024")),
+                ttl=float(os.environ.get("RESPONSE_CACHE_TTL", "86400")),
+                path=os.environ.get("RESPONSE_CACHE_PATH") or None
+            )
+        
+        # Initialize semantic cache (reuses answers for paraphrased queries)
+        self.semantic_cache = None
+        if os.environ.get("SEMANTIC_CACHE_ENABLED", "false").lower() == "true":
+            self.semantic_cache = SemanticCache(
+                dimension=self.embedding_provider.dimension,
+                threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+                max_size=int(os.environ.get("SEMANTIC_CACHE_MAX_SIZE", "512")),
+                ttl=float(os.environ.get("SEMANTIC_CACHE_TTL", "86400"))
+            )
+        
+        # Identical requests in flight at the same time share one computation
+        self.single_flight = None
+        if os.environ.get("SINGLE_FLIGHT_ENABLED", "true").lower() == "true":
+            self.single_flight = SingleFlight()
+        
+        # Worker pool for blocking work (embedding, vector search) in agenerate()
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("GENERATOR_WORKERS", "8")),
+            thread_name_prefix="cx-generator"
+        )
+        
+        # Batch generation limits (generate_batch)
+        self.batch_concurrency = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+        self.batch_max_size = int(os.environ.get("BATCH_MAX_SIZE", "200"))
+        self._begin_init_phase(None)
+        
         print(f"📦 LLM Provider: {self.llm_provider_name} ({self.llm_provider.llm_model})")
         print(f"📊 Embedding Provider: {self.embedding_provider_name}")
-        prompt_version = os.environ.get("PROMPT_VERSION", "v2").lower()
         rules_status = "✓ loaded" if self.rules else "✗ not found"
-        print(f"📝 Prompt Version: {prompt_version} (rules: {rules_status})")
+        print(f"📝 Prompt Version: {self.prompt_version} (rules: {rules_status}, layout: {self.prompt_layout_mode})")
+        if self.schema_index is not None:
+            print(f"✂️  Schema pruning: {len(self.schema_index.parameters)} parameters, "
+                  f"budget {self.schema_index.token_budget} tokens (full schema ~{self.schema_index.full_tokens})")
+        if self.rules_index is not None:
+            print(f"✂️  Rules retrieval: {len(self.rules_index.chunks)} chunks "
+                  f"({sum(1 for c in self.rules_index.chunks if c.core)} core), top-k {self.rules_index.top_k}")
+        if self.few_shot_selector is not None:
+            print(f"🎯 Few-shot selection: budget {self.few_shot_selector.token_budget} tokens "
+                  f"({self.token_counter.name}), MMR lambda {self.few_shot_selector.mmr_lambda}")
+        cache_status = "enabled" if self.response_cache else "disabled"
+        semantic_status = (
+            f"enabled (threshold {self.semantic_cache.threshold})" if self.semantic_cache else "disabled"
+        )
+        print(f"💾 Response Cache: {cache_status}, Semantic Cache: {semantic_status}")
+        if self.config_validator is not None:
+            print(f"🔎 Config validation: {len(self.config_validator.specs)} parameters, "
+                  f"{len(self.config_validator.graph_types)} graph types, "
+                  f"auto-repair {'on' if self.config_auto_repair else 'off'}")
         print("✅ CanvasXpress Generator initialized successfully!")
     
+    def _begin_init_phase(self, name: Optional[str]):
+        """Finish the running initialization phase (recording its duration) and start the next one.
+        
+        Phase dicts are read by other threads while this runs, so only their
+        values change; keys are never added or removed after creation.
+        """
+        now = time.perf_counter()
+        if self.init_phases and self.init_phases[-1]["status"] == "running":
+            phase = self.init_phases[-1]
+            phase["duration_ms"] = round((now - phase["_start"]) * 1000, 1)
+            phase["status"] = "done"
+        if name is not None:
+            self.init_phases.append({"phase": name, "status": "running", "duration_ms": None, "_start": now})
+    
     def _load_examples(self) -> List[Dict]:
         """Load few-shot examples from JSON file."""
         examples_file = self.data_dir / "few_shot_examples.json"
@@ -459,8 +1351,7 @@ class CanvasXpressGenerator:
         Uses prompt_template_v2.md if PROMPT_VERSION=v2 (includes rules),
         otherwise uses the original prompt_template.md.
         """
-        prompt_version = os.environ.get("PROMPT_VERSION", "v2").lower()
-        if prompt_version == "v2":
+        if self.prompt_version == "v2":
             template_file = self.data_dir / "prompt_template_v2.md"
         else:
             template_file = self.data_dir / "prompt_template.md"
@@ -469,84 +1360,80 @@ class CanvasXpressGenerator:
             # Fall back to original if v2 doesn't exist
             template_file = self.data_dir / "prompt_template.md"
         
+        self.prompt_template_file = template_file
         with open(template_file) as f:
             return f.read()
     
+    @staticmethod
+    def _few_shot_budget(llm_model: str) -> int:
+        """Few-shot token budget for a model (FEW_SHOT_MODEL_BUDGETS overrides FEW_SHOT_TOKEN_BUDGET)."""
+        for entry in os.environ.get("FEW_SHOT_MODEL_BUDGETS", "").split(","):
+            model, _, budget = entry.partition("=")
+            if model.strip() == llm_model and budget.strip():
+                return int(budget)
+        return int(os.environ.get("FEW_SHOT_TOKEN_BUDGET", "2000"))
+    
+    def _hash_data_files(self) -> str:
+        """Hash the data files that shape the prompt (used to key cached responses)."""
+        digest = hashlib.sha256()
+        for path in [
+            self.data_dir / "few_shot_examples.json",
+            self.data_dir / "schema.md",
+            self.data_dir / "canvasxpress_rules.md",
+            self.prompt_template_file,
+        ]:
+            digest.update(str(path.name).encode("utf-8"))
+            if path.exists():
+                digest.update(path.read_bytes())
+        return digest.hexdigest()
+    
     def _setup_vector_db(self):
         """Set up vector database with few-shot examples.
         
         Supports both single descriptions and multiple alternative wordings.
         If an example has 'alt_descriptions', each wording gets its own vector
         but all point to the same config.
+        
+        Re-indexing is incremental: a manifest stored with the index records
+        the embedding model, dimension and a content hash per description row.
+        On startup only added or changed rows are embedded and upserted and
+        removed rows are deleted. The index is rebuilt from scratch only when
+        the embedding model or dimension changed, or when there is no usable
+        manifest (index created by an older version, or out of sync).
         """
-        collection_name = "few_shot_examples"
+        rows = ExampleTable.vector_rows(self.examples)
+        model = {
+            "embedding_provider": self.embedding_provider.provider,
+            "embedding_model": getattr(self.embedding_provider, "model_name", None),
+            "dimension": self.embedding_provider.dimension,
+        }
+        rebuild_reason, changed, removed = self.vector_index.plan_sync(rows, model)
         
-        # Check if collection exists
-        if self.vector_db.has_collection(collection_name):
-            print(f"   ✓ Vector database collection '{collection_name}' already exists")
+        if rebuild_reason is not None:
+            print(f"   📊 Building vector database ({self.vector_backend}): {rebuild_reason}...")
+        elif not changed and not removed:
+            print(f"   ✓ Vector database ({self.vector_backend}) up to date ({len(rows)} vectors)")
             return
+        else:
+            print(f"   🔄 Updating vector database ({self.vector_backend}): "
+                  f"{len(changed)} added/changed, {len(removed)} removed")
         
-        print(f"   📊 Creating vector database collection...")
-        
-        # Create collection with appropriate dimension for the embedding provider
-        self.vector_db.create_collection(
-            collection_name=collection_name,
-            dimension=self.embedding_provider.dimension
-        )
-        
-        # Build list of all descriptions (primary + alternatives)
-        # Each description will get its own vector, but share the same config
-        all_descriptions = []
-        description_metadata = []  # Track which example each description belongs to
-        
-        for example in self.examples:
-            # Primary description (always present)
-            all_descriptions.append(example['description'])
-            description_metadata.append({
-                'example': example,
-                'is_primary': True
-            })
-            
-            # Alternative descriptions (if present)
-            if 'alt_descriptions' in example:
-                for alt_desc in example['alt_descriptions']:
-                    all_descriptions.append(alt_desc)
-                    description_metadata.append({
-                        'example': example,
-                        'is_primary': False
-                    })
-        
-        num_primary = len(self.examples)
-        num_alt = len(all_descriptions) - num_primary
-        print(f"   🔢 Embedding {len(all_descriptions)} descriptions ({num_primary} primary + {num_alt} alternatives)...")
-        
-        # Batch embed all descriptions
-        embeddings = self.embedding_provider.encode(all_descriptions)
-        
-        # Build data for insertion
-        data = []
-        for i, (desc, embedding, meta) in enumerate(zip(all_descriptions, embeddings, description_metadata)):
-            example = meta['example']
-            data.append({
-                "id": i,  # Sequential ID for each vector
-                "vector": embedding,
-                "description": desc,
-                "config": json.dumps(example["config"]),
-                "headers": example.get("headers", ""),  # Optional, default to empty
-                "type": example.get("type", "unknown"),  # Optional, default to unknown
-                "example_id": example.get("id", i),  # Optional, default to index
-                "is_primary": meta['is_primary']
-            })
-        
-        # Insert all vectors
-        self.vector_db.insert(collection_name=collection_name, data=data)
-        print(f"   ✓ Inserted {len(data)} vectors into vector database")
+        embeddings = []
+        if changed:
+            num_primary = sum(1 for row_id in changed if rows[row_id]["is_primary"])
+            print(f"   🔢 Embedding {len(changed)} descriptions "
+                  f"({num_primary} primary + {len(changed) - num_primary} alternatives)...")
+            # Batch embed the new/changed descriptions
+            embeddings = self.embedding_provider.encode([rows[row_id]["description"] for row_id in changed])
+        self.vector_index.apply_sync(rows, model, rebuild_reason, changed, removed, embeddings)
+        print(f"   ✓ Vector database ({self.vector_backend}) holds {self.vector_index.count()} vectors")
     
     def get_similar_examples(
         self,
         description: str,
         num_examples: int = 25,
-        deduplicate: bool = True
+        deduplicate: bool = True,
+        query_vector: Optional[List[float]] = None
     ) -> List[Dict]:
         """
         Retrieve similar few-shot examples using semantic search.
@@ -555,12 +1442,40 @@ class CanvasXpressGenerator:
             description: Natural language description of desired visualization
             num_examples: Number of similar examples to retrieve
             deduplicate: If True, return only unique configs (best match per example)
+            query_vector: Pre-computed query embedding (computed if omitted)
             
         Returns:
             List of similar example dictionaries
         """
-        # Embed the query using the configured embedding provider
-        query_vector = self.embedding_provider.encode_query(description)
+        return self.get_similar_examples_batch(
+            [description],
+            num_examples=num_examples,
+            deduplicate=deduplicate,
+            query_vectors=[query_vector] if query_vector is not None else None
+        )[0]
+    
+    def get_similar_examples_batch(
+        self,
+        descriptions: List[str],
+        num_examples: int = 25,
+        deduplicate: bool = True,
+        query_vectors: Optional[List[List[float]]] = None
+    ) -> List[List[Dict]]:
+        """
+        Retrieve similar few-shot examples for several descriptions with one search.
+        
+        Args:
+            descriptions: Natural language descriptions
+            num_examples: Number of similar examples to retrieve per description
+            deduplicate: If True, return only unique configs (best match per example)
+            query_vectors: Pre-computed query embeddings (batch-encoded if omitted)
+            
+        Returns:
+            One list of similar example dictionaries per description
+        """
+        # Embed the queries using the configured embedding provider
+        if query_vectors is None:
+            query_vectors = self.embedding_provider.encode_queries(descriptions)
         
         # Request more results if deduplicating (multiple wordings may match same config)
         # Multiplier based on ALT_WORDING_COUNT: 1 primary + N alternatives
@@ -568,19 +1483,21 @@ class CanvasXpressGenerator:
         search_multiplier = alt_wording_count + 1  # e.g., 3 alts + 1 primary = 4x
         search_limit = num_examples * search_multiplier if deduplicate else num_examples
         
-        # Search vector database
-        results = self.vector_db.search(
-            collection_name="few_shot_examples",
-            data=[query_vector],
+        # Search vector database (one multi-vector search for the whole batch).
+        # Only the example id and matched wording are fetched; configs and
+        # prompt blocks come pre-parsed/pre-rendered from the example table.
+        results = self.vector_index.search(
+            query_vectors,
             limit=search_limit,
-            output_fields=["description", "config", "headers", "type", "example_id"]
+            output_fields=["description", "example_id"]
         )
         
-        # Format results
-        similar_examples = []
-        seen_example_ids = set()
-        
+        # Hydrate results
+        all_similar_examples = []
         for hits in results:
+            similar_examples = []
+            seen_example_ids = set()
+            
             for hit in hits:
                 entity = hit["entity"]
                 example_id = entity.get("example_id")
@@ -591,22 +1508,19 @@ class CanvasXpressGenerator:
                         continue
                     seen_example_ids.add(example_id)
                 
-                similar_examples.append({
-                    "description": entity["description"],
-                    "config": json.loads(entity["config"]),
-                    "headers": entity["headers"],
-                    "type": entity["type"],
-                    "score": hit.get("distance", 0)
-                })
+                example = self.example_table.get(example_id, entity["description"], hit.get("distance", 0))
+                if example is None:
+                    # Index built from a different examples file; rebuild it to use this hit
+                    continue
+                similar_examples.append(example)
                 
                 # Stop once we have enough unique examples
                 if len(similar_examples) >= num_examples:
                     break
             
-            if len(similar_examples) >= num_examples:
-                break
+            all_similar_examples.append(similar_examples)
         
-        return similar_examples
+        return all_similar_examples
     
     def build_prompt(
         self,
@@ -625,29 +1539,103 @@ class CanvasXpressGenerator:
         Returns:
             Complete prompt string
         """
+        system_prompt, prompt = self.build_prompt_parts(description, headers, similar_examples)
+        return system_prompt + prompt if system_prompt else prompt
+    
+    def build_prompt_parts(
+        self,
+        description: str,
+        headers: Optional[str] = None,
+        similar_examples: Optional[List[Dict]] = None,
+        query_vector: Optional[List[float]] = None,
+        trace: Optional[Dict] = None,
+        prune_schema: Optional[bool] = None,
+        prune_rules: Optional[bool] = None
+    ) -> Tuple[Optional[str], str]:
+        """
+        Build the prompt as (static prefix, per-request part).
+        
+        With PROMPT_LAYOUT=prefix_cache the prefix is the byte-stable
+        rules/schema block rendered once at startup; otherwise it is None and
+        the second element is the whole prompt.
+        
+        Args:
+            description: Natural language description
+            headers: Column headers/names (optional)
+            similar_examples: Pre-fetched similar examples (optional)
+            query_vector: Pre-computed query embedding, used for schema pruning (optional)
+            trace: Optional dict filled with prompt metadata (e.g. schema tokens)
+            prune_schema: Override SCHEMA_PRUNING for this prompt (requires the schema index)
+            prune_rules: Override RULES_RETRIEVAL for this prompt (requires the rules index)
+            
+        Returns:
+            Tuple of (system prompt or None, user prompt)
+        """
         # Get similar examples if not provided
         if similar_examples is None:
-            similar_examples = self.get_similar_examples(description, num_examples=25)
+            similar_examples = self.get_similar_examples(
+                description, num_examples=self.num_candidates, query_vector=query_vector
+            )
+        
+        # Fill the token budget with relevant, non-redundant examples
+        few_shot_info = None
+        if self.few_shot_selector is not None:
+            similar_examples, few_shot_info = self.few_shot_selector.select(
+                similar_examples, self.example_table.render
+            )
+        
+        schema_text, rules_text = self.schema, self.rules
+        use_schema_index = self.schema_index is not None and prune_schema is not False
+        use_rules_index = self.rules_index is not None and prune_rules is not False
+        if use_schema_index or use_rules_index:
+            if query_vector is None:
+                query_vector = self.embedding_provider.encode_query(description)
+            # Predicted graph types (description, top examples) and keys used by the examples
+            graph_types = graph_types_in(description) + [
+                ex["type"] for ex in similar_examples[:self.schema_type_examples] if ex.get("type")
+            ]
+            config_keys = [key for ex in similar_examples for key in ex["config"]]
+            if use_schema_index:
+                schema_text, info = self.schema_index.select(query_vector, graph_types, config_keys)
+                if trace is not None:
+                    trace["schema_tokens"] = info["schema_tokens"]
+                    trace["schema_parameters"] = info["schema_parameters"]
+            if use_rules_index:
+                rules_text, info = self.rules_index.select(query_vector, graph_types, config_keys)
+                if trace is not None:
+                    trace["rules_tokens"] = info["rules_tokens"]
+                    trace["rules_tokens_saved"] = info["rules_tokens_saved"]
         
         # Format few-shot examples
-        few_shot_text = ""
-        for i, ex in enumerate(similar_examples, 1):
-            config_json = json.dumps(ex["config"], indent=2)
-            few_shot_text += f"English Text: {ex['description']}; "
-            few_shot_text += f"Headers/Column Names: {ex['headers']}, "
-            few_shot_text += f"Answer: {config_json}\n"
+        few_shot_text = "".join(self.example_table.render(ex) for ex in similar_examples)
+        if trace is not None:
+            if few_shot_info is None:
+                few_shot_info = {
+                    "few_shot_k": len(similar_examples),
+                    "few_shot_tokens": self.token_counter.count(few_shot_text)
+                }
+            trace.update(few_shot_info)
         
         # Use headers if provided, otherwise empty
         headers_text = headers or ""
         
+        if self.prompt_layout is not None:
+            return self.prompt_layout.render(
+                canvasxpress_config_english=description,
+                headers_column_names=headers_text,
+                schema_info=schema_text,
+                rules_info=rules_text,
+                few_shot_examples=few_shot_text
+            )
+        
         # Build complete prompt using template
         # Support both v1 (no rules_info) and v2 (with rules_info) templates
         try:
             prompt = self.prompt_template.format(
                 canvasxpress_config_english=description,
                 headers_column_names=headers_text,
-                schema_info=self.schema,
-                rules_info=self.rules,
+                schema_info=schema_text,
+                rules_info=rules_text,
                 few_shot_examples=few_shot_text
             )
         except KeyError:
@@ -655,11 +1643,11 @@ class CanvasXpressGenerator:
             prompt = self.prompt_template.format(
                 canvasxpress_config_english=description,
                 headers_column_names=headers_text,
-                schema_info=self.schema,
+                schema_info=schema_text,
                 few_shot_examples=few_shot_text
             )
         
-        return prompt
+        return None, prompt
     
     def _extract_json_from_response(self, response: str) -> str:
         """
@@ -669,7 +1657,8 @@ class CanvasXpressGenerator:
         - Clean JSON
         - Markdown code blocks (```json ... ```)
         - Extra text before/after JSON
-        - Multiple JSON objects (returns first valid one)
+        - Braces and quotes inside JSON strings
+        - Multiple JSON objects (returns the first valid one)
         
         Args:
             response: Raw LLM response text
@@ -678,55 +1667,38 @@ class CanvasXpressGenerator:
             Cleaned JSON string
             
         Raises:
-            ValueError: If no valid JSON found
+            JsonExtractionError: If no valid JSON object is found (a
+                json.JSONDecodeError saying why and at which offset)
         """
-        text = response.strip()
-        
-        # Try 1: Direct JSON parse (cleanest case)
-        if text.startswith('{'):
-            # Find matching closing brace
-            brace_count = 0
-            for i, char in enumerate(text):
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    if brace_count == 0:
-                        return text[:i+1]
-        
-        # Try 2: Extract from markdown code block
-        code_block_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', text, re.DOTALL)
-        if code_block_match:
-            return code_block_match.group(1).strip()
-        
-        # Try 3: Find JSON object anywhere in text
-        json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', text, re.DOTALL)
-        if json_match:
-            return json_match.group(0)
-        
-        # Try 4: More aggressive - find first { and last }
-        first_brace = text.find('{')
-        last_brace = text.rfind('}')
-        if first_brace != -1 and last_brace > first_brace:
-            return text[first_brace:last_brace+1]
-        
-        raise ValueError(f"No valid JSON found in response: {text[:200]}...")
+        return extract_json(response)
     
     def generate(
         self,
         description: str,
         headers: Optional[str] = None,
         temperature: float = 0.0,
-        max_retries: int = 3
+        max_retries: int = 3,
+        trace: Optional[Dict] = None
     ) -> Dict:
         """
         Generate CanvasXpress configuration from description.
         
+        Deterministic requests (temperature 0.0) are served from the response
+        cache when an identical request was answered before, or from the
+        semantic cache when a paraphrase with the same headers was. Generated
+        configs are checked against the schema, the rules and the headers;
+        trace["validation"] lists repairs and remaining violations.
+        
+        An identical request (same description, headers and temperature)
+        already in flight is not repeated: this call waits for it and shares
+        its result or error, and trace["coalesced"] is set.
+        
         Args:
             description: Natural language description of visualization
             headers: Optional column headers/names
             temperature: LLM temperature (0.0 = deterministic)
             max_retries: Maximum number of endpoint retry attempts
+            trace: Optional dict filled with per-request metadata (e.g. cache status)
             
         Returns:
             CanvasXpress configuration as dictionary
@@ -735,17 +1707,558 @@ class CanvasXpressGenerator:
             json.JSONDecodeError: If LLM returns invalid JSON
             Exception: If all LLM call attempts fail
         """
+        if trace is None:
+            trace = {}
+        if self.single_flight is None:
+            return self._generate(description, headers, temperature, max_retries, trace)
+        return self.single_flight.do(
+            self._flight_key(description, headers, temperature),
+            lambda flight_trace: self._generate(description, headers, temperature, max_retries, flight_trace),
+            trace
+        )
+    
+    def _generate(
+        self,
+        description: str,
+        headers: Optional[str],
+        temperature: float,
+        max_retries: int,
+        trace: Dict
+    ) -> Dict:
+        """Generate a configuration (generate() without single-flight coalescing)."""
+        # Check the exact-match response cache (deterministic requests only)
+        cache_key, config = self._lookup_response_cache(description, headers, temperature, trace)
+        if config is not None:
+            return config
+        
+        # Embed the query once; it drives both the semantic cache and retrieval
+        query_vector = self.embedding_provider.encode_query(description)
+        
+        # Check the semantic cache for a near-identical past query with the same headers
+        config = self._lookup_semantic_cache(query_vector, headers, temperature, cache_key, trace)
+        if config is not None:
+            return config
+        
         # Build prompt with RAG
-        prompt = self.build_prompt(description, headers)
+        system_prompt, prompt = self._build_rag_prompt(description, headers, query_vector, trace)
         
         # Generate using the configured LLM provider
+        usage = trace.setdefault("usage", {})
         generated_text = self.llm_provider.generate(
             prompt=prompt,
             temperature=temperature,
-            max_retries=max_retries
+            max_retries=max_retries,
+            system_prompt=system_prompt,
+            usage=usage
         )
         
-        # Extract and parse JSON response (handles markdown, extra text, etc.)
-        json_text = self._extract_json_from_response(generated_text)
-        config = json.loads(json_text)
+        parsed = self._repair(generated_text, headers, (system_prompt, prompt), max_retries, trace)
+        return self._parse_and_store(parsed, query_vector, headers, temperature, cache_key, description, trace)
+    
+    async def agenerate(
+        self,
+        description: str,
+        headers: Optional[str] = None,
+        temperature: float = 0.0,
+        max_retries: int = 3,
+        trace: Optional[Dict] = None,
+        on_progress=None
+    ) -> Dict:
+        """
+        Async variant of generate() for use inside an event loop.
+        
+        Embedding and vector search run on the generator's worker pool and the
+        LLM call uses the provider's native async client, so one process can
+        keep many requests in flight. With LLM_STREAMING=true the completion
+        is streamed and cut off once the JSON config is complete; trace["stream"]
+        then holds time to first token and the (estimated) tokens saved.
+        
+        Identical requests in flight are coalesced as in generate(); sync and
+        async callers share the same computations.
+        
+        Args:
+            description: Natural language description of visualization
+            headers: Optional column headers/names
+            temperature: LLM temperature (0.0 = deterministic)
+            max_retries: Maximum number of endpoint retry attempts
+            trace: Optional dict filled with per-request metadata (e.g. cache status)
+            on_progress: Optional async callback(progress, message) for streaming
+                progress (not called for a request coalesced with one in flight)
+            
+        Returns:
+            CanvasXpress configuration as dictionary
+            
+        Raises:
+            json.JSONDecodeError: If LLM returns invalid JSON
+            Exception: If all LLM call attempts fail
+        """
+        if trace is None:
+            trace = {}
+        if self.single_flight is None:
+            return await self._agenerate(description, headers, temperature, max_retries, trace, on_progress)
+        return await self.single_flight.ado(
+            self._flight_key(description, headers, temperature),
+            lambda flight_trace: self._agenerate(
+                description, headers, temperature, max_retries, flight_trace, on_progress
+            ),
+            trace
+        )
+    
+    async def _agenerate(
+        self,
+        description: str,
+        headers: Optional[str],
+        temperature: float,
+        max_retries: int,
+        trace: Dict,
+        on_progress=None
+    ) -> Dict:
+        """Async generation (agenerate() without single-flight coalescing)."""
+        loop = asyncio.get_running_loop()
+        
+        cache_key, config = self._lookup_response_cache(description, headers, temperature, trace)
+        if config is not None:
+            return config
+        
+        query_vector = await loop.run_in_executor(
+            self.executor, self.embedding_provider.encode_query, description
+        )
+        
+        config = self._lookup_semantic_cache(query_vector, headers, temperature, cache_key, trace)
+        if config is not None:
+            return config
+        
+        system_prompt, prompt = await loop.run_in_executor(
+            self.executor, self._build_rag_prompt, description, headers, query_vector, trace
+        )
+        
+        usage = trace.setdefault("usage", {})
+        stream_info = {}
+        generated_text = await self.llm_provider.agenerate(
+            prompt=prompt,
+            temperature=temperature,
+            max_retries=max_retries,
+            system_prompt=system_prompt,
+            usage=usage,
+            on_progress=on_progress,
+            stream_info=stream_info
+        )
+        if stream_info:
+            trace["stream"] = stream_info
+        
+        parsed = await self._arepair(generated_text, headers, (system_prompt, prompt), max_retries, trace)
+        return self._parse_and_store(parsed, query_vector, headers, temperature, cache_key, description, trace)
+    
+    def generate_batch(
+        self,
+        requests: List[Dict],
+        temperature: float = 0.0,
+        max_retries: int = 3,
+        concurrency: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Generate configurations for many descriptions at once.
+        
+        Cache lookups run first; the remaining descriptions are embedded in
+        one batched encode call and matched against the index in one
+        multi-vector search, then the LLM calls run concurrently (at most
+        `concurrency` in flight). A failing item does not fail the batch.
+        An item identical to a request already in flight (including another
+        item of the batch) shares its result, as in generate().
+        
+        Args:
+            requests: List of {"description": str, "headers": Optional[str],
+                "temperature": Optional[float]} dicts
+            temperature: Default LLM temperature for items that do not set one (or set null)
+            max_retries: Maximum number of endpoint retry attempts per item
+            concurrency: Maximum concurrent LLM calls (default: BATCH_CONCURRENCY)
+            
+        Returns:
+            One result per request, in input order:
+            {"index", "success", "config", "error", "error_type", "metadata", "elapsed_ms"}
+            
+        Raises:
+            ValueError: If the batch is larger than BATCH_MAX_SIZE
+        """
+        if len(requests) > self.batch_max_size:
+            raise ValueError(
+                f"Batch of {len(requests)} requests exceeds BATCH_MAX_SIZE ({self.batch_max_size})"
+            )
+        batch_start = time.perf_counter()
+        concurrency = max(1, concurrency or self.batch_concurrency)
+        
+        results = []
+        pending = []  # indices still needing the RAG + LLM path
+        cache_keys = {}
+        temperatures = {}
+        for i, request in enumerate(requests):
+            trace = {}
+            results.append({
+                "index": i, "success": False, "config": None, "error": None,
+                "error_type": None, "metadata": trace, "elapsed_ms": None
+            })
+            description = request.get("description") if isinstance(request, dict) else None
+            if not description or not isinstance(description, str):
+                self._fail_batch_item(results[i], ValueError("'description' is required"), batch_start)
+                continue
+            headers = request.get("headers")
+            if headers is not None and not isinstance(headers, str):
+                self._fail_batch_item(results[i], ValueError("'headers' must be a string"), batch_start)
+                continue
+            item_temperature = request.get("temperature")
+            if item_temperature is None:
+                item_temperature = temperature
+            elif isinstance(item_temperature, bool) or not isinstance(item_temperature, (int, float)):
+                self._fail_batch_item(results[i], ValueError("'temperature' must be a number"), batch_start)
+                continue
+            temperatures[i] = float(item_temperature)
+            cache_keys[i], config = self._lookup_response_cache(description, headers, temperatures[i], trace)
+            if config is not None:
+                self._finish_batch_item(results[i], config, batch_start)
+            else:
+                pending.append(i)
+        
+        if not pending:
+            return results
+        
+        # One batched embedding call for every cache miss
+        try:
+            query_vectors = dict(zip(
+                pending,
+                self.embedding_provider.encode_queries([requests[i]["description"] for i in pending])
+            ))
+        except Exception as e:
+            for i in pending:
+                self._fail_batch_item(results[i], e, batch_start)
+            return results
+        
+        remaining = []
+        for i in pending:
+            request = requests[i]
+            config = self._lookup_semantic_cache(
+                query_vectors[i], request.get("headers"), temperatures[i],
+                cache_keys[i], results[i]["metadata"]
+            )
+            if config is not None:
+                self._finish_batch_item(results[i], config, batch_start)
+            else:
+                remaining.append(i)
+        
+        if not remaining:
+            return results
+        
+        # One multi-vector search for all remaining items
+        try:
+            all_examples = self.get_similar_examples_batch(
+                [requests[i]["description"] for i in remaining],
+                num_examples=self.num_candidates,
+                query_vectors=[query_vectors[i] for i in remaining]
+            )
+            prompts = {
+                i: self.build_prompt_parts(
+                    requests[i]["description"], requests[i].get("headers"), examples,
+                    query_vector=query_vectors[i], trace=results[i]["metadata"]
+                )
+                for i, examples in zip(remaining, all_examples)
+            }
+        except Exception as e:
+            for i in remaining:
+                self._fail_batch_item(results[i], e, batch_start)
+            return results
+        
+        def generate_item(i: int, trace: Dict) -> Dict:
+            request = requests[i]
+            llm_start = time.perf_counter()
+            system_prompt, prompt = prompts[i]
+            generated_text = self.llm_provider.generate(
+                prompt=prompt,
+                temperature=temperatures[i],
+                max_retries=max_retries,
+                system_prompt=system_prompt,
+                usage=trace.setdefault("usage", {})
+            )
+            trace["llm_ms"] = round((time.perf_counter() - llm_start) * 1000, 1)
+            parsed = self._repair(generated_text, request.get("headers"), prompts[i], max_retries, trace)
+            return self._parse_and_store(
+                parsed, query_vectors[i], request.get("headers"),
+                temperatures[i], cache_keys[i], request["description"], trace
+            )
+        
+        def run_item(i: int):
+            request = requests[i]
+            try:
+                if self.single_flight is None:
+                    config = generate_item(i, results[i]["metadata"])
+                else:
+                    config = self.single_flight.do(
+                        self._flight_key(request["description"], request.get("headers"), temperatures[i]),
+                        lambda flight_trace: generate_item(i, flight_trace),
+                        results[i]["metadata"]
+                    )
+                self._finish_batch_item(results[i], config, batch_start)
+            except Exception as e:
+                self._fail_batch_item(results[i], e, batch_start)
+        
+        # Concurrent LLM calls, bounded by `concurrency`
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(remaining)), thread_name_prefix="cx-batch") as pool:
+            list(pool.map(run_item, remaining))
+        
+        return results
+    
+    @staticmethod
+    def _finish_batch_item(result: Dict, config: Dict, batch_start: float):
+        result["success"] = True
+        result["config"] = config
+        result["elapsed_ms"] = round((time.perf_counter() - batch_start) * 1000, 1)
+    
+    @staticmethod
+    def _fail_batch_item(result: Dict, error: Exception, batch_start: float):
+        result["error"] = str(error)
+        result["error_type"] = type(error).__name__
+        result["elapsed_ms"] = round((time.perf_counter() - batch_start) * 1000, 1)
+    
+    def _lookup_response_cache(
+        self,
+        description: str,
+        headers: Optional[str],
+        temperature: float,
+        trace: Dict
+    ) -> Tuple[Optional[str], Optional[Dict]]:
+        """Check the exact-match cache; returns (cache key or None, cached config or None)."""
+        if self.response_cache is None or temperature != 0.0:
+            trace["cache"] = "bypass"
+            return None, None
+        
+        cache_key = self._response_cache_key(description, headers, temperature)
+        cached_config = self.response_cache.get(cache_key)
+        if cached_config is not None:
+            trace["cache"] = "exact"
+            return cache_key, cached_config
+        trace["cache"] = "miss"
+        return cache_key, None
+    
+    def _lookup_semantic_cache(
+        self,
+        query_vector: List[float],
+        headers: Optional[str],
+        temperature: float,
+        cache_key: Optional[str],
+        trace: Dict
+    ) -> Optional[Dict]:
+        """Check the semantic cache; a hit is also stored under the exact-match key."""
+        if self.semantic_cache is None or temperature != 0.0:
+            return None
+        
+        cached_config, similarity = self.semantic_cache.lookup(query_vector, headers)
+        trace["semantic_similarity"] = round(similarity, 4)
+        if cached_config is None:
+            return None
+        
+        trace["cache"] = "semantic"
+        if cache_key is not None:
+            self.response_cache.put(cache_key, cached_config)
+        return cached_config
+    
+    def _build_rag_prompt(
+        self,
+        description: str,
+        headers: Optional[str],
+        query_vector: List[float],
+        trace: Optional[Dict] = None
+    ) -> Tuple[Optional[str], str]:
+        """Retrieve similar examples for a pre-computed query vector and build (system, user) prompts."""
+        similar_examples = self.get_similar_examples(
+            description, num_examples=self.num_candidates, query_vector=query_vector
+        )
+        return self.build_prompt_parts(
+            description, headers, similar_examples, query_vector=query_vector, trace=trace
+        )
+    
+    def _parse_output(self, generated_text: str, headers: Optional[str]) -> Tuple:
+        """
+        Extract, parse and validate (with deterministic repairs) one LLM output.
+        
+        Returns:
+            Tuple of (config or None, ValidationResult or None, problem): problem
+            is None for a usable config, otherwise the json.JSONDecodeError or
+            the ValidationResult that still has errors
+        """
+        try:
+            # Handles markdown, extra text, etc.
+            config = json.loads(self._extract_json_from_response(generated_text))
+        except json.JSONDecodeError as e:
+            return None, None, e
+        if self.config_validator is None:
+            return config, None, None
+        result = self.config_validator.validate(config, headers, repair=self.config_auto_repair)
+        return result.config, result, (None if result.valid else result)
+    
+    def _regeneration_tokens(self, prompt_parts: Tuple[Optional[str], str], generated_text: str, usage: Dict) -> int:
+        """Tokens the request cost (provider counts, else estimated): what a regeneration would cost again."""
+        if usage.get("prompt_tokens"):
+            return usage["prompt_tokens"] + usage.get("completion_tokens", 0)
+        system_prompt, prompt = prompt_parts
+        return self.token_counter.count((system_prompt or "") + prompt) + self.token_counter.count(generated_text)
+    
+    def _repair(
+        self,
+        generated_text: str,
+        headers: Optional[str],
+        prompt_parts: Tuple[Optional[str], str],
+        max_retries: int,
+        trace: Dict
+    ) -> Tuple:
+        """Parse an LLM output; if it is unusable, send repair prompts within the repair budget."""
+        parsed = self._parse_output(generated_text, headers)
+        if parsed[2] is None or self.config_repairer is None:
+            return parsed
+        parsed, trace["repair"] = self.config_repairer.repair(
+            generated_text,
+            parsed,
+            lambda output: self._parse_output(output, headers),
+            lambda prompt, usage: self.llm_provider.generate(
+                prompt=prompt, temperature=0.0, max_retries=max_retries, usage=usage
+            ),
+            headers,
+            self._regeneration_tokens(prompt_parts, generated_text, trace.get("usage", {}))
+        )
+        return parsed
+    
+    async def _arepair(
+        self,
+        generated_text: str,
+        headers: Optional[str],
+        prompt_parts: Tuple[Optional[str], str],
+        max_retries: int,
+        trace: Dict
+    ) -> Tuple:
+        """Async variant of _repair()."""
+        parsed = self._parse_output(generated_text, headers)
+        if parsed[2] is None or self.config_repairer is None:
+            return parsed
+        parsed, trace["repair"] = await self.config_repairer.arepair(
+            generated_text,
+            parsed,
+            lambda output: self._parse_output(output, headers),
+            lambda prompt, usage: self.llm_provider.agenerate(
+                prompt=prompt, temperature=0.0, max_retries=max_retries, usage=usage, stream=False
+            ),
+            headers,
+            self._regeneration_tokens(prompt_parts, generated_text, trace.get("usage", {}))
+        )
+        return parsed
+    
+    def _parse_and_store(
+        self,
+        parsed: Tuple,
+        query_vector: List[float],
+        headers: Optional[str],
+        temperature: float,
+        cache_key: Optional[str],
+        description: str,
+        trace: Optional[Dict] = None
+    ) -> Dict:
+        """Report the parsed output's validation and store valid configs in the enabled caches.
+        
+        Raises:
+            json.JSONDecodeError: If the output (after any repair) contains no valid JSON object
+        """
+        config, result, problem = parsed
+        if isinstance(problem, json.JSONDecodeError):
+            raise problem
+        if result is not None:
+            if trace is not None:
+                trace["validation"] = result.summary()
+            if not result.valid:
+                # Not cached, so asking again gets a fresh generation
+                return config
+        
+        if cache_key is not None:
+            self.response_cache.put(cache_key, config)
+        if self.semantic_cache is not None and temperature == 0.0:
+            self.semantic_cache.add(query_vector, headers, config, description)
         return config
+    
+    def _flight_key(self, description: str, headers: Optional[str], temperature: float) -> Optional[str]:
+        """Single-flight key of a request; None (not coalesced) for sampled requests, like the caches."""
+        if temperature != 0.0:
+            return None
+        return self._response_cache_key(description, headers, temperature)
+    
+    def _response_cache_key(self, description: str, headers: Optional[str], temperature: float) -> str:
+        """Build the response cache key for a request."""
+        return ResponseCache.make_key(
+            description=description,
+            headers=headers,
+            temperature=temperature,
+            prompt_version=self._prompt_signature(),
+            llm_model=self.llm_provider.llm_model,
+            data_hash=self.data_hash
+        )
+    
+    def _prompt_signature(self) -> str:
+        """Prompt version plus the settings that change what is sent to the LLM."""
+        parts = [self.prompt_version]
+        if self.prompt_layout is not None:
+            parts.append("prefix_cache")
+        if self.schema_index is not None:
+            parts.append(f"schema{self.schema_index.token_budget}")
+        if self.rules_index is not None:
+            parts.append(f"rules{self.rules_index.top_k}")
+        if self.few_shot_selector is not None:
+            parts.append(f"fewshot{self.few_shot_selector.token_budget}/{self.few_shot_selector.mmr_lambda}")
+        if self.config_validator is not None:
+            parts.append("repair" if self.config_auto_repair else "validate")
+        return "+".join(parts)
+    
+    def get_stats(self) -> Dict:
+        """Return runtime statistics (cache hit rates etc.) for monitoring."""
+        # LLM and OpenAI embeddings share one process-wide client pool and manifest
+        client_pool = (
+            getattr(self.llm_provider, "client_pool", None)
+            or getattr(self.embedding_provider, "client_pool", None)
+        )
+        manifest = (
+            getattr(self.llm_provider, "manifest", None)
+            or getattr(self.embedding_provider, "manifest", None)
+        )
+        return {
+            "startup_phases": [phase_report(phase) for phase in list(self.init_phases)],
+            "response_cache": self.response_cache.stats() if self.response_cache else None,
+            "semantic_cache": self.semantic_cache.stats() if self.semantic_cache else None,
+            "embedding_cache": self.embedding_provider.cache_stats(),
+            "embedding_store": self.embedding_provider.store_stats(),
+            "openai_client_pool": client_pool.stats() if client_pool else None,
+            "endpoint_manifest": manifest.stats() if manifest else None,
+            "llm_usage": self.llm_provider.usage_stats() if hasattr(self.llm_provider, "usage_stats") else None,
+            "llm_streaming": self.llm_provider.stream_stats() if hasattr(self.llm_provider, "stream_stats") else None,
+            "rate_limits": {
+                "llm": self.llm_provider.rate_limiter.stats() if hasattr(self.llm_provider, "rate_limiter") else None,
+                "embeddings": (
+                    self.embedding_provider.rate_limiter.stats()
+                    if hasattr(self.embedding_provider, "rate_limiter") else None
+                )
+            },
+            "llm_hedging": (
+                self.llm_provider.hedger.stats() if getattr(self.llm_provider, "hedger", None) else None
+            ),
+            "config_validation": self.config_validator.stats() if self.config_validator else None,
+            "config_repair": self.config_repairer.stats() if self.config_repairer else None,
+            "single_flight": self.single_flight.stats() if self.single_flight else None,
+            "schema_pruning": self.schema_index.stats() if self.schema_index else None,
+            "rules_retrieval": self.rules_index.stats() if self.rules_index else None,
+            "few_shot": (
+                self.few_shot_selector.stats() if self.few_shot_selector
+                else {"mode": "fixed", "tokenizer": self.token_counter.name}
+            ),
+            "prompt_layout": dict(
+                mode=self.prompt_layout_mode,
+                **(self.prompt_layout.stats() if self.prompt_layout else {})
+            ),
+            "endpoints": {
+                "llm": self.llm_provider.balancer.stats() if hasattr(self.llm_provider, "balancer") else None,
+                "embeddings": (
+                    self.embedding_provider.balancer.stats() if hasattr(self.embedding_provider, "balancer") else None
+                )
+            }
+        }
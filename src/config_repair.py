@@ -0,0 +1,289 @@
+"""
+Targeted repair round trip for malformed or invalid LLM output.
+
+When the generated text contains no parseable JSON object, or the parsed
+config still has validation errors after the deterministic repairs, the
+request used to fail and the user re-sent it, paying for the full RAG
+prompt (rules, schema, few-shot examples) again. ConfigRepairer builds a
+small prompt instead: the broken output, the parser or validator errors,
+the schema.md lines of the parameters involved and the headers. The
+generator sends it to the same LLM, then parses and validates the answer
+like any other output.
+
+Repairs are bounded by a budget:
+- at most `max_attempts` repair calls per request
+- repair prompts of at most `max_prompt_tokens`
+- never a repair prompt that costs as much as regenerating the request
+
+A repair call that raises (timeout, rate limit, provider error) ends the
+repairs: the request keeps its best output so far (a parsed config with
+validation errors beats unparseable text) and counts as not rescued.
+
+Statistics count the requests rescued and compare the tokens spent on
+repairs with the full regenerations they replaced.
+"""
+
+import json
+import re
+import threading
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from config_validator import ValidationResult
+except ImportError:
+    from src.config_validator import ValidationResult
+
+_KEY = re.compile(r'"(\w+)"\s*:')
+
+REPAIR_PROMPT = """The CanvasXpress JSON configuration below has errors.
+Fix only these errors and keep everything else unchanged.
+
+Errors:
+{errors}
+{schema}{headers}
+Configuration:
+{output}
+
+Return only the corrected JSON object, without explanations or code fences.
+"""
+
+
+class ConfigRepairer:
+    """Builds budgeted repair prompts and keeps repair statistics."""
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        schema_lines: Optional[Callable[[Iterable[str]], List[str]]] = None,
+        max_attempts: int = 1,
+        max_prompt_tokens: int = 2000,
+        max_schema_lines: int = 12
+    ):
+        """
+        Args:
+            count_tokens: Token counter of the LLM model
+            schema_lines: Returns the schema.md lines of parameter names
+                (ConfigValidator.schema_lines); without it no schema is sent
+            max_attempts: Maximum repair calls per request
+            max_prompt_tokens: Maximum tokens of one repair prompt
+            max_schema_lines: Maximum schema parameters included in a prompt
+        """
+        self.count_tokens = count_tokens
+        self.schema_lines = schema_lines
+        self.max_attempts = max_attempts
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_schema_lines = max_schema_lines
+        self._lock = threading.Lock()
+        self.totals = {
+            "failed_outputs": 0,  # requests whose output needed a repair
+            "attempts": 0,
+            "rescued": 0,
+            "not_rescued": 0,
+            "skipped": 0,  # no repair call (budget)
+            "errors": 0,  # repair calls that raised
+            "repair_tokens": 0,
+            "rescued_repair_tokens": 0,
+            "regeneration_tokens": 0,  # full requests the rescued repairs replaced
+        }
+
+    def repair(
+        self,
+        output: str,
+        parsed: Tuple,
+        parse: Callable[[str], Tuple],
+        call: Callable[[str, Dict], str],
+        headers: Optional[str],
+        regeneration_tokens: int
+    ) -> Tuple[Tuple, Optional[Dict]]:
+        """
+        Send repair prompts for an unusable output until one parses and validates or the budget is spent.
+
+        Args:
+            output: The failed LLM output
+            parsed: parse(output): (config or None, ValidationResult or None, problem)
+            parse: Extracts, parses and validates an LLM output
+            call: Sends a repair prompt to the LLM: call(prompt, usage) -> text,
+                filling usage with the provider's token counts
+            headers: The request's column headers
+            regeneration_tokens: Tokens regenerating the whole request would cost
+
+        Returns:
+            Tuple of (the best parsed result; the repair info, for trace["repair"])
+        """
+        best, info = parsed, None
+        while parsed[2] is not None:
+            prompt, info = self.plan(output, parsed[2], headers, info, regeneration_tokens)
+            if prompt is None:
+                break
+            usage = {}
+            try:
+                output = call(prompt, usage)
+            except Exception as e:
+                self.failed(info, prompt, e)
+                break
+            self.spent(info, prompt, output, usage)
+            parsed = parse(output)
+            best = self._better(best, parsed)
+        self.finish(info, rescued=best[2] is None)
+        return best, info
+
+    async def arepair(
+        self,
+        output: str,
+        parsed: Tuple,
+        parse: Callable[[str], Tuple],
+        call: Callable[[str, Dict], Awaitable[str]],
+        headers: Optional[str],
+        regeneration_tokens: int
+    ) -> Tuple[Tuple, Optional[Dict]]:
+        """Async variant of repair(): call(prompt, usage) is a coroutine."""
+        best, info = parsed, None
+        while parsed[2] is not None:
+            prompt, info = self.plan(output, parsed[2], headers, info, regeneration_tokens)
+            if prompt is None:
+                break
+            usage = {}
+            try:
+                output = await call(prompt, usage)
+            except Exception as e:
+                self.failed(info, prompt, e)
+                break
+            self.spent(info, prompt, output, usage)
+            parsed = parse(output)
+            best = self._better(best, parsed)
+        self.finish(info, rescued=best[2] is None)
+        return best, info
+
+    @staticmethod
+    def _better(best: Tuple, parsed: Tuple) -> Tuple:
+        """The more useful of two parsed results: usable, else a parsed config, else the latest."""
+        if parsed[2] is None or parsed[0] is not None or best[0] is None:
+            return parsed
+        return best
+
+    def describe(self, output: str, problem) -> Tuple[str, str, List[str]]:
+        """
+        Return (error text, text to repair, parameter names involved) for a failed output.
+
+        Args:
+            output: The LLM output
+            problem: json.JSONDecodeError, or the ValidationResult with errors
+        """
+        if isinstance(problem, ValidationResult):
+            errors = problem.errors
+            text = "\n".join(f"- {error['key'] or 'config'}: {error['message']}" for error in errors)
+            # The deterministic repairs already applied are kept
+            return text, json.dumps(problem.config, indent=2), [error["key"] for error in errors if error["key"]]
+        return f"- Invalid JSON: {problem}", output.strip(), _KEY.findall(output)
+
+    def plan(
+        self,
+        output: str,
+        problem,
+        headers: Optional[str],
+        info: Optional[Dict],
+        regeneration_tokens: int
+    ) -> Tuple[Optional[str], Dict]:
+        """
+        Build the next repair prompt for a failed output, within the budget.
+
+        Args:
+            output: The failed LLM output
+            problem: json.JSONDecodeError, or the ValidationResult with errors
+            headers: The request's column headers
+            info: The request's repair info from the previous call (None at first)
+            regeneration_tokens: Tokens regenerating the whole request would cost
+
+        Returns:
+            Tuple of (repair prompt, or None if the budget does not allow one;
+            the request's repair info, for trace["repair"])
+        """
+        if info is None:
+            info = {
+                "problem": "validation" if isinstance(problem, ValidationResult) else "json",
+                "attempts": 0,
+                "rescued": False,
+                "repair_tokens": 0,
+                "regeneration_tokens": regeneration_tokens,
+            }
+            with self._lock:
+                self.totals["failed_outputs"] += 1
+        if info["attempts"] >= self.max_attempts:
+            return None, info
+
+        # A repair must also cost fewer tokens than regenerating the request
+        budget = self.max_prompt_tokens
+        if regeneration_tokens:
+            budget = min(budget, regeneration_tokens - 1)
+        errors, text, keys = self.describe(output, problem)
+        schema = []
+        if self.schema_lines is not None:
+            schema = self.schema_lines(keys)[:self.max_schema_lines]
+        prompt = self._render(errors, text, schema, headers)
+        tokens = self.count_tokens(prompt)
+        # Drop schema lines (largest first) before giving up on the budget
+        while tokens > budget and schema:
+            schema.remove(max(schema, key=len))
+            prompt = self._render(errors, text, schema, headers)
+            tokens = self.count_tokens(prompt)
+
+        if tokens > budget:
+            info["skipped"] = f"repair prompt of {tokens} tokens exceeds the budget ({budget} tokens)"
+            if info["attempts"] == 0:
+                with self._lock:
+                    self.totals["skipped"] += 1
+            return None, info
+        info["attempts"] += 1
+        return prompt, info
+
+    @staticmethod
+    def _render(errors: str, text: str, schema: List[str], headers: Optional[str]) -> str:
+        schema_text = "\nRelevant schema parameters:\n" + "\n".join(schema) + "\n" if schema else ""
+        headers_text = f"\nColumn headers: {headers}\n" if headers else ""
+        return REPAIR_PROMPT.format(errors=errors, schema=schema_text, headers=headers_text, output=text)
+
+    def spent(self, info: Dict, prompt: str, response: str, usage: Dict):
+        """Record the tokens of one repair call (provider counts, else local estimates)."""
+        if usage.get("prompt_tokens"):
+            tokens = usage["prompt_tokens"] + usage.get("completion_tokens", 0)
+        else:
+            tokens = self.count_tokens(prompt) + self.count_tokens(response)
+        info["repair_tokens"] += tokens
+        with self._lock:
+            self.totals["attempts"] += 1
+            self.totals["repair_tokens"] += tokens
+
+    def failed(self, info: Dict, prompt: str, error: Exception):
+        """Record a repair call that raised; its prompt tokens are counted as spent."""
+        info["error"] = f"{type(error).__name__}: {error}"
+        self.spent(info, prompt, "", {})
+        with self._lock:
+            self.totals["errors"] += 1
+
+    def finish(self, info: Optional[Dict], rescued: bool):
+        """Record the outcome of a request that went through plan()."""
+        if info is None or info["attempts"] == 0:
+            return
+        info["rescued"] = rescued
+        with self._lock:
+            if rescued:
+                self.totals["rescued"] += 1
+                self.totals["rescued_repair_tokens"] += info["repair_tokens"]
+                self.totals["regeneration_tokens"] += info["regeneration_tokens"]
+            else:
+                self.totals["not_rescued"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            totals = dict(self.totals)
+        repaired = totals["rescued"] + totals["not_rescued"]
+        regeneration = totals["regeneration_tokens"]
+        return {
+            "max_attempts": self.max_attempts,
+            "max_prompt_tokens": self.max_prompt_tokens,
+            **totals,
+            "rescue_rate": round(totals["rescued"] / repaired, 4) if repaired else 0.0,
+            # Tokens of the rescued repairs relative to regenerating those requests
+            "repair_cost_ratio": round(totals["rescued_repair_tokens"] / regeneration, 4) if regeneration else 0.0,
+            "tokens_saved": regeneration - totals["rescued_repair_tokens"],
+        }
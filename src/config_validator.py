@@ -0,0 +1,625 @@
+"""
+Local validation and deterministic repair of generated CanvasXpress configs.
+
+Any LLM output that parses as JSON used to be returned as is, even with a
+misspelled graphType, a string where an array belongs or a yAxis on a
+single-dimensional graph. ConfigValidator compiles, once at startup:
+
+- from schema.md: the type, options and default of every parameter
+- from the "Key Definitions" of canvasxpress_rules.md: the valid graph
+  types, color schemes and themes, the single-dimensional, combined and
+  multi-dimensional graph families and the decoration families
+- from the rule sections: the graph types that must not be sorted, the
+  parameters required per graph type (with their defaults) and the
+  yAxis -> smp parameter replacements for one-dimensional graphs
+
+and checks each generated config against those tables and against the
+request's headers (column references in xAxis, groupingFactors, colorBy,
+filterData, sortData, ...). Unambiguous problems are repaired in place
+(case of enum values and column names, "true" -> true, a scalar where a
+one-element array belongs, a missing required parameter with its rule
+default, yAxis titles renamed to their smp equivalents, ...); everything
+else is reported as a structured violation:
+
+    {"code": "invalid_graph_type", "key": "graphType", "severity": "error",
+     "message": "...", "repaired": false}
+
+Errors are problems CanvasXpress cannot render as intended; warnings are
+deviations from the style rules that still render. A column name that
+matches no header even ignoring case, blanks, '_' and '-' is a warning: it
+may be a misspelling of the user's own headers and is left to the caller.
+A missing graphType is an error, not guessed: the repair prompt decides.
+"""
+
+import copy
+import json
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Parameters whose values reference data columns (arrays / single names)
+COLUMN_ARRAY_KEYS = (
+    "xAxis", "xAxis2", "yAxis", "zAxis", "groupingFactors", "segregateSamplesBy", "segregateVariablesBy",
+    "smpOverlays", "varOverlays", "hierarchy", "stringSampleFactors", "stringVariableFactors",
+)
+COLUMN_STRING_KEYS = (
+    "rAxis", "colorBy", "shapeBy", "sizeBy", "pieBy", "pivotBy", "ridgeBy", "stackBy",
+    "splitSamplesBy", "splitVariablesBy", "showHistogram",
+)
+# Non-column values accepted by the column parameters
+_COLUMN_KEYWORDS = {"variable", ""}
+_SORT_KEYWORDS = {"samples", "variables"}
+
+DECORATION_KEYS = ("line", "point", "text")
+DECORATION_ITEM_KEYS = ("color", "value", "x", "y", "width", "label", "align")
+FILTER_TYPES = ("guess", "var", "smp", "series", "meta", "x", "y", "z", "data", "network")
+FILTER_OPERATORS = (">", ">=", "<", "<=", "between", "exact", "like", "not like", "different")
+SORT_TYPES = ("var", "smp", "cat")
+SORT_TARGETS = ("var", "smp")
+
+_PARAMETER = re.compile(r'^-\s+\*\*(\w+)\*\*:')
+_DESCRIPTION = re.compile(r'Description:\s*"([^"]*)"')
+_TYPE = re.compile(r'Type:\s*"([^"]+)"')
+_OPTIONS = re.compile(r'Options:\s*(\[.*?\])\s*,?\s*Default:')
+_DEFAULT = re.compile(r'Default:\s*(.+?)\s*$')
+_DEFINITION = re.compile(r'^-\s+\*\*([^*]+)\*\*:\s*(.*)$')
+_REQUIRED = re.compile(
+    r'When `graphType` is "(\w+)", the JSON configuration \*\*must\*\* include the `(\w+)` parameter'
+    r'.*?default value is "(\w+)"'
+)
+_NO_SORT = re.compile(r'Do not sort the data when the "graphType" is one of the following:\s*(.+)$')
+_Y_REPLACEMENTS = re.compile(
+    r'parameters related to the `yAxis` including (.+?)\. .*?Use instead the parameters (.+?) to'
+)
+_BACKTICKED = re.compile(r'`(\w+)`')
+_NUMBER = re.compile(r'^\s*-?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*$')
+
+# Key definitions of canvasxpress_rules.md -> validator tables
+_DEFINITION_NAMES = {
+    "valid graphtype": "graph_types",
+    "single-dimensional graph types": "single_dimensional",
+    "combined graph types": "combined",
+    "multi-dimensional graph types": "multi_dimensional",
+    "graph types with x or y decoration parameters": "xy_decorations",
+    "graph types with value decoration parameters": "value_decorations",
+    "valid color schemes": "color_schemes",
+    "valid themes": "themes",
+}
+
+
+def _normalize(name: str) -> str:
+    """Column name comparison key: case, blanks, '_' and '-' ignored."""
+    return re.sub(r"[\s_\-]+", "", name.casefold())
+
+
+def parse_headers(headers: Optional[str]) -> List[str]:
+    """Column names from the request headers ('A, B, C', tab-separated or a JSON array)."""
+    if not headers:
+        return []
+    text = headers.strip()
+    if text.startswith("["):
+        try:
+            names = json.loads(text)
+            if isinstance(names, list):
+                return [str(name).strip() for name in names if str(name).strip()]
+        except ValueError:
+            pass
+    return [name.strip() for name in re.split(r"[,\t]", text) if name.strip()]
+
+
+class SchemaSpec:
+    """Type, options and default of one schema.md parameter."""
+
+    __slots__ = ("name", "type", "options", "default", "accepts_bool", "line")
+
+    def __init__(self, name: str, type_: str, options: Optional[List], default: Any, accepts_bool: bool, line: str):
+        self.name = name
+        self.type = type_
+        self.options = options
+        self.default = default
+        self.accepts_bool = accepts_bool
+        self.line = line
+
+
+class ValidationResult:
+    """Outcome of validating one config: the (repaired) config and its violations."""
+
+    __slots__ = ("config", "violations", "elapsed_ms")
+
+    def __init__(self, config: Dict, violations: List[Dict], elapsed_ms: float):
+        self.config = config
+        self.violations = violations
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def errors(self) -> List[Dict]:
+        """Errors left after repair."""
+        return [v for v in self.violations if v["severity"] == "error" and not v["repaired"]]
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    @property
+    def repairs(self) -> int:
+        return sum(1 for v in self.violations if v["repaired"])
+
+    def summary(self) -> Dict:
+        """Compact report for request metadata."""
+        return {
+            "valid": self.valid,
+            "repairs": self.repairs,
+            "errors": len(self.errors),
+            "warnings": sum(1 for v in self.violations if v["severity"] == "warning" and not v["repaired"]),
+            "violations": self.violations,
+            "validation_ms": self.elapsed_ms,
+        }
+
+
+class _Check:
+    """Violation collector for one validate() call."""
+
+    def __init__(self, config: Dict, repair: bool, columns: List[str]):
+        self.config = config
+        self.repair = repair
+        self.columns = columns
+        self.violations: List[Dict] = []
+
+    def report(self, code: str, key: Optional[str], message: str, severity: str = "error", repaired: bool = False):
+        self.violations.append({
+            "code": code, "key": key, "severity": severity, "message": message, "repaired": repaired
+        })
+
+    def fix(self, code: str, key: Optional[str], message: str, apply, severity: str = "error") -> bool:
+        """Report a repairable problem and apply the repair if repairs are enabled."""
+        if self.repair:
+            apply()
+        self.report(code, key, message, severity, repaired=self.repair)
+        return self.repair
+
+
+class ConfigValidator:
+    """Validator compiled from schema.md and the rules' key definitions."""
+
+    def __init__(self, schema_text: str, rules_text: str = ""):
+        """
+        Args:
+            schema_text: Contents of schema.md
+            rules_text: Contents of canvasxpress_rules.md (optional; without it
+                graph families and rule-specific checks are not enforced)
+        """
+        self.specs = self._parse_schema(schema_text)
+        definitions = self._parse_definitions(rules_text)
+
+        graph_types = definitions.get("graph_types", [])
+        schema_graph_types = self.specs["graphType"].options if "graphType" in self.specs else None
+        self.graph_types = list(dict.fromkeys(graph_types + (schema_graph_types or [])))
+        self.single_dimensional = set(definitions.get("single_dimensional", []))
+        self.combined = set(definitions.get("combined", []))
+        self.multi_dimensional = set(definitions.get("multi_dimensional", []))
+        self.xy_decorations = set(definitions.get("xy_decorations", []))
+        self.value_decorations = set(definitions.get("value_decorations", []))
+        for key, names in (("colorScheme", definitions.get("color_schemes")), ("theme", definitions.get("themes"))):
+            spec = self.specs.get(key)
+            if spec is not None and names:
+                spec.options = list(dict.fromkeys((spec.options or []) + names))
+        if "graphType" in self.specs:
+            self.specs["graphType"].options = self.graph_types
+
+        self.required: Dict[str, List[Tuple[str, str]]] = {}
+        for graph_type, key, default in _REQUIRED.findall(rules_text):
+            self.required.setdefault(graph_type, []).append((key, default))
+        self.no_sort = set()
+        for line in rules_text.splitlines():
+            match = _NO_SORT.search(line)
+            if match:
+                self.no_sort.update(self._names(match.group(1).replace(" or ", ", ")))
+        self.y_replacements: Dict[str, str] = {}
+        match = _Y_REPLACEMENTS.search(rules_text)
+        if match:
+            y_keys = _BACKTICKED.findall(match.group(1))
+            smp_keys = _BACKTICKED.findall(match.group(2))
+            if len(y_keys) == len(smp_keys):
+                self.y_replacements = dict(zip(y_keys, smp_keys))
+
+        self._enum_lookup = {
+            name: {str(option).casefold(): option for option in spec.options if isinstance(option, str)}
+            for name, spec in self.specs.items() if spec.options
+        }
+        self._lock = threading.Lock()
+        self.validated = 0
+        self.valid_count = 0
+        self.repaired_count = 0
+        self.total_ms = 0.0
+        self.codes: Counter = Counter()
+
+    @staticmethod
+    def _parse_schema(schema_text: str) -> Dict[str, SchemaSpec]:
+        specs = {}
+        for line in schema_text.splitlines():
+            match = _PARAMETER.match(line)
+            type_match = _TYPE.search(line)
+            if not match or not type_match:
+                continue
+            options = default = None
+            options_match = _OPTIONS.search(line)
+            if options_match:
+                try:
+                    options = json.loads(options_match.group(1))
+                except ValueError:
+                    options = None
+            default_match = _DEFAULT.search(line)
+            if default_match:
+                try:
+                    default = json.loads(default_match.group(1))
+                except ValueError:
+                    default = None
+            description = _DESCRIPTION.search(line)
+            accepts_bool = (
+                isinstance(default, bool) or bool(options and False in options)
+                or bool(description and description.group(1).startswith("Flag"))
+            )
+            specs[match.group(1)] = SchemaSpec(
+                match.group(1), type_match.group(1), options, default, accepts_bool, line
+            )
+        return specs
+
+    @staticmethod
+    def _names(text: str) -> List[str]:
+        return [name.strip().rstrip(".") for name in text.split(",") if name.strip().rstrip(".")]
+
+    @classmethod
+    def _parse_definitions(cls, rules_text: str) -> Dict[str, List[str]]:
+        """The 'Key Definitions' lists of the rules ('- **Valid Themes**: ...: bw, classic, ...')."""
+        definitions = {}
+        for line in rules_text.splitlines():
+            match = _DEFINITION.match(line.strip())
+            if not match:
+                continue
+            name = _DEFINITION_NAMES.get(match.group(1).strip().lower())
+            if name is not None and ":" in match.group(2):
+                definitions[name] = cls._names(match.group(2).rsplit(":", 1)[1])
+        return definitions
+
+    def family(self, graph_type: str) -> Optional[str]:
+        """'single', 'combined' or 'multi' (None for graph types outside the families)."""
+        if graph_type in self.combined:
+            return "combined"
+        if graph_type in self.single_dimensional:
+            return "single"
+        if graph_type in self.multi_dimensional:
+            return "multi"
+        return None
+
+    def schema_lines(self, keys: Iterable[str]) -> List[str]:
+        """The schema.md lines of the given parameters (for repair prompts and messages)."""
+        return [self.specs[key].line for key in dict.fromkeys(keys) if key in self.specs]
+
+    def validate(self, config: Dict, headers: Optional[str] = None, repair: bool = True) -> ValidationResult:
+        """
+        Validate a generated config and repair what is unambiguous.
+
+        Args:
+            config: Parsed config (not modified; repairs are applied to a copy)
+            headers: The request's column headers; column references are only
+                checked when given
+            repair: Apply deterministic repairs (otherwise only report them)
+
+        Returns:
+            ValidationResult with the repaired config and all violations
+        """
+        start = time.perf_counter()
+        columns = parse_headers(headers)
+        check = _Check(copy.deepcopy(config) if isinstance(config, dict) else config, repair, columns)
+        if not isinstance(check.config, dict):
+            check.report("not_an_object", None, f"Config must be a JSON object, got {type(config).__name__}")
+        else:
+            graph_type = self._check_graph_type(check)
+            self._check_types(check)
+            if graph_type is not None:
+                self._check_family(check, graph_type)
+                self._check_graph_rules(check, graph_type)
+            self._check_decorations(check, graph_type)
+            self._check_filter_sort(check, graph_type)
+            if columns:
+                self._check_columns(check, columns)
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+        result = ValidationResult(check.config, check.violations, elapsed_ms)
+        with self._lock:
+            self.validated += 1
+            self.valid_count += result.valid
+            self.repaired_count += result.repairs > 0
+            self.total_ms += elapsed_ms
+            self.codes.update(v["code"] for v in check.violations)
+        return result
+
+    # ------------------------------------------------------------------
+    # Checks
+    # ------------------------------------------------------------------
+
+    def _check_graph_type(self, check: _Check) -> Optional[str]:
+        config = check.config
+        graph_type = config.get("graphType")
+        if graph_type is None:
+            # CanvasXpress would silently draw a Bar graph; which type was meant is left to the repair prompt
+            check.report("missing_graph_type", "graphType", "graphType is required")
+            return None
+        if not isinstance(graph_type, str):
+            check.report("invalid_type", "graphType", f"graphType must be a string, got {json.dumps(graph_type)}")
+            return None
+        if graph_type in self.graph_types:
+            return graph_type
+        match = self._enum_lookup.get("graphType", {}).get(graph_type.strip().casefold())
+        if match is not None:
+            check.fix("invalid_option", "graphType", f'graphType "{graph_type}" corrected to "{match}"',
+                      lambda: config.update(graphType=match))
+            return config["graphType"]
+        check.report("invalid_graph_type", "graphType",
+                     f'"{graph_type}" is not a valid graphType (valid: {", ".join(self.graph_types)})')
+        return None
+
+    def _check_types(self, check: _Check):
+        config = check.config
+        for key in list(config):
+            spec = self.specs.get(key)
+            if spec is None or key == "graphType":
+                continue
+            value = config[key]
+            if key in COLUMN_STRING_KEYS and isinstance(value, list) and len(value) == 1 \
+                    and isinstance(value[0], str):
+                check.fix("invalid_type", key, f"{key} takes a single name, not an array",
+                          lambda key=key, value=value: config.update({key: value[0]}))
+                continue
+            self._check_value(check, key, spec, value)
+
+    def _check_value(self, check: _Check, key: str, spec: SchemaSpec, value: Any):
+        config = check.config
+        expected = spec.type
+        if value is None:
+            return
+        if expected == "boolean":
+            if isinstance(value, bool):
+                return
+            if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+                fixed = value.strip().lower() == "true"
+                check.fix("invalid_type", key, f'{key} must be a boolean; "{value}" converted to {json.dumps(fixed)}',
+                          lambda: config.update({key: fixed}))
+                return
+            if isinstance(value, str) and not check.columns:
+                # Some flags also take a factor (showRegressionFit: "cyl"); unknown without headers
+                check.report("invalid_type", key, f"{key} expects a boolean or a column name, got {json.dumps(value)}",
+                             "warning")
+                return
+            if isinstance(value, str) and value in check.columns:
+                return
+        elif expected in ("integer", "float"):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if expected == "integer" and isinstance(value, float):
+                    if value.is_integer():
+                        check.fix("invalid_type", key, f"{key} must be an integer; {value} converted",
+                                  lambda: config.update({key: int(value)}))
+                        return
+                else:
+                    return
+            elif isinstance(value, str) and _NUMBER.match(value):
+                number = float(value)
+                if expected == "float" or number.is_integer():
+                    fixed = int(number) if expected == "integer" or number.is_integer() else number
+                    check.fix("invalid_type", key, f'{key} must be a number; "{value}" converted to {fixed}',
+                              lambda: config.update({key: fixed}))
+                    return
+        elif expected == "array":
+            if isinstance(value, list):
+                return
+            if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+                check.fix("invalid_type", key, f"{key} must be an array; {json.dumps(value)} wrapped",
+                          lambda: config.update({key: [value]}))
+                return
+        elif expected in ("string", "color"):
+            if isinstance(value, str):
+                self._check_option(check, key, spec, value)
+                return
+            # e.g. showHistogram: true, colorBy: false, objectBorderColor: false
+            if isinstance(value, bool) and (spec.accepts_bool or (expected == "color" and value is False)):
+                return
+        else:  # "object", "object or array": checked by the dedicated checks
+            return
+        check.report("invalid_type", key, f"{key} must be of type {expected}, got {json.dumps(value)}")
+
+    def _check_option(self, check: _Check, key: str, spec: SchemaSpec, value: str):
+        if not spec.options or key in COLUMN_STRING_KEYS or value in spec.options:
+            return
+        match = self._enum_lookup.get(key, {}).get(value.strip().casefold())
+        if match is not None:
+            check.fix("invalid_option", key, f'{key} "{value}" corrected to "{match}"',
+                      lambda: check.config.update({key: match}))
+            return
+        options = [json.dumps(option) for option in spec.options]
+        shown = ", ".join(options[:40]) + (", ..." if len(options) > 40 else "")
+        check.report("invalid_option", key, f'"{value}" is not a valid {key} (valid: {shown})')
+
+    def _rename(self, check: _Check, key: str, target: str, code: str, reason: str, severity: str = "error"):
+        """Move a parameter to `target` (dropped instead if `target` is already set)."""
+        config = check.config
+        if target in config:
+            check.fix(code, key, f"{reason}; removed ({target} is already set)",
+                      lambda: config.pop(key), severity)
+        else:
+            check.fix(code, key, f"{reason}; moved to {target}",
+                      lambda: config.update({target: config.pop(key)}), severity)
+
+    def _check_family(self, check: _Check, graph_type: str):
+        config = check.config
+        family = self.family(graph_type)
+        if family in ("single", "combined"):
+            label = "Single-Dimensional" if family == "single" else "Combined"
+            if "yAxis" in config:
+                reason = f"yAxis is not used by {label} graph types such as {graph_type}"
+                if "xAxis" not in config:
+                    self._rename(check, "yAxis", "xAxis", "y_axis_not_allowed", reason)
+                elif family == "combined" and "xAxis2" not in config:
+                    self._rename(check, "yAxis", "xAxis2", "y_axis_not_allowed", reason)
+                else:
+                    check.report("y_axis_not_allowed", "yAxis",
+                                 f"{reason}; put all plotted columns in xAxis" +
+                                 (" and xAxis2" if family == "combined" else ""))
+            for y_key, smp_key in self.y_replacements.items():
+                if y_key in config:
+                    self._rename(check, y_key, smp_key, "y_axis_not_allowed",
+                                 f"{y_key} does not apply to {label} graph types", severity="warning")
+            if "yAxis" not in config:
+                for y_key, x_key in (("setMinY", "setMinX"), ("setMaxY", "setMaxX")):
+                    if y_key in config:
+                        self._rename(check, y_key, x_key, "y_axis_not_allowed",
+                                     f"{y_key} is not used when only xAxis is present", severity="warning")
+        elif family == "multi" and "xAxis" in config and "yAxis" not in config:
+            check.report("missing_y_axis", "yAxis",
+                         f"Multi-Dimensional graph types such as {graph_type} need both xAxis and yAxis",
+                         severity="warning" if graph_type != "Contour" else "error")
+
+    def _check_graph_rules(self, check: _Check, graph_type: str):
+        config = check.config
+        for key, default in self.required.get(graph_type, []):
+            if key not in config:
+                check.fix("missing_required", key, f'{graph_type} graphs require {key}; set to the default "{default}"',
+                          lambda key=key, default=default: config.update({key: default}), "warning")
+        if graph_type == "Ridgeline" and "groupingFactors" in config:
+            factors = config["groupingFactors"]
+            if "ridgeBy" not in config and isinstance(factors, list) and len(factors) == 1:
+                check.fix("ridgeline_grouping", "groupingFactors",
+                          "Ridgeline graphs use ridgeBy instead of groupingFactors; moved to ridgeBy",
+                          lambda: config.update(ridgeBy=config.pop("groupingFactors")[0]))
+            else:
+                check.report("ridgeline_grouping", "groupingFactors",
+                             "Ridgeline graphs use ridgeBy (a single column) instead of groupingFactors")
+
+    def _check_decorations(self, check: _Check, graph_type: Optional[str]):
+        decorations = check.config.get("decorations")
+        if decorations is None or decorations is False:
+            return
+        if isinstance(decorations, list) and graph_type == "Network":
+            return  # network decorations are node property names
+        if not isinstance(decorations, dict):
+            check.report("invalid_decorations", "decorations",
+                         f"decorations must be an object with {', '.join(DECORATION_KEYS)} arrays")
+            return
+        for kind in list(decorations):
+            items = decorations[kind]
+            if kind not in DECORATION_KEYS:
+                check.report("invalid_decorations", "decorations",
+                             f'decorations key "{kind}" is not one of {", ".join(DECORATION_KEYS)}', "warning")
+            if isinstance(items, dict):
+                check.fix("invalid_decorations", "decorations", f"decorations.{kind} must be an array; wrapped",
+                          lambda kind=kind, items=items: decorations.update({kind: [items]}))
+                items = decorations[kind]
+            if not isinstance(items, list):
+                check.report("invalid_decorations", "decorations", f"decorations.{kind} must be an array of objects")
+                continue
+            for item in items:
+                self._check_decoration_item(check, kind, item, graph_type)
+
+    def _check_decoration_item(self, check: _Check, kind: str, item: Any, graph_type: Optional[str]):
+        if not isinstance(item, dict):
+            check.report("invalid_decorations", "decorations", f"decorations.{kind} items must be objects")
+            return
+        extra = [key for key in item if key not in DECORATION_ITEM_KEYS]
+        if extra:
+            check.report("invalid_decorations", "decorations",
+                         f"decorations.{kind} keys {extra} are not among {', '.join(DECORATION_ITEM_KEYS)}",
+                         "warning")
+        if any(isinstance(value, (list, dict)) for value in item.values()):
+            check.report("invalid_decorations", "decorations", f"decorations.{kind} values must be scalars")
+        anchors = [key for key in ("x", "y", "value") if key in item]
+        if len(anchors) > 1:
+            check.report("invalid_decorations", "decorations",
+                         f"decorations.{kind} items use only one of x, y or value (got {', '.join(anchors)})")
+        if graph_type is None or not (self.xy_decorations or self.value_decorations):
+            return
+        if ("x" in item or "y" in item) and graph_type not in self.xy_decorations:
+            check.report("invalid_decorations", "decorations",
+                         f"x/y decorations are not supported by {graph_type}; use value")
+        if "value" in item and graph_type not in self.value_decorations:
+            check.report("invalid_decorations", "decorations",
+                         f"value decorations are not supported by {graph_type}; use x or y")
+
+    def _check_filter_sort(self, check: _Check, graph_type: Optional[str]):
+        config = check.config
+        for key, size in (("filterData", 4), ("sortData", 3)):
+            entries = config.get(key)
+            if entries is None:
+                continue
+            if isinstance(entries, list) and len(entries) == size and not any(isinstance(e, list) for e in entries[:3]):
+                check.fix("invalid_type", key, f"{key} must be an array of arrays; wrapped",
+                          lambda key=key, entries=entries: config.update({key: [entries]}))
+                entries = config[key]
+            if not isinstance(entries, list) or not all(isinstance(e, list) for e in entries):
+                check.report("invalid_type", key, f"{key} must be an array of {size}-element arrays")
+                continue
+            for entry in entries:
+                if len(entry) != size:
+                    check.report(f"invalid_{key}", key,
+                                 f"{key} entries have exactly {size} elements, got {json.dumps(entry)}")
+                elif key == "filterData":
+                    if entry[0] not in FILTER_TYPES:
+                        check.report("invalid_filterData", key,
+                                     f'filter type "{entry[0]}" is not one of {", ".join(FILTER_TYPES)}')
+                    if entry[2] not in FILTER_OPERATORS:
+                        check.report("invalid_filterData", key,
+                                     f'filter operator "{entry[2]}" is not one of {", ".join(FILTER_OPERATORS)}')
+                else:
+                    if entry[0] not in SORT_TYPES or entry[1] not in SORT_TARGETS:
+                        check.report("invalid_sortData", key,
+                                     f"sortData entries start with one of {', '.join(SORT_TYPES)} and then "
+                                     f"{' or '.join(SORT_TARGETS)}, got {json.dumps(entry[:2])}")
+        if "sortData" in config and graph_type in self.no_sort:
+            check.fix("sort_not_allowed", "sortData", f"{graph_type} graphs must not sort the data; sortData removed",
+                      lambda: config.pop("sortData"))
+
+    def _check_columns(self, check: _Check, columns: List[str]):
+        config = check.config
+        exact = set(columns)
+        lookup: Dict[str, Optional[str]] = {}
+        for column in columns:
+            normalized = _normalize(column)
+            lookup[normalized] = None if normalized in lookup and lookup[normalized] != column else column
+
+        def resolve(key: str, name: Any, keywords=_COLUMN_KEYWORDS) -> Any:
+            if not isinstance(name, str) or name in exact or name in keywords:
+                return name
+            match = lookup.get(_normalize(name))
+            if match is not None:
+                check.report("column_name", key, f'"{name}" corrected to the header "{match}"',
+                             repaired=check.repair)
+                return match if check.repair else name
+            check.report("unknown_column", key,
+                         f'"{name}" is not one of the headers ({", ".join(columns)})', severity="warning")
+            return name
+
+        for key in COLUMN_ARRAY_KEYS:
+            if isinstance(config.get(key), list):
+                config[key] = [resolve(key, name) for name in config[key]]
+        for key in COLUMN_STRING_KEYS:
+            if key in config:
+                config[key] = resolve(key, config[key])
+        for key, position, keywords in (("filterData", 1, _COLUMN_KEYWORDS), ("sortData", 2, _SORT_KEYWORDS)):
+            entries = config.get(key)
+            if isinstance(entries, list):
+                for entry in entries:
+                    if isinstance(entry, list) and len(entry) > position:
+                        entry[position] = resolve(key, entry[position], keywords)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "parameters": len(self.specs),
+                "graph_types": len(self.graph_types),
+                "validated": self.validated,
+                "valid": self.valid_count,
+                "repaired": self.repaired_count,
+                "invalid": self.validated - self.valid_count,
+                "avg_validation_ms": round(self.total_ms / self.validated, 3) if self.validated else 0.0,
+                "violations": dict(self.codes.most_common()),
+            }
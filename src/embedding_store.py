@@ -0,0 +1,195 @@
+"""
+Persistent, content-addressed embedding store.
+
+Every EmbeddingProvider.encode call (index builds, rules/schema chunk
+embeddings, scripts) goes through the store, so re-running init,
+rebuilding the index after a model switch back, or comparing providers
+only embeds text that was never embedded with that model before. This
+matters most for the paid openai/gemini APIs. The store has no eviction,
+so it only holds the bounded set of document texts; live search queries
+use the size-capped query-embedding cache instead.
+
+Vectors are keyed by (provider, model, mode, sha256(text)). The generator
+stores only "document" embeddings (search queries never reach the store);
+the mode stays in the key because the nomic "search_document: " prefix and
+the Gemini task types make a text's vector depend on how it was embedded.
+
+Files (in the store directory):
+    vectors.f32  - append-only float32 values of all vectors, back to back
+    index.tsv    - append-only lines "key<TAB>offset<TAB>dimension", offset
+                   counted in float32 values
+
+Reads go through a read-only memory map of vectors.f32. Appends take an
+exclusive file lock (where fcntl is available), so several processes (the
+server and an init script) can share one store; entries appended by
+another process are picked up on the next miss. A torn last index line
+from an interrupted write is ignored.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+
+class EmbeddingStore:
+    """On-disk embedding store keyed by provider, model, mode and text hash."""
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory: Store directory (created if needed)
+        """
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / "vectors.f32"
+        self.index_path = self.directory / "index.tsv"
+        self.vectors_path.touch(exist_ok=True)
+        self.index_path.touch(exist_ok=True)
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._index_size = 0  # bytes of index.tsv already parsed
+        self._mmap: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+        with self._lock:
+            self._refresh()
+
+    @staticmethod
+    def make_key(provider: str, model_name: str, mode: str, text: str) -> str:
+        """Build the store key for a text embedded by one provider/model in one mode."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{provider}|{model_name}|{mode}|{digest}"
+
+    def _refresh(self):
+        """Parse index lines appended since the last refresh (by any process)."""
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_size)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # ignore a torn last line
+        for line in data[:end].decode("utf-8").splitlines():
+            parts = line.split("\t")
+            if len(parts) == 3:
+                self._index[parts[0]] = (int(parts[1]), int(parts[2]))
+        self._index_size += end
+
+    def _vectors(self) -> np.memmap:
+        """Memory map of vectors.f32, re-opened when the file has grown."""
+        values = os.path.getsize(self.vectors_path) // 4
+        if self._mmap is None or len(self._mmap) < values:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(values,)) if values else None
+        return self._mmap
+
+    def _read(self, key: str) -> Optional[np.ndarray]:
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        offset, dimension = entry
+        vectors = self._vectors()
+        if vectors is None or offset + dimension > len(vectors):
+            return None
+        return np.array(vectors[offset:offset + dimension])
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return the stored vector for each key (None for misses)."""
+        with self._lock:
+            vectors = [self._read(key) for key in keys]
+            if any(v is None for v in vectors):
+                self._refresh()
+                vectors = [v if v is not None else self._read(key) for key, v in zip(keys, vectors)]
+            found = sum(1 for v in vectors if v is not None)
+            self.hits += found
+            self.misses += len(vectors) - found
+        return vectors
+
+    def put_many(self, keys: Sequence[str], vectors: Sequence) -> None:
+        """Append vectors (float32) under their keys."""
+        if not keys:
+            return
+        arrays = [np.asarray(v, dtype=np.float32).ravel() for v in vectors]
+        with self._lock, open(self.vectors_path, "ab") as vf, open(self.index_path, "ab") as xf:
+            if fcntl is not None:
+                fcntl.flock(vf.fileno(), fcntl.LOCK_EX)
+            try:
+                vf.seek(0, os.SEEK_END)
+                offset = vf.tell() // 4
+                lines = []
+                for key, array in zip(keys, arrays):
+                    vf.write(array.tobytes())
+                    lines.append(f"{key}\t{offset}\t{len(array)}\n")
+                    offset += len(array)
+                # Vectors reach the file before the index lines that point to them
+                vf.flush()
+                if not self._ends_with_newline():
+                    lines.insert(0, "\n")  # terminate a torn line left by an interrupted write
+                xf.write("".join(lines).encode("utf-8"))
+                xf.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(vf.fileno(), fcntl.LOCK_UN)
+            self._refresh()
+
+    def _ends_with_newline(self) -> bool:
+        size = os.path.getsize(self.index_path)
+        if size == 0:
+            return True
+        with open(self.index_path, "rb") as f:
+            f.seek(size - 1)
+            return f.read(1) == b"\n"
+
+    def embed(
+        self,
+        texts: List[str],
+        provider: str,
+        model_name: str,
+        mode: str,
+        embed: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        """
+        Return embeddings for texts, calling `embed` only for texts not in the store.
+
+        Args:
+            texts: Texts to embed
+            provider: Embedding provider name
+            model_name: Embedding model name
+            mode: Embedding mode, part of the key (the generator uses "document")
+            embed: Function embedding a list of texts with the model/API
+
+        Returns:
+            One vector (list of floats) per text
+        """
+        keys = [self.make_key(provider, model_name, mode, t) for t in texts]
+        vectors = self.get_many(keys)
+
+        missing: Dict[str, List[int]] = {}  # text -> positions (duplicates are embedded once)
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
+        if missing:
+            # Stored as float32, so fresh and stored vectors are identical on later runs
+            embedded = [np.asarray(v, dtype=np.float32).ravel() for v in embed(list(missing))]
+            self.put_many([keys[positions[0]] for positions in missing.values()], embedded)
+            for positions, embedding in zip(missing.values(), embedded):
+                for i in positions:
+                    vectors[i] = embedding
+        return [v.tolist() for v in vectors]
+
+    def stats(self) -> Dict:
+        """Return the store size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.directory),
+            "entries": len(self._index),
+            "size_bytes": os.path.getsize(self.vectors_path),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
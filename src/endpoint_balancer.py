@@ -0,0 +1,207 @@
+"""
+Latency- and error-aware endpoint selection for the BMS Azure OpenAI proxy.
+
+Replaces uniform random choice over the endpoints in the BMS manifest.
+Each endpoint tracks an EWMA of its latency and error rate plus a count of
+rate-limit (HTTP 429) responses. Selection uses power-of-two-choices (or
+least-latency) over the healthy endpoints, and a per-endpoint circuit
+breaker takes repeatedly failing endpoints out of rotation until a
+half-open probe succeeds.
+
+Configuration via environment variables:
+    ENDPOINT_STRATEGY: p2c, least_latency or random (default: p2c)
+    ENDPOINT_FAILURE_THRESHOLD: Consecutive failures that open the circuit (default: 3)
+    ENDPOINT_COOLDOWN: Seconds before an open circuit allows a probe (default: 30)
+    ENDPOINT_EWMA_ALPHA: Weight of the newest sample in the EWMAs (default: 0.3)
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+
+class EndpointState:
+    """Health statistics and circuit breaker state of one endpoint."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self):
+        self.ewma_latency: Optional[float] = None
+        self.ewma_error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.consecutive_failures = 0
+        self.circuit = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "circuit": self.circuit,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "ewma_error_rate": round(self.ewma_error_rate, 4),
+            "requests": self.requests,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class EndpointBalancer:
+    """Chooses endpoints by observed latency and errors, with circuit breaking."""
+
+    STRATEGIES = ("p2c", "least_latency", "random")
+
+    # Penalty multiplier applied to latency per unit of EWMA error rate
+    ERROR_PENALTY = 10.0
+
+    def __init__(
+        self,
+        name: str = "default",
+        strategy: Optional[str] = None,
+        failure_threshold: Optional[int] = None,
+        cooldown: Optional[float] = None,
+        ewma_alpha: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None
+    ):
+        """
+        Args:
+            name: Label used in stats (e.g. 'llm' or 'embeddings')
+            strategy: 'p2c', 'least_latency' or 'random' (env default)
+            failure_threshold: Consecutive failures that open the circuit (env default)
+            cooldown: Seconds an open circuit waits before a half-open probe (env default)
+            ewma_alpha: Weight of the newest sample in the EWMAs (env default)
+            clock: Monotonic time source in seconds (tests use a fake one)
+            rng: Random source for the choice (tests use a seeded one)
+        """
+        self.name = name
+        self.strategy = (strategy or os.environ.get("ENDPOINT_STRATEGY", "p2c")).lower()
+        if self.strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown endpoint strategy: {self.strategy}. Use one of {self.STRATEGIES}.")
+        self.failure_threshold = failure_threshold or int(os.environ.get("ENDPOINT_FAILURE_THRESHOLD", "3"))
+        self.cooldown = cooldown or float(os.environ.get("ENDPOINT_COOLDOWN", "30"))
+        self.alpha = ewma_alpha or float(os.environ.get("ENDPOINT_EWMA_ALPHA", "0.3"))
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._states: Dict[str, EndpointState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, endpoint: str) -> EndpointState:
+        state = self._states.get(endpoint)
+        if state is None:
+            state = self._states[endpoint] = EndpointState()
+        return state
+
+    def _is_available(self, state: EndpointState, now: float) -> bool:
+        """Closed circuits are available; open ones become a half-open probe after the cooldown."""
+        if state.circuit == EndpointState.CLOSED:
+            return True
+        if state.circuit == EndpointState.OPEN:
+            return now - state.opened_at >= self.cooldown
+        # Half-open: only one probe at a time (a stale probe is replaced after a cooldown)
+        return state.probe_started_at is None or now - state.probe_started_at >= self.cooldown
+
+    def _score(self, state: EndpointState) -> float:
+        """Lower is better; endpoints without samples score 0 so they get explored."""
+        if state.ewma_latency is None:
+            return 0.0
+        return state.ewma_latency * (1.0 + self.ERROR_PENALTY * state.ewma_error_rate)
+
+    def choose(self, endpoints: Iterable[str], exclude: Optional[Set[str]] = None) -> str:
+        """Pick an endpoint, skipping excluded ones and those with an open circuit.
+
+        Falls back to excluded endpoints, then to open circuits, rather than
+        failing when nothing healthy is left.
+
+        Args:
+            endpoints: Candidate endpoint URLs
+            exclude: Endpoints to avoid (e.g. the one that just failed)
+
+        Returns:
+            The chosen endpoint URL
+        """
+        endpoints = list(endpoints)
+        if not endpoints:
+            raise ValueError("No endpoints to choose from")
+        exclude = exclude or set()
+        now = self.clock()
+        with self._lock:
+            available = [e for e in endpoints if self._is_available(self._state(e), now)]
+            candidates = (
+                [e for e in available if e not in exclude]
+                or available
+                or [e for e in endpoints if e not in exclude]
+                or endpoints
+            )
+            chosen = self._pick(candidates)
+            state = self._state(chosen)
+            if state.circuit == EndpointState.OPEN and now - state.opened_at >= self.cooldown:
+                state.circuit = EndpointState.HALF_OPEN
+            if state.circuit == EndpointState.HALF_OPEN:
+                state.probe_started_at = now
+            return chosen
+
+    def _pick(self, candidates: List[str]) -> str:
+        if len(candidates) == 1 or self.strategy == "random":
+            return self.rng.choice(candidates)
+        if self.strategy == "least_latency":
+            return min(candidates, key=lambda e: (self._score(self._states[e]), self.rng.random()))
+        first, second = self.rng.sample(candidates, 2)
+        return first if self._score(self._states[first]) <= self._score(self._states[second]) else second
+
+    def record_success(self, endpoint: str, latency: float):
+        """Record a successful call and its latency in seconds."""
+        with self._lock:
+            state = self._state(endpoint)
+            state.requests += 1
+            state.ewma_latency = (
+                latency if state.ewma_latency is None
+                else self.alpha * latency + (1 - self.alpha) * state.ewma_latency
+            )
+            state.ewma_error_rate *= (1 - self.alpha)
+            state.consecutive_failures = 0
+            state.circuit = EndpointState.CLOSED
+            state.probe_started_at = None
+
+    def record_latency(self, endpoint: str, latency: float):
+        """Record a latency sample without an outcome (e.g. a slow call cancelled by a hedge).
+
+        The sample is a lower bound of the call's latency; it raises the
+        endpoint's EWMA without touching error counts or the circuit.
+        """
+        with self._lock:
+            state = self._state(endpoint)
+            state.ewma_latency = (
+                latency if state.ewma_latency is None
+                else self.alpha * max(latency, state.ewma_latency) + (1 - self.alpha) * state.ewma_latency
+            )
+
+    def record_failure(self, endpoint: str, rate_limited: bool = False):
+        """Record a failed call (connection error, HTTP 429 or 5xx)."""
+        with self._lock:
+            state = self._state(endpoint)
+            state.requests += 1
+            state.errors += 1
+            if rate_limited:
+                state.rate_limited += 1
+            state.ewma_error_rate = self.alpha + (1 - self.alpha) * state.ewma_error_rate
+            state.consecutive_failures += 1
+            state.probe_started_at = None
+            if state.circuit == EndpointState.HALF_OPEN or state.consecutive_failures >= self.failure_threshold:
+                state.circuit = EndpointState.OPEN
+                state.opened_at = self.clock()
+
+    def stats(self) -> Dict:
+        """Return per-endpoint health and circuit state."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "strategy": self.strategy,
+                "endpoints": {endpoint: state.to_dict() for endpoint, state in self._states.items()},
+            }
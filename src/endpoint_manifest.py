@@ -0,0 +1,195 @@
+"""
+Shared BMS OpenAI endpoint manifest.
+
+The manifest (openai-urls.json) lists the Azure OpenAI endpoints per
+environment and model. It is loaded once per process and shared by the LLM
+and embedding providers:
+
+- A local override file (BMS_ENDPOINTS_FILE) is used as-is, for tests and
+  offline runs.
+- Otherwise the last downloaded copy is read from the cache file and used
+  immediately, so startup does not depend on the proxy being reachable.
+- A background thread re-downloads the manifest when the cached copy is
+  older than the TTL and swaps it in atomically.
+- Only when there is no cached copy at all is the first download done
+  synchronously.
+
+Configuration via environment variables:
+    BMS_ENDPOINTS_URL: Manifest URL (default: BMS proxy openai-urls.json)
+    BMS_ENDPOINTS_FILE: Local manifest file overriding the download
+    BMS_ENDPOINTS_CACHE: Cache file (default: ~/.cache/canvasxpress_openai_urls.json)
+    BMS_ENDPOINTS_TTL: Seconds before the manifest is refreshed (default: 3600)
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+
+DEFAULT_MANIFEST_URL = 'https://bms-openai-proxy-eus-prod.azu.bms.com/openai-urls.json'
+
+
+class EndpointManifest:
+    """Process-wide, cached and background-refreshed endpoint manifest."""
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        cache_path: Optional[str] = None,
+        override_path: Optional[str] = None,
+        ttl: Optional[float] = None
+    ):
+        """
+        Args:
+            url: Manifest URL (env default)
+            cache_path: Local cache file (env default)
+            override_path: Local manifest file used instead of downloading (env default)
+            ttl: Seconds before the manifest is refreshed (env default)
+        """
+        self.url = url or os.environ.get("BMS_ENDPOINTS_URL", DEFAULT_MANIFEST_URL)
+        self.cache_path = Path(
+            cache_path or os.environ.get("BMS_ENDPOINTS_CACHE")
+            or os.path.join(os.path.expanduser("~"), ".cache", "canvasxpress_openai_urls.json")
+        )
+        self.override_path = override_path or os.environ.get("BMS_ENDPOINTS_FILE") or None
+        self.ttl = ttl or float(os.environ.get("BMS_ENDPOINTS_TTL", "3600"))
+        self._manifest: Optional[Dict] = None
+        self._loaded_at = 0.0
+        self._source = None
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.last_error: Optional[str] = None
+
+    def get(self) -> Dict:
+        """Return the current manifest, loading it on first use."""
+        manifest = self._manifest
+        if manifest is None:
+            with self._lock:
+                if self._manifest is None:
+                    self._load_initial()
+                manifest = self._manifest
+        return manifest
+
+    def _load_initial(self):
+        """Load from override, cache or network (caller holds the lock)."""
+        if self.override_path:
+            with open(self.override_path) as f:
+                self._manifest = json.load(f)
+            self._loaded_at = time.time()
+            self._source = f"file:{self.override_path}"
+            print(f"   ✓ Using local endpoint manifest: {self.override_path}")
+            return
+
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path) as f:
+                    self._manifest = json.load(f)
+                self._loaded_at = self.cache_path.stat().st_mtime
+                self._source = f"cache:{self.cache_path}"
+                print(f"   ✓ Using cached endpoint manifest: {self.cache_path}")
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignoring unreadable endpoint manifest cache: {e}")
+
+        if self._manifest is None:
+            # No usable copy yet: the first download has to block
+            self._manifest = self._download()
+            self._loaded_at = time.time()
+            self._source = f"url:{self.url}"
+            self._write_cache(self._manifest)
+
+        self._start_background_refresh()
+
+    def _download(self) -> Dict:
+        """Fetch and validate the manifest from the proxy."""
+        try:
+            response = requests.get(self.url, timeout=10)
+            response.raise_for_status()
+            manifest = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise RuntimeError(f"Failed to fetch BMS OpenAI endpoints: {e}")
+        if not isinstance(manifest, dict) or not manifest:
+            raise RuntimeError("Failed to fetch BMS OpenAI endpoints: empty or invalid manifest")
+        return manifest
+
+    def _write_cache(self, manifest: Dict):
+        """Write the cache file atomically (temp file + rename)."""
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"⚠️  Could not write endpoint manifest cache: {e}")
+
+    def refresh(self) -> bool:
+        """Download the manifest and swap it in; keeps the current copy on failure."""
+        try:
+            manifest = self._download()
+        except RuntimeError as e:
+            self.refresh_failures += 1
+            self.last_error = str(e)
+            print(f"⚠️  Endpoint manifest refresh failed (keeping current copy): {e}")
+            return False
+        self._manifest = manifest  # single reference assignment: readers see old or new, never partial
+        self._loaded_at = time.time()
+        self._source = f"url:{self.url}"
+        self.refreshes += 1
+        self.last_error = None
+        self._write_cache(manifest)
+        return True
+
+    def _start_background_refresh(self):
+        """Start the daemon thread that keeps the manifest fresh."""
+        if self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, name="bms-manifest-refresh", daemon=True
+        )
+        self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            age = time.time() - self._loaded_at
+            if age >= self.ttl:
+                self.refresh()
+                # Retry failed refreshes sooner than a full TTL
+                wait = self.ttl if self.last_error is None else min(self.ttl, 60.0)
+            else:
+                wait = self.ttl - age
+            self._stop.wait(wait)
+
+    def stop(self):
+        """Stop the background refresh thread."""
+        self._stop.set()
+
+    def stats(self) -> Dict:
+        """Return manifest source, age and refresh counters."""
+        return {
+            "source": self._source,
+            "age_seconds": round(time.time() - self._loaded_at, 1) if self._manifest is not None else None,
+            "ttl": self.ttl,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "last_error": self.last_error,
+        }
+
+
+_manifest: Optional[EndpointManifest] = None
+_manifest_lock = threading.Lock()
+
+
+def get_endpoint_manifest() -> EndpointManifest:
+    """Return the process-wide endpoint manifest shared by all providers."""
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            _manifest = EndpointManifest()
+        return _manifest
@@ -0,0 +1,115 @@
+"""
+In-memory table of pre-rendered few-shot examples.
+
+Every request used to pull each hit's config JSON string out of the vector
+store, json.loads it and json.dumps it again (indented) for the prompt.
+ExampleTable does that work once at load time: each example is stored by
+example_id with its parsed config, its config features for MMR and its
+pre-rendered answer block ("Headers/Column Names: ..., Answer: {...}\\n").
+Vector search then only needs to return the example_id and the matched
+wording, and hydration is a dictionary lookup plus one string concatenation.
+
+Hydrated examples share the table's config objects; treat them as read-only.
+ExampleTable.vector_rows builds the rows the vector index stores for the
+same examples (one per description, with stable ids and content hashes).
+"""
+
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+
+class ExampleTable:
+    """Few-shot examples keyed by example_id, with pre-rendered prompt blocks."""
+
+    def __init__(self, examples: List[Dict]):
+        """
+        Args:
+            examples: Entries of few_shot_examples.json (id, description, config, headers, type)
+        """
+        self._entries: Dict[int, Dict] = {}
+        for index, example in enumerate(examples):
+            example_id = self.example_id(example, index)
+            config = example["config"]
+            headers = example.get("headers", "")
+            self._entries[example_id] = {
+                "example_id": example_id,
+                "config": config,
+                "headers": headers,
+                "type": example.get("type", "unknown"),
+                "features": frozenset(
+                    f"{key}={json.dumps(value, sort_keys=True)}" for key, value in config.items()
+                ),
+                "answer_block": f"Headers/Column Names: {headers}, Answer: {json.dumps(config, indent=2)}\n",
+            }
+
+    @staticmethod
+    def example_id(example: Dict, index: int) -> int:
+        """The example's id, defaulting to its position in the examples file."""
+        return example.get("id", index)
+
+    @classmethod
+    def vector_rows(cls, examples: List[Dict]) -> Dict[int, Dict]:
+        """Index rows (without vectors) for every example description, keyed by stable row id.
+
+        Each description (primary or alternative) becomes one row. The row id is
+        derived from the example id and the description text, so it stays the
+        same across re-indexing; 'hash' covers everything stored in the row.
+        """
+        rows: Dict[int, Dict] = {}
+        for index, example in enumerate(examples):
+            example_id = cls.example_id(example, index)
+            # Primary description (always present), then alternative wordings (if present)
+            descriptions = [(example['description'], True)]
+            descriptions += [(alt_desc, False) for alt_desc in example.get('alt_descriptions', [])]
+
+            for description, is_primary in descriptions:
+                key = hashlib.sha256(f"{example_id}\x1f{description}".encode("utf-8")).digest()
+                row_id = int.from_bytes(key[:8], "big") >> 1  # Milvus ids are signed int64
+                if row_id in rows:
+                    continue  # Alternative wording repeats another description of this example
+                row = {
+                    "id": row_id,
+                    "description": description,
+                    "config": json.dumps(example["config"]),
+                    "headers": example.get("headers", ""),  # Optional, default to empty
+                    "type": example.get("type", "unknown"),  # Optional, default to unknown
+                    "example_id": example_id,  # Optional id, default to example index
+                    "is_primary": is_primary
+                }
+                row["hash"] = hashlib.sha256(json.dumps(row, sort_keys=True).encode("utf-8")).hexdigest()
+                rows[row_id] = row
+        return rows
+
+    def __contains__(self, example_id) -> bool:
+        return example_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, example_id: int, description: str, score: float = 0.0) -> Optional[Dict]:
+        """Hydrate one hit: the stored example with the matched wording and score."""
+        entry = self._entries.get(example_id)
+        if entry is None:
+            return None
+        return {
+            "example_id": example_id,
+            "description": description,
+            "config": entry["config"],
+            "headers": entry["headers"],
+            "type": entry["type"],
+            "score": score,
+            "features": entry["features"],
+            "answer_block": entry["answer_block"],
+        }
+
+    @staticmethod
+    def render(example: Dict) -> str:
+        """Few-shot prompt block of an example (pre-rendered answer when available)."""
+        answer_block = example.get("answer_block")
+        if answer_block is None:
+            answer_block = (
+                f"Headers/Column Names: {example['headers']}, "
+                f"Answer: {json.dumps(example['config'], indent=2)}\n"
+            )
+        return f"English Text: {example['description']}; {answer_block}"
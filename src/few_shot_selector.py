@@ -0,0 +1,140 @@
+"""
+Token-budgeted, diversity-aware few-shot example selection.
+
+Instead of always sending the 25 nearest examples, FewShotSelector fills the
+few-shot section up to a token budget using maximal marginal relevance
+(MMR) over the retrieved candidates:
+
+    mmr(c) = lambda * relevance(c) - (1 - lambda) * max_similarity(c, selected)
+
+Relevance is the retrieval cosine score; similarity between two examples is
+the Jaccard overlap of their config key/value pairs, so near-duplicate
+configs are penalized and exact duplicates are skipped. Each candidate
+costs the tokens of its rendered few-shot block, counted with the model's
+tokenizer. Candidates hydrated from the example table carry precomputed
+config features, and block token counts are memoized, so repeated
+selections do no JSON or tokenizer work for blocks already seen.
+"""
+
+import json
+import threading
+from typing import Callable, Dict, List, Tuple
+
+try:
+    from tokenizer import TokenCounter
+except ImportError:
+    from src.tokenizer import TokenCounter
+
+
+def _config_features(config: Dict) -> frozenset:
+    """Top-level key/value pairs of a config, as hashable strings."""
+    return frozenset(f"{key}={json.dumps(value, sort_keys=True)}" for key, value in config.items())
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class FewShotSelector:
+    """Selects few-shot examples by MMR until the token budget is used up."""
+
+    def __init__(
+        self,
+        token_counter: TokenCounter,
+        token_budget: int = 2000,
+        mmr_lambda: float = 0.7,
+        max_examples: int = 25,
+        min_examples: int = 1
+    ):
+        """
+        Args:
+            token_counter: Tokenizer of the LLM the prompt is sent to
+            token_budget: Maximum tokens of the few-shot section
+            mmr_lambda: Relevance vs diversity trade-off (1.0 = relevance only)
+            max_examples: Upper bound on selected examples
+            min_examples: Examples always included, even over budget
+        """
+        self.token_counter = token_counter
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.max_examples = max_examples
+        self.min_examples = min_examples
+        self._lock = threading.Lock()
+        self._block_tokens: Dict[str, int] = {}
+        self.selections = 0
+        self.selected_examples = 0
+        self.selected_tokens = 0
+
+    def select(self, candidates: List[Dict], render: Callable[[Dict], str]) -> Tuple[List[Dict], Dict]:
+        """
+        Pick examples from retrieval candidates (best first, each with 'score' and 'config').
+
+        Args:
+            candidates: Retrieved examples, most relevant first
+            render: Function rendering an example as its few-shot prompt block
+
+        Returns:
+            Tuple of (selected examples in selection order, info with k/tokens/candidates)
+        """
+        costs = [self._count(render(c)) for c in candidates]
+        features = [c.get("features") or _config_features(c["config"]) for c in candidates]
+        max_similarity = [0.0] * len(candidates)
+        remaining = set(range(len(candidates)))
+        selected: List[int] = []
+        used = 0
+
+        while remaining and len(selected) < self.max_examples:
+            must_take = len(selected) < self.min_examples
+            best, best_score = None, None
+            for i in remaining:
+                if not must_take and used + costs[i] > self.token_budget:
+                    continue
+                score = (
+                    self.mmr_lambda * candidates[i].get("score", 0.0)
+                    - (1 - self.mmr_lambda) * max_similarity[i]
+                )
+                if best_score is None or score > best_score:
+                    best, best_score = i, score
+            if best is None:
+                break
+
+            selected.append(best)
+            used += costs[best]
+            remaining.discard(best)
+            for i in list(remaining):
+                similarity = _jaccard(features[i], features[best])
+                if similarity >= 1.0:
+                    remaining.discard(i)  # identical config: nothing new to show
+                else:
+                    max_similarity[i] = max(max_similarity[i], similarity)
+
+        with self._lock:
+            self.selections += 1
+            self.selected_examples += len(selected)
+            self.selected_tokens += used
+        return [candidates[i] for i in selected], {
+            "few_shot_k": len(selected),
+            "few_shot_tokens": used,
+            "few_shot_candidates": len(candidates),
+        }
+
+    def _count(self, block: str) -> int:
+        """Token count of a few-shot block, memoized (the set of blocks is small)."""
+        tokens = self._block_tokens.get(block)
+        if tokens is None:
+            tokens = self._block_tokens[block] = self.token_counter.count(block)
+        return tokens
+
+    def stats(self) -> Dict:
+        with self._lock:
+            selections = self.selections or 1
+            return {
+                "tokenizer": self.token_counter.name,
+                "token_budget": self.token_budget,
+                "mmr_lambda": self.mmr_lambda,
+                "selections": self.selections,
+                "avg_k": round(self.selected_examples / selections, 2),
+                "avg_tokens": round(self.selected_tokens / selections, 1),
+            }
@@ -0,0 +1,308 @@
+"""
+Hedged LLM requests across Azure OpenAI endpoints.
+
+A single slow endpoint sets the tail latency: the retry loop only moves on
+after an error. With hedging, a call that has not returned within a
+dynamic threshold (a quantile, p90 by default, of recently observed call
+latencies) is sent again to a second, different endpoint. The first
+response wins and the other call is cancelled (async) or abandoned (sync
+calls cannot be interrupted; their result is discarded).
+
+Hedges cost extra tokens, so they are capped by a budget: every request
+earns `max_rate` hedge tokens (up to BUDGET_CAP) and every hedge spends
+one, so at most about `max_rate` of the requests are hedged even when an
+endpoint is slow for everyone. No request is hedged before `min_samples`
+latencies have been observed.
+
+RequestHedger.call (sync, calls run on an executor) and acall (async) run
+the race with provider callables: the call on an endpoint, the choice of
+the hedge endpoint, and callbacks for the hedge's errors and the losing
+call.
+
+Observed latencies are those of single HTTP attempts: the pooled clients
+do not retry (max_retries=0), so the threshold is not inflated by hidden
+retries and a failing endpoint surfaces its error at once, for the
+caller's retry loop to move on to an endpoint not tried yet.
+
+Configuration via environment variables:
+    LLM_HEDGING: Enable hedged requests (default: false)
+    LLM_HEDGE_QUANTILE: Latency quantile used as the hedge threshold (default: 0.9)
+    LLM_HEDGE_MAX_RATE: Maximum share of requests that are hedged (default: 0.1)
+    LLM_HEDGE_MIN_DELAY: Lower bound of the threshold in seconds (default: 1.0)
+    LLM_HEDGE_MIN_SAMPLES: Latencies observed before hedging starts (default: 20)
+    LLM_HEDGE_WINDOW: Number of recent latencies the quantile is computed over (default: 200)
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def _quantile(sorted_values, q: float) -> float:
+    """Nearest-rank quantile of a sorted, non-empty sequence."""
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _timeout_error(endpoint: str) -> BaseException:
+    return TimeoutError(f"no response from {endpoint}")
+
+
+class RequestHedger:
+    """Hedge threshold, hedge budget and hedging statistics of one LLM provider."""
+
+    # Hedge tokens a quiet period can accumulate (bounds bursts of hedges)
+    BUDGET_CAP = 2.0
+
+    def __init__(
+        self,
+        quantile: Optional[float] = None,
+        max_rate: Optional[float] = None,
+        min_delay: Optional[float] = None,
+        min_samples: Optional[int] = None,
+        window: Optional[int] = None
+    ):
+        """
+        Args:
+            quantile: Latency quantile used as the hedge threshold (env default)
+            max_rate: Maximum share of requests that are hedged (env default)
+            min_delay: Lower bound of the threshold in seconds (env default)
+            min_samples: Latencies observed before hedging starts (env default)
+            window: Number of recent latencies the quantile is computed over (env default)
+        """
+        self.quantile = quantile or float(os.environ.get("LLM_HEDGE_QUANTILE", "0.9"))
+        self.max_rate = max_rate if max_rate is not None else float(os.environ.get("LLM_HEDGE_MAX_RATE", "0.1"))
+        self.min_delay = min_delay if min_delay is not None else float(os.environ.get("LLM_HEDGE_MIN_DELAY", "1.0"))
+        self.min_samples = min_samples or int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self._latencies = deque(maxlen=window or int(os.environ.get("LLM_HEDGE_WINDOW", "200")))
+        self._budget = 0.0
+        self._lock = threading.Lock()
+        self.totals = {
+            "requests": 0,
+            "hedges": 0,
+            "hedge_wins": 0,  # the hedge answered first
+            "primary_wins": 0,  # the first call answered first after a hedge was sent
+            "both_failed": 0,
+            "over_budget": 0,  # threshold passed but the hedge budget was spent
+            "no_alternate": 0,  # threshold passed but no other endpoint to hedge to
+        }
+
+    def observe(self, latency: float):
+        """Record the latency in seconds of a completed call (or a lower bound for a cancelled one)."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def threshold(self) -> Optional[float]:
+        """Current hedge delay in seconds, or None while too few latencies were observed."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return max(self.min_delay, _quantile(latencies, self.quantile))
+
+    def begin(self) -> Optional[float]:
+        """Count a request, earn its share of the hedge budget and return its hedge delay (None: no hedge)."""
+        with self._lock:
+            self.totals["requests"] += 1
+            self._budget = min(self.BUDGET_CAP, self._budget + self.max_rate)
+        return self.threshold()
+
+    def try_hedge(self) -> bool:
+        """Spend one hedge token; False (and counted) when the budget is exhausted."""
+        with self._lock:
+            if self._budget < 1.0:
+                self.totals["over_budget"] += 1
+                return False
+            self._budget -= 1.0
+            self.totals["hedges"] += 1
+            return True
+
+    def no_alternate(self):
+        """Return the token of a hedge that could not be sent (no other endpoint available)."""
+        with self._lock:
+            self._budget += 1.0
+            self.totals["hedges"] -= 1
+            self.totals["no_alternate"] += 1
+
+    def finish(self, hedge_won: Optional[bool]):
+        """Record the outcome of a hedged request (None: both calls failed)."""
+        key = "both_failed" if hedge_won is None else "hedge_wins" if hedge_won else "primary_wins"
+        with self._lock:
+            self.totals[key] += 1
+
+    def _alternate(self, endpoint: str, alternate: Callable[[], Optional[str]]) -> Optional[str]:
+        """Hedge endpoint for a slow call to `endpoint`, or None (budget spent, no other endpoint)."""
+        if not self.try_hedge():
+            return None
+        hedge_endpoint = alternate()
+        if hedge_endpoint is None or hedge_endpoint == endpoint:
+            self.no_alternate()
+            return None
+        return hedge_endpoint
+
+    def call(
+        self,
+        fn: Callable[[str], Any],
+        endpoint: str,
+        alternate: Callable[[], Optional[str]],
+        executor: futures.Executor,
+        timeout: float,
+        recoverable: Tuple[type, ...] = (Exception,),
+        on_hedge_error: Optional[Callable[[str, BaseException], None]] = None,
+        on_abandon: Optional[Callable[[futures.Future], None]] = None,
+        timeout_error: Callable[[str], BaseException] = _timeout_error
+    ) -> Any:
+        """
+        Run fn(endpoint); once it is slower than the hedge delay, race it against fn on a second endpoint.
+
+        The first successful result wins. A recoverable error of one call
+        falls back to the other; any other error is raised at once. When both
+        fail, or neither answers within `timeout` seconds, the first call's
+        error (else timeout_error(endpoint)) is raised. A sync call cannot be
+        interrupted: the losing call is abandoned and handed to on_abandon.
+
+        Args:
+            fn: One call on an endpoint (run on the executor when hedging)
+            endpoint: Endpoint of the first call
+            alternate: Returns the hedge endpoint (None or `endpoint`: no other endpoint)
+            executor: Runs the racing calls
+            timeout: Seconds from the first call after which both calls are given up
+            recoverable: Errors of one call that fall back to the other call
+            on_hedge_error: Called with (hedge endpoint, error) when the hedge fails or times out
+            on_abandon: Called with the future of each abandoned call
+            timeout_error: Error for an endpoint that did not answer within `timeout`
+
+        Returns:
+            The winning call's result
+        """
+        delay = self.begin()
+        if delay is None:
+            return fn(endpoint)
+
+        start = time.perf_counter()
+        primary = executor.submit(fn, endpoint)
+        if futures.wait([primary], timeout=delay).done:
+            return primary.result()
+        hedge_endpoint = self._alternate(endpoint, alternate)
+        if hedge_endpoint is None:
+            return primary.result()
+        hedge = executor.submit(fn, hedge_endpoint)
+
+        pending = {primary, hedge}
+        primary_error = None
+        try:
+            while pending:
+                remaining = max(start + timeout - time.perf_counter(), 0.0)
+                done, pending = futures.wait(pending, timeout=remaining, return_when=futures.FIRST_COMPLETED)
+                if not done:
+                    break
+                for call in done:
+                    error = call.exception()
+                    if error is None:
+                        self.finish(hedge_won=call is hedge)
+                        return call.result()
+                    if not isinstance(error, recoverable):
+                        raise error
+                    if call is primary:
+                        primary_error = error
+                    elif on_hedge_error is not None:
+                        on_hedge_error(hedge_endpoint, error)
+
+            self.finish(hedge_won=None)
+            if hedge in pending and on_hedge_error is not None:
+                on_hedge_error(hedge_endpoint, timeout_error(hedge_endpoint))
+            raise primary_error or timeout_error(endpoint)
+        finally:
+            for call in pending:
+                if on_abandon is not None:
+                    on_abandon(call)
+
+    async def acall(
+        self,
+        fn: Callable[[str], Awaitable[Any]],
+        endpoint: str,
+        alternate: Callable[[], Optional[str]],
+        timeout: float,
+        recoverable: Tuple[type, ...] = (Exception,),
+        on_hedge_error: Optional[Callable[[str, BaseException], None]] = None,
+        on_cancelled: Optional[Callable[[str, float], None]] = None,
+        timeout_error: Callable[[str], BaseException] = _timeout_error
+    ) -> Any:
+        """
+        Async variant of call(); the losing call is cancelled.
+
+        A first call cancelled because the hedge won has its elapsed time
+        observed as a lower bound of its latency and passed to
+        on_cancelled(endpoint, seconds), so the threshold still sees it.
+        """
+        delay = self.begin()
+        if delay is None:
+            return await fn(endpoint)
+
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(fn(endpoint))
+        pending = {primary}
+        hedge = hedge_endpoint = None
+        primary_error = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+            hedge_endpoint = self._alternate(endpoint, alternate)
+            if hedge_endpoint is None:
+                return await primary
+            hedge = asyncio.ensure_future(fn(hedge_endpoint))
+            pending.add(hedge)
+
+            while pending:
+                remaining = max(start + timeout - time.perf_counter(), 0.0)
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for call in done:
+                    error = call.exception()
+                    if error is None:
+                        self.finish(hedge_won=call is hedge)
+                        if primary in pending:
+                            elapsed = time.perf_counter() - start
+                            self.observe(elapsed)
+                            if on_cancelled is not None:
+                                on_cancelled(endpoint, elapsed)
+                        return call.result()
+                    if not isinstance(error, recoverable):
+                        raise error
+                    if call is primary:
+                        primary_error = error
+                    elif on_hedge_error is not None:
+                        on_hedge_error(hedge_endpoint, error)
+
+            self.finish(hedge_won=None)
+            if hedge in pending and on_hedge_error is not None:
+                on_hedge_error(hedge_endpoint, timeout_error(hedge_endpoint))
+            raise primary_error or timeout_error(endpoint)
+        finally:
+            for call in pending:
+                call.cancel()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            totals = dict(self.totals)
+            latencies = sorted(self._latencies)
+        threshold = self.threshold()
+        requests, hedges = totals["requests"], totals["hedges"]
+        return {
+            "quantile": self.quantile,
+            "max_rate": self.max_rate,
+            "threshold_ms": round(threshold * 1000, 1) if threshold is not None else None,
+            **totals,
+            "hedge_rate": round(hedges / requests, 4) if requests else 0.0,
+            "hedge_win_rate": round(totals["hedge_wins"] / hedges, 4) if hedges else 0.0,
+            "latency_samples": len(latencies),
+            "latency_ms": {
+                f"p{p}": round(_quantile(latencies, p / 100) * 1000, 1) for p in (50, 90, 99)
+            } if latencies else None,
+        }
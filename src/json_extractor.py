@@ -0,0 +1,253 @@
+"""
+Single-pass, string-aware extraction of the first JSON object in LLM output.
+
+LLM responses wrap the config in prose, markdown code fences or both, and
+configs contain braces inside strings (a title "{x}"). JsonExtractor scans
+the text once, left to right, and can be fed incrementally from a token
+stream:
+
+- outside an object it jumps to the next "{" (str.find)
+- a "{" starts a candidate only if the next non-blank character is '"' or
+  "}", so prose such as "{x}" or "{{ template }}" is skipped immediately
+- inside a candidate it jumps between structural characters with a
+  character-class regex (no backtracking), tracking string and escape
+  state, so braces and quotes inside strings are ignored
+- a candidate whose braces balance is validated with json.loads; if it is
+  invalid, scanning continues after its closing brace: an object nested
+  in it is a fragment of the broken config (a "legendBox" of a config
+  with a trailing comma), not the config
+- a candidate still open when the response ends (finish()) is rescanned
+  from just inside its opening brace: a stray '{"' in prose before the
+  real object leaves the first candidate unbalanced
+
+Rescans are limited to RESCAN_FACTOR times the response length in total
+(candidates rejected for their nesting depth are not rescanned), so each
+character is examined a bounded number of times and extraction stays
+linear in the response length. Only the text of the current candidate is
+buffered. When no valid object is found, JsonExtractionError (a
+json.JSONDecodeError) reports why and where the first candidate failed:
+an unterminated string, unclosed braces, nesting deeper than max_depth or
+its JSON error; or that there was no object at all.
+"""
+
+import json
+import re
+from typing import Any, List, Optional
+
+# Structural characters inside an object (outside strings) and inside strings
+_OBJECT_CHARS = re.compile(r'[{}"]')
+_STRING_CHARS = re.compile(r'["\\]')
+_BLANK = " \t\r\n"
+
+_SEEK, _OPENED, _OBJECT, _STRING, _ESCAPE, _DONE = range(6)
+
+
+class JsonExtractionError(json.JSONDecodeError):
+    """No complete, valid JSON object in the response; pos is the offset in the response."""
+
+
+class JsonExtractor:
+    """Incremental extractor of the first complete, valid JSON object."""
+
+    # Characters rescanned after failed candidates, as a multiple of the characters fed
+    RESCAN_FACTOR = 2
+
+    def __init__(self, max_depth: int = 256):
+        """
+        Args:
+            max_depth: Deepest brace nesting accepted in a candidate object
+        """
+        self.max_depth = max_depth
+        self.consumed = 0  # characters fed so far
+        self.start: Optional[int] = None  # offset of the object's opening brace
+        self.end: Optional[int] = None  # offset just past its closing brace
+        self.text: Optional[str] = None  # the object's JSON text
+        self.value: Any = None  # the parsed object
+        self._state = _SEEK
+        self._depth = 0
+        self._candidate_start = 0
+        self._string_start = 0
+        self._too_deep: Optional[int] = None  # offset where the candidate exceeded max_depth
+        self._parts: List[str] = []  # text of the current candidate
+        self._first_error: Optional[tuple] = None  # (message, offset) of the first failed candidate
+        self._rescanned = 0  # characters scanned again after failed candidates
+
+    @property
+    def complete(self) -> bool:
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> bool:
+        """Scan the next chunk of the response; True once a valid object is complete."""
+        if self._state == _DONE:
+            return True
+        base = self.consumed
+        self.consumed += len(chunk)
+        return self._scan(chunk, base)
+
+    def _scan(self, chunk: str, base: int) -> bool:
+        """Scan chunk, starting at stream offset base."""
+        i, n = 0, len(chunk)
+        keep_from = 0 if self._state != _SEEK else None  # chunk offset where the candidate text starts
+
+        while i < n:
+            state = self._state
+            if state == _SEEK:
+                j = chunk.find("{", i)
+                if j < 0:
+                    break
+                self._state, self._depth, self._too_deep = _OPENED, 1, None
+                self._candidate_start = base + j
+                self._parts = []
+                keep_from = j
+                i = j + 1
+            elif state == _OPENED:
+                char = chunk[i]
+                if char in _BLANK:
+                    i += 1
+                elif char == '"':
+                    self._state, self._string_start = _STRING, base + i
+                    i += 1
+                elif char == "}":
+                    if self._close(chunk, keep_from, i, base):
+                        return True
+                    keep_from = None
+                    i += 1
+                else:
+                    # "{x}", "{{": not a JSON object; rescan from this character
+                    self._state, self._depth, keep_from = _SEEK, 0, None
+            elif state == _OBJECT:
+                match = _OBJECT_CHARS.search(chunk, i)
+                if match is None:
+                    break
+                j = match.start()
+                char = chunk[j]
+                i = j + 1
+                if char == '"':
+                    self._state, self._string_start = _STRING, base + j
+                elif char == "{":
+                    self._depth += 1
+                    if self._depth > self.max_depth and self._too_deep is None:
+                        # Rejected as a whole once it closes, so no inner fragment is returned
+                        self._too_deep = base + j
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        if self._close(chunk, keep_from, j, base):
+                            return True
+                        keep_from = None
+            elif state == _STRING:
+                match = _STRING_CHARS.search(chunk, i)
+                if match is None:
+                    break
+                j = match.start()
+                i = j + 1
+                self._state = _OBJECT if chunk[j] == '"' else _ESCAPE
+            else:  # _ESCAPE: the escaped character is never structural
+                self._state = _STRING
+                i += 1
+
+        if keep_from is not None and self._state not in (_SEEK, _DONE):
+            self._parts.append(chunk[keep_from:])
+        return False
+
+    def _close(self, chunk: str, keep_from: int, j: int, base: int) -> bool:
+        """A candidate's braces balanced at chunk[j]; validate it. True if it is valid JSON."""
+        if self._too_deep is not None:
+            self._reject(f"Nesting deeper than {self.max_depth} levels", self._too_deep)
+            return False
+        self._parts.append(chunk[keep_from:j + 1])
+        text = "".join(self._parts)
+        self._parts = [text]
+        try:
+            self.value = json.loads(text)
+        except (ValueError, RecursionError) as e:
+            message = e.msg if isinstance(e, json.JSONDecodeError) else str(e)
+            offset = self._candidate_start + (e.pos if isinstance(e, json.JSONDecodeError) else 0)
+            self._reject(f"Invalid JSON object: {message}", offset)
+            return False
+        self._state = _DONE
+        self.start, self.end, self.text = self._candidate_start, base + j + 1, text
+        return True
+
+    def _rescan_text(self) -> Optional[str]:
+        """The inside of the open candidate just abandoned, or None (nothing to rescan, budget spent)."""
+        parts, self._parts = self._parts, []
+        if not parts:
+            return None
+        text = "".join(parts)[1:]
+        if self._rescanned + len(text) > self.RESCAN_FACTOR * self.consumed:
+            return None
+        self._rescanned += len(text)
+        return text
+
+    def _state_error(self) -> Optional[tuple]:
+        """(message, offset) for a candidate still open at the end of the response."""
+        if self._state in (_STRING, _ESCAPE):
+            return f"Unterminated string (object opened at offset {self._candidate_start})", self._string_start
+        if self._state in (_OPENED, _OBJECT):
+            return (
+                f"Unclosed JSON object: {self._depth} brace(s) still open at end of response",
+                self._candidate_start
+            )
+        return None
+
+    def finish(self) -> bool:
+        """The response is complete: rescan candidates still open at its end. True if a valid object was found."""
+        while self._state not in (_SEEK, _DONE):
+            error = self._state_error()
+            if self._first_error is None:
+                self._first_error = error
+            if self._too_deep is not None:
+                self._parts = None  # its inner objects are too deep as well: no rescan
+            candidate_start = self._candidate_start
+            self._state, self._depth = _SEEK, 0
+            text = self._rescan_text()
+            if text is None:
+                break
+            if self._scan(text, candidate_start + 1):
+                return True
+        return self._state == _DONE
+
+    def _reject(self, message: str, offset: int):
+        """Abandon the current candidate (remembering the first failure) and seek the next one."""
+        if self._first_error is None:
+            self._first_error = (message, offset)
+        self._state, self._depth = _SEEK, 0
+
+    def error(self, doc: str = "") -> JsonExtractionError:
+        """Why no object was extracted from everything fed so far.
+
+        Args:
+            doc: The full response, if available, for line/column information
+        """
+        failure = self._first_error or self._state_error()
+        if failure is not None:
+            message, offset = failure
+            return JsonExtractionError(message, doc, offset)
+        return JsonExtractionError("No JSON object found in response", doc, self.consumed)
+
+    def result(self, doc: str = "") -> str:
+        """The extracted object's JSON text; raises JsonExtractionError if there is none."""
+        if self._state != _DONE:
+            raise self.error(doc)
+        return self.text
+
+
+def extract_json(text: str, max_depth: int = 256) -> str:
+    """
+    Return the first complete, valid top-level JSON object in text.
+
+    Args:
+        text: Raw LLM response (clean JSON, markdown code block, prose around JSON)
+        max_depth: Deepest brace nesting accepted
+
+    Returns:
+        The JSON text of the object
+
+    Raises:
+        JsonExtractionError: If the response contains no valid JSON object
+    """
+    extractor = JsonExtractor(max_depth=max_depth)
+    if not extractor.feed(text):
+        extractor.finish()
+    return extractor.result(text)
@@ -0,0 +1,178 @@
+"""
+Pooled Azure OpenAI clients.
+
+Creating an AzureOpenAI client per request means a fresh TCP connection,
+TLS handshake and DNS lookup every time. OpenAIClientPool keeps one sync
+and one async client per endpoint URL, each backed by an httpx client with
+persistent keep-alive connections (HTTP/2 when the optional `h2` package is
+installed). The same pool is shared by the LLM and embedding paths.
+
+The SDK's own retries are disabled (max_retries=0): retries happen in the
+endpoint balancer and the adaptive rate limiter, which must see every 429,
+5xx and timeout, and a call is bounded by one request timeout.
+
+Configuration via environment variables:
+    OPENAI_POOL_MAX_CONNECTIONS: Max connections per endpoint (default: 20)
+    OPENAI_POOL_MAX_KEEPALIVE: Idle keep-alive connections per endpoint (default: 10)
+    OPENAI_POOL_KEEPALIVE_EXPIRY: Seconds an idle connection is kept (default: 30)
+    OPENAI_TIMEOUT: Overall request timeout in seconds (default: 60)
+    OPENAI_CONNECT_TIMEOUT: Connect timeout in seconds (default: 10)
+    OPENAI_HTTP2: auto, true or false (default: auto)
+"""
+
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+import httpx
+from openai import AsyncAzureOpenAI, AzureOpenAI
+
+
+def _http2_enabled() -> bool:
+    """Resolve OPENAI_HTTP2; 'auto' enables HTTP/2 when h2 is installed."""
+    setting = os.environ.get("OPENAI_HTTP2", "auto").lower()
+    if setting == "auto":
+        return importlib.util.find_spec("h2") is not None
+    return setting == "true"
+
+
+class OpenAIClientPool:
+    """Keep-alive Azure OpenAI clients keyed by endpoint URL."""
+
+    def __init__(
+        self,
+        api_key: str,
+        api_version: str,
+        max_connections: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        timeout: Optional[float] = None,
+        connect_timeout: Optional[float] = None,
+        http2: Optional[bool] = None
+    ):
+        """
+        Args:
+            api_key: Azure OpenAI API key
+            api_version: Azure OpenAI API version
+            max_connections: Max connections per endpoint (env default)
+            max_keepalive: Idle keep-alive connections per endpoint (env default)
+            keepalive_expiry: Seconds an idle connection is kept (env default)
+            timeout: Overall request timeout in seconds (env default)
+            connect_timeout: Connect timeout in seconds (env default)
+            http2: Use HTTP/2 (env default, 'auto' = when h2 is installed)
+        """
+        self.api_key = api_key
+        self.api_version = api_version
+        self.limits = httpx.Limits(
+            max_connections=max_connections or int(os.environ.get("OPENAI_POOL_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=max_keepalive or int(os.environ.get("OPENAI_POOL_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=keepalive_expiry or float(os.environ.get("OPENAI_POOL_KEEPALIVE_EXPIRY", "30"))
+        )
+        self.timeout = httpx.Timeout(
+            timeout or float(os.environ.get("OPENAI_TIMEOUT", "60")),
+            connect=connect_timeout or float(os.environ.get("OPENAI_CONNECT_TIMEOUT", "10"))
+        )
+        self.http2 = _http2_enabled() if http2 is None else http2
+        self._clients: Dict[str, AzureOpenAI] = {}
+        # Per event loop (weakly referenced: a loop's clients go away with the loop)
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncAzureOpenAI]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self.clients_created = 0
+        self.requests = 0
+
+    def get(self, endpoint: str) -> AzureOpenAI:
+        """Return the shared sync client for an endpoint, creating it on first use."""
+        with self._lock:
+            self.requests += 1
+            client = self._clients.get(endpoint)
+            if client is None:
+                client = AzureOpenAI(
+                    api_version=self.api_version,
+                    api_key=self.api_key,
+                    azure_endpoint=endpoint,
+                    timeout=self.timeout,
+                    max_retries=0,
+                    http_client=httpx.Client(limits=self.limits, timeout=self.timeout, http2=self.http2)
+                )
+                self._clients[endpoint] = client
+                self.clients_created += 1
+            return client
+
+    def get_async(self, endpoint: str) -> AsyncAzureOpenAI:
+        """Return the shared async client for an endpoint in the running event loop.
+
+        httpx async connections are bound to the loop that opened them, so
+        async clients are kept per loop. Loops are weakly referenced and the
+        clients of closed loops are dropped here (their pooled connections
+        would otherwise keep the loop alive), so clients do not accumulate
+        and a new loop never receives a client bound to an old one.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.requests += 1
+            for closed in [other for other in list(self._async_clients) if other.is_closed()]:
+                del self._async_clients[closed]
+            try:
+                clients = self._async_clients.get(loop)
+                if clients is None:
+                    clients = self._async_clients[loop] = {}
+            except TypeError:
+                clients = {}  # loop type without weak reference support: client is not shared
+            client = clients.get(endpoint)
+            if client is None:
+                client = AsyncAzureOpenAI(
+                    api_version=self.api_version,
+                    api_key=self.api_key,
+                    azure_endpoint=endpoint,
+                    timeout=self.timeout,
+                    max_retries=0,
+                    http_client=httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+                )
+                clients[endpoint] = client
+                self.clients_created += 1
+            return client
+
+    def close(self):
+        """Close all sync clients and forget the async ones (they cannot be closed outside their loop)."""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+            self._async_clients.clear()
+
+    def stats(self) -> Dict:
+        """Return pool configuration and reuse counters."""
+        return {
+            "endpoints": len(self._clients),
+            "async_loops": len(self._async_clients),
+            "async_endpoints": sum(len(clients) for clients in list(self._async_clients.values())),
+            "clients_created": self.clients_created,
+            "requests": self.requests,
+            "reused": self.requests - self.clients_created,
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+        }
+
+
+_shared_pools: Dict[Tuple[str, str], OpenAIClientPool] = {}
+_shared_pools_lock = threading.Lock()
+
+
+def get_client_pool(api_key: str, api_version: str) -> OpenAIClientPool:
+    """Return the process-wide pool for a credential/API version pair.
+
+    LLMProvider and EmbeddingProvider both call this, so they share
+    connections to endpoints they have in common.
+    """
+    with _shared_pools_lock:
+        pool = _shared_pools.get((api_key, api_version))
+        if pool is None:
+            pool = OpenAIClientPool(api_key=api_key, api_version=api_version)
+            _shared_pools[(api_key, api_version)] = pool
+        return pool
@@ -23,13 +23,66 @@ Configuration via environment variables (set in .env file):
     MCP_TRANSPORT: Transport mode - stdio or http (default: stdio)
     MCP_HOST: HTTP host to bind to (default: 0.0.0.0)
     MCP_PORT: HTTP port to listen on (default: 8000)
+    
+    RESPONSE_CACHE_ENABLED: Cache identical deterministic requests (default: true)
+    RESPONSE_CACHE_MAX_SIZE: Maximum cached configs in memory (default: 1024)
+    RESPONSE_CACHE_TTL: Cache entry lifetime in seconds (default: 86400)
+    RESPONSE_CACHE_PATH: Optional SQLite file for a persistent cache tier
+    GENERATOR_WORKERS: Worker threads for embedding/vector search (default: 8)
+    SINGLE_FLIGHT_ENABLED: Identical in-flight temperature=0 requests share one generation (default: true)
+    SEMANTIC_CACHE_ENABLED: Reuse configs for paraphrased queries (default: false)
+    SEMANTIC_CACHE_THRESHOLD: Minimum cosine similarity for a hit (default: 0.95)
+    SEMANTIC_CACHE_TTL: Semantic cache entry lifetime in seconds (default: 86400)
+    EMBEDDING_CACHE_PATH: Optional SQLite file persisting query embeddings
+    EMBEDDING_STORE_ENABLED: Persistent store of computed document embeddings (default: true)
+    EMBEDDING_STORE_DIR: Embedding store directory (default: ~/.cache/canvasxpress_mcp/embeddings)
+    BATCH_CONCURRENCY: Concurrent LLM calls per batch request (default: 8)
+    BATCH_MAX_SIZE: Maximum descriptions per batch request (default: 200)
+    PROMPT_LAYOUT: template or prefix_cache (static prefix for provider prompt caching)
+    SCHEMA_PRUNING: Send only the relevant schema.md parameters (default: false)
+    SCHEMA_TOKEN_BUDGET: Token budget of the pruned schema (default: 2500)
+    RULES_RETRIEVAL: Send core rules plus only the relevant rule chunks (default: false)
+    FEW_SHOT_SELECTION: fixed (25 examples) or budget (token-budgeted MMR selection)
+    FEW_SHOT_TOKEN_BUDGET: Few-shot token budget in budget mode (default: 2000)
+    LLM_STREAMING: Stream completions with progress notifications, stop at JSON end (default: false)
+    CONFIG_VALIDATION: Check generated configs against schema, rules and headers (default: true)
+    CONFIG_AUTO_REPAIR: Apply deterministic repairs to generated configs (default: true)
+    CONFIG_REPAIR_ENABLED: Send invalid outputs back to the LLM in a small repair prompt (default: true)
+    CONFIG_REPAIR_MAX_ATTEMPTS: Repair calls per request (default: 1)
+    CONFIG_REPAIR_MAX_TOKENS: Maximum tokens of a repair prompt (default: 2000)
+    LLM_CALL_TIMEOUT: Deadline in seconds of one LLM call (default: 60)
+    LLM_HEDGING: Re-send calls slower than the latency quantile to a second endpoint (default: false)
+    LLM_HEDGE_QUANTILE: Latency quantile used as the hedge threshold (default: 0.9)
+    LLM_HEDGE_MAX_RATE: Maximum share of requests that are hedged (default: 0.1)
+    ADMISSION_CONTROL: auto (on in HTTP mode), true or false (default: auto)
+    ADMISSION_MAX_CONCURRENT: Generation slots in use at once (default: 16)
+    ADMISSION_MAX_QUEUE: Requests waiting for a slot before "overloaded" errors (default: 64)
+    ADMISSION_MAX_QUEUE_PER_CLIENT: Waiting requests per client, 0 = no limit (default: 0)
+    ADMISSION_QUEUE_TIMEOUT: Seconds a request may wait for a slot (default: 30)
+    RATE_LIMIT_ENABLED: Pace LLM/embedding calls with adaptive per-endpoint and global token buckets (default: true)
+    RATE_LIMIT_ENDPOINT_RPS: Maximum requests/s per endpoint (default: 10)
+    RATE_LIMIT_GLOBAL_RPS: Maximum requests/s over all endpoints (default: 50)
+    RATE_LIMIT_MAX_WAIT: Longest wait in seconds for a rate limit turn (default: 120)
+
+The generator is initialized in a background thread at startup; until it is
+ready, tools return a "warming up" error. Readiness and per-phase durations
+are reported by the get_server_health tool and, in HTTP mode, GET /health.
+In STDIO mode all print() output goes to stderr, keeping stdout for the
+JSON-RPC stream.
 """
 
+import asyncio
 import json
 import os
+import sys
 
 from dotenv import load_dotenv
-from fastmcp import FastMCP
+from fastmcp import Context, FastMCP
+
+try:
+    from fastmcp.server.dependencies import get_http_request
+except ImportError:  # older fastmcp: no access to the HTTP request
+    get_http_request = None
 
 # Load .env file if running locally (not in Docker)
 if not os.path.exists('/app/data'):
@@ -37,9 +90,13 @@ if not os.path.exists('/app/data'):
 
 # Handle imports for both Docker and local environments
 try:
+    from admission import AdmissionController, AdmissionRejected, fair_queue_key, run_blocking
     from canvasxpress_generator import CanvasXpressGenerator
+    from warmup import GeneratorWarmup
 except ImportError:
+    from src.admission import AdmissionController, AdmissionRejected, fair_queue_key, run_blocking
     from src.canvasxpress_generator import CanvasXpressGenerator
+    from src.warmup import GeneratorWarmup
 
 # Auto-detect paths based on environment (Docker vs local)
 def get_paths():
@@ -71,6 +128,39 @@ LLM_ENVIRONMENT = os.environ.get("LLM_ENVIRONMENT", "nonprod")
 LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "openai")
 EMBEDDING_PROVIDER = os.environ.get("EMBEDDING_PROVIDER", "local")
 
+# HTTP mode serves many clients over the network; STDIO serves one local client
+HTTP_MODE = "--http" in sys.argv or os.environ.get("MCP_TRANSPORT") == "http"
+
+
+class StderrTextStdout:
+    """sys.stdout for the STDIO transport: text written with print() goes to stderr.
+
+    In STDIO mode stdout carries the JSON-RPC stream. Log lines from the
+    warm-up thread (generator initialization runs while the server is already
+    serving) or from request handling would otherwise land between protocol
+    messages. The binary buffer and file descriptor, which the transport
+    writes through, still belong to the real stdout.
+    """
+
+    def __init__(self, stdout):
+        self._stdout = stdout
+
+    def write(self, text: str) -> int:
+        return sys.stderr.write(text)
+
+    def writelines(self, lines):
+        sys.stderr.writelines(lines)
+
+    def flush(self):
+        sys.stderr.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stdout, name)
+
+
+if not HTTP_MODE and not isinstance(sys.stdout, StderrTextStdout):
+    sys.stdout = StderrTextStdout(sys.stdout)
+
 # Initialize generator on startup
 print("=" * 60)
 print("🚀 Starting CanvasXpress MCP Server (FastMCP 2.0)")
@@ -82,23 +172,96 @@ print(f"📦 LLM Provider: {LLM_PROVIDER}")
 print(f"📦 Embedding Provider: {EMBEDDING_PROVIDER}")
 print("=" * 60)
 
-generator = CanvasXpressGenerator(
-    data_dir=PATHS['data_dir'],
-    vector_db_path=PATHS['vector_db_path'],
-    llm_model=LLM_MODEL,
-    llm_environment=LLM_ENVIRONMENT
-)
 
-print("=" * 60)
-print("✅ Generator initialized! Server ready.")
-print("=" * 60)
+def build_generator(init_phases: list) -> CanvasXpressGenerator:
+    """Construct the generator (runs in the warm-up thread)."""
+    generator = CanvasXpressGenerator(
+        data_dir=PATHS['data_dir'],
+        vector_db_path=PATHS['vector_db_path'],
+        llm_model=LLM_MODEL,
+        llm_environment=LLM_ENVIRONMENT,
+        init_phases=init_phases
+    )
+    print("=" * 60)
+    print("✅ Generator initialized! Server ready.")
+    print("=" * 60)
+    return generator
+
+
+# The generator loads models and indexes in the background, so the server
+# binds its port right away; tools answer "warming up" until it is ready.
+warmup = GeneratorWarmup(build_generator)
+warmup.start()
+
+
+def _admission_enabled() -> bool:
+    """Resolve ADMISSION_CONTROL; 'auto' enables admission control in HTTP mode."""
+    setting = os.environ.get("ADMISSION_CONTROL", "auto").lower()
+    if setting == "auto":
+        return HTTP_MODE
+    return setting == "true"
+
+
+# Concurrency limit and fair, bounded queue in front of the generation tools
+admission = AdmissionController(enabled=_admission_enabled())
+
+
+def client_key(ctx: Context) -> str:
+    """Fair-queueing key of a request: the MCP client id, else the session id, else the HTTP peer address.
+
+    Requests with none of these share the "anonymous" bucket (FIFO among
+    themselves); in STDIO mode admission control is off by default and
+    there is a single client anyway.
+    """
+    try:
+        ids = [ctx.client_id, ctx.session_id] if ctx is not None else []
+    except (AttributeError, RuntimeError):
+        ids = []
+    if get_http_request is not None:
+        try:
+            request = get_http_request()
+        except RuntimeError:
+            request = None
+        if request is not None and request.client is not None:
+            ids.append(f"addr:{request.client.host}")
+    return fair_queue_key(*ids)
+
+
+def overloaded_response(error: AdmissionRejected, **fields) -> str:
+    """Fast, explicit answer for requests rejected by admission control."""
+    return json.dumps({
+        "success": False,
+        **fields,
+        "error": str(error),
+        "error_type": "overloaded",
+        "retry_after_s": error.retry_after,
+        "metadata": {
+            "admission": {
+                "rejected": error.reason,
+                "active": admission.active,
+                "queue_depth": admission.queued,
+            }
+        }
+    })
+
+
+def warming_up_response(**fields) -> str:
+    """Fast, explicit answer for requests that arrive before the generator is ready."""
+    return json.dumps({
+        "success": False,
+        **fields,
+        "error": warmup.not_ready_message(),
+        "error_type": "warming_up" if warmup.status != "failed" else "initialization_failed",
+        "metadata": {"startup": warmup.report()}
+    })
 
 
 @mcp.tool()
-def generate_canvasxpress_config(
+async def generate_canvasxpress_config(
     description: str,
     headers: str = None,
-    temperature: float = 0.0
+    temperature: float = 0.0,
+    ctx: Context = None
 ) -> str:
     """Generate CanvasXpress visualization configuration from natural language description.
     
@@ -130,16 +293,62 @@ def generate_canvasxpress_config(
             "description": "original description",
             "headers": "original headers or null",
             "config": {...} or null,
-            "error": null or "error message"
+            "error": null or "error message",
+            "metadata": {"cache": "exact" | "semantic" | "miss" | "bypass",
+                         "usage": {"prompt_tokens", "cached_tokens", "completion_tokens"},
+                         "stream": {"ttft_ms", "early_stop", "tokens_saved_est", ...},
+                         "validation": {"valid", "repairs", "errors", "warnings",
+                                        "violations": [{"code", "key", "severity", "message", "repaired"}]},
+                         "repair": {"problem": "json" | "validation", "attempts", "rescued",
+                                    "repair_tokens", "regeneration_tokens"} (only after a failed output),
+                         "coalesced": true (only when an identical request in flight was shared),
+                         "admission": {"queued_ms"} (HTTP mode: time spent waiting for a slot),
+                         ...}
         }
+    
+    Generated configs are validated locally against the CanvasXpress schema,
+    the configuration rules and the given headers. Unambiguous problems
+    (e.g. "bar" instead of "Bar", a column name in the wrong case) are
+    repaired locally. If the output is not valid JSON or still has errors, a
+    small repair prompt (the output, the errors and the relevant schema
+    lines) is sent to the LLM instead of failing the request; anything left
+    is listed in metadata.validation.violations.
+    
+    With LLM_STREAMING=true the completion is streamed: progress
+    notifications are sent while it is generated and the stream is closed
+    as soon as the JSON config is complete.
+    
+    In HTTP mode, requests beyond ADMISSION_MAX_CONCURRENT wait in a bounded
+    queue served fairly across clients. When the queue is full, or a request
+    waited ADMISSION_QUEUE_TIMEOUT seconds, the tool returns at once with
+    "error_type": "overloaded" and "retry_after_s".
     """
+    if not warmup.ready:
+        return warming_up_response(description=description, headers=headers, config=None)
+    generator = warmup.generator
+    
+    on_progress = None
+    if ctx is not None:
+        async def on_progress(progress: float, message: str):
+            # Progress notifications are best effort; never fail the generation over them
+            try:
+                await ctx.report_progress(progress, None, message)
+            except Exception:
+                pass
+    
+    trace = {}
     try:
-        # Generate configuration
-        config = generator.generate(
-            description=description,
-            headers=headers,
-            temperature=temperature
-        )
+        # Wait for a generation slot (fair across clients), then generate without blocking the event loop
+        async with admission.admit(client_key(ctx)) as queued_s:
+            if admission.enabled:
+                trace["admission"] = {"queued_ms": round(queued_s * 1000, 1)}
+            config = await generator.agenerate(
+                description=description,
+                headers=headers,
+                temperature=temperature,
+                trace=trace,
+                on_progress=on_progress
+            )
         
         # Return structured JSON response
         result = {
@@ -147,17 +356,22 @@ def generate_canvasxpress_config(
             "description": description,
             "headers": headers,
             "config": config,
-            "error": None
+            "error": None,
+            "metadata": trace
         }
         return json.dumps(result)
         
+    except AdmissionRejected as e:
+        return overloaded_response(e, description=description, headers=headers, config=None)
+        
     except json.JSONDecodeError as e:
         result = {
             "success": False,
             "description": description,
             "headers": headers,
             "config": None,
-            "error": f"JSON parsing error: {str(e)}. The LLM returned invalid JSON. Try rephrasing your description."
+            "error": f"JSON parsing error: {str(e)}. The LLM returned invalid JSON. Try rephrasing your description.",
+            "metadata": trace
         }
         return json.dumps(result)
         
@@ -167,22 +381,163 @@ def generate_canvasxpress_config(
             "description": description,
             "headers": headers,
             "config": None,
-            "error": f"Generation error: {str(e)}"
+            "error": f"Generation error: {str(e)}",
+            "metadata": trace
         }
         return json.dumps(result)
 
 
-if __name__ == "__main__":
-    import sys
+@mcp.tool()
+async def generate_canvasxpress_configs_batch(
+    requests: list,
+    temperature: float = 0.0,
+    concurrency: int = None,
+    ctx: Context = None
+) -> str:
+    """Generate CanvasXpress configurations for many descriptions in one call.
+    
+    Faster than calling generate_canvasxpress_config repeatedly: the
+    descriptions are embedded in one batch, matched against the examples in
+    one search, and the LLM calls run concurrently. A failing item does not
+    fail the batch.
+    
+    Args:
+        requests: List of objects with "description" (required), and optional
+            "headers" and "temperature".
+            Example: [{"description": "Bar chart of sales by region",
+                       "headers": "Region, Sales"}, {"description": "Heatmap"}]
+        temperature: Default LLM temperature for items that do not set one
+            (or set it to null). Default: 0.0
+        concurrency: Maximum concurrent LLM calls (default: BATCH_CONCURRENCY)
+    
+    Returns:
+        JSON string with structure:
+        {
+            "success": true/false (false only if the batch itself was rejected),
+            "results": [
+                {"success": ..., "description": ..., "headers": ..., "config": {...} or null,
+                 "error": null or "error message", "metadata": {...}, "elapsed_ms": ...},
+                ...
+            ],  # in input order
+            "error": null or "error message",
+            "elapsed_ms": total batch time
+        }
+    
+    In HTTP mode a batch takes one admission slot per concurrent LLM call
+    (its concurrency is capped at ADMISSION_MAX_CONCURRENT) and is rejected
+    with "error_type": "overloaded" like single requests.
+    """
+    if not warmup.ready:
+        return warming_up_response(results=[], elapsed_ms=None)
+    
+    start = asyncio.get_running_loop().time()
+    concurrency = max(1, concurrency or warmup.generator.batch_concurrency)
+    if admission.enabled:
+        concurrency = min(concurrency, admission.max_concurrent)
+    weight = min(len(requests) if isinstance(requests, list) else 1, concurrency)
+    try:
+        async with admission.admit(client_key(ctx), weight):
+            # The batch pipeline is blocking; keep the event loop free for other requests
+            items = await run_blocking(
+                warmup.generator.generate_batch,
+                requests,
+                temperature=temperature,
+                concurrency=concurrency
+            )
+    except AdmissionRejected as e:
+        return overloaded_response(e, results=[], elapsed_ms=None)
+    except Exception as e:
+        return json.dumps({"success": False, "results": [], "error": f"Batch error: {str(e)}", "elapsed_ms": None})
+    
+    results = []
+    for request, item in zip(requests, items):
+        request = request if isinstance(request, dict) else {}
+        error = item["error"]
+        if item["error_type"] in ("JSONDecodeError", "JsonExtractionError"):
+            error = f"JSON parsing error: {error}. The LLM returned invalid JSON. Try rephrasing your description."
+        elif error is not None:
+            error = f"Generation error: {error}"
+        results.append({
+            "success": item["success"],
+            "description": request.get("description"),
+            "headers": request.get("headers"),
+            "config": item["config"],
+            "error": error,
+            "metadata": item["metadata"],
+            "elapsed_ms": item["elapsed_ms"]
+        })
+    
+    return json.dumps({
+        "success": True,
+        "results": results,
+        "error": None,
+        "elapsed_ms": round((asyncio.get_running_loop().time() - start) * 1000, 1)
+    })
+
+
+@mcp.tool()
+def get_generator_stats() -> str:
+    """Return runtime statistics of the CanvasXpress generator.
+    
+    Includes response cache hit/miss counters, semantic cache hit rate and
+    similarity distribution, the number of embedding calls saved by the
+    query-embedding cache, per-endpoint latency, error rate and circuit
+    breaker state, and admission control load (queue depth, queue wait
+    times, rejections).
+    
+    Returns:
+        JSON string with statistics grouped by component
+    """
+    if not warmup.ready:
+        return warming_up_response()
+    stats = warmup.generator.get_stats()
+    stats["admission"] = admission.stats()
+    return json.dumps(stats)
+
+
+@mcp.tool()
+def get_server_health() -> str:
+    """Report whether the server is ready to generate configurations.
+    
+    The generator (embedding model, vector database, LLM provider) is
+    initialized in the background after the server starts. Until it is
+    ready, generation tools return a "warming up" error; poll this tool
+    to follow the progress.
+    
+    Returns:
+        JSON string with structure:
+        {
+            "status": "warming_up" | "ready" | "failed",
+            "ready": true/false,
+            "current_phase": name of the phase in progress or null,
+            "elapsed_s": seconds spent initializing so far (total once finished),
+            "phases": [{"phase": ..., "status": "running" | "done" | "failed",
+                        "duration_ms": ..., "elapsed_ms": (running phase only)}, ...],
+            "error": null or initialization error,
+            "admission": {"enabled", "active", "queue_depth", "queue_wait_ms", ...}
+        }
+    """
+    return json.dumps(dict(warmup.report(), admission=admission.stats()))
+
+
+@mcp.custom_route("/health", methods=["GET"])
+async def health(request):
+    """HTTP readiness probe: 200 when ready, 503 while warming up or after a failed start."""
+    from starlette.responses import JSONResponse
     
-    # Check for transport argument
-    if "--http" in sys.argv or os.environ.get("MCP_TRANSPORT") == "http":
+    report = dict(warmup.report(), admission=admission.stats())
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+if __name__ == "__main__":
+    if HTTP_MODE:
         # HTTP mode: accessible over the network
         host = os.environ.get("MCP_HOST", "0.0.0.0")
         port = int(os.environ.get("MCP_PORT", "8000"))
         
         print("\n🌐 Starting HTTP MCP Server")
         print(f"📡 Accessible at: http://{host}:{port}/mcp")
+        print(f"🩺 Readiness: http://{host}:{port}/health")
         print("=" * 60)
         
         mcp.run(transport="http", host=host, port=port)
@@ -0,0 +1,86 @@
+"""
+Prefix-cache-friendly prompt assembly.
+
+Azure OpenAI caches prompt prefixes automatically (for prompts of 1024+
+tokens) and Gemini can serve a prefix from an explicit context cache, but
+only if the leading bytes are identical across requests. The v2 template
+puts the large static parts (rules, schema) and the per-request parts
+(description, headers, few-shot examples) into one string that is
+re-formatted on every call.
+
+PromptLayout splits the template once at startup into:
+
+- a static prefix: the leading sections that only use static fields
+  (rules_info, schema_info), rendered once and byte-stable for the lifetime
+  of the process
+- a dynamic suffix template: everything from the first section that uses a
+  per-request field on, formatted per request
+
+Sections are delimited by '### ' headings and always move with their
+heading. Nothing is reordered, so prefix + suffix is exactly the formatted
+template; a static section after the first dynamic one (as {schema_info}
+inside the v1 Input section) stays in the suffix.
+"""
+
+import hashlib
+import re
+from string import Formatter
+from typing import Dict, List, Tuple
+
+_HEADING = re.compile(r"^### ")
+
+
+def _template_fields(text: str) -> set:
+    """Names of the format fields used in a template fragment."""
+    return {field for _, field, _, _ in Formatter().parse(text) if field}
+
+
+def _split_sections(template: str) -> List[str]:
+    """Split a template into '### ' sections (text before the first heading is a section of its own)."""
+    sections = []
+    current = []
+    for line in template.splitlines(keepends=True):
+        if _HEADING.match(line) and current:
+            sections.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("".join(current))
+    return sections
+
+
+class PromptLayout:
+    """A prompt template split into a static prefix and a dynamic suffix."""
+
+    def __init__(self, template: str, static_values: Dict[str, str]):
+        """
+        Args:
+            template: Prompt template (str.format placeholders)
+            static_values: Values of the fields that never change per request
+                (e.g. rules_info, schema_info); fields the template does not
+                use are ignored
+        """
+        self.static_values = dict(static_values)
+        sections = _split_sections(template)
+        static_fields = set(self.static_values)
+        split = len(sections)
+        for i, section in enumerate(sections):
+            if _template_fields(section) - static_fields:
+                split = i  # the first section using a per-request field starts the suffix
+                break
+
+        self.prefix = "".join(sections[:split]).format(**self.static_values)
+        self.suffix_template = "".join(sections[split:])
+        self.prefix_hash = hashlib.sha256(self.prefix.encode("utf-8")).hexdigest()[:16]
+
+    def render(self, **dynamic_values) -> Tuple[str, str]:
+        """Return (static prefix, rendered dynamic suffix) for one request."""
+        # Static values are passed too, for static fields in or after the first dynamic section
+        return self.prefix, self.suffix_template.format(**{**self.static_values, **dynamic_values})
+
+    def stats(self) -> Dict:
+        return {
+            "prefix_chars": len(self.prefix),
+            "prefix_hash": self.prefix_hash,
+            "suffix_template_chars": len(self.suffix_template),
+        }
@@ -0,0 +1,310 @@
+"""
+Client-side adaptive rate limiting for the Azure OpenAI and Gemini APIs.
+
+On HTTP 429 the retry loops used to move on to another endpoint at once,
+so under load concurrent requests turned a short rate limit on the BMS
+proxy into a 429 storm. AdaptiveRateLimiter paces calls before they are
+sent, with one token bucket per endpoint and one global bucket shared by
+all concurrent requests of a provider (LLM or embeddings):
+
+- every call reserves a token from both buckets; when none is available
+  the caller waits for its turn (reservations are FIFO) instead of failing
+- the allowed rates adapt with AIMD: each successful call adds
+  `increase` requests/s (up to the configured rate), a 429 multiplies
+  the endpoint's and the global rate by `decrease` (at most once per
+  `backoff_base` seconds, so a burst of 429s from calls already in
+  flight counts once)
+- a 429 blocks its endpoint for the Retry-After (retry-after-ms) time or,
+  without one, for a jittered exponential backoff
+- x-ratelimit-remaining-requests/-tokens of 0 block the endpoint until the
+  matching x-ratelimit-reset-* time, before a 429 happens
+
+Configuration via environment variables:
+    RATE_LIMIT_ENABLED: Pace calls client-side (default: true)
+    RATE_LIMIT_ENDPOINT_RPS: Maximum requests/s per endpoint (default: 10)
+    RATE_LIMIT_GLOBAL_RPS: Maximum requests/s over all endpoints (default: 50)
+    RATE_LIMIT_MIN_RPS: Lowest rate AIMD decreases to (default: 0.2)
+    RATE_LIMIT_INCREASE: Requests/s added per successful call (default: 0.1)
+    RATE_LIMIT_DECREASE: Rate multiplier per HTTP 429 (default: 0.5)
+    RATE_LIMIT_BACKOFF_BASE: First backoff in seconds without Retry-After (default: 1)
+    RATE_LIMIT_BACKOFF_MAX: Longest backoff in seconds (default: 60)
+    RATE_LIMIT_MAX_WAIT: Longest time in seconds a call waits for its turn (default: 120)
+    RATE_LIMIT_MAX_RETRIES: Retries of an embedding call after HTTP 429 (default: 3)
+"""
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Mapping, Optional
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitTimeout(RuntimeError):
+    """A call would have to wait longer than RATE_LIMIT_MAX_WAIT for its turn."""
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds of an x-ratelimit-reset-* value ('20ms', '1s', '6m0s' or a plain number)."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    return sum(float(number) * _UNIT_SECONDS[unit] for number, unit in parts) if parts else None
+
+
+def retry_after(headers: Optional[Mapping]) -> Optional[float]:
+    """Seconds to wait from retry-after-ms or retry-after (seconds or an HTTP date)."""
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _Bucket:
+    """Token bucket whose tokens go negative for callers queued behind a reservation."""
+
+    def __init__(self, rate: float, now: float):
+        self.ceiling = rate  # configured rate, the AIMD upper bound
+        self.rate = rate
+        self.tokens = self.burst
+        self.updated = now  # refill resumes here (in the future while blocked)
+        self.decreased_at = float("-inf")
+
+    @property
+    def burst(self) -> float:
+        return max(1.0, self.rate)
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, now: float) -> float:
+        """Take a token; return the time at which the caller may send its request."""
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return max(now, self.updated)
+        return max(now, self.updated) + -self.tokens / self.rate
+
+    def refund(self):
+        self.tokens += 1
+
+    def block(self, until: float):
+        """Hand out no token before `until` and one at `until`; queued reservations move behind it."""
+        self.tokens = min(self.tokens, 1.0)
+        self.updated = max(self.updated, until)
+
+    def blocked_for(self, now: float) -> float:
+        return max(0.0, self.updated - now)
+
+
+class _EndpointState:
+    def __init__(self, rate: float, now: float):
+        self.bucket = _Bucket(rate, now)
+        self.consecutive_429 = 0
+        self.rate_limited = 0
+
+
+class AdaptiveRateLimiter:
+    """Per-endpoint and global token buckets with AIMD rates and 429 backoff."""
+
+    def __init__(
+        self,
+        name: str = "default",
+        enabled: Optional[bool] = None,
+        endpoint_rps: Optional[float] = None,
+        global_rps: Optional[float] = None,
+        min_rps: Optional[float] = None,
+        increase: Optional[float] = None,
+        decrease: Optional[float] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        max_wait: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            name: Label used in stats (e.g. 'llm' or 'embeddings')
+            enabled: Pace calls (env default); when disabled only 429s are counted
+            endpoint_rps: Maximum requests/s per endpoint (env default)
+            global_rps: Maximum requests/s over all endpoints (env default)
+            min_rps: Lowest rate AIMD decreases to (env default)
+            increase: Requests/s added per successful call (env default)
+            decrease: Rate multiplier per HTTP 429 (env default)
+            backoff_base: First backoff in seconds without Retry-After (env default)
+            backoff_max: Longest backoff in seconds (env default)
+            max_wait: Longest wait in seconds for a turn before RateLimitTimeout (env default)
+            max_retries: Retries of an embedding call after HTTP 429 (env default)
+            clock: Monotonic time source in seconds (tests use a fake one)
+        """
+        self.name = name
+        self.clock = clock
+        self.enabled = (
+            enabled if enabled is not None
+            else os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        )
+        self.endpoint_rps = endpoint_rps or float(os.environ.get("RATE_LIMIT_ENDPOINT_RPS", "10"))
+        self.min_rps = min_rps or float(os.environ.get("RATE_LIMIT_MIN_RPS", "0.2"))
+        self.increase = increase or float(os.environ.get("RATE_LIMIT_INCREASE", "0.1"))
+        self.decrease = decrease or float(os.environ.get("RATE_LIMIT_DECREASE", "0.5"))
+        self.backoff_base = backoff_base or float(os.environ.get("RATE_LIMIT_BACKOFF_BASE", "1"))
+        self.backoff_max = backoff_max or float(os.environ.get("RATE_LIMIT_BACKOFF_MAX", "60"))
+        self.max_wait = max_wait or float(os.environ.get("RATE_LIMIT_MAX_WAIT", "120"))
+        self.max_retries = (
+            max_retries if max_retries is not None else int(os.environ.get("RATE_LIMIT_MAX_RETRIES", "3"))
+        )
+        self._global = _Bucket(global_rps or float(os.environ.get("RATE_LIMIT_GLOBAL_RPS", "50")), clock())
+        self._endpoints: Dict[str, _EndpointState] = {}
+        self._lock = threading.Lock()
+        self.totals = {
+            "calls": 0,
+            "queued": 0,  # calls that waited for their turn
+            "wait_s": 0.0,
+            "max_wait_s": 0.0,
+            "timeouts": 0,
+            "rate_limited": 0,  # HTTP 429 responses
+            "retry_after": 0,  # 429s that carried a Retry-After time
+            "header_blocks": 0,  # blocks from x-ratelimit-remaining-* = 0
+        }
+
+    def _state(self, endpoint: str) -> _EndpointState:
+        state = self._endpoints.get(endpoint)
+        if state is None:
+            state = self._endpoints[endpoint] = _EndpointState(self.endpoint_rps, self.clock())
+        return state
+
+    def reserve(self, endpoint: str) -> float:
+        """Reserve a turn for one call to an endpoint; return the seconds to wait before sending it.
+
+        Raises:
+            RateLimitTimeout: If the turn is more than max_wait seconds away
+        """
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            bucket = self._state(endpoint).bucket
+            now = self.clock()
+            wait = max(self._global.reserve(now), bucket.reserve(now)) - now
+            if wait > self.max_wait:
+                self._global.refund()
+                bucket.refund()
+                self.totals["timeouts"] += 1
+                raise RateLimitTimeout(
+                    f"Rate limit: next {self.name} slot for {endpoint} is {wait:.0f}s away "
+                    f"(RATE_LIMIT_MAX_WAIT={self.max_wait:.0f}s)"
+                )
+            self.totals["calls"] += 1
+            if wait > 0:
+                self.totals["queued"] += 1
+                self.totals["wait_s"] += wait
+                self.totals["max_wait_s"] = max(self.totals["max_wait_s"], wait)
+            return wait
+
+    def acquire(self, endpoint: str):
+        """Block until the next call to an endpoint may be sent."""
+        wait = self.reserve(endpoint)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, endpoint: str):
+        """Wait (without blocking the event loop) until the next call to an endpoint may be sent."""
+        wait = self.reserve(endpoint)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_success(self, endpoint: str, headers: Optional[Mapping] = None):
+        """Additive increase after a successful call; honor x-ratelimit-remaining-* headers."""
+        with self._lock:
+            state = self._state(endpoint)
+            state.consecutive_429 = 0
+            for bucket in (state.bucket, self._global):
+                bucket.rate = min(bucket.ceiling, bucket.rate + self.increase)
+            if not headers:
+                return
+            now = self.clock()
+            for kind in ("requests", "tokens"):
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if remaining is not None and remaining.strip() in ("0", "0.0"):
+                    reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    state.bucket.block(now + (reset if reset is not None else self.backoff_base))
+                    self.totals["header_blocks"] += 1
+
+    def on_rate_limited(self, endpoint: str, headers: Optional[Mapping] = None) -> float:
+        """Multiplicative decrease after HTTP 429 and block the endpoint; return the block in seconds.
+
+        The block is the response's Retry-After time, else a jittered
+        exponential backoff over the endpoint's consecutive 429s.
+        """
+        delay = retry_after(headers)
+        with self._lock:
+            now = self.clock()
+            state = self._state(endpoint)
+            state.consecutive_429 += 1
+            state.rate_limited += 1
+            self.totals["rate_limited"] += 1
+            for bucket in (state.bucket, self._global):
+                if now - bucket.decreased_at >= self.backoff_base:
+                    bucket.rate = max(self.min_rps, bucket.rate * self.decrease)
+                    bucket.tokens = min(bucket.tokens, bucket.burst)
+                    bucket.decreased_at = now
+            if delay is not None:
+                self.totals["retry_after"] += 1
+            else:
+                backoff = min(self.backoff_max, self.backoff_base * 2 ** (state.consecutive_429 - 1))
+                delay = backoff * random.uniform(0.5, 1.0)
+            if self.enabled:
+                state.bucket.block(now + delay)
+            return delay
+
+    def stats(self) -> Dict:
+        """Return current rates, blocks and queueing totals."""
+        with self._lock:
+            now = self.clock()
+            totals = dict(self.totals)
+            endpoints = {
+                endpoint: {
+                    "rate_rps": round(state.bucket.rate, 3),
+                    "blocked_for_s": round(state.bucket.blocked_for(now), 3),
+                    "rate_limited": state.rate_limited,
+                    "consecutive_429": state.consecutive_429,
+                }
+                for endpoint, state in self._endpoints.items()
+            }
+            global_rate = self._global.rate
+        calls = totals["calls"]
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "global_rate_rps": round(global_rate, 3),
+            **totals,
+            "wait_s": round(totals["wait_s"], 3),
+            "max_wait_s": round(totals["max_wait_s"], 3),
+            "avg_wait_ms": round(totals["wait_s"] / calls * 1000, 1) if calls else 0.0,
+            "endpoints": endpoints,
+        }
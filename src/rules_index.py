@@ -0,0 +1,221 @@
+"""
+Retrievable canvasxpress_rules.md chunks.
+
+The v2 prompt pastes the whole rules file (about 17 KB) into every request,
+although most of it (decoration, filter and sort rules, rules for other
+graph families) does not apply to a given description. RulesIndex splits
+the file by heading into chunks and, per request, keeps:
+
+1. the core chunks (task, key definitions, steps, output/graph type/axis
+   rules, ...), always
+2. graph-specific chunks ("Area Graph Specific Rules", ...) for the
+   predicted graph types
+3. chunks whose configuration keys (`filterData`, `sortData`, `colorScheme`,
+   ...) appear in the retrieved examples' configs
+4. the top-k remaining chunks most similar to the query
+
+Selected chunks are rendered in document order; a parent heading such as
+"## CRITICAL RULES" is kept whenever one of its sub-chunks is.
+"""
+
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from schema_index import estimate_tokens
+except ImportError:
+    from src.schema_index import estimate_tokens
+
+# Title prefixes of the chunks that are always included
+DEFAULT_CORE_CHUNKS = (
+    "CanvasXpress Configuration Rules",
+    "Core Task",
+    "Data Structure Overview",
+    "CanvasXpress Key Definitions",
+    "Steps to Generate",
+    "JSON Output Requirements",
+    "Graph Type Selection",
+    "Axis Configuration",
+    "Additional Parameters",
+    "Ambiguity Handling",
+)
+
+_HEADING = re.compile(r"^(#{1,3}) (.+?)\s*$")
+_GRAPH_SPECIFIC = re.compile(r"^(\w+) (?:Graph|Chart|Plot) Specific Rules", re.IGNORECASE)
+_CODE_KEY = re.compile(r"`(\w+)`")
+
+
+class RuleChunk:
+    """One heading of canvasxpress_rules.md with its body."""
+
+    __slots__ = ("title", "level", "parent", "text", "tokens", "graph_type", "keys", "core", "position")
+
+    def __init__(self, title: str, level: int, parent: Optional[int], text: str, position: int):
+        self.title = title
+        self.level = level
+        self.parent = parent
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        match = _GRAPH_SPECIFIC.match(title)
+        self.graph_type = match.group(1) if match else None
+        self.keys = set(_CODE_KEY.findall(text))
+        self.core = False
+        self.position = position
+
+
+class RulesIndex:
+    """canvasxpress_rules.md chunked by heading, with per-request chunk selection."""
+
+    # A key mentioned in more chunks than this does not select chunks
+    MAX_KEY_CHUNKS = 2
+
+    def __init__(
+        self,
+        rules_text: str,
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        core: Iterable[str] = DEFAULT_CORE_CHUNKS,
+        top_k: int = 2
+    ):
+        """
+        Args:
+            rules_text: Contents of canvasxpress_rules.md
+            embed: Document embedding function for the retrievable chunks
+            core: Title prefixes of chunks that are always included
+            top_k: Number of additional chunks retrieved by query similarity
+        """
+        self.full_text = rules_text
+        self.full_tokens = estimate_tokens(rules_text)
+        self.top_k = top_k
+        self.chunks = self._split(rules_text)
+        core = tuple(core)
+        for chunk in self.chunks:
+            chunk.core = chunk.title.startswith(core)
+
+        # Keys mentioned all over the rules (xAxis, graphType, ...) are too common to trigger a chunk
+        key_counts: Dict[str, int] = {}
+        for chunk in self.chunks:
+            for key in chunk.keys:
+                key_counts[key] = key_counts.get(key, 0) + 1
+        for chunk in self.chunks:
+            chunk.keys = {key for key in chunk.keys if key_counts[key] <= self.MAX_KEY_CHUNKS}
+
+        # Heading-only chunks (e.g. "## CRITICAL RULES") are only included as parents
+        self.retrievable = [c for c in self.chunks if not c.core and "\n" in c.text]
+        self.vectors: Optional[np.ndarray] = None
+        if embed is not None and self.retrievable:
+            vectors = np.asarray(embed([c.text for c in self.retrievable]), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.vectors = vectors / norms
+
+        self._lock = threading.Lock()
+        self.selections = 0
+        self.selected_tokens = 0
+
+    @staticmethod
+    def _split(rules_text: str) -> List[RuleChunk]:
+        """Split the rules into one chunk per heading (text before the first heading is dropped)."""
+        chunks: List[RuleChunk] = []
+        current: List[str] = []
+        title, level = None, 0
+        parents: Dict[int, int] = {}  # heading level -> index of the latest chunk at that level
+
+        def flush():
+            if title is None:
+                return
+            parent = max((parents[l] for l in parents if l < level), default=None)
+            chunks.append(RuleChunk(title, level, parent, "\n".join(current).strip(), len(chunks)))
+            parents[level] = len(chunks) - 1
+            for deeper in [l for l in parents if l > level]:
+                del parents[deeper]
+
+        for line in rules_text.splitlines():
+            match = _HEADING.match(line)
+            if match:
+                flush()
+                title, level, current = match.group(2), len(match.group(1)), [line]
+            else:
+                current.append(line)
+        flush()
+        return chunks
+
+    def select(
+        self,
+        query_vector: Optional[List[float]] = None,
+        graph_types: Iterable[str] = (),
+        config_keys: Iterable[str] = (),
+        top_k: Optional[int] = None
+    ) -> Tuple[str, Dict]:
+        """
+        Select the rule chunks relevant to a request.
+
+        Args:
+            query_vector: Query embedding (same model as the chunk embeddings)
+            graph_types: Predicted graph types (description + retrieved examples)
+            config_keys: Parameter names used by the retrieved examples
+            top_k: Chunks retrieved by similarity (default: the index setting)
+
+        Returns:
+            Tuple of (rules text, selection info)
+        """
+        graph_types = {t.lower() for t in graph_types}
+        config_keys = set(config_keys)
+        chosen = {c.position for c in self.chunks if c.core}
+        for chunk in self.retrievable:
+            if chunk.graph_type is not None:
+                if chunk.graph_type.lower() in graph_types:
+                    chosen.add(chunk.position)
+            elif chunk.keys & config_keys:
+                chosen.add(chunk.position)
+
+        k = self.top_k if top_k is None else top_k
+        if self.vectors is not None and query_vector is not None and k > 0:
+            query = np.asarray(query_vector, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            added = 0
+            for index in np.argsort(-(self.vectors @ query), kind="stable"):
+                chunk = self.retrievable[int(index)]
+                # Graph-specific chunks only apply to their own graph type
+                if chunk.position in chosen or chunk.graph_type is not None:
+                    continue
+                chosen.add(chunk.position)
+                added += 1
+                if added >= k:
+                    break
+
+        # Keep the parent headings of selected sub-chunks
+        for position in list(chosen):
+            parent = self.chunks[position].parent
+            while parent is not None:
+                chosen.add(parent)
+                parent = self.chunks[parent].parent
+
+        text = "\n\n".join(self.chunks[p].text for p in sorted(chosen))
+        tokens = estimate_tokens(text)
+        with self._lock:
+            self.selections += 1
+            self.selected_tokens += tokens
+        return text, {
+            "rules_tokens": tokens,
+            "rules_tokens_saved": self.full_tokens - tokens,
+            "rules_chunks": [
+                self.chunks[p].title for p in sorted(chosen)
+                if not self.chunks[p].core and "\n" in self.chunks[p].text
+            ],
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            average = self.selected_tokens / self.selections if self.selections else 0.0
+        return {
+            "chunks": len(self.chunks),
+            "core_chunks": sum(1 for c in self.chunks if c.core),
+            "top_k": self.top_k,
+            "full_rules_tokens": self.full_tokens,
+            "selections": self.selections,
+            "avg_selected_tokens": round(average, 1),
+            "avg_reduction": round(1 - average / self.full_tokens, 4) if self.selections else 0.0,
+        }
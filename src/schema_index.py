@@ -0,0 +1,278 @@
+"""
+Retrieval-driven schema pruning.
+
+schema.md lists every common CanvasXpress parameter, grouped into sections
+("## Graph Types Section", "## Axes Section", ...) and categories
+("### Bar Graphs", "### X-Axis", ...), one parameter per line. Sending all
+of it (about 32 KB) with every prompt dominates the input tokens.
+
+SchemaIndex parses schema.md once at startup, embeds each parameter's
+description and, per request, selects the lines worth sending, in this
+order of priority and within a token budget:
+
+1. The graph-type categories of the requested graph types (named in the
+   description or used by the retrieved examples)
+2. Parameters used in the retrieved examples' configs
+3. The remaining parameters most similar to the query
+
+The selected lines are rendered in their original schema order under their
+section/category headings, after the schema's key definitions preamble.
+"""
+
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Graph types (few-shot 'type' field / graphType) -> "Graph Types Section" categories
+GRAPH_TYPE_CATEGORIES = {
+    "Area": ["Area Graphs"],
+    "AreaLine": ["Area Graphs", "Line Graphs"],
+    "Bar": ["Bar Graphs"],
+    "BarLine": ["Bar Graphs", "Line Graphs"],
+    "Stacked": ["Bar Graphs"],
+    "StackedPercent": ["Bar Graphs"],
+    "StackedLine": ["Bar Graphs", "Line Graphs"],
+    "Binplot": ["Bin Plots"],
+    "Hexplot": ["Bin Plots"],
+    "Hexplot-Binplot": ["Bin Plots"],
+    "Boxplot": ["Boxplot Graphs"],
+    "Bullet": ["Bullet Graphs"],
+    "Circular": ["Circular Graphs"],
+    "Donut": ["Circular Graphs"],
+    "Pie": ["Circular Graphs"],
+    "Radar": ["Circular Graphs"],
+    "Sunburst": ["Circular Graphs"],
+    "Contour": ["Contours"],
+    "Density": ["Density Plots", "Histograms"],
+    "Ridgeline": ["Density Plots"],
+    "Dumbbell": ["Dumbbell Graphs"],
+    "Histogram": ["Histograms"],
+    "Line": ["Line Graphs"],
+    "DotLine": ["Line Graphs"],
+    "Map": ["Maps"],
+    "Quantile": ["Quantile Regression Plots"],
+    "Sankey": ["Sankey Diagrams"],
+    "Violin": ["Violin Plots", "Boxplot Graphs"],
+}
+
+_GRAPH_TYPE_NAMES = {name.lower(): name for name in GRAPH_TYPE_CATEGORIES}
+_GRAPH_TYPE_PATTERN = re.compile(
+    r"\b(" + "|".join(sorted(map(re.escape, GRAPH_TYPE_CATEGORIES), key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+_SECTION = re.compile(r"^## (.+ Section)\s*$")
+_CATEGORY = re.compile(r"^### (.+?)\s*$")
+_PARAMETER = re.compile(r'^-\s+\*\*(\w+)\*\*:\s*(?:Description:\s*"([^"]*)")?')
+
+
+def graph_types_in(text: str) -> List[str]:
+    """Graph type names mentioned in a description (e.g. 'bar chart' -> 'Bar')."""
+    found = []
+    for match in _GRAPH_TYPE_PATTERN.finditer(text):
+        name = _GRAPH_TYPE_NAMES[match.group(1).lower()]
+        if name not in found:
+            found.append(name)
+    return found
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English/JSON)."""
+    return (len(text) + 3) // 4
+
+
+class SchemaParameter:
+    """One parameter line of schema.md."""
+
+    __slots__ = ("name", "description", "section", "category", "line", "position")
+
+    def __init__(self, name: str, description: str, section: str, category: str, line: str, position: int):
+        self.name = name
+        self.description = description
+        self.section = section
+        self.category = category
+        self.line = line
+        self.position = position
+
+    @property
+    def embedding_text(self) -> str:
+        return f"{self.category} - {self.name}: {self.description}"
+
+
+class SchemaIndex:
+    """schema.md parsed into parameters, with per-request selection under a token budget."""
+
+    def __init__(
+        self,
+        schema_text: str,
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        token_budget: int = 2500
+    ):
+        """
+        Args:
+            schema_text: Contents of schema.md
+            embed: Document embedding function for the parameter descriptions
+                (without one, selection uses graph types and example keys only)
+            token_budget: Default maximum estimated tokens of the selected schema
+        """
+        self.full_text = schema_text
+        self.token_budget = token_budget
+        self.preamble, self.parameters = self._parse(schema_text)
+        self.by_name = {p.name: p for p in self.parameters}
+        self.by_category: Dict[str, List[SchemaParameter]] = {}
+        for parameter in self.parameters:
+            self.by_category.setdefault(parameter.category, []).append(parameter)
+
+        self.vectors: Optional[np.ndarray] = None
+        if embed is not None and self.parameters:
+            vectors = np.asarray(embed([p.embedding_text for p in self.parameters]), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.vectors = vectors / norms
+
+        self._lock = threading.Lock()
+        self.selections = 0
+        self.selected_tokens = 0
+        self.full_tokens = estimate_tokens(schema_text)
+
+    @staticmethod
+    def _parse(schema_text: str) -> Tuple[str, List[SchemaParameter]]:
+        """Split schema.md into the preamble (before the first section) and parameter lines."""
+        preamble_lines = []
+        parameters = []
+        section = category = None
+        for line in schema_text.splitlines():
+            section_match = _SECTION.match(line)
+            if section_match:
+                section, category = section_match.group(1), None
+                continue
+            if section is None:
+                preamble_lines.append(line)
+                continue
+            category_match = _CATEGORY.match(line)
+            if category_match:
+                category = category_match.group(1)
+                continue
+            parameter_match = _PARAMETER.match(line)
+            if parameter_match and category is not None:
+                parameters.append(SchemaParameter(
+                    name=parameter_match.group(1),
+                    description=parameter_match.group(2) or "",
+                    section=section,
+                    category=category,
+                    line=line,
+                    position=len(parameters)
+                ))
+        return "\n".join(preamble_lines).strip(), parameters
+
+    def categories_for(self, graph_type: str) -> List[str]:
+        """Schema categories specific to a graph type."""
+        categories = GRAPH_TYPE_CATEGORIES.get(graph_type)
+        if categories is not None:
+            return categories
+        # Unknown type: match on the category stem (e.g. 'Violin Plots' for 'ViolinX')
+        lowered = graph_type.lower()
+        return [
+            category for category in self.by_category
+            if self.by_category[category][0].section == "Graph Types Section"
+            and category.split()[0].lower().rstrip("s") in lowered
+        ]
+
+    def select(
+        self,
+        query_vector: Optional[List[float]] = None,
+        graph_types: Iterable[str] = (),
+        config_keys: Iterable[str] = (),
+        token_budget: Optional[int] = None
+    ) -> Tuple[str, Dict]:
+        """
+        Select the schema lines relevant to a request.
+
+        Args:
+            query_vector: Query embedding (same model as the parameter embeddings)
+            graph_types: Requested/retrieved graph types, most relevant first
+            config_keys: Parameter names used by the retrieved examples
+            token_budget: Maximum estimated tokens (default: the index budget)
+
+        Returns:
+            Tuple of (pruned schema text, selection info)
+        """
+        budget = token_budget or self.token_budget
+        used = estimate_tokens(self.preamble)
+        chosen = set()
+        headings = set()
+
+        def add(parameter: SchemaParameter) -> bool:
+            nonlocal used
+            if parameter.position in chosen:
+                return True
+            cost = estimate_tokens(parameter.line) + 1
+            for heading in (parameter.section, parameter.category):
+                if heading not in headings:
+                    cost += estimate_tokens(heading) + 2
+            if used + cost > budget:
+                return False
+            used += cost
+            chosen.add(parameter.position)
+            headings.update((parameter.section, parameter.category))
+            return True
+
+        type_categories = []
+        for graph_type in graph_types:
+            for category in self.categories_for(graph_type):
+                if category not in type_categories:
+                    type_categories.append(category)
+        for category in type_categories:
+            for parameter in self.by_category.get(category, []):
+                add(parameter)
+
+        for key in config_keys:
+            parameter = self.by_name.get(key)
+            if parameter is not None:
+                add(parameter)
+
+        if self.vectors is not None and query_vector is not None:
+            query = np.asarray(query_vector, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            for position in np.argsort(-(self.vectors @ query), kind="stable"):
+                add(self.parameters[int(position)])
+                if used >= budget:
+                    break
+
+        text = self.render(sorted(chosen))
+        with self._lock:
+            self.selections += 1
+            self.selected_tokens += used
+        return text, {
+            "schema_tokens": used,
+            "schema_parameters": len(chosen),
+            "schema_categories": type_categories,
+        }
+
+    def render(self, positions: List[int]) -> str:
+        """Render the preamble plus the given parameters under their headings, in schema order."""
+        lines = [self.preamble]
+        section = category = None
+        for position in positions:
+            parameter = self.parameters[position]
+            if parameter.section != section:
+                section, category = parameter.section, None
+                lines.append(f"\n## {section}")
+            if parameter.category != category:
+                category = parameter.category
+                lines.append(f"\n### {category}")
+            lines.append(parameter.line)
+        return "\n".join(lines) + "\n"
+
+    def stats(self) -> Dict:
+        with self._lock:
+            average = self.selected_tokens / self.selections if self.selections else 0.0
+        return {
+            "parameters": len(self.parameters),
+            "token_budget": self.token_budget,
+            "full_schema_tokens": self.full_tokens,
+            "selections": self.selections,
+            "avg_selected_tokens": round(average, 1),
+            "avg_reduction": round(1 - average / self.full_tokens, 4) if self.selections else 0.0,
+        }
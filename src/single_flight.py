@@ -0,0 +1,186 @@
+"""
+Single-flight coalescing of identical in-flight generation requests.
+
+When a dashboard loads, the same (description, headers, temperature) often
+arrives several times within a second. The response cache only helps once
+the first request has finished, so until then every copy paid for its own
+embedding, vector search and LLM call. SingleFlight lets the first request
+(the leader) run the computation; identical requests arriving while it is
+in flight attach to it and receive the same result or error.
+
+Only deterministic requests may share a computation: a caller that asked
+for sampling (temperature > 0) expects its own draw, so the generator
+passes key None for those, and they run alone like with the caches.
+
+Sync (do) and async (ado) callers share one table: a sync request can
+attach to an async computation and vice versa. Followers get their own
+copy of the result and of the leader's trace (marked "coalesced"), so
+callers may modify what they receive.
+
+An async leader whose caller is cancelled keeps computing for its
+followers, or is cancelled itself when no one else waits for it. Either
+way the cancelled caller only returns once the computation has stopped,
+so whatever the caller holds for it (an admission slot) covers the whole
+computation.
+"""
+
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _Flight:
+    """One in-flight computation and the snapshot of its trace."""
+
+    def __init__(self):
+        self.future: Future = Future()
+        self.future.set_running_or_notify_cancel()  # followers must not be able to cancel it
+        self.trace: Dict = {}
+        self.followers = 0
+
+
+class SingleFlight:
+    """Table of in-flight computations keyed by request."""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.totals = {
+            "calls": 0,
+            "executions": 0,  # computations actually run (leaders)
+            "coalesced": 0,  # calls that attached to an in-flight computation
+            "coalesced_errors": 0,  # of those, calls that received the leader's error
+            "max_followers": 0,
+            "bypassed": 0,  # calls without a key (not coalesced)
+        }
+
+    def _join(self, key: str) -> Tuple[_Flight, bool]:
+        """Return (flight, True) for a new leader or (in-flight computation, False) for a follower."""
+        with self._lock:
+            self.totals["calls"] += 1
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.totals["executions"] += 1
+                return flight, True
+            flight.followers += 1
+            self.totals["coalesced"] += 1
+            self.totals["max_followers"] = max(self.totals["max_followers"], flight.followers)
+            return flight, False
+
+    def _finish(self, key: str, flight: _Flight, trace: Dict, result: Any = None, error: BaseException = None):
+        """Publish the leader's outcome; later identical requests start a new computation."""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.trace = copy.deepcopy(trace)
+        if error is not None:
+            flight.future.set_exception(error)
+        else:
+            flight.future.set_result(copy.deepcopy(result))
+
+    def _follow(self, flight: _Flight, trace: Dict) -> Any:
+        """Hand the leader's outcome to a follower."""
+        trace.update(copy.deepcopy(flight.trace), coalesced=True)
+        error = flight.future.exception()
+        if error is not None:
+            with self._lock:
+                self.totals["coalesced_errors"] += 1
+            raise error
+        return copy.deepcopy(flight.future.result())
+
+    def _bypass(self):
+        with self._lock:
+            self.totals["calls"] += 1
+            self.totals["bypassed"] += 1
+
+    def do(self, key: Optional[str], fn: Callable[[Dict], Any], trace: Dict) -> Any:
+        """
+        Run fn(trace) unless an identical computation is in flight, then share its outcome.
+
+        Args:
+            key: Request key (identical requests have the same key); None runs
+                fn alone (requests that must not share a result)
+            fn: The computation; receives the trace dict to fill
+            trace: The caller's trace dict (a follower's receives a copy of the leader's)
+
+        Returns:
+            The computation's result
+        """
+        if key is None:
+            self._bypass()
+            return fn(trace)
+        flight, leader = self._join(key)
+        if leader:
+            try:
+                result = fn(trace)
+            except BaseException as e:
+                self._finish(key, flight, trace, error=e)
+                raise
+            self._finish(key, flight, trace, result)
+            return result
+        flight.future.exception()  # wait for the leader
+        return self._follow(flight, trace)
+
+    async def ado(self, key: Optional[str], fn: Callable[[Dict], Awaitable[Any]], trace: Dict) -> Any:
+        """Async variant of do(); fn(trace) returns an awaitable."""
+        if key is None:
+            self._bypass()
+            return await fn(trace)
+        flight, leader = self._join(key)
+        if leader:
+            task = asyncio.ensure_future(self._lead(key, flight, fn, trace))
+            # Retrieve the outcome even if the leader's caller is cancelled before it is ready
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if self._abandon(key, flight):
+                    task.cancel()
+                await self._outlast(task)
+                raise
+        if not flight.future.done():
+            # asyncio.wait neither raises the leader's error nor cancels the computation with a cancelled follower
+            waiter = asyncio.wrap_future(flight.future)
+            waiter.add_done_callback(lambda done: done.cancelled() or done.exception())
+            await asyncio.wait([waiter])
+        return self._follow(flight, trace)
+
+    def _abandon(self, key: str, flight: _Flight) -> bool:
+        """Retire a flight whose leader was cancelled; True if no follower waits for it (it can be cancelled)."""
+        with self._lock:
+            if flight.followers or self._flights.get(key) is not flight:
+                return False
+            del self._flights[key]  # later identical requests start a new computation
+            return True
+
+    @staticmethod
+    async def _outlast(task: asyncio.Future):
+        """Wait until task is done, even when cancelled again meanwhile."""
+        while not task.done():
+            try:
+                await asyncio.wait([task])
+            except asyncio.CancelledError:
+                pass
+
+    async def _lead(self, key: str, flight: _Flight, fn: Callable[[Dict], Awaitable[Any]], trace: Dict) -> Any:
+        try:
+            result = await fn(trace)
+        except BaseException as e:
+            self._finish(key, flight, trace, error=e)
+            raise
+        self._finish(key, flight, trace, result)
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            totals = dict(self.totals)
+            in_flight = len(self._flights)
+        calls = totals["calls"]
+        return {
+            **totals,
+            "in_flight": in_flight,
+            "coalesced_rate": round(totals["coalesced"] / calls, 4) if calls else 0.0,
+        }
@@ -0,0 +1,59 @@
+"""
+Token counting for prompt budgets.
+
+Uses tiktoken with the encoding of the configured OpenAI model when it is
+installed and its encoding files are available (downloaded on first use,
+or from TIKTOKEN_CACHE_DIR); otherwise, and for Gemini models, falls back
+to an estimate of about 4 characters per token.
+"""
+
+import threading
+from typing import Dict, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+class TokenCounter:
+    """Counts tokens for one model."""
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model
+        self._encoding = self._load_encoding(model)
+        self.name = f"tiktoken:{self._encoding.name}" if self._encoding is not None else "estimate:chars/4"
+
+    @staticmethod
+    def _load_encoding(model: Optional[str]):
+        if tiktoken is None or not model or model.startswith("gemini"):
+            return None
+        # BMS deployment names carry a suffix (gpt-4o-mini-global -> gpt-4o-mini)
+        base = model[:-len("-global")] if model.endswith("-global") else model
+        try:
+            try:
+                return tiktoken.encoding_for_model(base)
+            except KeyError:
+                return tiktoken.get_encoding("o200k_base" if base.startswith(("gpt-4o", "gpt-4.1", "o")) else "cl100k_base")
+        except Exception as e:
+            print(f"⚠️  tiktoken encoding unavailable for {model}, estimating tokens from length: {e}")
+            return None
+
+    def count(self, text: str) -> int:
+        """Number of tokens in text."""
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+
+_counters: Dict[Optional[str], TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model: Optional[str] = None) -> TokenCounter:
+    """Return the shared token counter for a model."""
+    with _counters_lock:
+        counter = _counters.get(model)
+        if counter is None:
+            counter = _counters[model] = TokenCounter(model)
+        return counter
@@ -0,0 +1,333 @@
+"""
+Retrieval backends for the few-shot example vectors.
+
+get_similar_examples talks to a VectorIndex, so the store behind it can be
+swapped via VECTOR_BACKEND:
+
+- milvus: Milvus Lite file (default, previous behavior)
+- numpy:  in-process exact search over a normalized float32 matrix held in
+          a memory-mapped .npy file plus a JSON metadata array. The corpus
+          is a few hundred vectors, so one matrix-vector product and
+          argpartition beat a round trip through Milvus Lite.
+
+Both backends return Milvus-shaped hits ({"id", "distance", "entity"}) and
+use cosine similarity as the distance. Each index keeps a JSON manifest next
+to its data (embedding model, dimension, per-row content hashes) so the
+generator can re-index incrementally when few_shot_examples.json changes:
+plan_sync compares the rows against the manifest, the caller embeds only the
+added or changed rows, and apply_sync writes them, deletes removed rows and
+saves the new manifest.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class VectorIndex:
+    """Interface of a few-shot example vector store."""
+
+    backend = "base"
+    manifest_path: Path
+
+    def exists(self) -> bool:
+        """True if the index has been created."""
+        raise NotImplementedError
+
+    def create(self, dimension: int):
+        """Create an empty index for vectors of the given dimension."""
+        raise NotImplementedError
+
+    def insert(self, rows: List[Dict]):
+        """Insert rows with an integer 'id', a 'vector' and scalar metadata fields."""
+        raise NotImplementedError
+
+    def upsert(self, rows: List[Dict]):
+        """Insert rows, replacing stored rows with the same 'id'."""
+        raise NotImplementedError
+
+    def delete(self, ids: List[int]):
+        """Delete the rows with the given ids."""
+        raise NotImplementedError
+
+    def drop(self):
+        """Delete the index and its manifest."""
+        raise NotImplementedError
+
+    def search(self, vectors: List, limit: int, output_fields: Optional[List[str]] = None) -> List[List[Dict]]:
+        """Return the top `limit` hits for each query vector, best first."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Number of stored vectors."""
+        raise NotImplementedError
+
+    def load_manifest(self) -> Optional[Dict]:
+        """The manifest written by the last (re-)index, or None."""
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_manifest(self, manifest: Dict):
+        """Write the manifest via temp file + rename."""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _remove_manifest(self):
+        if self.manifest_path.exists():
+            self.manifest_path.unlink()
+
+    def plan_sync(self, rows: Dict[int, Dict], model: Dict) -> Tuple[Optional[str], List[int], List[int]]:
+        """Compare the rows to index with the manifest.
+
+        Args:
+            rows: Rows without vectors keyed by stable row id, each with a
+                content 'hash'
+            model: Embedding provider, model and dimension; any change
+                forces a rebuild
+
+        Returns:
+            (rebuild_reason, changed, removed): rebuild_reason is None for an
+            incremental update; changed are the ids of the rows to embed (all
+            rows on a rebuild), removed the ids to delete
+        """
+        rebuild_reason = None
+        manifest = None
+        if not self.exists():
+            rebuild_reason = "creating"
+        else:
+            manifest = self.load_manifest()
+            if manifest is None:
+                rebuild_reason = "no manifest (index predates incremental re-indexing)"
+            elif any(manifest.get(key) != value for key, value in model.items()):
+                rebuild_reason = (
+                    f"embedding model changed ({manifest.get('embedding_model')}/{manifest.get('dimension')} -> "
+                    f"{model.get('embedding_model')}/{model.get('dimension')})"
+                )
+            elif self.count() != len(manifest.get("rows", {})):
+                rebuild_reason = "index out of sync with its manifest"
+        if rebuild_reason is not None:
+            return rebuild_reason, list(rows), []
+
+        stored = {int(row_id): row_hash for row_id, row_hash in manifest["rows"].items()}
+        changed = [row_id for row_id, row in rows.items() if stored.get(row_id) != row["hash"]]
+        removed = [row_id for row_id in stored if row_id not in rows]
+        return None, changed, removed
+
+    def apply_sync(self, rows: Dict[int, Dict], model: Dict, rebuild_reason: Optional[str],
+                   changed: List[int], removed: List[int], vectors: List):
+        """Write a plan_sync result: `vectors` are the embeddings of the `changed` rows, in order."""
+        if rebuild_reason is not None:
+            if self.exists():
+                self.drop()
+            self.create(model["dimension"])
+        data = [
+            {**{k: v for k, v in rows[row_id].items() if k != "hash"}, "vector": vector}
+            for row_id, vector in zip(changed, vectors)
+        ]
+        if rebuild_reason is not None:
+            if data:
+                self.insert(data)
+        else:
+            self.upsert(data)
+        self.delete(removed)
+        self.save_manifest({**model, "rows": {str(row_id): row["hash"] for row_id, row in rows.items()}})
+
+
+class MilvusIndex(VectorIndex):
+    """Milvus Lite collection."""
+
+    backend = "milvus"
+
+    def __init__(self, db_path: str, collection_name: str = "few_shot_examples"):
+        from pymilvus import MilvusClient
+
+        self.db_path = db_path
+        self.collection_name = collection_name
+        self.client = MilvusClient(db_path)
+        path = Path(db_path)
+        self.manifest_path = path.with_name(f"{path.stem}.{collection_name}.manifest.json")
+
+    def exists(self) -> bool:
+        return self.client.has_collection(self.collection_name)
+
+    def create(self, dimension: int):
+        self.client.create_collection(collection_name=self.collection_name, dimension=dimension)
+
+    def insert(self, rows: List[Dict]):
+        self.client.insert(collection_name=self.collection_name, data=rows)
+
+    def upsert(self, rows: List[Dict]):
+        if rows:
+            self.client.upsert(collection_name=self.collection_name, data=rows)
+
+    def delete(self, ids: List[int]):
+        if ids:
+            self.client.delete(collection_name=self.collection_name, ids=list(ids))
+
+    def drop(self):
+        if self.exists():
+            self.client.drop_collection(self.collection_name)
+        self._remove_manifest()
+
+    def search(self, vectors: List, limit: int, output_fields: Optional[List[str]] = None) -> List[List[Dict]]:
+        return self.client.search(
+            collection_name=self.collection_name,
+            data=[list(map(float, v)) if isinstance(v, np.ndarray) else v for v in vectors],
+            limit=limit,
+            output_fields=output_fields or []
+        )
+
+    def count(self) -> int:
+        return int(self.client.get_collection_stats(self.collection_name)["row_count"])
+
+
+class NumpyIndex(VectorIndex):
+    """Exact cosine search over an in-process, memory-mapped float32 matrix.
+
+    Files (in `index_dir`):
+        vectors.npy    - (n, dim) float32, L2-normalized rows
+        metadata.json  - {"dimension": dim, "rows": [{"id": ..., <fields>}, ...]}
+        manifest.json  - re-indexing manifest (see VectorIndex.load_manifest)
+    """
+
+    backend = "numpy"
+
+    def __init__(self, index_dir: str):
+        self.index_dir = Path(index_dir)
+        self.vectors_path = self.index_dir / "vectors.npy"
+        self.metadata_path = self.index_dir / "metadata.json"
+        self.manifest_path = self.index_dir / "manifest.json"
+        self._lock = threading.Lock()
+        # (vectors, rows, ids), replaced as one tuple so a lock-free search never mixes two versions
+        self._data: Tuple[Optional[np.ndarray], List[Dict], Optional[np.ndarray]] = (None, [], None)
+        self.dimension: Optional[int] = None
+        if self.exists():
+            self._load()
+
+    def exists(self) -> bool:
+        return self.vectors_path.exists() and self.metadata_path.exists()
+
+    def _load(self):
+        with open(self.metadata_path) as f:
+            metadata = json.load(f)
+        self.dimension = metadata["dimension"]
+        rows = metadata["rows"]
+        ids = np.asarray([row["id"] for row in rows], dtype=np.int64)
+        self._data = (np.load(self.vectors_path, mmap_mode="r"), rows, ids)
+
+    def _save(self, vectors: np.ndarray, rows: List[Dict]):
+        """Write both files via temp file + rename, then re-open the memory map."""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        tmp_vectors = self.index_dir / "vectors.tmp.npy"
+        tmp_metadata = self.index_dir / "metadata.tmp.json"
+        np.save(tmp_vectors, np.ascontiguousarray(vectors, dtype=np.float32))
+        with open(tmp_metadata, "w") as f:
+            json.dump({"dimension": self.dimension, "rows": rows}, f)
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_metadata, self.metadata_path)
+        self._load()
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def create(self, dimension: int):
+        with self._lock:
+            self.dimension = dimension
+            self._save(np.zeros((0, dimension), dtype=np.float32), [])
+
+    def insert(self, rows: List[Dict]):
+        if not rows:
+            return
+        new_vectors = self._normalize(np.asarray([row["vector"] for row in rows], dtype=np.float32))
+        new_rows = [{k: v for k, v in row.items() if k != "vector"} for row in rows]
+        with self._lock:
+            vectors, old_rows, _ = self._data
+            self._save(np.concatenate([np.asarray(vectors), new_vectors]), old_rows + new_rows)
+
+    def upsert(self, rows: List[Dict]):
+        if not rows:
+            return
+        with self._lock:
+            self._delete_locked({row["id"] for row in rows})
+        self.insert(rows)
+
+    def delete(self, ids: List[int]):
+        if not len(ids):
+            return
+        with self._lock:
+            self._delete_locked(set(ids))
+
+    def _delete_locked(self, ids: set):
+        vectors, rows, _ = self._data
+        if vectors is None:
+            return
+        keep = [i for i, row in enumerate(rows) if row["id"] not in ids]
+        if len(keep) < len(rows):
+            self._save(np.asarray(vectors)[keep], [rows[i] for i in keep])
+
+    def drop(self):
+        with self._lock:
+            for path in (self.vectors_path, self.metadata_path):
+                if path.exists():
+                    path.unlink()
+            self._remove_manifest()
+            self._data, self.dimension = (None, [], None), None
+
+    def search(self, vectors: List, limit: int, output_fields: Optional[List[str]] = None) -> List[List[Dict]]:
+        matrix, rows, ids = self._data  # one consistent version, even while _save re-indexes
+        queries = self._normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        if matrix is None or len(rows) == 0:
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ matrix.T  # (num_queries, n) cosine similarities
+        k = min(limit, scores.shape[1])
+        fields = output_fields or []
+        results = []
+        for query_scores in scores:
+            if k < len(query_scores):
+                top = np.argpartition(-query_scores, k - 1)[:k]
+            else:
+                top = np.arange(len(query_scores))
+            top = top[np.argsort(-query_scores[top], kind="stable")]
+            results.append([
+                {
+                    "id": int(ids[i]),
+                    "distance": float(query_scores[i]),
+                    "entity": {field: rows[i].get(field) for field in fields},
+                }
+                for i in top
+            ])
+        return results
+
+    def count(self) -> int:
+        return len(self._data[1])
+
+
+def create_vector_index(backend: str, vector_db_path: str, collection_name: str = "few_shot_examples") -> VectorIndex:
+    """Create the configured retrieval backend.
+
+    Args:
+        backend: 'milvus' or 'numpy'
+        vector_db_path: Milvus Lite file; the numpy index lives in a sibling
+            directory named after it (e.g. canvasxpress_mcp.db -> canvasxpress_mcp_numpy/)
+        collection_name: Milvus collection name
+    """
+    if backend == "milvus":
+        return MilvusIndex(vector_db_path, collection_name)
+    if backend == "numpy":
+        path = Path(vector_db_path)
+        return NumpyIndex(str(path.with_name(f"{path.stem}_numpy")))
+    raise ValueError(f"Unknown vector backend: {backend}. Use 'milvus' or 'numpy'.")
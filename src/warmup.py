@@ -0,0 +1,112 @@
+"""
+Background warm-up of the CanvasXpress generator.
+
+Building CanvasXpressGenerator loads the embedding model, opens (and
+possibly re-indexes) the vector database and fetches the BMS endpoint
+manifest, which can take minutes. GeneratorWarmup runs that construction
+in a background thread so the MCP server can bind its port immediately,
+and exposes a readiness report (status, per-phase durations, error) for
+the health tool and HTTP route. Requests arriving before the generator is
+ready get an explicit "warming up" answer instead of a connection failure.
+"""
+
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Optional
+
+
+def phase_report(phase: Dict) -> Dict:
+    """Public view of an initialization phase: internal '_' keys dropped, elapsed time while running."""
+    # The warm-up thread only updates values of a phase dict (never its keys), so iterating is safe
+    report = {key: value for key, value in phase.items() if not key.startswith("_")}
+    start = phase.get("_start")
+    if report.get("status") == "running" and start is not None:
+        report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return report
+
+
+class GeneratorWarmup:
+    """Constructs the generator in a background thread and reports its progress."""
+
+    def __init__(self, factory: Callable[[List[Dict]], object]):
+        """
+        Args:
+            factory: Builds the generator; receives the list the generator
+                appends its initialization phases to
+        """
+        self.factory = factory
+        self.phases: List[Dict] = []
+        self.status = "pending"  # pending -> warming_up -> ready | failed
+        self.error: Optional[str] = None
+        self.generator = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start building the generator in a daemon thread (no-op if already started)."""
+        if self._thread is not None:
+            return
+        self.status = "warming_up"
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="cx-warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.generator = self.factory(self.phases)
+            self.status = "ready"
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            for phase in self.phases:
+                if phase.get("status") == "running":
+                    phase["status"] = "failed"
+            self.status = "failed"
+            print(f"❌ Generator initialization failed: {self.error}", file=sys.stderr)
+            traceback.print_exc()
+        finally:
+            self.finished_at = time.time()
+            self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until initialization finished (ready or failed); True if ready."""
+        self._ready.wait(timeout)
+        return self.ready
+
+    def current_phase(self) -> Optional[str]:
+        """Name of the phase in progress, if any."""
+        for phase in reversed(self.phases):
+            if phase.get("status") == "running":
+                return phase["phase"]
+        return None
+
+    def not_ready_message(self) -> str:
+        """Explanation returned to requests that arrive before the generator is ready."""
+        if self.status == "failed":
+            return f"Generator initialization failed: {self.error}. Check the server logs and restart the server."
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        phase = self.current_phase()
+        phase_text = f" (phase: {phase})" if phase else ""
+        return (
+            f"Server is warming up{phase_text}, {elapsed:.0f}s since start. "
+            "Retry in a few seconds; call get_server_health for progress."
+        )
+
+    def report(self) -> Dict:
+        """Readiness report: status, per-phase durations and total initialization time."""
+        end = self.finished_at or time.time()
+        return {
+            "status": self.status,
+            "ready": self.ready,
+            "current_phase": self.current_phase(),
+            "elapsed_s": round(end - self.started_at, 3) if self.started_at else 0.0,
+            "phases": [phase_report(phase) for phase in list(self.phases)],
+            "error": self.error,
+        }
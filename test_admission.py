@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Admission Control Test Suite
+
+Checks src/admission.py, the concurrency limit and fair queue in front of
+the generation tools in HTTP mode. Requests are real asyncio tasks holding
+slots concurrently; no model, server or API key is needed.
+
+- slot accounting: never more than max_concurrent slots in use, weighted
+  (batch) requests, no overtaking of a large request by smaller ones
+- slots are held until the work stops: a cancelled caller of run_blocking()
+  or of a shielded SingleFlight leader keeps its slot until the
+  computation has finished
+- fairness: round-robin across client keys, FIFO within one; callers with
+  no identifier share the "anonymous" bucket
+- rejections: queue full, per-client queue full, queue timeout, and a
+  request cancelled while queued
+
+Runs with pytest or standalone:
+    python test_admission.py
+    python -m pytest test_admission.py -q
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from admission import ANONYMOUS, AdmissionController, AdmissionRejected, fair_queue_key, run_blocking
+from single_flight import SingleFlight
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+
+async def settle():
+    """Let every ready task run until it blocks."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def queue_in_order(admission: AdmissionController, clients, order):
+    """Start one queued request per client (in this order); each records its client when admitted."""
+    async def request(client, label):
+        async with admission.admit(client):
+            order.append(label)
+            await asyncio.sleep(0.01)
+
+    tasks = []
+    for label, client in clients:
+        tasks.append(asyncio.ensure_future(request(client, label)))
+        await settle()  # queue position follows creation order
+    return tasks
+
+
+# ----------------------------------------------------------------------
+# Slot accounting
+# ----------------------------------------------------------------------
+
+def test_concurrency_never_exceeds_limit():
+    async def main():
+        admission = AdmissionController(max_concurrent=3, max_queue=100, queue_timeout=5)
+        running, peak = 0, 0
+
+        async def request(i):
+            nonlocal running, peak
+            async with admission.admit(f"client{i % 4}"):
+                running += 1
+                peak = max(peak, running)
+                assert admission.active <= 3
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(request(i) for i in range(20)))
+        stats = admission.stats()
+        assert peak == 3 and stats["max_active"] == 3
+        assert stats["active"] == 0 and stats["queue_depth"] == 0
+        assert stats["admitted"] == 20 and stats["admitted_after_wait"] == 17
+        assert stats["queue_wait_ms"]["max"] > 0
+
+    run(main())
+
+
+def test_weighted_requests_do_not_get_overtaken():
+    async def main():
+        admission = AdmissionController(max_concurrent=4, max_queue=10, queue_timeout=5)
+        order = []
+        release = asyncio.Event()
+
+        async def request(client, weight, label):
+            async with admission.admit(client, weight):
+                order.append(label)
+                await release.wait()
+
+        holder = asyncio.ensure_future(request("a", 2, "holder"))
+        await settle()
+        batch = asyncio.ensure_future(request("b", 3, "batch"))  # needs 3 of the 2 free slots
+        await settle()
+        small = asyncio.ensure_future(request("c", 1, "small"))  # would fit, but waits its turn
+        await settle()
+        assert order == ["holder"] and admission.active == 2 and admission.queued == 2
+        release.set()
+        await asyncio.gather(holder, batch, small)
+        assert order == ["holder", "batch", "small"]
+        # Weights above the limit are clamped instead of waiting forever
+        async with admission.admit("d", 99):
+            assert admission.active == 4
+        assert admission.active == 0
+
+    run(main())
+
+
+def test_slot_held_until_blocking_work_finishes():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5)
+        started, finished = threading.Event(), []
+
+        def blocking():
+            started.set()
+            time.sleep(0.2)
+            finished.append(time.perf_counter())
+
+        async def request():
+            async with admission.admit("a"):
+                await run_blocking(blocking)
+
+        async def next_request():
+            async with admission.admit("b"):
+                return time.perf_counter()
+
+        caller = asyncio.ensure_future(request())
+        while not started.is_set():
+            await asyncio.sleep(0.005)
+        waiting = asyncio.ensure_future(next_request())
+        await settle()
+        caller.cancel()
+        try:
+            await caller
+        except asyncio.CancelledError:
+            pass
+        # The cancelled caller returns only once the thread is done, holding its slot until then
+        assert finished, "cancelled caller returned while its thread was still running"
+        admitted_at = await waiting
+        assert admitted_at >= finished[0]
+        assert admission.active == 0
+
+    run(main())
+
+
+def test_slot_held_until_shielded_leader_finishes():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5)
+        flights = SingleFlight()
+        events = []
+
+        async def compute(trace):
+            events.append("start")
+            try:
+                await asyncio.sleep(0.2)
+            except asyncio.CancelledError:
+                events.append("cancelled")
+                raise
+            events.append("end")
+            return {"graphType": "Bar"}
+
+        async def leader():
+            async with admission.admit("a"):
+                return await flights.ado("key", compute, {})
+
+        async def next_request():
+            async with admission.admit("b"):
+                events.append("admitted")
+
+        # With a follower waiting, the leader's computation goes on; its slot is held until it ends
+        caller = asyncio.ensure_future(leader())
+        await settle()
+        follower = asyncio.ensure_future(flights.ado("key", compute, {}))
+        waiting = asyncio.ensure_future(next_request())
+        await settle()
+        caller.cancel()
+        await asyncio.sleep(0.05)
+        assert admission.active == 1 and events == ["start"]
+        assert await follower == {"graphType": "Bar"}
+        await waiting
+        try:
+            await caller
+        except asyncio.CancelledError:
+            pass
+        assert events == ["start", "end", "admitted"]
+
+        # Alone, the leader's computation is cancelled and the slot freed once it has stopped
+        events.clear()
+        caller = asyncio.ensure_future(leader())
+        await settle()
+        caller.cancel()
+        try:
+            await caller
+        except asyncio.CancelledError:
+            pass
+        assert events == ["start", "cancelled"] and admission.active == 0
+        assert flights.stats()["in_flight"] == 0
+
+    run(main())
+
+
+# ----------------------------------------------------------------------
+# Fairness
+# ----------------------------------------------------------------------
+
+def test_round_robin_across_clients():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5)
+        order = []
+        gate = asyncio.Event()
+
+        async def hold():
+            async with admission.admit("holder"):
+                await gate.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await settle()
+        tasks = await queue_in_order(
+            admission,
+            [("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b"), ("c1", "c"), ("b2", "b")],
+            order
+        )
+        assert admission.stats()["clients_waiting"] == 3
+        gate.set()
+        await asyncio.gather(holder, *tasks)
+        # One busy client cannot starve the others; FIFO within a client
+        assert order == ["a1", "b1", "c1", "a2", "b2", "a3"]
+
+    run(main())
+
+
+def test_anonymous_bucket():
+    assert fair_queue_key("client-1", "session-1", "addr:10.0.0.1") == "client-1"
+    assert fair_queue_key(None, "session-1", "addr:10.0.0.1") == "session-1"
+    assert fair_queue_key("", None, "addr:10.0.0.1") == "addr:10.0.0.1"
+    assert fair_queue_key(None, "") == ANONYMOUS == "anonymous"
+    assert fair_queue_key() == ANONYMOUS
+
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=5)
+        order = []
+        gate = asyncio.Event()
+
+        async def hold():
+            async with admission.admit("holder"):
+                await gate.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await settle()
+        # Unidentified callers share one bucket: FIFO among themselves, one turn per round
+        tasks = await queue_in_order(
+            admission,
+            [("anon1", fair_queue_key(None)), ("anon2", fair_queue_key(None, "")), ("x1", fair_queue_key("x"))],
+            order
+        )
+        assert admission.stats()["clients_waiting"] == 2
+        gate.set()
+        await asyncio.gather(holder, *tasks)
+        assert order == ["anon1", "x1", "anon2"]
+
+    run(main())
+
+
+# ----------------------------------------------------------------------
+# Rejections
+# ----------------------------------------------------------------------
+
+def test_queue_full_is_rejected_at_once():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=5)
+        gate = asyncio.Event()
+
+        async def request(client):
+            async with admission.admit(client):
+                await gate.wait()
+
+        tasks = [asyncio.ensure_future(request(c)) for c in ("a", "b", "c")]
+        await settle()
+        assert admission.active == 1 and admission.queued == 2
+        start = time.perf_counter()
+        try:
+            await admission.acquire("d")
+            raise AssertionError("request admitted with a full queue")
+        except AdmissionRejected as e:
+            assert e.reason == "queue_full" and e.retry_after >= 1.0
+            assert "1 generation slots busy and 2 requests queued" in str(e)
+        assert time.perf_counter() - start < 0.05
+        gate.set()
+        await asyncio.gather(*tasks)
+        stats = admission.stats()
+        assert stats["rejected_queue_full"] == 1 and stats["admitted"] == 3 and stats["active"] == 0
+
+    run(main())
+
+
+def test_client_queue_limit():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=10, max_queue_per_client=1, queue_timeout=5)
+        gate = asyncio.Event()
+
+        async def request(client):
+            async with admission.admit(client):
+                await gate.wait()
+
+        tasks = [asyncio.ensure_future(request(c)) for c in ("a", "a", "b")]
+        await settle()
+        try:
+            await admission.acquire("a")
+            raise AssertionError("second queued request of one client admitted")
+        except AdmissionRejected as e:
+            assert e.reason == "client_queue_full"
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert admission.stats()["rejected_client_queue_full"] == 1
+
+    run(main())
+
+
+def test_queue_timeout():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=0.05)
+        gate = asyncio.Event()
+
+        async def hold():
+            async with admission.admit("a"):
+                await gate.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await settle()
+        try:
+            await admission.acquire("b")
+            raise AssertionError("request admitted past its queue timeout")
+        except AdmissionRejected as e:
+            assert e.reason == "queue_timeout"
+        assert admission.queued == 0 and admission.active == 1
+        gate.set()
+        await holder
+        assert admission.stats()["rejected_queue_timeout"] == 1
+
+    run(main())
+
+
+def test_cancelled_in_queue_frees_its_place():
+    async def main():
+        admission = AdmissionController(max_concurrent=2, max_queue=10, queue_timeout=5)
+        order = []
+        gate = asyncio.Event()
+
+        async def request(client, weight, label):
+            async with admission.admit(client, weight):
+                order.append(label)
+                await gate.wait()
+
+        holder = asyncio.ensure_future(request("a", 1, "holder"))
+        await settle()
+        big = asyncio.ensure_future(request("b", 2, "big"))  # blocks the small request behind it
+        await settle()
+        small = asyncio.ensure_future(request("c", 1, "small"))
+        await settle()
+        assert admission.queued == 2
+        big.cancel()
+        await settle()
+        # The small request gets the free slot as soon as the big one leaves the queue
+        assert order == ["holder", "small"] and admission.queued == 0 and admission.active == 2
+        gate.set()
+        await asyncio.gather(holder, small)
+        assert big.cancelled() and admission.active == 0
+        assert admission.stats()["cancelled_in_queue"] == 1
+
+    run(main())
+
+
+def test_disabled_admits_everything():
+    async def main():
+        admission = AdmissionController(enabled=False, max_concurrent=1, max_queue=0)
+        async with admission.admit("a"):
+            async with admission.admit("b"):
+                assert admission.active == 2 and admission.queued == 0
+
+    run(main())
+
+
+def main():
+    """Run all tests and print a report."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 ADMISSION CONTROL TESTS")
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Caching Test Suite
+
+Checks src/caching.py: the LRU cache and SQLite tier underneath, the
+exact-match response cache, the semantic cache and the query-embedding
+cache. Vectors are built by hand and SQLite files live in temporary
+directories, so no model or API key is needed. TTLs are a fraction of a
+second and the tests sleep past them.
+
+- LRUCache / SQLiteCacheTier: LRU eviction order, TTL expiry, persistence
+- ResponseCache: key normalisation (whitespace, headers), every key part
+  matters, fresh copies, the persistent tier across instances, TTL
+- SemanticCache: the similarity threshold, headers must match, the same
+  query replaces its entry instead of adding a duplicate, TTL, LRU eviction
+- EmbeddingCache: keys per provider/model/prefix, LRU eviction, float32
+  read-only vectors, the persistent tier
+
+Runs with pytest or standalone:
+    python test_caching.py
+    python -m pytest test_caching.py -q
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from caching import EmbeddingCache, LRUCache, ResponseCache, SemanticCache, SQLiteCacheTier
+
+TTL = 0.2
+DIM = 4
+HEADERS = "Region, Sales"
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+def expire():
+    time.sleep(TTL * 1.5)
+
+
+def at_similarity(similarity: float) -> np.ndarray:
+    """A unit vector with the given cosine similarity to [1, 0, 0, 0]."""
+    return np.array([similarity, np.sqrt(1 - similarity ** 2), 0.0, 0.0], dtype=np.float32)
+
+
+BASE = at_similarity(1.0)
+
+
+def response_key(description="Bar chart of sales", headers=HEADERS, temperature=0.0,
+                 prompt_version="v2", llm_model="gpt-4o-global", data_hash="abc"):
+    return ResponseCache.make_key(description, headers, temperature, prompt_version, llm_model, data_hash)
+
+
+# ----------------------------------------------------------------------
+# LRUCache and SQLiteCacheTier
+# ----------------------------------------------------------------------
+
+def test_lru_eviction_order():
+    cache = LRUCache(max_size=3)
+    for key in "abc":
+        cache.put(key, key.upper())
+    assert cache.get("a") == "A"  # a is now the most recently used
+    cache.put("d", "D")
+    assert cache.get("b") is None and [cache.get(key) for key in "acd"] == ["A", "C", "D"]
+    cache.put("c", "C2")  # refreshing an entry does not evict
+    assert len(cache) == 3 and cache.get("c") == "C2"
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["hits"] == 5 and stats["misses"] == 1
+
+
+def test_lru_ttl():
+    cache = LRUCache(max_size=10, ttl=TTL)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    expire()
+    assert cache.get("a", "gone") == "gone"
+    assert cache.stats()["expirations"] == 1 and len(cache) == 0
+    assert LRUCache(ttl=0).ttl is None
+
+
+def test_sqlite_tier_ttl_and_persistence():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "nested", "cache.db")
+        tier = SQLiteCacheTier(path, table="responses", ttl=TTL)
+        tier.put("a", b"one")
+        tier.put("a", b"two")
+        assert SQLiteCacheTier(path, table="responses").get("a") == b"two"
+        assert SQLiteCacheTier(path, table="other").get("a") is None
+        expire()
+        tier.put("b", b"fresh")
+        assert tier.purge_expired() == 1 and len(tier) == 1
+        assert tier.get("b") == b"fresh"
+
+
+# ----------------------------------------------------------------------
+# ResponseCache
+# ----------------------------------------------------------------------
+
+def test_response_key_normalisation():
+    key = response_key()
+    # Whitespace in the description and around headers does not matter
+    assert response_key("  Bar   chart of\nsales ") == key
+    assert response_key(headers=" Region ,Sales ") == key
+    assert response_key(temperature=0) == key
+    # Case does (titles and column names are case-sensitive), and so does every other part
+    assert response_key("bar chart of sales") != key
+    assert response_key(headers="region, sales") != key
+    for changed in (dict(temperature=0.7), dict(prompt_version="v1"), dict(llm_model="gpt-4o-mini"),
+                    dict(data_hash="def"), dict(headers=None)):
+        assert response_key(**changed) != key, changed
+    assert response_key(headers=None) == response_key(headers="")
+
+
+def test_response_cache_returns_fresh_copies():
+    cache = ResponseCache(max_size=10)
+    key = response_key()
+    assert cache.get(key) is None
+    cache.put(key, {"graphType": "Bar", "xAxis": ["Sales"]})
+    first = cache.get(key)
+    first["xAxis"].append("Profit")
+    assert cache.get(key) == {"graphType": "Bar", "xAxis": ["Sales"]}
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["disk"] is None
+
+
+def test_response_cache_lru_eviction():
+    cache = ResponseCache(max_size=2)
+    keys = [response_key(f"chart {i}") for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, {"n": i})
+    assert cache.get(keys[0]) is None and cache.get(keys[2]) == {"n": 2}
+    assert cache.stats()["memory"]["evictions"] == 1
+
+
+def test_response_cache_persistent_tier_and_ttl():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "response_cache.db")
+        key = response_key()
+        ResponseCache(path=path, ttl=TTL).put(key, {"graphType": "Bar"})
+        # A restarted server finds the config on disk and promotes it to memory
+        restarted = ResponseCache(path=path, ttl=TTL)
+        assert restarted.get(key) == {"graphType": "Bar"}
+        assert restarted.stats()["memory"]["size"] == 1 and restarted.stats()["disk"]["hits"] == 1
+        expire()
+        assert restarted.get(key) is None
+        assert ResponseCache(path=path, ttl=TTL).get(key) is None
+
+
+# ----------------------------------------------------------------------
+# SemanticCache
+# ----------------------------------------------------------------------
+
+def test_semantic_threshold():
+    cache = SemanticCache(dimension=DIM, threshold=0.95)
+    cache.add(BASE, HEADERS, {"graphType": "Bar"}, "Bar chart of sales by region")
+    config, similarity = cache.lookup(at_similarity(0.96), HEADERS)
+    assert config == {"graphType": "Bar"} and abs(similarity - 0.96) < 1e-5
+    config, similarity = cache.lookup(at_similarity(0.94), HEADERS)
+    assert config is None and abs(similarity - 0.94) < 1e-5
+    # Vectors are normalised: a scaled query is the same query
+    assert cache.lookup(BASE * 3, HEADERS)[0] == {"graphType": "Bar"}
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1
+    assert stats["similarity"]["histogram"]["0.90-0.95"] == 1
+
+
+def test_semantic_headers_must_match():
+    cache = SemanticCache(dimension=DIM)
+    cache.add(BASE, HEADERS, {"graphType": "Bar"})
+    assert cache.lookup(BASE, " Region ,Sales")[0] == {"graphType": "Bar"}
+    config, similarity = cache.lookup(BASE, "Region, Profit")
+    assert config is None and similarity == 0.0
+
+
+def test_semantic_add_replaces_duplicates():
+    cache = SemanticCache(dimension=DIM, threshold=0.95)
+    cache.add(BASE, HEADERS, {"graphType": "Bar"}, "Bar chart of sales")
+    # A near-identical vector under another wording: replaced
+    cache.add(at_similarity(0.99999), HEADERS, {"graphType": "Line"}, "Bar chart showing sales")
+    assert cache.stats()["size"] == 1 and cache.lookup(BASE, HEADERS)[0] == {"graphType": "Line"}
+    # The same description (whitespace aside): replaced as well, even if its vector differs slightly
+    cache.add(at_similarity(0.97), HEADERS, {"graphType": "Area"}, " Bar chart  showing sales")
+    assert cache.stats()["size"] == 1 and cache.stats()["duplicates"] == 2
+    assert cache.lookup(at_similarity(0.97), HEADERS)[0] == {"graphType": "Area"}
+
+    # A paraphrase above the hit threshold but not near-identical, or other headers, gets its own entry
+    cache = SemanticCache(dimension=DIM, threshold=0.95)
+    cache.add(BASE, HEADERS, {"graphType": "Bar"}, "Bar chart of sales")
+    cache.add(at_similarity(0.96), HEADERS, {"graphType": "Bar"}, "Sales per region as bars")
+    cache.add(BASE, "Region, Profit", {"graphType": "Pie"}, "Bar chart of sales")
+    assert cache.stats()["size"] == 3 and cache.stats()["duplicates"] == 0
+
+
+def test_semantic_ttl():
+    cache = SemanticCache(dimension=DIM, max_size=2, ttl=TTL)
+    cache.add(BASE, HEADERS, {"graphType": "Bar"}, "Bar chart of sales")
+    assert cache.lookup(BASE, HEADERS)[0] == {"graphType": "Bar"}
+    expire()
+    assert cache.lookup(BASE, HEADERS) == (None, 0.0)
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["size"] == 0 and stats["ttl"] == TTL
+    # Expired slots are reused before anything is evicted
+    cache.add(BASE, HEADERS, {"graphType": "Line"}, "Line chart of sales")
+    cache.add(at_similarity(0.5), HEADERS, {"graphType": "Pie"}, "Pie chart of sales")
+    assert cache.stats()["evictions"] == 0 and cache.stats()["size"] == 2
+    assert SemanticCache(dimension=DIM, ttl=0).ttl is None
+
+
+def test_semantic_lru_eviction():
+    cache = SemanticCache(dimension=DIM, threshold=0.99, max_size=2)
+    cache.add(at_similarity(1.0), HEADERS, {"n": 1}, "one")
+    time.sleep(0.01)
+    cache.add(at_similarity(0.5), HEADERS, {"n": 2}, "two")
+    time.sleep(0.01)
+    assert cache.lookup(at_similarity(1.0), HEADERS)[0] == {"n": 1}  # "one" is now the most recent
+    time.sleep(0.01)
+    cache.add(at_similarity(0.0), HEADERS, {"n": 3}, "three")
+    assert cache.lookup(at_similarity(0.5), HEADERS)[0] is None
+    assert cache.lookup(at_similarity(1.0), HEADERS)[0] == {"n": 1}
+    assert cache.stats()["evictions"] == 1 and cache.stats()["size"] == 2
+
+
+# ----------------------------------------------------------------------
+# EmbeddingCache
+# ----------------------------------------------------------------------
+
+def test_embedding_cache_keys():
+    key = EmbeddingCache.make_key("onnx", "nomic-embed-text-v1.5", "search_query: ", "bar chart")
+    assert key == EmbeddingCache.make_key("onnx", "nomic-embed-text-v1.5", "search_query: ", "bar chart")
+    others = [
+        EmbeddingCache.make_key("openai", "nomic-embed-text-v1.5", "search_query: ", "bar chart"),
+        EmbeddingCache.make_key("onnx", "bge-m3", "search_query: ", "bar chart"),
+        EmbeddingCache.make_key("onnx", "nomic-embed-text-v1.5", "", "bar chart"),
+        EmbeddingCache.make_key("onnx", "nomic-embed-text-v1.5", "search_query: ", "Bar chart"),
+    ]
+    assert key not in others and len(set(others)) == 4
+
+
+def test_embedding_cache_lru_and_read_only_vectors():
+    cache = EmbeddingCache(max_size=2)
+    stored = cache.put("a", [0.5, 0.25])
+    assert stored.dtype == np.float32 and not stored.flags.writeable
+    cache.put("b", [1.0, 0.0])
+    assert cache.get("a") is stored
+    cache.put("c", [0.0, 1.0])
+    assert cache.get("b") is None and cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["calls_saved"] == 2 and stats["calls_made"] == 1 and stats["memory"]["evictions"] == 1
+
+
+def test_embedding_cache_persistent_tier():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "query_embeddings.db")
+        EmbeddingCache(path=path).put("q", [0.1, 0.2, 0.3])
+        restarted = EmbeddingCache(max_size=1, path=path)
+        vector = restarted.get("q")
+        assert vector.dtype == np.float32 and np.allclose(vector, [0.1, 0.2, 0.3])
+        assert restarted.stats()["disk"]["hits"] == 1
+        assert restarted.get("q") is vector  # promoted to memory
+
+
+def main():
+    """Run all tests and print a report."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 CACHING TESTS")
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Config Repair Test Suite
+
+Checks src/config_repair.py, the budgeted repair round trip for LLM outputs
+that are not valid JSON or still have validation errors. A stub provider
+returns scripted repair answers (or raises), so no model or API key is
+needed.
+
+- prompt planning: errors, schema lines of the keys involved, headers
+- budget: max_attempts, max_prompt_tokens, never as costly as regenerating
+  the request, schema lines dropped largest first before giving up
+- outcomes: rescued, not rescued, a repair call that raises (the request
+  keeps its best output), statistics
+
+Runs with pytest or standalone:
+    python test_config_repair.py
+    python -m pytest test_config_repair.py -q
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from config_repair import ConfigRepairer
+from config_validator import ValidationResult
+from json_extractor import extract_json
+
+BROKEN_JSON = '{"graphType": "Bar", "xAxis": ["Sales"],}'
+MISSING_GRAPH_TYPE = '{"xAxis": ["Sales"]}'
+VALID = '{"graphType": "Bar", "xAxis": ["Sales"]}'
+
+SCHEMA = {
+    "graphType": "graphType: string. Type of graph (Bar, Line, Scatter2D, ...)",
+    "xAxis": "xAxis: array. Columns on the x axis, " + "long description " * 20,
+}
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+def count_tokens(text: str) -> int:
+    return len(text.split())
+
+
+def schema_lines(keys):
+    return [SCHEMA[key] for key in dict.fromkeys(keys) if key in SCHEMA]
+
+
+def parse(output: str):
+    """Stand-in for CanvasXpressGenerator._parse_output: graphType is the only rule."""
+    try:
+        config = json.loads(extract_json(output))
+    except json.JSONDecodeError as e:
+        return None, None, e
+    violations = []
+    if "graphType" not in config:
+        violations.append({
+            "code": "missing_graph_type", "key": "graphType", "severity": "error",
+            "message": "graphType is required", "repaired": False
+        })
+    result = ValidationResult(config, violations, 0.0)
+    return config, result, (None if result.valid else result)
+
+
+class StubProvider:
+    """Returns scripted repair answers in order; an exception in the script is raised."""
+
+    def __init__(self, *answers, usage=None):
+        self.answers = list(answers)
+        self.usage = usage or {}
+        self.prompts = []
+
+    def generate(self, prompt, usage):
+        self.prompts.append(prompt)
+        usage.update(self.usage)
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    async def agenerate(self, prompt, usage):
+        await asyncio.sleep(0)
+        return self.generate(prompt, usage)
+
+
+def run_repair(repairer, output, provider, headers="Region, Sales", regeneration_tokens=10_000):
+    return repairer.repair(output, parse(output), parse, provider.generate, headers, regeneration_tokens)
+
+
+# ----------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------
+
+def test_invalid_json_is_rescued():
+    repairer = ConfigRepairer(count_tokens, schema_lines)
+    provider = StubProvider(VALID)
+    (config, result, problem), info = run_repair(repairer, BROKEN_JSON, provider)
+    assert problem is None and config == json.loads(VALID)
+    assert info["problem"] == "json" and info["attempts"] == 1 and info["rescued"]
+    prompt = provider.prompts[0]
+    assert "Invalid JSON" in prompt and BROKEN_JSON in prompt and "Region, Sales" in prompt
+    # Schema lines of the keys found in the broken output
+    assert SCHEMA["graphType"] in prompt and SCHEMA["xAxis"] in prompt
+    stats = repairer.stats()
+    assert stats["failed_outputs"] == 1 and stats["attempts"] == 1 and stats["rescued"] == 1
+    assert stats["rescue_rate"] == 1.0 and stats["regeneration_tokens"] == 10_000
+    assert stats["tokens_saved"] == 10_000 - info["repair_tokens"]
+
+
+def test_validation_errors_are_described():
+    repairer = ConfigRepairer(count_tokens, schema_lines)
+    provider = StubProvider(VALID)
+    _, info = run_repair(repairer, MISSING_GRAPH_TYPE, provider)
+    assert info["problem"] == "validation" and info["rescued"]
+    prompt = provider.prompts[0]
+    assert "- graphType: graphType is required" in prompt
+    # Only the keys with errors bring their schema lines
+    assert SCHEMA["graphType"] in prompt and SCHEMA["xAxis"] not in prompt
+
+
+def test_provider_usage_counts_tokens():
+    repairer = ConfigRepairer(count_tokens)
+    provider = StubProvider(VALID, usage={"prompt_tokens": 120, "completion_tokens": 30})
+    _, info = run_repair(repairer, BROKEN_JSON, provider)
+    assert info["repair_tokens"] == 150
+    assert repairer.stats()["repair_tokens"] == 150
+
+
+def test_max_attempts():
+    repairer = ConfigRepairer(count_tokens, max_attempts=2)
+    provider = StubProvider("still {broken", "no json here", VALID)
+    (config, _, problem), info = run_repair(repairer, BROKEN_JSON, provider)
+    assert len(provider.prompts) == 2 and info["attempts"] == 2
+    assert config is None and isinstance(problem, json.JSONDecodeError)
+    # The second prompt repairs the first repair's output
+    assert "still {broken" in provider.prompts[1]
+    stats = repairer.stats()
+    assert stats["attempts"] == 2 and stats["not_rescued"] == 1 and stats["rescued"] == 0
+
+
+def test_prompt_never_costs_a_regeneration():
+    repairer = ConfigRepairer(count_tokens)
+    provider = StubProvider(VALID)
+    (_, _, problem), info = run_repair(repairer, BROKEN_JSON, provider, regeneration_tokens=20)
+    assert not provider.prompts and problem is not None
+    assert "exceeds the budget (19 tokens)" in info["skipped"] and info["attempts"] == 0
+    stats = repairer.stats()
+    assert stats["skipped"] == 1 and stats["attempts"] == 0 and stats["not_rescued"] == 0
+
+
+def test_schema_lines_dropped_largest_first():
+    base = ConfigRepairer(count_tokens)
+    without_schema, _ = base.plan(BROKEN_JSON, parse(BROKEN_JSON)[2], "Region, Sales", None, 10_000)
+    # Room for the short graphType line, not for the long xAxis one
+    repairer = ConfigRepairer(count_tokens, schema_lines, max_prompt_tokens=count_tokens(without_schema) + 20)
+    prompt, info = repairer.plan(BROKEN_JSON, parse(BROKEN_JSON)[2], "Region, Sales", None, 10_000)
+    assert prompt is not None and info["attempts"] == 1
+    assert SCHEMA["graphType"] in prompt and SCHEMA["xAxis"] not in prompt
+    assert count_tokens(prompt) <= repairer.max_prompt_tokens
+
+
+def test_max_schema_lines():
+    repairer = ConfigRepairer(count_tokens, schema_lines, max_schema_lines=1)
+    prompt, _ = repairer.plan(BROKEN_JSON, parse(BROKEN_JSON)[2], None, None, 10_000)
+    assert SCHEMA["graphType"] in prompt and SCHEMA["xAxis"] not in prompt
+    assert "Column headers" not in prompt
+
+
+def test_provider_error_keeps_best_output():
+    repairer = ConfigRepairer(count_tokens, max_attempts=2)
+    provider = StubProvider(TimeoutError("repair call timed out"))
+    (config, result, problem), info = run_repair(repairer, MISSING_GRAPH_TYPE, provider)
+    # The parsed config with its validation errors is kept, not lost with the exception
+    assert config == json.loads(MISSING_GRAPH_TYPE) and problem is result and not result.valid
+    assert info["attempts"] == 1 and not info["rescued"]
+    assert info["error"] == "TimeoutError: repair call timed out"
+    assert info["repair_tokens"] == count_tokens(provider.prompts[0])
+    stats = repairer.stats()
+    assert stats["attempts"] == 1 and stats["errors"] == 1 and stats["not_rescued"] == 1
+
+
+def test_worse_repair_keeps_parsed_config():
+    repairer = ConfigRepairer(count_tokens, max_attempts=2)
+    provider = StubProvider("Sorry, I cannot help with that.", RuntimeError("rate limited"))
+    (config, _, problem), info = run_repair(repairer, MISSING_GRAPH_TYPE, provider)
+    assert config == json.loads(MISSING_GRAPH_TYPE) and problem is not None
+    assert info["attempts"] == 2 and info["error"] == "RuntimeError: rate limited"
+
+
+def test_async_repair():
+    repairer = ConfigRepairer(count_tokens, max_attempts=2)
+    provider = StubProvider(ConnectionError("provider unavailable"))
+    output = MISSING_GRAPH_TYPE
+    (config, _, problem), info = asyncio.run(
+        repairer.arepair(output, parse(output), parse, provider.agenerate, None, 10_000)
+    )
+    assert config == json.loads(output) and problem is not None and "ConnectionError" in info["error"]
+
+    provider = StubProvider(VALID)
+    (config, _, problem), info = asyncio.run(
+        repairer.arepair(output, parse(output), parse, provider.agenerate, None, 10_000)
+    )
+    assert problem is None and info["rescued"]
+    stats = repairer.stats()
+    assert stats["rescued"] == 1 and stats["not_rescued"] == 1 and stats["rescue_rate"] == 0.5
+
+
+def test_usable_output_sends_no_repair():
+    repairer = ConfigRepairer(count_tokens)
+    provider = StubProvider()
+    (config, _, problem), info = run_repair(repairer, VALID, provider)
+    assert problem is None and info is None and not provider.prompts
+    assert repairer.stats()["failed_outputs"] == 0
+
+
+def main():
+    """Run all tests and print a report."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 CONFIG REPAIR TESTS")
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
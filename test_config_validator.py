@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Config Validator Test Suite
+
+Checks src/config_validator.py against the shipped data/schema.md and
+data/canvasxpress_rules.md, the same tables the generator compiles at
+startup. Pure Python: no model or API key is needed.
+
+- graphType: missing is an unrepaired error (never guessed), wrong case is
+  corrected, unknown names and non-strings are errors
+- columns: names differing from a header only in case, blanks, '_' or '-'
+  are corrected; names matching no header are warnings that keep the
+  config valid; no column checks without headers
+- per graph type: required parameters with their rule defaults, no sortData
+  on unsorted graph types, yAxis moved on single-dimensional graphs,
+  Contour needs a yAxis
+- types: booleans, numbers and arrays repaired; repair=False only reports
+
+Runs with pytest or standalone:
+    python test_config_validator.py
+    python -m pytest test_config_validator.py -q
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from config_validator import ConfigValidator, parse_headers
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+def _read(name: str) -> str:
+    with open(os.path.join(ROOT, "data", name), encoding="utf-8") as f:
+        return f.read()
+
+
+VALIDATOR = ConfigValidator(_read("schema.md"), _read("canvasxpress_rules.md"))
+HEADERS = "Region, Sales, Profit"
+
+
+def codes(result, severity=None):
+    """(code, key, repaired) of the violations, optionally of one severity."""
+    return [(v["code"], v["key"], v["repaired"]) for v in result.violations
+            if severity is None or v["severity"] == severity]
+
+
+# ----------------------------------------------------------------------
+# graphType
+# ----------------------------------------------------------------------
+
+def test_missing_graph_type_is_an_error_not_a_guess():
+    config = {"xAxis": ["Sales"]}
+    result = VALIDATOR.validate(config, HEADERS)
+    assert not result.valid and "graphType" not in result.config
+    assert codes(result) == [("missing_graph_type", "graphType", False)]
+    assert result.errors[0]["severity"] == "error"
+
+
+def test_graph_type_case_is_corrected():
+    result = VALIDATOR.validate({"graphType": "scatter2d", "xAxis": ["Sales"], "yAxis": ["Profit"]}, HEADERS)
+    assert result.valid and result.config["graphType"] == "Scatter2D"
+    assert codes(result) == [("invalid_option", "graphType", True)]
+
+
+def test_unknown_graph_type_is_an_error():
+    result = VALIDATOR.validate({"graphType": "Barchart", "xAxis": ["Sales"]})
+    assert not result.valid and codes(result) == [("invalid_graph_type", "graphType", False)]
+    assert "Bar" in result.errors[0]["message"]
+    result = VALIDATOR.validate({"graphType": 7})
+    assert not result.valid and codes(result) == [("invalid_type", "graphType", False)]
+
+
+def test_not_an_object():
+    result = VALIDATOR.validate(["graphType", "Bar"])
+    assert not result.valid and codes(result) == [("not_an_object", None, False)]
+
+
+# ----------------------------------------------------------------------
+# Columns
+# ----------------------------------------------------------------------
+
+def test_column_names_are_normalised_to_headers():
+    config = {"graphType": "Bar", "xAxis": ["sales", "PROFIT"], "groupingFactors": ["re gion"]}
+    result = VALIDATOR.validate(config, HEADERS)
+    assert result.valid
+    assert result.config["xAxis"] == ["Sales", "Profit"] and result.config["groupingFactors"] == ["Region"]
+    assert codes(result) == [("column_name", "xAxis", True)] * 2 + [("column_name", "groupingFactors", True)]
+    # The input config is left untouched
+    assert config["xAxis"] == ["sales", "PROFIT"]
+
+
+def test_unknown_column_is_a_warning():
+    config = {"graphType": "Bar", "xAxis": ["Sales"], "colorBy": "Regoin"}
+    result = VALIDATOR.validate(config, HEADERS)
+    # A misspelled header neither fails validation (so caching stays on) nor is guessed
+    assert result.valid and result.config["colorBy"] == "Regoin"
+    assert codes(result, "warning") == [("unknown_column", "colorBy", False)]
+    assert result.summary()["warnings"] == 1 and result.summary()["errors"] == 0
+
+
+def test_columns_in_filter_and_sort_data():
+    config = {
+        "graphType": "Bar", "xAxis": ["Sales"],
+        "filterData": [["guess", "region", "like", "North"]],
+        "sortData": [["cat", "smp", "Margin"], ["cat", "smp", "samples"]],
+    }
+    result = VALIDATOR.validate(config, HEADERS)
+    assert result.valid and result.config["filterData"][0][1] == "Region"
+    assert ("unknown_column", "sortData", False) in codes(result, "warning")
+    # "samples" is a sortData keyword, not a column
+    assert sum(1 for v in result.violations if v["code"] == "unknown_column") == 1
+
+
+def test_no_column_checks_without_headers():
+    result = VALIDATOR.validate({"graphType": "Bar", "xAxis": ["anything"]})
+    assert result.valid and not result.violations
+
+
+def test_ambiguous_normalised_header_is_not_corrected():
+    result = VALIDATOR.validate({"graphType": "Bar", "xAxis": ["salesq1"]}, "Sales Q1, Sales_Q1")
+    assert result.config["xAxis"] == ["salesq1"]
+    assert codes(result) == [("unknown_column", "xAxis", False)]
+
+
+def test_parse_headers():
+    assert parse_headers("Region, Sales,\tProfit") == ["Region", "Sales", "Profit"]
+    assert parse_headers('["Region", "Sales, net"]') == ["Region", "Sales, net"]
+    assert parse_headers("") == [] and parse_headers(None) == []
+
+
+# ----------------------------------------------------------------------
+# Per graph type
+# ----------------------------------------------------------------------
+
+def test_required_parameters_per_graph_type():
+    assert VALIDATOR.required["Histogram"] == [("histogramType", "stacked")]
+    for graph_type, key, default in (
+        ("Area", "areaType", "overlapping"), ("Density", "densityPosition", "normal"),
+        ("Dumbbell", "dumbbellType", "stacked"), ("Histogram", "histogramType", "stacked"),
+    ):
+        result = VALIDATOR.validate({"graphType": graph_type, "xAxis": ["Sales"]}, HEADERS)
+        assert result.valid and result.config[key] == default, graph_type
+        assert codes(result, "warning") == [("missing_required", key, True)]
+        # An explicit value is kept
+        result = VALIDATOR.validate({"graphType": graph_type, "xAxis": ["Sales"], key: "stacked"}, HEADERS)
+        assert result.config[key] == "stacked" and not result.violations
+    # Other graph types require nothing extra
+    assert not VALIDATOR.validate({"graphType": "Bar", "xAxis": ["Sales"]}, HEADERS).violations
+
+
+def test_sort_data_removed_on_unsorted_graph_types():
+    config = {"graphType": "Scatter2D", "xAxis": ["Sales"], "yAxis": ["Profit"],
+              "sortData": [["cat", "smp", "Region"]]}
+    result = VALIDATOR.validate(config, HEADERS)
+    assert result.valid and "sortData" not in result.config
+    assert codes(result) == [("sort_not_allowed", "sortData", True)]
+    config["graphType"] = "Bar"
+    assert "sortData" in VALIDATOR.validate(config, HEADERS).config
+
+
+def test_y_axis_on_single_dimensional_graphs():
+    result = VALIDATOR.validate({"graphType": "Bar", "yAxis": ["Sales"], "yAxisTitle": "Sales"}, HEADERS)
+    assert result.valid and result.config == {"graphType": "Bar", "xAxis": ["Sales"], "smpTitle": "Sales"}
+    result = VALIDATOR.validate({"graphType": "Bar", "xAxis": ["Region"], "yAxis": ["Sales"]}, HEADERS)
+    assert not result.valid and codes(result) == [("y_axis_not_allowed", "yAxis", False)]
+    # Combined graph types take the second axis as xAxis2
+    result = VALIDATOR.validate({"graphType": "BarLine", "xAxis": ["Sales"], "yAxis": ["Profit"]}, HEADERS)
+    assert result.valid and result.config["xAxis2"] == ["Profit"]
+
+
+def test_multi_dimensional_graphs_need_y_axis():
+    result = VALIDATOR.validate({"graphType": "Scatter2D", "xAxis": ["Sales"]}, HEADERS)
+    assert result.valid and codes(result, "warning") == [("missing_y_axis", "yAxis", False)]
+    result = VALIDATOR.validate({"graphType": "Contour", "xAxis": ["Sales"]}, HEADERS)
+    assert not result.valid and codes(result, "error") == [("missing_y_axis", "yAxis", False)]
+
+
+# ----------------------------------------------------------------------
+# Types and repair mode
+# ----------------------------------------------------------------------
+
+def test_type_repairs():
+    config = {"graphType": "Bar", "xAxis": "Sales", "showLegend": "true", "colorBy": ["Region"]}
+    result = VALIDATOR.validate(config, HEADERS)
+    assert result.valid and result.repairs == 3
+    assert result.config == {"graphType": "Bar", "xAxis": ["Sales"], "showLegend": True, "colorBy": "Region"}
+
+
+def test_report_only_mode():
+    config = {"graphType": "bar", "xAxis": "sales"}
+    result = VALIDATOR.validate(config, HEADERS, repair=False)
+    assert result.config == config and result.repairs == 0
+    assert not result.valid and codes(result) == [("invalid_option", "graphType", False), ("invalid_type", "xAxis", False)]
+
+
+def test_stats():
+    validator = ConfigValidator(_read("schema.md"), _read("canvasxpress_rules.md"))
+    validator.validate({"graphType": "Bar", "xAxis": ["Sales"]}, HEADERS)
+    validator.validate({"graphType": "bar", "xAxis": ["Sales"]}, HEADERS)
+    validator.validate({"xAxis": ["Sales"]}, HEADERS)
+    stats = validator.stats()
+    assert stats["validated"] == 3 and stats["valid"] == 2 and stats["repaired"] == 1 and stats["invalid"] == 1
+    assert stats["violations"] == {"invalid_option": 1, "missing_graph_type": 1}
+
+
+def main():
+    """Run all tests and print a report."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 CONFIG VALIDATOR TESTS")
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Embedding Store Test Suite
+
+Checks src/embedding_store.py, the persistent content-addressed store every
+document embedding goes through. A counting fake model stands in for the
+embedding provider and each test uses a temporary store directory.
+
+- round trip: vectors come back as stored (float32), across instances;
+  only texts never embedded before reach the model, duplicates once
+- keying: the same text under another provider, model or mode is a miss
+- sharing: entries appended by another instance are found on the next
+  miss; a torn last index line is ignored and terminated
+- concurrency: put_many from several threads and store instances, and from
+  several processes (the file lock), never loses or corrupts an entry
+
+Runs with pytest or standalone:
+    python test_embedding_store.py
+    python -m pytest test_embedding_store.py -q
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from embedding_store import EmbeddingStore
+
+DIM = 8
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+class FakeModel:
+    """Deterministic embeddings (the text's characters); records every text it embeds."""
+
+    def __init__(self, offset: float = 0.0):
+        self.offset = offset
+        self.embedded = []
+
+    def vector(self, text: str):
+        return [(ord(text[i % len(text)]) + i) / 100 + self.offset for i in range(DIM)]
+
+    def __call__(self, texts):
+        self.embedded.extend(texts)
+        return [self.vector(text) for text in texts]
+
+
+def embed(store, texts, model, provider="openai", model_name="text-embedding-3-small", mode="document"):
+    return store.embed(texts, provider, model_name, mode, model)
+
+
+def keys_and_vectors(prefix: str, count: int):
+    keys = [EmbeddingStore.make_key("openai", "m", "document", f"{prefix} {i}") for i in range(count)]
+    vectors = [np.arange(DIM, dtype=np.float32) * (i + 1) + len(prefix) for i in range(count)]
+    return keys, vectors
+
+
+# ----------------------------------------------------------------------
+# Round trip and keying
+# ----------------------------------------------------------------------
+
+def test_round_trip():
+    model = FakeModel()
+    texts = ["Bar chart of sales", "Scatter plot of height", "Pie chart of share"]
+    with tempfile.TemporaryDirectory() as directory:
+        store = EmbeddingStore(directory)
+        first = embed(store, texts, model)
+        assert model.embedded == texts
+        # Stored as float32: fresh and stored vectors are identical
+        assert first == [np.asarray(model.vector(t), dtype=np.float32).tolist() for t in texts]
+        assert embed(store, texts, model) == first and len(model.embedded) == 3
+
+        reopened = EmbeddingStore(directory)
+        assert embed(reopened, list(reversed(texts)), model) == list(reversed(first))
+        assert len(model.embedded) == 3
+        stats = reopened.stats()
+        assert stats["entries"] == 3 and stats["hits"] == 3 and stats["misses"] == 0
+        assert stats["size_bytes"] == 3 * DIM * 4
+
+
+def test_only_new_texts_are_embedded():
+    model = FakeModel()
+    with tempfile.TemporaryDirectory() as directory:
+        store = EmbeddingStore(directory)
+        embed(store, ["a", "b"], model)
+        vectors = embed(store, ["b", "c", "c", "a", "d"], model)
+        # Only the new texts, and a duplicate once
+        assert model.embedded == ["a", "b", "c", "d"]
+        assert vectors[1] == vectors[2] and len(vectors) == 5
+        assert store.stats()["entries"] == 4
+        assert embed(store, [], model) == []
+
+
+def test_keyed_by_provider_model_and_mode():
+    text = "Bar chart of sales"
+    with tempfile.TemporaryDirectory() as directory:
+        store = EmbeddingStore(directory)
+        small, large, gemini, query = FakeModel(0.0), FakeModel(1.0), FakeModel(2.0), FakeModel(3.0)
+        vectors = [
+            embed(store, [text], small)[0],
+            embed(store, [text], large, model_name="text-embedding-3-large")[0],
+            embed(store, [text], gemini, provider="gemini")[0],
+            embed(store, [text], query, mode="query")[0],
+        ]
+        assert [len(m.embedded) for m in (small, large, gemini, query)] == [1, 1, 1, 1]
+        assert len({tuple(v) for v in vectors}) == 4
+        # Each key returns its own vector
+        assert embed(store, [text], FakeModel(), model_name="text-embedding-3-large")[0] == vectors[1]
+        keys = {
+            EmbeddingStore.make_key("openai", "m", "document", text),
+            EmbeddingStore.make_key("openai", "m", "document", text + " "),
+            EmbeddingStore.make_key("openai", "m2", "document", text),
+        }
+        assert len(keys) == 3
+
+
+# ----------------------------------------------------------------------
+# Sharing and concurrency
+# ----------------------------------------------------------------------
+
+def test_entries_of_another_instance_are_found():
+    with tempfile.TemporaryDirectory() as directory:
+        server, script = EmbeddingStore(directory), EmbeddingStore(directory)
+        keys, vectors = keys_and_vectors("init", 3)
+        assert server.get_many(keys) == [None] * 3
+        script.put_many(keys, vectors)
+        found = server.get_many(keys)
+        assert all(np.array_equal(a, b) for a, b in zip(found, vectors))
+
+
+def test_torn_index_line_is_ignored():
+    with tempfile.TemporaryDirectory() as directory:
+        store = EmbeddingStore(directory)
+        keys, vectors = keys_and_vectors("torn", 2)
+        store.put_many(keys[:1], vectors[:1])
+        with open(store.index_path, "ab") as f:
+            f.write(b"openai|m|document|deadbeef\t99")  # interrupted write
+        reopened = EmbeddingStore(directory)
+        assert reopened.stats()["entries"] == 1
+        reopened.put_many(keys[1:], vectors[1:])
+        assert all(np.array_equal(a, b) for a, b in zip(EmbeddingStore(directory).get_many(keys), vectors))
+        assert EmbeddingStore(directory).stats()["entries"] == 2
+
+
+def test_concurrent_put_many():
+    threads_per_store, stores, batches, batch = 4, 3, 10, 5
+    with tempfile.TemporaryDirectory() as directory:
+        # Several instances on one directory (like the server and an init script) and several threads each
+        instances = [EmbeddingStore(directory) for _ in range(stores)]
+        errors = []
+        written = {}
+
+        def writer(store, name):
+            try:
+                for b in range(batches):
+                    keys, vectors = keys_and_vectors(f"{name}-{b}", batch)
+                    store.put_many(keys, vectors)
+                    written.update(zip(keys, vectors))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=writer, args=(store, f"s{s}t{t}"))
+            for s, store in enumerate(instances) for t in range(threads_per_store)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, errors[0]
+
+        total = stores * threads_per_store * batches * batch
+        fresh = EmbeddingStore(directory)
+        assert fresh.stats()["entries"] == total and fresh.stats()["size_bytes"] == total * DIM * 4
+        keys = list(written)
+        for store in (fresh, *instances):
+            found = store.get_many(keys)
+            assert all(v is not None and np.array_equal(v, written[k]) for k, v in zip(keys, found))
+
+
+def _append_batches(directory: str, name: str, batches: int, batch: int):
+    store = EmbeddingStore(directory)
+    for b in range(batches):
+        store.put_many(*keys_and_vectors(f"{name}-{b}", batch))
+
+
+def test_concurrent_processes():
+    processes, batches, batch = 4, 200, 5
+    with tempfile.TemporaryDirectory() as directory:
+        workers = [
+            multiprocessing.Process(target=_append_batches, args=(directory, f"p{p}", batches, batch))
+            for p in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert all(worker.exitcode == 0 for worker in workers)
+
+        store = EmbeddingStore(directory)
+        assert store.stats()["entries"] == processes * batches * batch
+        for p in range(processes):
+            for b in range(batches):
+                keys, vectors = keys_and_vectors(f"p{p}-{b}", batch)
+                # Without the lock two processes can append at the same offset and index the wrong vector
+                assert all(np.array_equal(v, expected) for v, expected in zip(store.get_many(keys), vectors))
+
+
+def main():
+    """Run all tests and print a report."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 EMBEDDING STORE TESTS")
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Endpoint Balancer Test Suite
+
+Checks src/endpoint_balancer.py, the latency- and error-aware endpoint
+selection with per-endpoint circuit breakers. A seeded RNG and a fake
+clock make every choice and cooldown deterministic; no endpoint is called.
+
+- selection: power-of-two-choices never picks the worse of a pair and
+  never the worst endpoint; endpoints without samples are explored first;
+  errors weigh on the score; least_latency and random strategies; excluded
+  endpoints are avoided, but used when nothing else is left
+- circuit breaker: opens after failure_threshold consecutive failures,
+  stays out of rotation for the cooldown, then lets one half-open probe
+  through; the probe's success closes the circuit, its failure reopens it
+  for another cooldown; a stale probe is replaced after a cooldown
+
+Runs with pytest or standalone:
+    python test_endpoint_balancer.py
+    python -m pytest test_endpoint_balancer.py -q
+"""
+
+import os
+import random
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from endpoint_balancer import EndpointBalancer, EndpointState
+
+ENDPOINTS = ["https://a", "https://b", "https://c"]
+A, B, C = ENDPOINTS
+COOLDOWN = 30.0
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def make_balancer(clock: FakeClock = None, strategy: str = "p2c", seed: int = 42) -> EndpointBalancer:
+    return EndpointBalancer(
+        name="llm", strategy=strategy, failure_threshold=3, cooldown=COOLDOWN, ewma_alpha=0.5,
+        clock=clock or FakeClock(), rng=random.Random(seed)
+    )
+
+
+def choices(balancer: EndpointBalancer, count: int = 300, exclude=None) -> Counter:
+    return Counter(balancer.choose(ENDPOINTS, exclude) for _ in range(count))
+
+
+def circuit(balancer: EndpointBalancer, endpoint: str) -> str:
+    return balancer.stats()["endpoints"][endpoint]["circuit"]
+
+
+def open_circuit(balancer: EndpointBalancer, endpoint: str):
+    for _ in range(balancer.failure_threshold):
+        balancer.record_failure(endpoint)
+
+
+# ----------------------------------------------------------------------
+# Selection
+# ----------------------------------------------------------------------
+
+def test_p2c_prefers_lower_latency():
+    balancer = make_balancer()
+    for endpoint, latency in ((A, 0.1), (B, 0.5), (C, 2.0)):
+        balancer.record_success(endpoint, latency)
+    counts = choices(balancer)
+    # The slowest endpoint loses every pair; the fastest wins both pairs it is drawn in
+    assert counts[C] == 0
+    assert counts[A] > counts[B] > 0
+    assert abs(counts[A] / 300 - 2 / 3) < 0.1
+
+
+def test_p2c_is_reproducible_with_a_seed():
+    runs = []
+    for _ in range(2):
+        balancer = make_balancer(seed=7)
+        for endpoint, latency in ((A, 0.1), (B, 0.5), (C, 2.0)):
+            balancer.record_success(endpoint, latency)
+        runs.append([balancer.choose(ENDPOINTS) for _ in range(50)])
+    assert runs[0] == runs[1]
+
+
+def test_unsampled_endpoints_are_explored():
+    balancer = make_balancer()
+    balancer.record_success(A, 0.1)
+    balancer.record_success(B, 0.1)
+    # C has no latency yet and scores 0: it wins every pair it is drawn in
+    assert choices(balancer)[C] > 150
+
+
+def test_errors_weigh_on_the_score():
+    balancer = make_balancer()
+    balancer.record_success(A, 0.1)
+    balancer.record_success(B, 0.3)
+    balancer.record_failure(A, rate_limited=True)
+    # 0.1s with an error rate of 0.5 scores 0.6: B is now preferred over A
+    counts = Counter(balancer.choose([A, B]) for _ in range(50))
+    assert counts == {B: 50}
+    stats = balancer.stats()["endpoints"][A]
+    assert stats["errors"] == 1 and stats["rate_limited"] == 1 and stats["ewma_error_rate"] == 0.5
+    # Successes decay the error rate again
+    for _ in range(5):
+        balancer.record_success(A, 0.1)
+    assert Counter(balancer.choose([A, B]) for _ in range(50)) == {A: 50}
+
+
+def test_least_latency_and_random_strategies():
+    balancer = make_balancer(strategy="least_latency")
+    for endpoint, latency in ((A, 0.5), (B, 0.1), (C, 2.0)):
+        balancer.record_success(endpoint, latency)
+    assert choices(balancer, 50) == {B: 50}
+
+    balancer = make_balancer(strategy="random")
+    balancer.record_success(A, 10.0)
+    counts = choices(balancer)
+    assert set(counts) == {A, B, C} and min(counts.values()) > 60
+
+    try:
+        EndpointBalancer(strategy="fastest")
+        raise AssertionError("unknown strategy accepted")
+    except ValueError as e:
+        assert "fastest" in str(e)
+
+
+def test_exclude_falls_back_when_nothing_else_is_left():
+    balancer = make_balancer()
+    assert B not in choices(balancer, 50, exclude={B})
+    assert choices(balancer, 20, exclude={A, B}) == {C: 20}
+    # Everything excluded: rather an excluded endpoint than no answer
+    assert sum(choices(balancer, 20, exclude=set(ENDPOINTS)).values()) == 20
+    try:
+        balancer.choose([])
+        raise AssertionError("empty endpoint list accepted")
+    except ValueError:
+        pass
+
+
+def test_record_latency_only_raises_the_ewma():
+    balancer = make_balancer()
+    balancer.record_success(A, 1.0)
+    balancer.record_latency(A, 3.0)
+    stats = balancer.stats()["endpoints"][A]
+    assert stats["ewma_latency_ms"] == 2000.0 and stats["requests"] == 1
+    # A lower bound below the EWMA says nothing new
+    balancer.record_latency(A, 0.1)
+    assert balancer.stats()["endpoints"][A]["ewma_latency_ms"] == 2000.0
+
+
+# ----------------------------------------------------------------------
+# Circuit breaker
+# ----------------------------------------------------------------------
+
+def test_circuit_opens_after_consecutive_failures():
+    balancer = make_balancer()
+    balancer.record_failure(A)
+    balancer.record_failure(A)
+    assert circuit(balancer, A) == EndpointState.CLOSED
+    # A success in between resets the count
+    balancer.record_success(A, 0.1)
+    balancer.record_failure(A)
+    balancer.record_failure(A)
+    assert circuit(balancer, A) == EndpointState.CLOSED
+    balancer.record_failure(A)
+    assert circuit(balancer, A) == EndpointState.OPEN
+    assert balancer.stats()["endpoints"][A]["consecutive_failures"] == 3
+    assert A not in choices(balancer)
+
+
+def test_open_circuit_waits_for_the_cooldown():
+    clock = FakeClock()
+    balancer = make_balancer(clock)
+    open_circuit(balancer, A)
+    clock.advance(COOLDOWN - 1)
+    assert A not in choices(balancer, 100)
+    assert circuit(balancer, A) == EndpointState.OPEN
+    clock.advance(1)
+    # Recovery timeout reached: A is available again, as a half-open probe
+    assert balancer.choose([A]) == A
+    assert circuit(balancer, A) == EndpointState.HALF_OPEN
+
+
+def test_half_open_allows_one_probe():
+    clock = FakeClock()
+    balancer = make_balancer(clock)
+    open_circuit(balancer, A)
+    clock.advance(COOLDOWN)
+    assert balancer.choose([A, B], exclude={B}) == A
+    # While the probe is in flight A is out of rotation again
+    assert A not in choices(balancer, 100)
+    assert circuit(balancer, A) == EndpointState.HALF_OPEN
+
+
+def test_probe_success_closes_the_circuit():
+    clock = FakeClock()
+    balancer = make_balancer(clock)
+    open_circuit(balancer, A)
+    clock.advance(COOLDOWN)
+    balancer.choose([A])
+    balancer.record_success(A, 0.05)
+    assert circuit(balancer, A) == EndpointState.CLOSED
+    assert balancer.stats()["endpoints"][A]["consecutive_failures"] == 0
+    # Back in rotation, and the fastest endpoint again
+    balancer.record_success(B, 0.5)
+    balancer.record_success(C, 0.5)
+    assert choices(balancer, 100)[A] > 50
+
+
+def test_probe_failure_reopens_for_another_cooldown():
+    clock = FakeClock()
+    balancer = make_balancer(clock)
+    open_circuit(balancer, A)
+    clock.advance(COOLDOWN)
+    balancer.choose([A])
+    clock.advance(5)
+    # A single failed probe reopens the circuit, below failure_threshold
+    balancer.record_failure(A)
+    assert circuit(balancer, A) == EndpointState.OPEN
+    clock.advance(COOLDOWN - 1)
+    assert A not in choices(balancer, 100)
+    clock.advance(1)
+    assert balancer.choose([A]) == A and circuit(balancer, A) == EndpointState.HALF_OPEN
+
+
+def test_stale_probe_is_replaced_after_a_cooldown():
+    clock = FakeClock()
+    balancer = make_balancer(clock)
+    open_circuit(balancer, A)
+    clock.advance(COOLDOWN)
+    balancer.choose([A])  # the probe never reports back
+    clock.advance(COOLDOWN - 1)
+    assert A not in choices(balancer, 100)
+    clock.advance(1)
+    assert balancer.choose([A, B], exclude={B}) == A
+
+
+def test_all_circuits_open_still_answers():
+    balancer = make_balancer()
+    for endpoint in ENDPOINTS:
+        open_circuit(balancer, endpoint)
+    counts = choices(balancer, 30)
+    assert sum(counts.values()) == 30
+    assert all(circuit(balancer, endpoint) == EndpointState.OPEN for endpoint in ENDPOINTS)
+
+
+def main():
+    """Run all tests and print a report."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 ENDPOINT BALANCER TESTS")
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Hedging Test Suite
+
+Checks src/hedging.py, hedged LLM calls across endpoints. Fake sync and
+async calls answer (or fail) after a scripted delay per endpoint, so no
+model or API key is needed.
+
+- hedge delay: the latency quantile (floored at min_delay), no hedge before
+  min_samples latencies, a fast first call is never hedged, the hedge is
+  sent only once the delay has passed
+- budget: at most about max_rate of the requests are hedged; a hedge with
+  no other endpoint returns its token
+- race: the first result wins, the loser is cancelled (async) or abandoned
+  (sync), an error of one call falls back to the other, both failing or
+  timing out raises the first call's error, other errors are raised at once
+
+Runs with pytest or standalone:
+    python test_hedging.py
+    python -m pytest test_hedging.py -q
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from hedging import RequestHedger
+
+DELAY = 0.05  # hedge delay of the hedgers below
+SLOW = 0.5
+FAST = 0.01
+
+# Abandoned sync calls run on in the background; the executor is never shut down with them pending
+EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="test-hedge")
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+class EndpointError(Exception):
+    """A recoverable API error (stands for openai.APIError)."""
+
+
+def make_hedger(max_rate: float = 1.0, **overrides) -> RequestHedger:
+    """A hedger that hedges every request after DELAY seconds (budget permitting)."""
+    settings = dict(quantile=0.9, max_rate=max_rate, min_delay=DELAY, min_samples=1, window=10)
+    settings.update(overrides)
+    hedger = RequestHedger(**settings)
+    hedger.observe(0.001)
+    return hedger
+
+
+class FakeEndpoints:
+    """Endpoint -> (delay, result or exception); records when each call started, finished or was cancelled."""
+
+    def __init__(self, **script):
+        self.script = script
+        self.started = {}
+        self.finished = []
+        self.cancelled = []
+        self._lock = threading.Lock()
+
+    def _start(self, endpoint):
+        with self._lock:
+            self.started[endpoint] = time.perf_counter()
+        return self.script[endpoint]
+
+    def _outcome(self, endpoint, outcome):
+        with self._lock:
+            self.finished.append(endpoint)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def call(self, endpoint):
+        delay, outcome = self._start(endpoint)
+        time.sleep(delay)
+        return self._outcome(endpoint, outcome)
+
+    async def acall(self, endpoint):
+        delay, outcome = self._start(endpoint)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(endpoint)
+            raise
+        return self._outcome(endpoint, outcome)
+
+
+def hedged(hedger, endpoints, alternate="b", timeout=5.0, **callbacks):
+    """Sync hedged call from endpoint "a"; returns (result or exception, hedge errors, abandoned futures)."""
+    hedge_errors, abandoned = [], []
+    try:
+        result = hedger.call(
+            endpoints.call, "a", lambda: alternate, EXECUTOR, timeout,
+            recoverable=(EndpointError,),
+            on_hedge_error=lambda endpoint, error: hedge_errors.append((endpoint, error)),
+            on_abandon=abandoned.append,
+            **callbacks
+        )
+    except Exception as e:
+        result = e
+    return result, hedge_errors, abandoned
+
+
+def ahedged(hedger, endpoints, alternate="b", timeout=5.0):
+    """Async hedged call from endpoint "a"; returns (result or exception, hedge errors, cancelled latencies)."""
+    hedge_errors, cancelled = [], []
+
+    async def main():
+        try:
+            return await hedger.acall(
+                endpoints.acall, "a", lambda: alternate, timeout,
+                recoverable=(EndpointError,),
+                on_hedge_error=lambda endpoint, error: hedge_errors.append((endpoint, error)),
+                on_cancelled=lambda endpoint, elapsed: cancelled.append((endpoint, elapsed))
+            )
+        except Exception as e:
+            return e
+
+    return asyncio.run(main()), hedge_errors, cancelled
+
+
+# ----------------------------------------------------------------------
+# Hedge delay and budget
+# ----------------------------------------------------------------------
+
+def test_threshold():
+    hedger = RequestHedger(quantile=0.9, max_rate=0.1, min_delay=0.5, min_samples=5, window=10)
+    for latency in (1, 2, 3, 4):
+        hedger.observe(latency)
+    assert hedger.threshold() is None  # too few samples
+    for latency in (5, 6, 7, 8, 9, 10):
+        hedger.observe(latency)
+    assert hedger.threshold() == 9
+    # Only the window's latest samples count, and min_delay is a floor
+    for _ in range(10):
+        hedger.observe(0.1)
+    assert hedger.threshold() == 0.5
+    assert hedger.stats()["threshold_ms"] == 500.0 and hedger.stats()["latency_samples"] == 10
+
+
+def test_no_hedge_before_min_samples():
+    hedger = RequestHedger(quantile=0.9, max_rate=1.0, min_delay=DELAY, min_samples=20, window=10)
+    endpoints = FakeEndpoints(a=(0.2, "primary"), b=(FAST, "hedge"))
+    result, _, _ = hedged(hedger, endpoints)
+    assert result == "primary" and list(endpoints.started) == ["a"]
+    assert hedger.stats()["hedges"] == 0
+
+
+def test_fast_call_is_not_hedged():
+    hedger = make_hedger()
+    endpoints = FakeEndpoints(a=(FAST, "primary"), b=(FAST, "hedge"))
+    result, _, abandoned = hedged(hedger, endpoints)
+    assert result == "primary" and list(endpoints.started) == ["a"] and not abandoned
+    result, _, _ = ahedged(hedger, endpoints)
+    assert result == "primary" and hedger.stats()["hedges"] == 0
+
+
+def test_hedge_sent_after_the_delay():
+    hedger = make_hedger()
+    endpoints = FakeEndpoints(a=(SLOW, "primary"), b=(FAST, "hedge"))
+    result, _, _ = hedged(hedger, endpoints)
+    assert result == "hedge"
+    assert endpoints.started["b"] - endpoints.started["a"] >= DELAY * 0.9
+
+
+def test_budget_limits_hedges():
+    hedger = make_hedger(max_rate=0.25)
+    endpoints = FakeEndpoints(a=(0.08, "primary"), b=(FAST, "hedge"))
+    results = [hedged(hedger, endpoints)[0] for _ in range(8)]
+    # Every 4th request has earned a hedge token
+    assert results.count("hedge") == 2
+    stats = hedger.stats()
+    assert stats["requests"] == 8 and stats["hedges"] == 2 and stats["over_budget"] == 6
+    assert stats["hedge_rate"] == 0.25
+
+
+def test_no_alternate_returns_the_token():
+    hedger = make_hedger()
+    endpoints = FakeEndpoints(a=(0.1, "primary"))
+    assert hedged(hedger, endpoints, alternate="a")[0] == "primary"
+    assert hedged(hedger, endpoints, alternate=None)[0] == "primary"
+    stats = hedger.stats()
+    assert stats["hedges"] == 0 and stats["no_alternate"] == 2
+    assert hedger._budget == RequestHedger.BUDGET_CAP
+
+
+# ----------------------------------------------------------------------
+# Race
+# ----------------------------------------------------------------------
+
+def test_first_result_wins_and_loser_is_abandoned():
+    hedger = make_hedger()
+    endpoints = FakeEndpoints(a=(SLOW, "primary"), b=(FAST, "hedge"))
+    result, hedge_errors, abandoned = hedged(hedger, endpoints)
+    assert result == "hedge" and not hedge_errors
+    # The sync primary cannot be interrupted: it is handed over, still running
+    assert len(abandoned) == 1 and not abandoned[0].done()
+    assert abandoned[0].result() == "primary"
+
+    endpoints = FakeEndpoints(a=(0.1, "primary"), b=(SLOW, "hedge"))
+    result, _, abandoned = hedged(hedger, endpoints)
+    assert result == "primary" and len(abandoned) == 1
+    stats = hedger.stats()
+    assert stats["hedge_wins"] == 1 and stats["primary_wins"] == 1 and stats["hedge_win_rate"] == 0.5
+
+
+def test_async_loser_is_cancelled():
+    hedger = make_hedger()
+    endpoints = FakeEndpoints(a=(SLOW, "primary"), b=(FAST, "hedge"))
+    start = time.perf_counter()
+    result, _, cancelled = ahedged(hedger, endpoints)
+    assert result == "hedge" and endpoints.cancelled == ["a"] and "a" not in endpoints.finished
+    assert time.perf_counter() - start < SLOW
+    # The cancelled first call's elapsed time is a lower bound of its latency
+    assert [endpoint for endpoint, _ in cancelled] == ["a"] and cancelled[0][1] >= DELAY * 0.9
+
+    endpoints = FakeEndpoints(a=(0.1, "primary"), b=(SLOW, "hedge"))
+    result, _, cancelled = ahedged(hedger, endpoints)
+    assert result == "primary" and endpoints.cancelled == ["b"] and not cancelled
+
+
+def test_error_falls_back_to_the_other_call():
+    hedger = make_hedger()
+    # The first call fails after the hedge was sent: the hedge answers
+    endpoints = FakeEndpoints(a=(0.08, EndpointError("502 from a")), b=(0.15, "hedge"))
+    for run in (hedged, ahedged):
+        result, hedge_errors, _ = run(hedger, endpoints)
+        assert result == "hedge" and not hedge_errors
+
+    # The hedge fails: the error is reported for its endpoint and the first call answers
+    endpoints = FakeEndpoints(a=(0.15, "primary"), b=(FAST, EndpointError("429 from b")))
+    for run in (hedged, ahedged):
+        result, hedge_errors, _ = run(hedger, endpoints)
+        assert result == "primary"
+        assert [(endpoint, str(error)) for endpoint, error in hedge_errors] == [("b", "429 from b")]
+
+
+def test_both_failing_raises_the_first_calls_error():
+    hedger = make_hedger()
+    primary_error = EndpointError("502 from a")
+    endpoints = FakeEndpoints(a=(0.08, primary_error), b=(FAST, EndpointError("429 from b")))
+    for run in (hedged, ahedged):
+        result, hedge_errors, _ = run(hedger, endpoints)
+        assert result is primary_error and len(hedge_errors) == 1
+    assert hedger.stats()["both_failed"] == 2
+
+
+def test_timeout_raises_and_reports_the_hedge():
+    hedger = make_hedger()
+    endpoints = FakeEndpoints(a=(SLOW, "primary"), b=(SLOW, "hedge"))
+    timeout_error = lambda endpoint: EndpointError(f"timeout on {endpoint}")
+    result, hedge_errors, abandoned = hedged(hedger, endpoints, timeout=0.15, timeout_error=timeout_error)
+    assert str(result) == "timeout on a" and len(abandoned) == 2
+    assert [(endpoint, str(error)) for endpoint, error in hedge_errors] == [("b", "timeout on b")]
+
+    result, hedge_errors, _ = ahedged(hedger, endpoints, timeout=0.15)
+    assert isinstance(result, TimeoutError) and [endpoint for endpoint, _ in hedge_errors] == ["b"]
+    assert sorted(endpoints.cancelled) == ["a", "b"]
+
+
+def test_other_errors_are_raised_at_once():
+    hedger = make_hedger()
+    endpoints = FakeEndpoints(a=(SLOW, "primary"), b=(FAST, ValueError("bad request")))
+    start = time.perf_counter()
+    result, hedge_errors, abandoned = hedged(hedger, endpoints)
+    assert isinstance(result, ValueError) and not hedge_errors and len(abandoned) == 1
+    assert time.perf_counter() - start < SLOW
+    result, _, _ = ahedged(hedger, endpoints)
+    assert isinstance(result, ValueError) and "a" in endpoints.cancelled
+
+
+def main():
+    """Run all tests and print a report."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 HEDGING TESTS")
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
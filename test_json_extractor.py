@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+JSON Extractor Test Suite
+
+Correctness, fuzz and performance tests for src/json_extractor.py, the
+extractor behind CanvasXpressGenerator._extract_json_from_response and the
+streaming early stop.
+
+- correctness: code fences, prose around JSON, braces/quotes inside strings,
+  prose braces, invalid candidates (never mined for nested fragments),
+  stray '{"' in prose, precise errors
+- fuzz: random configs (strings full of braces, quotes, backslashes and
+  unicode) wrapped in random prose, fed whole and in random chunks
+- performance: ~1 MB adversarial responses (unbalanced braces, unterminated
+  strings, escape runs, deep nesting, many invalid candidates) must finish
+  within a worst-case bound and scale linearly
+
+Runs with pytest or standalone:
+    python test_json_extractor.py
+    python -m pytest test_json_extractor.py -q
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from json_extractor import JsonExtractionError, JsonExtractor, extract_json
+
+FUZZ_SEED = int(os.environ.get("FUZZ_SEED", "1234"))
+FUZZ_CASES = int(os.environ.get("FUZZ_CASES", "500"))
+
+# Worst-case bound for one ~1 MB adversarial response (seconds)
+PERF_SIZE = 1_000_000
+PERF_BOUND_S = 2.0
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+def feed_in_chunks(text: str, rng: random.Random) -> JsonExtractor:
+    """Feed text to a new extractor in random-sized chunks (1-40 characters)."""
+    extractor = JsonExtractor()
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, 40)
+        if extractor.feed(text[i:i + size]):
+            break
+        i += size
+    return extractor
+
+
+def assert_raises_extraction_error(text: str, fragment: str):
+    try:
+        extract_json(text)
+    except JsonExtractionError as e:
+        assert fragment in str(e), f"expected {fragment!r} in {str(e)!r}"
+        return e
+    raise AssertionError(f"no JsonExtractionError for {text[:80]!r}")
+
+
+# ----------------------------------------------------------------------
+# Correctness
+# ----------------------------------------------------------------------
+
+def test_clean_json():
+    assert extract_json('{"graphType": "Bar"}') == '{"graphType": "Bar"}'
+    assert extract_json('  {}  ') == '{}'
+
+
+def test_markdown_code_block():
+    text = 'Here is the config:\n```json\n{\n  "graphType": "Scatter2D"\n}\n```\nEnjoy!'
+    assert json.loads(extract_json(text)) == {"graphType": "Scatter2D"}
+
+
+def test_braces_and_quotes_inside_strings():
+    config = {"graphType": "Bar", "title": "{x} and }{ and \"quoted\" \\ back\\slash", "smpLabelFontStyle": "{"}
+    text = f"Sure: {json.dumps(config)} Let me know if you need more."
+    assert json.loads(extract_json(text)) == config
+
+
+def test_prose_braces_before_json():
+    text = 'Use the {x} placeholder or {{ template }} syntax: {"graphType": "Line"} done {"other": 1}'
+    assert extract_json(text) == '{"graphType": "Line"}'
+
+
+def test_first_valid_object_wins():
+    text = '{"graphType": "Bar"}\n{"graphType": "Line"}'
+    assert extract_json(text) == '{"graphType": "Bar"}'
+
+
+def test_invalid_candidate_is_skipped():
+    text = 'Draft: {"graphType": "Bar",} Final: {"graphType": "Heatmap"}'
+    assert extract_json(text) == '{"graphType": "Heatmap"}'
+
+
+def test_stray_quote_brace_in_prose_before_json():
+    text = 'Put the title in {"title field. Here it is: {"graphType": "Bar", "title": "Sales"}'
+    assert json.loads(extract_json(text)) == {"graphType": "Bar", "title": "Sales"}
+    text = 'Use {"key": value} pairs.\n```json\n{"graphType": "Scatter2D"}\n```'
+    assert extract_json(text) == '{"graphType": "Scatter2D"}'
+
+
+def test_balanced_invalid_candidate_is_not_mined_for_fragments():
+    # A config with a trailing comma: report the syntax error, not the nested legendBox
+    text = ('```json\n{"graphType":"Bar","xAxis":["Sales"],"legendBox":{"position":"right"},'
+            '"title":"Sales by region",}\n```')
+    error = assert_raises_extraction_error(text, "Invalid JSON object")
+    assert error.pos == text.index("}\n```")
+    # Scanning continues after the invalid candidate, with the next top-level object
+    assert extract_json('{"a": {"b": 1}, bad} {"c":2}') == '{"c":2}'
+    assert_raises_extraction_error('Draft {"config": oops {"graphType": "Bar"} }', "Invalid JSON object")
+
+
+def test_unclosed_candidate_is_rescanned():
+    # Only a candidate still open at the end of the response is rescanned from inside
+    assert extract_json('{"note": "truncated", "config": {"graphType": "Line"}') == '{"graphType": "Line"}'
+    rng = random.Random(FUZZ_SEED)
+    text = 'Draft {"config": "x", "inner": {"graphType": "Bar"} and more'
+    for _ in range(100):
+        extractor = feed_in_chunks(text, rng)
+        assert not extractor.complete and extractor.finish()
+        assert extractor.text == '{"graphType": "Bar"}'
+        assert text[extractor.start:extractor.end] == extractor.text
+
+
+def test_nested_objects_and_arrays():
+    config = {"graphType": "Bar", "decorations": {"line": [{"value": 1, "color": "rgb(0,0,0)"}]}, "xAxis": ["A", "B"]}
+    assert json.loads(extract_json("```\n" + json.dumps(config, indent=2) + "\n```")) == config
+
+
+def test_unicode_and_escapes():
+    config = {"title": "Expression — μg/mL ✓ é\n\t\"tab\"", "graphType": "Boxplot"}
+    assert json.loads(extract_json("Result: " + json.dumps(config, ensure_ascii=False))) == config
+    assert json.loads(extract_json("Result: " + json.dumps(config))) == config
+
+
+def test_value_and_offsets():
+    extractor = JsonExtractor()
+    text = 'abc {"a": {"b": "}"}} tail'
+    assert extractor.feed(text)
+    assert extractor.value == {"a": {"b": "}"}}
+    assert text[extractor.start:extractor.end] == extractor.text
+
+
+def test_error_no_object():
+    error = assert_raises_extraction_error("I cannot create that chart.", "No JSON object found")
+    assert isinstance(error, json.JSONDecodeError)
+
+
+def test_error_unterminated_string():
+    text = 'Config: {"graphType": "Bar", "title": "never closed}'
+    error = assert_raises_extraction_error(text, "Unterminated string")
+    assert error.pos == text.index('"never')
+
+
+def test_error_unclosed_object():
+    text = 'Config: {"graphType": "Bar", "xAxis": ["a", 1]'
+    error = assert_raises_extraction_error(text, "1 brace(s) still open")
+    assert error.pos == text.index("{")
+
+
+def test_error_invalid_json_reports_position():
+    text = 'Config: {"graphType": "Bar" "title": "x"}'
+    error = assert_raises_extraction_error(text, "Invalid JSON object")
+    assert error.pos == text.index('"title"')
+    assert error.lineno == 1
+
+
+def test_error_too_deep():
+    text = '{"a": ' * 300 + '1' + '}' * 300
+    assert_raises_extraction_error(text, "Nesting deeper than 256 levels")
+
+
+def test_incremental_matches_whole_text():
+    rng = random.Random(FUZZ_SEED)
+    text = 'Prose {x} ```json\n{"title": "a \\"}\\" {b}", "n": [1, {"c": "\\\\"}]}\n``` trailing {"z": 1}'
+    expected = extract_json(text)
+    for _ in range(200):
+        extractor = feed_in_chunks(text, rng)
+        assert extractor.result(text) == expected
+
+
+# ----------------------------------------------------------------------
+# Fuzz
+# ----------------------------------------------------------------------
+
+_FUZZ_ALPHABET = 'abcXYZ019 {}[]":,\\/\n\t—μ✓\'`#'
+
+
+def random_string(rng: random.Random) -> str:
+    return "".join(rng.choice(_FUZZ_ALPHABET) for _ in range(rng.randint(0, 20)))
+
+
+def random_value(rng: random.Random, depth: int = 0):
+    kind = rng.randint(0, 6 if depth < 4 else 3)
+    if kind == 0:
+        return random_string(rng)
+    if kind == 1:
+        return rng.choice([True, False, None])
+    if kind == 2:
+        return rng.randint(-10**6, 10**6)
+    if kind == 3:
+        return rng.random() * 100
+    if kind in (4, 5):
+        return {random_string(rng): random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+    return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+
+
+def random_prose(rng: random.Random) -> str:
+    """Prose that may contain braces and quotes, but never a '{' followed by '"' or '}'."""
+    words = ["Here", "is", "the", "config", "{x}", "{{ y }}", "\"quoted\"", "it's", "}", "]", "```", "```json", "\n"]
+    return " ".join(rng.choice(words) for _ in range(rng.randint(0, 12)))
+
+
+def test_fuzz_embedded_configs():
+    rng = random.Random(FUZZ_SEED)
+    for _ in range(FUZZ_CASES):
+        config = {random_string(rng) or "k": random_value(rng) for _ in range(rng.randint(1, 5))}
+        json_text = json.dumps(config, indent=rng.choice([None, 2]), ensure_ascii=rng.random() < 0.5)
+        text = random_prose(rng) + " " + json_text + " " + random_prose(rng)
+        assert extract_json(text) == json_text
+        assert feed_in_chunks(text, rng).result(text) == json_text
+
+
+def test_fuzz_random_text_never_crashes():
+    rng = random.Random(FUZZ_SEED + 1)
+    for _ in range(FUZZ_CASES):
+        text = "".join(rng.choice('{}[]":,\\ a1\n') for _ in range(rng.randint(0, 200)))
+        try:
+            result = extract_json(text)
+        except JsonExtractionError:
+            continue
+        assert isinstance(json.loads(result), dict)
+        assert result in text
+
+
+# ----------------------------------------------------------------------
+# Performance (adversarial inputs)
+# ----------------------------------------------------------------------
+
+def adversarial_inputs(size: int) -> dict:
+    """Large malformed responses that make naive or backtracking extractors slow."""
+    return {
+        "open braces": "{" * size,
+        "close braces": "}" * size,
+        "unterminated string": '{"title": "' + "a{}" * (size // 3),
+        "escape run": '{"title": "' + "\\\\" * (size // 2),
+        "escaped quotes": '{"title": "' + '\\"' * (size // 2),
+        "deep nesting": '{"a": ' * (size // 6),
+        "invalid candidates": '{"a": 1,} ' * (size // 10),
+        "prose braces": "{x} " * (size // 4),
+        "regex backtracking": "{" + "{a}" * (size // 3),
+        "large valid tail": "x" * (size // 2) + json.dumps({"data": ["v" * 50] * (size // 120)}),
+    }
+
+
+def time_extraction(text: str) -> float:
+    start = time.perf_counter()
+    try:
+        extract_json(text)
+    except JsonExtractionError:
+        pass
+    return time.perf_counter() - start
+
+
+def test_perf_worst_case_bound():
+    for name, text in adversarial_inputs(PERF_SIZE).items():
+        elapsed = time_extraction(text)
+        assert elapsed < PERF_BOUND_S, f"{name}: {elapsed:.3f}s for {len(text)} chars (bound {PERF_BOUND_S}s)"
+
+
+def test_perf_linear_scaling():
+    small = adversarial_inputs(PERF_SIZE // 4)
+    large = adversarial_inputs(PERF_SIZE)
+    for name in small:
+        t_small = max(time_extraction(small[name]), 1e-3)
+        t_large = time_extraction(large[name])
+        # 4x the input may take at most ~3x longer than linear (noise, cache effects)
+        assert t_large < 12 * t_small + 0.05, f"{name}: {t_small:.4f}s -> {t_large:.4f}s (not linear)"
+
+
+def main():
+    """Run all tests and print a report with timings."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 JSON EXTRACTOR TESTS")
+    failed = 0
+    for name, fn in tests:
+        start = time.perf_counter()
+        try:
+            fn()
+            print(f"✓ {name} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header(f"⏱️  ADVERSARIAL INPUTS (~{PERF_SIZE // 1000} KB, bound {PERF_BOUND_S}s)")
+    for name, text in adversarial_inputs(PERF_SIZE).items():
+        elapsed = time_extraction(text)
+        print(f"  {name:22s} {len(text):>9,d} chars  {elapsed * 1000:8.1f} ms  "
+              f"({len(text) / max(elapsed, 1e-9) / 1e6:6.1f} M chars/s)")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
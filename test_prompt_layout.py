@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Prompt Layout Test Suite
+
+Checks src/prompt_layout.py, the PROMPT_LAYOUT=prefix_cache split of the
+prompt templates into a static prefix and a per-request suffix.
+
+For the v1 and v2 templates and every combination of static fields
+(rules_info, schema_info), prefix + rendered suffix must equal the
+formatted template byte for byte: same sections, same headings, same
+order. The prefix must be byte-stable across requests and hold no
+per-request text.
+
+Runs with pytest or standalone:
+    python test_prompt_layout.py
+    python -m pytest test_prompt_layout.py -q
+"""
+
+import itertools
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from prompt_layout import PromptLayout
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+TEMPLATES = ["prompt_template.md", "prompt_template_v2.md"]
+STATIC_FIELDS = ["rules_info", "schema_info"]
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+def load_template(name: str) -> str:
+    with open(os.path.join(DATA_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def request_values(i: int) -> dict:
+    """Distinct values of every template field for request i."""
+    return {
+        "canvasxpress_config_english": f"bar chart of sales {i}",
+        "headers_column_names": f"Region, Sales{i}",
+        "few_shot_examples": f"Example {i}: {{\"graphType\": \"Bar\"}}\n",
+        "rules_info": f"RULES BLOCK {i}\n",
+        "schema_info": f"SCHEMA BLOCK {i}\n",
+    }
+
+
+def headings(text: str) -> list:
+    return re.findall(r"^### .*$", text, flags=re.M)
+
+
+def static_combinations():
+    for n in range(len(STATIC_FIELDS) + 1):
+        yield from itertools.combinations(STATIC_FIELDS, n)
+
+
+# ----------------------------------------------------------------------
+# Tests
+# ----------------------------------------------------------------------
+
+def test_prefix_plus_suffix_matches_template():
+    for name in TEMPLATES:
+        template = load_template(name)
+        for static in static_combinations():
+            base = request_values(0)
+            layout = PromptLayout(template, {field: base[field] for field in static})
+            for i in range(2):
+                values = {**request_values(i), **{field: base[field] for field in static}}
+                prefix, suffix = layout.render(**values)
+                expected = template.format(**values)
+                label = f"{name} static={list(static)} request={i}"
+                assert headings(prefix + suffix) == headings(expected), f"{label}: headings out of order"
+                assert prefix + suffix == expected, f"{label}: prompt differs from the formatted template"
+
+
+def test_prefix_is_static_and_whole_sections():
+    for name in TEMPLATES:
+        template = load_template(name)
+        for static in static_combinations():
+            base = request_values(0)
+            layout = PromptLayout(template, {field: base[field] for field in static})
+            prefix, _ = layout.render(**request_values(1))
+            label = f"{name} static={list(static)}"
+            assert prefix == layout.prefix, f"{label}: prefix changed between requests"
+            for field in ("canvasxpress_config_english", "headers_column_names", "few_shot_examples"):
+                assert request_values(1)[field] not in prefix, f"{label}: per-request {field} in prefix"
+            assert not prefix or prefix.startswith("### "), f"{label}: prefix does not start at a heading"
+            # A heading is never separated from its body
+            assert not re.search(r"^### .*:\s*\Z", prefix), f"{label}: prefix ends with an empty heading"
+
+
+def test_v2_static_rules_and_schema_in_prefix():
+    template = load_template("prompt_template_v2.md")
+    layout = PromptLayout(template, {"rules_info": "RULES\n", "schema_info": "SCHEMA\n"})
+    assert headings(layout.prefix) == ["### Instructions:", "### Schema Information:"]
+    assert "RULES" in layout.prefix and "SCHEMA" in layout.prefix
+    assert layout.suffix_template.startswith("### Input:")
+
+
+def test_dynamic_rules_leave_prefix_empty():
+    # RULES_RETRIEVAL=true, SCHEMA_PRUNING=false: the first section is already per request
+    template = load_template("prompt_template_v2.md")
+    layout = PromptLayout(template, {"schema_info": "SCHEMA\n"})
+    assert layout.prefix == ""
+    assert layout.suffix_template == template
+
+
+def main():
+    """Run all tests and print a report."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 PROMPT LAYOUT TESTS")
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter Test Suite
+
+Checks src/rate_limiter.py, the client-side AIMD token buckets in front of
+the LLM and embedding APIs. A fake clock makes every wait exact; no API
+key is needed.
+
+- token buckets: burst, FIFO pacing of reservations, refill over time, the
+  global bucket shared by all endpoints, RATE_LIMIT_MAX_WAIT timeouts
+- AIMD: additive increase per success (capped at the configured rate),
+  multiplicative decrease per 429 (once per backoff_base, floored at
+  min_rps)
+- blocks: Retry-After (seconds, milliseconds, HTTP date), jittered
+  exponential backoff without it, and x-ratelimit-remaining-*/reset-*
+  headers of successful responses
+
+Runs with pytest or standalone:
+    python test_rate_limiter.py
+    python -m pytest test_rate_limiter.py -q
+"""
+
+import os
+import random
+import sys
+import time
+from email.utils import formatdate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from rate_limiter import AdaptiveRateLimiter, RateLimitTimeout, _parse_duration, retry_after
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def make_limiter(clock: FakeClock, **overrides) -> AdaptiveRateLimiter:
+    settings = dict(
+        name="llm", enabled=True, endpoint_rps=2, global_rps=100, min_rps=0.2, increase=0.1,
+        decrease=0.5, backoff_base=1, backoff_max=60, max_wait=120, max_retries=3
+    )
+    settings.update(overrides)
+    return AdaptiveRateLimiter(clock=clock, **settings)
+
+
+def rate(limiter: AdaptiveRateLimiter, endpoint: str = "e1") -> float:
+    return limiter.stats()["endpoints"][endpoint]["rate_rps"]
+
+
+def blocked_for(limiter: AdaptiveRateLimiter, endpoint: str = "e1") -> float:
+    return limiter.stats()["endpoints"][endpoint]["blocked_for_s"]
+
+
+# ----------------------------------------------------------------------
+# Token buckets
+# ----------------------------------------------------------------------
+
+def test_burst_then_fifo_pacing():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    # A burst of `rate` calls, then one turn every 1/rate seconds, in reservation order
+    waits = [limiter.reserve("e1") for _ in range(5)]
+    assert waits == [0.0, 0.0, 0.5, 1.0, 1.5]
+    stats = limiter.stats()
+    assert stats["calls"] == 5 and stats["queued"] == 3
+    assert stats["wait_s"] == 3.0 and stats["max_wait_s"] == 1.5
+
+
+def test_refill_over_time():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    assert [limiter.reserve("e1") for _ in range(2)] == [0.0, 0.0]
+    clock.advance(0.5)  # one token back
+    assert limiter.reserve("e1") == 0.0
+    assert limiter.reserve("e1") == 0.5
+    clock.advance(10)  # refills up to the burst, not beyond
+    assert [limiter.reserve("e1") for _ in range(3)] == [0.0, 0.0, 0.5]
+
+
+def test_global_bucket_is_shared_by_endpoints():
+    clock = FakeClock()
+    limiter = make_limiter(clock, endpoint_rps=10, global_rps=1)
+    assert limiter.reserve("e1") == 0.0
+    assert limiter.reserve("e2") == 1.0
+    assert limiter.reserve("e3") == 2.0
+
+
+def test_max_wait_raises_and_refunds():
+    clock = FakeClock()
+    limiter = make_limiter(clock, endpoint_rps=1, max_wait=2)
+    assert [limiter.reserve("e1") for _ in range(3)] == [0.0, 1.0, 2.0]
+    try:
+        limiter.reserve("e1")
+        raise AssertionError("no RateLimitTimeout past max_wait")
+    except RateLimitTimeout as e:
+        assert "RATE_LIMIT_MAX_WAIT=2s" in str(e)
+    # The rejected call gave its token back: the next turn is still 3s away after 1s
+    clock.advance(1)
+    assert limiter.reserve("e1") == 2.0
+    assert limiter.stats()["timeouts"] == 1
+
+
+def test_disabled_never_waits():
+    clock = FakeClock()
+    limiter = make_limiter(clock, enabled=False, endpoint_rps=1)
+    assert [limiter.reserve("e1") for _ in range(5)] == [0.0] * 5
+    limiter.on_rate_limited("e1", {"retry-after": "30"})
+    assert limiter.reserve("e1") == 0.0
+    assert limiter.stats()["rate_limited"] == 1 and blocked_for(limiter) == 0.0
+
+
+# ----------------------------------------------------------------------
+# AIMD
+# ----------------------------------------------------------------------
+
+def test_multiplicative_decrease_once_per_backoff_base():
+    clock = FakeClock()
+    limiter = make_limiter(clock, endpoint_rps=8, global_rps=40)
+    limiter.reserve("e1")
+    limiter.on_rate_limited("e1", {"retry-after": "0"})
+    assert rate(limiter) == 4.0 and limiter.stats()["global_rate_rps"] == 20.0
+    # A burst of 429s from calls already in flight counts once
+    limiter.on_rate_limited("e1", {"retry-after": "0"})
+    limiter.on_rate_limited("e1", {"retry-after": "0"})
+    assert rate(limiter) == 4.0
+    clock.advance(1)
+    limiter.on_rate_limited("e1", {"retry-after": "0"})
+    assert rate(limiter) == 2.0 and limiter.stats()["global_rate_rps"] == 10.0
+    for _ in range(10):
+        clock.advance(1)
+        limiter.on_rate_limited("e1", {"retry-after": "0"})
+    assert rate(limiter) == 0.2  # floored at min_rps
+    assert limiter.stats()["endpoints"]["e1"]["rate_limited"] == 14
+
+
+def test_additive_increase_up_to_configured_rate():
+    clock = FakeClock()
+    limiter = make_limiter(clock, endpoint_rps=2, global_rps=4)
+    limiter.on_rate_limited("e1", {"retry-after": "0"})
+    assert rate(limiter) == 1.0 and limiter.stats()["global_rate_rps"] == 2.0
+    for _ in range(3):
+        limiter.on_success("e1")
+    assert rate(limiter) == 1.3
+    for _ in range(20):
+        limiter.on_success("e1")
+    assert rate(limiter) == 2.0 and limiter.stats()["global_rate_rps"] == 4.0
+    assert limiter.stats()["endpoints"]["e1"]["consecutive_429"] == 0
+
+
+def test_decreased_rate_paces_calls():
+    clock = FakeClock()
+    limiter = make_limiter(clock, endpoint_rps=4)
+    limiter.on_rate_limited("e1", {"retry-after": "0"})
+    clock.advance(10)
+    # Rate 2/s: burst of 2, then 0.5s apart
+    assert [limiter.reserve("e1") for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+
+
+# ----------------------------------------------------------------------
+# Blocks
+# ----------------------------------------------------------------------
+
+def test_retry_after_blocks_the_endpoint():
+    clock = FakeClock()
+    limiter = make_limiter(clock, endpoint_rps=10)
+    assert limiter.on_rate_limited("e1", {"retry-after": "3"}) == 3.0
+    assert blocked_for(limiter) == 3.0
+    # The first call goes when the block ends, the next ones at the decreased rate (5/s)
+    assert limiter.reserve("e1") == 3.0
+    assert round(limiter.reserve("e1"), 6) == 3.2
+    assert limiter.reserve("e2") == 0.0  # other endpoints are not blocked
+    assert limiter.stats()["retry_after"] == 1
+
+
+def test_retry_after_formats():
+    assert retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert retry_after({"retry-after-ms": "soon", "retry-after": "2"}) == 2.0
+    assert retry_after({"retry-after": "7"}) == 7.0
+    http_date = retry_after({"retry-after": formatdate(time.time() + 30, usegmt=True)})
+    assert 28 <= http_date <= 30
+    assert retry_after({"retry-after": formatdate(time.time() - 30, usegmt=True)}) == 0.0
+    assert retry_after({"retry-after": "later"}) is None
+    assert retry_after({}) is None and retry_after(None) is None
+
+
+def test_exponential_backoff_without_retry_after():
+    clock = FakeClock()
+    limiter = make_limiter(clock, backoff_base=1, backoff_max=4)
+    random.seed(7)
+    delays = [limiter.on_rate_limited("e1") for _ in range(5)]
+    for n, delay in enumerate(delays):
+        backoff = min(4, 2 ** n)
+        assert backoff * 0.5 <= delay <= backoff, f"429 #{n + 1}: {delay}s not in [{backoff / 2}, {backoff}]"
+    assert limiter.stats()["retry_after"] == 0
+    # A success resets the exponent
+    limiter.on_success("e1")
+    assert limiter.on_rate_limited("e1") <= 1.0
+
+
+def test_rate_limit_headers_block_before_a_429():
+    clock = FakeClock()
+    limiter = make_limiter(clock, endpoint_rps=10)
+    limiter.on_success("e1", {"x-ratelimit-remaining-requests": "5", "x-ratelimit-reset-requests": "6m0s"})
+    assert blocked_for(limiter) == 0.0
+    limiter.on_success("e1", {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "6m0s"})
+    assert blocked_for(limiter) == 360.0
+    assert limiter.reserve("e2") == 0.0
+
+    limiter = make_limiter(clock, endpoint_rps=10, backoff_base=2)
+    limiter.on_success("e1", {"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "250ms"})
+    assert limiter.reserve("e1") == 0.25
+    # Without a reset time the block lasts backoff_base
+    clock.advance(10)
+    limiter.on_success("e1", {"x-ratelimit-remaining-requests": "0"})
+    assert blocked_for(limiter) == 2.0
+    assert limiter.stats()["header_blocks"] == 2
+
+
+def test_parse_duration():
+    assert _parse_duration("20ms") == 0.02
+    assert _parse_duration("1s") == 1.0
+    assert _parse_duration("6m0s") == 360.0
+    assert _parse_duration("1h2m3.5s") == 3723.5
+    assert _parse_duration("2.5") == 2.5
+    assert _parse_duration("") is None and _parse_duration(None) is None and _parse_duration("n/a") is None
+
+
+def main():
+    """Run all tests and print a report."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 RATE LIMITER TESTS")
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Single-Flight Test Suite
+
+Checks src/single_flight.py, the coalescing of identical in-flight
+generation requests. Computations are plain functions and coroutines that
+block until released, so followers really attach to an in-flight leader;
+no model or API key is needed.
+
+- coalescing: one computation for concurrent identical requests (threads,
+  asyncio tasks, and a sync follower on an async leader); different keys
+  run independently; followers get their own copies, traces marked
+  "coalesced"
+- errors: the leader's exception reaches every waiter
+- cleanup: the key leaves the table after success, failure and a
+  cancelled leader, so later requests start a new computation
+- no key (sampled, temperature > 0 requests): never coalesced
+
+Runs with pytest or standalone:
+    python test_single_flight.py
+    python -m pytest test_single_flight.py -q
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from single_flight import SingleFlight
+
+FOLLOWERS = 5
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the condition"
+        time.sleep(0.001)
+
+
+class Blocking:
+    """A computation that blocks until released, then returns a fresh config or raises."""
+
+    def __init__(self, error: Exception = None):
+        self.release = threading.Event()
+        self.calls = 0
+        self.error = error
+
+    def __call__(self, trace):
+        self.calls += 1
+        trace["leader_trace"] = self.calls
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {"graphType": "Bar", "xAxis": ["Sales"]}
+
+    async def acall(self, trace):
+        self.calls += 1
+        trace["leader_trace"] = self.calls
+        while not self.release.is_set():
+            await asyncio.sleep(0.001)
+        if self.error is not None:
+            raise self.error
+        return {"graphType": "Bar", "xAxis": ["Sales"]}
+
+
+def run_threads(flights: SingleFlight, key, fn, count: int):
+    """Call flights.do(key, fn) from count threads; returns [(result or exception, trace)] in thread order."""
+    outcomes = [None] * count
+
+    def call(i):
+        trace = {}
+        try:
+            outcomes[i] = (flights.do(key, fn, trace), trace)
+        except Exception as e:
+            outcomes[i] = (e, trace)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+# ----------------------------------------------------------------------
+# Coalescing
+# ----------------------------------------------------------------------
+
+def test_identical_requests_share_one_computation():
+    flights = SingleFlight()
+    fn = Blocking()
+    threads, outcomes = run_threads(flights, "key", fn, FOLLOWERS + 1)
+    wait_until(lambda: flights.stats()["coalesced"] == FOLLOWERS)
+    fn.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert fn.calls == 1
+    results = [result for result, _ in outcomes]
+    assert all(result == {"graphType": "Bar", "xAxis": ["Sales"]} for result in results)
+    # Every caller gets its own copy, and followers a copy of the leader's trace
+    assert len({id(result) for result in results}) == len(results)
+    results[0]["xAxis"].append("Profit")
+    assert results[1]["xAxis"] == ["Sales"]
+    traces = [trace for _, trace in outcomes]
+    assert sum(1 for trace in traces if trace.get("coalesced")) == FOLLOWERS
+    assert all(trace["leader_trace"] == 1 for trace in traces)
+
+    stats = flights.stats()
+    assert stats["calls"] == FOLLOWERS + 1 and stats["executions"] == 1
+    assert stats["max_followers"] == FOLLOWERS and stats["in_flight"] == 0
+    assert stats["coalesced_rate"] == round(FOLLOWERS / (FOLLOWERS + 1), 4)
+
+
+def test_different_keys_run_independently():
+    flights = SingleFlight()
+    first, second = Blocking(), Blocking()
+    threads_a, _ = run_threads(flights, "a", first, 2)
+    threads_b, _ = run_threads(flights, "b", second, 2)
+    wait_until(lambda: flights.stats()["coalesced"] == 2)
+    assert flights.stats()["in_flight"] == 2
+    first.release.set()
+    second.release.set()
+    for thread in threads_a + threads_b:
+        thread.join()
+    assert first.calls == 1 and second.calls == 1
+    assert flights.stats()["executions"] == 2
+
+
+def test_async_requests_share_one_computation():
+    async def main():
+        flights = SingleFlight()
+        fn = Blocking()
+        traces = [{} for _ in range(FOLLOWERS + 1)]
+        tasks = [asyncio.ensure_future(flights.ado("key", fn.acall, trace)) for trace in traces]
+        while flights.stats()["coalesced"] < FOLLOWERS:
+            await asyncio.sleep(0.001)
+        fn.release.set()
+        results = await asyncio.gather(*tasks)
+        assert fn.calls == 1
+        assert all(result == {"graphType": "Bar", "xAxis": ["Sales"]} for result in results)
+        assert len({id(result) for result in results}) == len(results)
+        assert sum(1 for trace in traces if trace.get("coalesced")) == FOLLOWERS
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_sync_follower_attaches_to_async_leader():
+    async def main():
+        flights = SingleFlight()
+        fn = Blocking()
+        leader = asyncio.ensure_future(flights.ado("key", fn.acall, {}))
+        await asyncio.sleep(0.01)
+        follower_trace = {}
+        follower = asyncio.get_running_loop().run_in_executor(
+            None, flights.do, "key", lambda trace: {"graphType": "Line"}, follower_trace
+        )
+        while flights.stats()["coalesced"] < 1:
+            await asyncio.sleep(0.001)
+        fn.release.set()
+        assert await leader == await follower == {"graphType": "Bar", "xAxis": ["Sales"]}
+        assert follower_trace["coalesced"] and fn.calls == 1
+
+    asyncio.run(main())
+
+
+def test_cancelled_follower_does_not_cancel_the_leader():
+    async def main():
+        flights = SingleFlight()
+        fn = Blocking()
+        leader = asyncio.ensure_future(flights.ado("key", fn.acall, {}))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flights.ado("key", fn.acall, {}))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        await asyncio.sleep(0.01)
+        assert not leader.done()
+        fn.release.set()
+        assert await leader == {"graphType": "Bar", "xAxis": ["Sales"]}
+        assert follower.cancelled()
+
+    asyncio.run(main())
+
+
+# ----------------------------------------------------------------------
+# Errors and cleanup
+# ----------------------------------------------------------------------
+
+def test_error_reaches_every_waiter():
+    flights = SingleFlight()
+    error = TimeoutError("LLM call timed out")
+    fn = Blocking(error)
+    threads, outcomes = run_threads(flights, "key", fn, FOLLOWERS + 1)
+    wait_until(lambda: flights.stats()["coalesced"] == FOLLOWERS)
+    fn.release.set()
+    for thread in threads:
+        thread.join()
+    assert fn.calls == 1
+    assert all(outcome is error for outcome, _ in outcomes)
+    assert flights.stats()["coalesced_errors"] == FOLLOWERS
+
+
+def test_async_error_reaches_every_waiter():
+    async def main():
+        flights = SingleFlight()
+        fn = Blocking(ValueError("invalid JSON"))
+        tasks = [asyncio.ensure_future(flights.ado("key", fn.acall, {})) for _ in range(FOLLOWERS + 1)]
+        while flights.stats()["coalesced"] < FOLLOWERS:
+            await asyncio.sleep(0.001)
+        fn.release.set()
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        assert fn.calls == 1
+        assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+        assert flights.stats()["coalesced_errors"] == FOLLOWERS
+
+    asyncio.run(main())
+
+
+def test_key_released_after_success_and_failure():
+    flights = SingleFlight()
+    assert flights.do("key", lambda trace: 1, {}) == 1
+    assert flights.stats()["in_flight"] == 0
+    # A later identical request starts a new computation
+    assert flights.do("key", lambda trace: 2, {}) == 2
+
+    def fail(trace):
+        raise RuntimeError("provider error")
+
+    try:
+        flights.do("key", fail, {})
+        raise AssertionError("error not raised")
+    except RuntimeError:
+        pass
+    assert flights.stats()["in_flight"] == 0
+    assert flights.do("key", lambda trace: 3, {}) == 3
+    assert flights.stats()["executions"] == 4 and flights.stats()["coalesced"] == 0
+
+    async def main():
+        async def afail(trace):
+            raise RuntimeError("provider error")
+
+        try:
+            await flights.ado("key", afail, {})
+            raise AssertionError("error not raised")
+        except RuntimeError:
+            pass
+        assert flights.stats()["in_flight"] == 0
+
+        # A leader cancelled with no follower is retired as well
+        fn = Blocking()
+        leader = asyncio.ensure_future(flights.ado("key", fn.acall, {}))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+        assert flights.stats()["in_flight"] == 0
+
+        async def four(trace):
+            return 4
+
+        assert await flights.ado("key", four, {}) == 4
+
+    asyncio.run(main())
+
+
+def test_no_key_is_never_coalesced():
+    flights = SingleFlight()
+    fn = Blocking()
+    threads, outcomes = run_threads(flights, None, fn, 3)
+    wait_until(lambda: fn.calls == 3)
+    fn.release.set()
+    for thread in threads:
+        thread.join()
+    assert not any(trace.get("coalesced") for _, trace in outcomes)
+
+    async def main():
+        async_fn = Blocking()
+        async_fn.release.set()
+        await asyncio.gather(*(flights.ado(None, async_fn.acall, {}) for _ in range(2)))
+        assert async_fn.calls == 2
+
+    asyncio.run(main())
+    stats = flights.stats()
+    assert stats["bypassed"] == 5 and stats["executions"] == 0 and stats["coalesced"] == 0
+
+
+def main():
+    """Run all tests and print a report."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 SINGLE-FLIGHT TESTS")
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Vector Index Test Suite
+
+Checks src/vector_index.py, the retrieval backends behind
+get_similar_examples. Random vectors stand in for embeddings, so no
+embedding model is needed; the indexes live in temporary directories.
+
+- parity: NumpyIndex returns the same top-k ids, distances and entities as
+  exact cosine search and as the Milvus Lite collection it replaces
+- maintenance: upsert replaces, delete removes, the files and manifest are
+  reloaded by a new instance, drop removes everything
+- concurrency: searches running while rows are added never see a mix of
+  two versions (every hit's distance matches its own row's vector) and end
+  up seeing every row
+- incremental re-indexing (plan_sync/apply_sync over ExampleTable.vector_rows,
+  as in the generator's startup): added, changed and removed examples update
+  only their rows, unchanged examples are not re-embedded, a model change or
+  a missing or stale manifest rebuilds the index
+
+Runs with pytest or standalone:
+    python test_vector_index.py
+    python -m pytest test_vector_index.py -q
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from example_table import ExampleTable
+from vector_index import MilvusIndex, NumpyIndex, create_vector_index
+
+DIM = 16
+FIELDS = ["description", "config"]
+MODEL = {"embedding_provider": "fake", "embedding_model": "fake-model", "dimension": DIM}
+
+
+def print_header(text):
+    """Print a formatted header."""
+    print(f"\n{'='*70}")
+    print(f"  {text}")
+    print(f"{'='*70}\n")
+
+
+def make_rows(count: int, start: int = 0, seed: int = 0):
+    vectors = np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+    return [
+        {"id": start + i, "vector": vectors[i].tolist(), "description": f"example {start + i}",
+         "config": f'{{"graphType": "Bar", "n": {start + i}}}'}
+        for i in range(count)
+    ]
+
+
+def exact_top_k(rows, queries, k):
+    """Reference search: (id, cosine) of the k most similar rows, best first."""
+    matrix = np.asarray([row["vector"] for row in rows], dtype=np.float64)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    results = []
+    for query in np.asarray(queries, dtype=np.float64):
+        scores = matrix @ (query / np.linalg.norm(query))
+        order = np.argsort(-scores, kind="stable")[:k]
+        results.append([(rows[i]["id"], scores[i]) for i in order])
+    return results
+
+
+def make_index(directory: str, rows=None) -> NumpyIndex:
+    index = NumpyIndex(os.path.join(directory, "numpy"))
+    index.create(DIM)
+    if rows:
+        index.insert(rows)
+    return index
+
+
+# ----------------------------------------------------------------------
+# Parity
+# ----------------------------------------------------------------------
+
+def test_top_k_matches_exact_search():
+    rows = make_rows(300)
+    queries = np.random.default_rng(1).normal(size=(20, DIM)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as directory:
+        index = make_index(directory, rows)
+        for k in (1, 5, 25):
+            hits = index.search(queries, k, FIELDS)
+            expected = exact_top_k(rows, queries, k)
+            for query_hits, query_expected in zip(hits, expected):
+                assert [hit["id"] for hit in query_hits] == [row_id for row_id, _ in query_expected]
+                for hit, (_, score) in zip(query_hits, query_expected):
+                    assert abs(hit["distance"] - score) < 1e-5
+        hit = index.search(queries[:1], 1, FIELDS)[0][0]
+        assert hit["entity"] == {"description": f"example {hit['id']}", "config": rows[hit["id"]]["config"]}
+        # A limit beyond the corpus returns every row, best first
+        everything = index.search(queries[:1], 1000)[0]
+        assert len(everything) == 300 and everything[0]["entity"] == {}
+        assert all(a["distance"] >= b["distance"] for a, b in zip(everything, everything[1:]))
+
+
+def test_top_k_matches_milvus():
+    rows = make_rows(200)
+    queries = np.random.default_rng(2).normal(size=(10, DIM)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as directory:
+        milvus = MilvusIndex(os.path.join(directory, "examples.db"))
+        milvus.create(DIM)
+        milvus.insert(rows)
+        index = make_index(directory, rows)
+        milvus_hits = milvus.search(queries, 10, FIELDS)
+        numpy_hits = index.search(queries, 10, FIELDS)
+        for expected, actual in zip(milvus_hits, numpy_hits):
+            assert [hit["id"] for hit in actual] == [hit["id"] for hit in expected]
+            assert [hit["entity"] for hit in actual] == [hit["entity"] for hit in expected]
+            for a, b in zip(actual, expected):
+                assert abs(a["distance"] - b["distance"]) < 1e-4
+        assert milvus.count() == index.count() == 200
+
+
+def test_single_vector_and_empty_index():
+    with tempfile.TemporaryDirectory() as directory:
+        index = make_index(directory)
+        assert index.search([[1.0] * DIM, [0.5] * DIM], 3) == [[], []]
+        index.insert(make_rows(5))
+        # One query vector (not wrapped in a list) is one query
+        assert len(index.search(make_rows(1, seed=9)[0]["vector"], 3)) == 1
+
+
+# ----------------------------------------------------------------------
+# Maintenance
+# ----------------------------------------------------------------------
+
+def test_upsert_delete_and_reload():
+    rows = make_rows(20)
+    with tempfile.TemporaryDirectory() as directory:
+        index = make_index(directory, rows)
+        replacement = dict(rows[3], vector=[1.0] + [0.0] * (DIM - 1), description="replaced")
+        index.upsert([replacement])
+        index.delete([5, 6])
+        assert index.count() == 18
+        hit = index.search([[1.0] + [0.0] * (DIM - 1)], 1, FIELDS)[0][0]
+        assert hit["id"] == 3 and hit["entity"]["description"] == "replaced" and abs(hit["distance"] - 1.0) < 1e-6
+        ids = {hit["id"] for hit in index.search([[1.0] * DIM], 100)[0]}
+        assert 5 not in ids and 6 not in ids and len(ids) == 18
+
+        index.save_manifest({"model": "fake", "rows": {"3": "hash"}})
+        reopened = NumpyIndex(os.path.join(directory, "numpy"))
+        assert reopened.exists() and reopened.count() == 18 and reopened.dimension == DIM
+        assert reopened.load_manifest() == {"model": "fake", "rows": {"3": "hash"}}
+        assert reopened.search([[1.0] + [0.0] * (DIM - 1)], 1)[0][0]["id"] == 3
+
+        reopened.drop()
+        assert not reopened.exists() and reopened.load_manifest() is None and reopened.count() == 0
+        assert not any(Path(directory, "numpy").iterdir())
+
+
+def test_create_vector_index():
+    with tempfile.TemporaryDirectory() as directory:
+        index = create_vector_index("numpy", os.path.join(directory, "canvasxpress_mcp.db"))
+        assert isinstance(index, NumpyIndex) and index.index_dir.name == "canvasxpress_mcp_numpy"
+        try:
+            create_vector_index("faiss", os.path.join(directory, "canvasxpress_mcp.db"))
+            raise AssertionError("unknown backend accepted")
+        except ValueError as e:
+            assert "faiss" in str(e)
+
+
+# ----------------------------------------------------------------------
+# Concurrency
+# ----------------------------------------------------------------------
+
+def test_concurrent_add_and_search():
+    rows = make_rows(400, seed=3)
+    vectors = {row["id"]: np.asarray(row["vector"]) / np.linalg.norm(row["vector"]) for row in rows}
+    query = np.random.default_rng(4).normal(size=DIM)
+    query /= np.linalg.norm(query)
+    errors = []
+    done = threading.Event()
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = make_index(directory, rows[:20])
+
+        def writer():
+            try:
+                for start in range(20, len(rows), 20):
+                    index.insert(rows[start:start + 20])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        def reader():
+            seen = 0
+            try:
+                while not done.is_set() or seen < len(rows):
+                    hits = index.search([query], 1000, ["description"])[0]
+                    # Never fewer rows than a search before, never a hit from another version's rows
+                    assert len(hits) >= seen, f"{len(hits)} hits after {seen}"
+                    seen = len(hits)
+                    for hit in hits:
+                        assert hit["entity"]["description"] == f"example {hit['id']}"
+                        assert abs(hit["distance"] - float(vectors[hit["id"]] @ query)) < 1e-5
+                    assert all(a["distance"] >= b["distance"] for a, b in zip(hits, hits[1:]))
+            except Exception as e:
+                errors.append(e)
+
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        writer_thread = threading.Thread(target=writer)
+        writer_thread.start()
+        writer_thread.join()
+        for thread in readers:
+            thread.join(10)
+        assert not errors, errors[0]
+        assert index.count() == len(rows)
+        assert NumpyIndex(os.path.join(directory, "numpy")).count() == len(rows)
+
+
+# ----------------------------------------------------------------------
+# Incremental re-indexing
+# ----------------------------------------------------------------------
+
+EXAMPLES = [
+    {"id": 1, "description": "Bar chart of sales by region", "alt_descriptions": ["Sales per region as bars"],
+     "config": {"graphType": "Bar", "xAxis": ["Sales"]}, "headers": "Region, Sales"},
+    {"id": 2, "description": "Scatter plot of height against weight",
+     "config": {"graphType": "Scatter2D", "xAxis": ["Height"], "yAxis": ["Weight"]}},
+    {"id": 3, "description": "Pie chart of market share", "config": {"graphType": "Pie"}},
+]
+
+
+class FakeEncoder:
+    """Deterministic embeddings; records every description it embeds."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def vector(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        return np.random.default_rng(seed).normal(size=DIM).astype(np.float32)
+
+    def encode(self, texts):
+        self.embedded.extend(texts)
+        return [self.vector(text).tolist() for text in texts]
+
+
+def reindex(index, examples, encoder, model=MODEL):
+    """The generator's startup re-indexing; returns (rebuild_reason, changed, removed)."""
+    rows = ExampleTable.vector_rows(examples)
+    rebuild_reason, changed, removed = index.plan_sync(rows, model)
+    if rebuild_reason is not None or changed or removed:
+        vectors = encoder.encode([rows[row_id]["description"] for row_id in changed]) if changed else []
+        index.apply_sync(rows, model, rebuild_reason, changed, removed, vectors)
+    return rebuild_reason, changed, removed
+
+
+def descriptions(index, encoder, text):
+    """Descriptions of all stored rows, and the best hit's example for `text`."""
+    hits = index.search([encoder.vector(text)], 100, ["description", "example_id"])[0]
+    return {hit["entity"]["description"] for hit in hits}, hits[0]["entity"]["example_id"]
+
+
+def test_vector_rows():
+    rows = ExampleTable.vector_rows(EXAMPLES)
+    assert len(rows) == 4
+    primary = [row for row in rows.values() if row["is_primary"]]
+    assert sorted(row["example_id"] for row in primary) == [1, 2, 3]
+    # Ids depend on the example id and wording only: stable across edits and reordering
+    assert ExampleTable.vector_rows(list(reversed(EXAMPLES))).keys() == rows.keys()
+    edited = [dict(EXAMPLES[0], config={"graphType": "Line"})] + EXAMPLES[1:]
+    edited_rows = ExampleTable.vector_rows(edited)
+    assert edited_rows.keys() == rows.keys()
+    assert sum(edited_rows[row_id]["hash"] != rows[row_id]["hash"] for row_id in rows) == 2
+    # A repeated wording is stored once; examples without an id use their position
+    repeated = [dict(EXAMPLES[2], alt_descriptions=[EXAMPLES[2]["description"]])]
+    assert len(ExampleTable.vector_rows(repeated)) == 1
+    assert next(iter(ExampleTable.vector_rows([{"description": "x", "config": {}}]).values()))["example_id"] == 0
+
+
+def test_reindex_creates_then_is_up_to_date():
+    encoder = FakeEncoder()
+    with tempfile.TemporaryDirectory() as directory:
+        index = make_index(directory)
+        index.drop()
+        assert reindex(index, EXAMPLES, encoder) == ("creating", list(ExampleTable.vector_rows(EXAMPLES)), [])
+        assert index.count() == 4 and len(encoder.embedded) == 4
+        manifest = index.load_manifest()
+        assert manifest["embedding_model"] == "fake-model" and len(manifest["rows"]) == 4
+        # A restart with the same examples embeds nothing
+        encoder.embedded.clear()
+        reopened = NumpyIndex(os.path.join(directory, "numpy"))
+        assert reindex(reopened, EXAMPLES, encoder) == (None, [], [])
+        assert encoder.embedded == [] and reopened.count() == 4
+
+
+def test_reindex_add_change_delete():
+    changed_examples = [
+        # Example 1: config changed (both wordings), alternative wording removed, one added
+        dict(EXAMPLES[0], alt_descriptions=["Regional sales as a bar chart"], config={"graphType": "Line"}),
+        EXAMPLES[1],  # unchanged
+        # Example 3 removed, example 4 added
+        {"id": 4, "description": "Heatmap of gene expression", "config": {"graphType": "Heatmap"}},
+    ]
+    for backend in ("numpy", "milvus"):
+        encoder = FakeEncoder()
+        with tempfile.TemporaryDirectory() as directory:
+            index = create_vector_index(backend, os.path.join(directory, "examples.db"))
+            reindex(index, EXAMPLES, encoder)
+            encoder.embedded.clear()
+
+            rebuild_reason, changed, removed = reindex(index, changed_examples, encoder)
+            assert rebuild_reason is None and len(changed) == 3 and len(removed) == 2
+            # Only added and changed rows were embedded, not the unchanged example 2
+            assert sorted(encoder.embedded) == sorted([
+                "Bar chart of sales by region", "Regional sales as a bar chart", "Heatmap of gene expression",
+            ]), backend
+            assert index.count() == 4
+            stored, best = descriptions(index, encoder, "Heatmap of gene expression")
+            assert best == 4
+            assert stored == {
+                "Bar chart of sales by region", "Regional sales as a bar chart",
+                "Scatter plot of height against weight", "Heatmap of gene expression",
+            }, backend
+            # The changed config is what the row now stores
+            hit = index.search([encoder.vector("Bar chart of sales by region")], 1, ["config"])[0][0]
+            assert hit["entity"]["config"] == '{"graphType": "Line"}'
+            rows = ExampleTable.vector_rows(changed_examples)
+            assert index.load_manifest()["rows"] == {str(row_id): row["hash"] for row_id, row in rows.items()}
+
+            encoder.embedded.clear()
+            assert reindex(index, changed_examples, encoder) == (None, [], []) and not encoder.embedded
+
+
+def test_reindex_rebuilds_when_the_manifest_cannot_be_trusted():
+    encoder = FakeEncoder()
+    with tempfile.TemporaryDirectory() as directory:
+        index = make_index(directory)
+        index.drop()
+        reindex(index, EXAMPLES, encoder)
+
+        other_model = dict(MODEL, embedding_model="other-model")
+        reason, changed, _ = reindex(index, EXAMPLES, encoder, other_model)
+        assert reason == "embedding model changed (fake-model/16 -> other-model/16)" and len(changed) == 4
+        assert index.load_manifest()["embedding_model"] == "other-model" and index.count() == 4
+
+        index.delete([next(iter(ExampleTable.vector_rows(EXAMPLES)))])
+        assert reindex(index, EXAMPLES, encoder, other_model)[0] == "index out of sync with its manifest"
+        assert index.count() == 4
+
+        index.manifest_path.unlink()
+        encoder.embedded.clear()
+        reason = reindex(index, EXAMPLES, encoder, other_model)[0]
+        assert reason == "no manifest (index predates incremental re-indexing)"
+        assert len(encoder.embedded) == 4 and index.count() == 4
+
+
+def main():
+    """Run all tests and print a report."""
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+
+    print_header("🧪 VECTOR INDEX TESTS")
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+
+    print_header("✅ ALL TESTS PASSED" if not failed else f"❌ {failed} TEST(S) FAILED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())